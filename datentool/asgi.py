@@ -16,9 +16,10 @@ django_asgi_app = get_asgi_application()
 from channels.auth import AuthMiddlewareStack
 from channels.routing import ProtocolTypeRouter, URLRouter
 from datentool.urls import websocket_urlpatterns
+from datentool_backend.utils.query_cancel import DisconnectMiddleware
 
 application = ProtocolTypeRouter({
-    'http': django_asgi_app,
+    'http': DisconnectMiddleware(django_asgi_app),
     'websocket': AuthMiddlewareStack(
         URLRouter(websocket_urlpatterns)
     ),
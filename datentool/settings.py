@@ -309,6 +309,22 @@ MEDIA_ROOT = os.path.join(PUBLIC_DIR, 'media')
 
 DATA_ROOT = os.path.join(BASE_DIR, 'datentool_backend', 'data')
 
+# memory mapped travel time matrices shared by the workers,
+# all workers (web and django_q) have to use the same directory, as the
+# removal of the files is the signal to reload a changed matrix
+MATRIX_CACHE_DIR = os.environ.get('MATRIX_CACHE_DIR',
+                                  os.path.join(BASE_DIR, 'matrix_cache'))
+# number of matrices each worker keeps loaded (least recently used evicted)
+MATRIX_CACHE_MAX_LOADED = int(os.environ.get('MATRIX_CACHE_MAX_LOADED', 8))
+# number of travel times evaluated at once when computing the nearest places
+# of several years and scenarios in one pass (bounds the memory used)
+MATRIX_BATCH_MAX_VALUES = int(os.environ.get('MATRIX_BATCH_MAX_VALUES',
+                                             50_000_000))
+
+# seconds to cache the vector tiles of stored indicator results, 0 to disable
+INDICATOR_TILE_CACHE_TIMEOUT = int(
+    os.environ.get('INDICATOR_TILE_CACHE_TIMEOUT', 3600))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
@@ -317,6 +333,13 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # maximum number of persisted log entries per room
 MAX_N_LOGS = 10000
 
+# record runtime and queries of the indicators and background processes
+PROFILING = str(os.environ.get('PROFILING', False)).lower() == 'true'
+# record the plans of the queries of every profiled call (executes them twice)
+PROFILING_EXPLAIN = False
+# maximum number of persisted profiling records
+MAX_N_PROFILES = 1000
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -355,6 +378,11 @@ LOGGING = {
             'level': 'DEBUG',
             'propagate': False,
         },
+        'analysis': {
+            'handlers': ['web_socket', 'console', 'persist'],
+            'level': 'DEBUG',
+            'propagate': False,
+        },
     },
 }
 
@@ -399,3 +427,24 @@ LOCALE = 'de_DE.utf8'
 STEPSIZE = 100000
 
 ROUTING_ALGORITHM = 'ch'
+
+# engine used per indicator ('sql' or 'sparse'), defaults to 'sql'
+INDICATOR_ENGINES = {}
+
+# seconds after which the queries of an indicator are aborted, 0 to disable
+INDICATOR_STATEMENT_TIMEOUT = int(
+    os.environ.get('INDICATOR_STATEMENT_TIMEOUT', 120))
+# statement timeouts by indicator name overriding the default
+INDICATOR_STATEMENT_TIMEOUTS = {}
+# statement timeout of the indicators computed in the background
+INDICATOR_JOB_STATEMENT_TIMEOUT = int(
+    os.environ.get('INDICATOR_JOB_STATEMENT_TIMEOUT', 0))
+# days after which finished background jobs and their results are removed,
+# 0 to keep them
+INDICATOR_JOB_MAX_AGE = int(os.environ.get('INDICATOR_JOB_MAX_AGE', 7))
+
+# precompute the default indicators of the services after data changes
+INDICATOR_PREWARM = str(
+    os.environ.get('INDICATOR_PREWARM', True)).lower() == 'true'
+# seconds after the last change of the data to start the precomputation
+INDICATOR_PREWARM_DELAY = 60
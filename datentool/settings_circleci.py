@@ -3,6 +3,7 @@ from datentool.settings_dev import *
 
 
 MEDIA_ROOT = mkdtemp(prefix='media_')
+MATRIX_CACHE_DIR = mkdtemp(prefix='matrix_')
 
 DATABASES = {
     'default': {
@@ -3,6 +3,7 @@ from datentool.settings_local import *
 from tempfile import mkdtemp
 
 MEDIA_ROOT = mkdtemp(prefix='media_')
+MATRIX_CACHE_DIR = mkdtemp(prefix='matrix_')
 USE_DJANGO_Q = False
 
 LOGGING['handlers']['debug_console'] = {'level': 'DEBUG',
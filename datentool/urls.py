@@ -28,7 +28,8 @@ from drf_spectacular.views import (SpectacularAPIView,
                                    SpectacularSwaggerView)
 
 from .loggers import LogConsumer
-from datentool_backend.views import (AreaLevelTileView, RasterCellTileView)
+from datentool_backend.views import (AreaLevelTileView, RasterCellTileView,
+                                     IndicatorResultTileView)
 
 from .views import HomePageView
 
@@ -51,6 +52,8 @@ urlpatterns = [
          name="raster-tile"),
     path('tiles/arealevels/<int:pk>/tile/<int:z>/<int:x>/<int:y>/',
          AreaLevelTileView.as_view(), name="areas-tile"),
+    path('tiles/indicators/<str:key>/<int:z>/<int:x>/<int:y>/',
+         IndicatorResultTileView.as_view(), name="indicator-tile"),
     # match all routes to the home page (entry point to angular) to let angular
     # handle the routing, /api and /static routes are still handled by django
     # automatically, for some reason /media is not, so it is excluded here
@@ -1,9 +1,9 @@
 from django.db import models
-from django.db.models import (TextField, F, OuterRef, Subquery,
+from django.db.models import (TextField, F, Q, OuterRef, Subquery,
                               Prefetch, Value,
                               Case, When)
 from django.db.models.functions import Cast, Coalesce, Concat
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.contrib.gis.db import models as gis_models
 
 from datentool_backend.utils.protect_cascade import PROTECT_CASCADE
@@ -158,11 +158,30 @@ class Area(DatentoolModelMixin, models.Model):
         if hasattr(instance, '_attr_dict'):
             instance.attributes = instance._attr_dict
 
+    @staticmethod
+    def post_save_geom(sender, instance, *args, **kwargs):
+        """the places have to be assigned to the areas of the level again"""
+        AreaLevel.objects.filter(pk=instance.area_level_id)\
+            .update(place_cache_dirty=True)
+
+    @staticmethod
+    def remove_overlaps(sender, instance, *args, **kwargs):
+        """
+        the overlaps of the area level with the other area levels are
+        outdated, they are computed again by intersect_area_levels
+        """
+        AreaOverlap.objects.filter(
+            Q(area__area_level=instance.area_level_id) |
+            Q(overlapping_area__area_level=instance.area_level_id)).delete()
+
     def __str__(self) -> str:
         return f'{self.__class__.__name__} ({self.area_level.name}): {self.label}'
 
 
 post_save.connect(Area.post_create, sender=Area)
+post_save.connect(Area.post_save_geom, sender=Area)
+post_save.connect(Area.remove_overlaps, sender=Area)
+post_delete.connect(Area.remove_overlaps, sender=Area)
 
 
 class FieldAttribute(DatentoolModelMixin, NamedModel, models.Model):
@@ -233,3 +252,20 @@ class AreaAttribute(FieldAttribute):
                          is_key=F('field__is_key'),
                          field_name=F('field__name'))
         return qs
+
+
+class AreaOverlap(DatentoolModelMixin, models.Model):
+    """
+    the share of the surface of an area lying in an area of another area level,
+    computed on import to roll up the values of finer area levels to the areas
+    containing them
+    """
+    area = models.ForeignKey(Area, on_delete=models.CASCADE,
+                             related_name='overlaps')
+    overlapping_area = models.ForeignKey(Area, on_delete=models.CASCADE,
+                                         related_name='+')
+    share = models.FloatField(
+        help_text='share of the area lying in the overlapping area')
+
+    class Meta:
+        unique_together = [['area', 'overlapping_area']]
@@ -24,6 +24,8 @@ class AreaLevel(DatentoolModelMixin, NamedModel, models.Model):
     is_pop_level = models.BooleanField(default=False)
     max_population = models.FloatField(null=True)
     population_cache_dirty = models.BooleanField(default=True)
+    # the assignment of the places to the areas has to be recalculated
+    place_cache_dirty = models.BooleanField(default=True)
 
     @property
     def label_field(self) -> str:
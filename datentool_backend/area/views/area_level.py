@@ -47,6 +47,7 @@ from datentool_backend.utils.permissions import (HasAdminAccessOrReadOnly,
 from datentool_backend.utils.processes import RunProcessMixin, ProcessScope
 
 from datentool_backend.utils.pop_aggregation import (intersect_areas_with_raster,
+                                                     intersect_area_levels,
                                                      aggregate_population)
 from datentool_backend.utils.layermapping import CustomLayerMapping
 
@@ -356,6 +357,8 @@ class AreaLevelViewSet(RunProcessMixin,
         areas = Area.objects.filter(area_level=area_level)
         logger.info('Verschneide Gebiete mit dem Bevölkerungsraster')
         intersect_areas_with_raster(areas, drop_constraints=True)
+        logger.info('Verschneide Gebiete mit den anderen Gebietseinheiten')
+        intersect_area_levels(areas)
         logger.info('Aggregiere Bevölkerungsdaten auf neue Gebiete hoch')
         n_pop = Population.objects.count()
         for i, population in enumerate(Population.objects.all()):
@@ -498,6 +501,8 @@ class AreaLevelViewSet(RunProcessMixin,
         if areas:
             logger.info('Verschneide Gebiete mit dem Bevölkerungsraster')
             intersect_areas_with_raster(areas, drop_constraints=True)
+            logger.info('Verschneide Gebiete mit den anderen Gebietseinheiten')
+            intersect_area_levels(areas)
             logger.info('Aggregiere Bevölkerungsdaten auf neue Gebiete hoch')
             n_pop = Population.objects.count()
             for i, population in enumerate(Population.objects.all()):
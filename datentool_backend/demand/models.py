@@ -2,7 +2,10 @@ from django.db import models, transaction
 
 from datentool_backend.base import NamedModel
 from datentool_backend.infrastructure.models import Service
-from datentool_backend.population.models import Year, AgeGroup, Gender
+from datentool_backend.population.models import (Year, AgeGroup, Gender,
+                                                 Population,
+                                                 RasterCell,
+                                                 RasterCellPopulation)
 from datentool_backend.utils.protect_cascade import PROTECT_CASCADE
 from datentool_backend.base import NamedModel, DatentoolModelMixin
 
@@ -49,4 +52,53 @@ class DemandRate(models.Model):
     age_group = models.ForeignKey(AgeGroup, on_delete=models.CASCADE)
     gender = models.ForeignKey(Gender, on_delete=models.CASCADE)
     demand_rate_set = models.ForeignKey(DemandRateSet, on_delete=models.CASCADE)
-    value = models.FloatField(null=True)
\ No newline at end of file
+    value = models.FloatField(null=True)
+
+
+class CellDemandCache(DatentoolModelMixin, models.Model):
+    """
+    state of the materialized demand per raster cell for a service
+    with a population and a demand rate set
+    """
+    population = models.ForeignKey(Population, on_delete=models.CASCADE)
+    service = models.ForeignKey(Service, on_delete=models.CASCADE)
+    demand_rate_set = models.ForeignKey(DemandRateSet, null=True,
+                                        on_delete=models.CASCADE)
+    demand_rates_hash = models.TextField(blank=True, default='',
+                                         help_text='hash of the demand rates '
+                                         'the demand was derived from')
+    up_to_date = models.BooleanField(default=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                name='celldemandcache_population_service_drs_uniq',
+                fields=('population', 'service', 'demand_rate_set')
+            ),
+            models.UniqueConstraint(
+                name='celldemandcache_population_service_nodrs_uniq',
+                fields=('population', 'service'),
+                condition=models.Q(demand_rate_set__isnull=True)
+            )
+        ]
+
+    @classmethod
+    def invalidate(cls, population_ids=None):
+        """mark the demand of the given populations as outdated"""
+        qs = cls.objects.all()
+        if population_ids is not None:
+            qs = qs.filter(population__in=population_ids)
+        qs.update(up_to_date=False)
+
+
+class CellDemand(models.Model):
+    """materialized demand of a service in a raster cell"""
+    cache = models.ForeignKey(CellDemandCache, on_delete=models.CASCADE,
+                              related_name='cell_demands')
+    rastercellpop = models.ForeignKey(RasterCellPopulation,
+                                      on_delete=models.CASCADE)
+    cell = models.ForeignKey(RasterCell, on_delete=models.CASCADE)
+    value = models.FloatField()
+
+    class Meta:
+        unique_together = ['cache', 'rastercellpop']
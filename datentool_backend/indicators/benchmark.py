@@ -0,0 +1,184 @@
+import time
+import json
+import statistics
+from typing import Callable, Dict, List
+
+from django.db import connection
+
+from datentool_backend.area.models import AreaLevel
+from datentool_backend.infrastructure.models import Service
+from datentool_backend.places.models import Capacity, Scenario
+from datentool_backend.population.models import RasterCellPopulation
+from datentool_backend.site.models import Year
+from datentool_backend.modes.models import Mode
+from datentool_backend.logging.profiling import QueryProfiler
+from datentool_backend.indicators.compute import (
+    ComputeIndicator,
+    ServiceIndicator,
+    ComputePopulationAreaIndicator,
+    NumberOfLocations,
+    TotalCapacityInArea,
+    DemandAreaIndicator,
+    ComputePopulationDetailIndicator,
+    ReachabilityPlace,
+    ReachabilityCell,
+    ReachabilityNextPlace,
+    CumulativeOpportunitiesCell,
+    CumulativeOpportunitiesArea,
+    ReachabilityDistribution,
+    ClosureImpact,
+    HuffModel,
+)
+
+
+FIXED_INDICATORS = [
+    ComputePopulationAreaIndicator,
+    NumberOfLocations,
+    TotalCapacityInArea,
+    DemandAreaIndicator,
+    ComputePopulationDetailIndicator,
+    ReachabilityPlace,
+    ReachabilityCell,
+    ReachabilityNextPlace,
+    CumulativeOpportunitiesCell,
+    CumulativeOpportunitiesArea,
+    ReachabilityDistribution,
+    ClosureImpact,
+    HuffModel,
+]
+
+
+class BenchmarkCase:
+    """an indicator with fixed parameters"""
+
+    def __init__(self, name: str, create: Callable[[], ComputeIndicator]):
+        self.name = name
+        self.create = create
+
+    def run(self, repeat: int = 3) -> Dict[str, object]:
+        """
+        compute and serialize the indicator `repeat` times, return the
+        timings of the first (cold) and the median of the following (warm)
+        runs and the number of queries and rows of the last run
+        """
+        timings = []
+        for i in range(repeat):
+            profiler = QueryProfiler()
+            indicator = self.create()
+            start = time.perf_counter()
+            with connection.execute_wrapper(profiler):
+                indicator.serialize(indicator.evaluate())
+            timings.append(time.perf_counter() - start)
+        warm = timings[1:] or timings
+        return {'first': timings[0],
+                'time': statistics.median(warm),
+                'sql_time': profiler.sql_time,
+                'n_queries': profiler.n_queries,
+                'n_rows': profiler.n_rows, }
+
+
+def get_default_params(mode: Mode = Mode.WALK) -> Dict[str, object]:
+    """
+    fixed parameters for the indicators taken from the project: the first
+    service, scenario and place with a capacity, a prognosis year, the default
+    population area level and the first inhabited cell
+    """
+    service = Service.objects.order_by('id').first()
+    if not service:
+        raise ValueError('no services defined')
+    years = list(Year.objects.order_by('year').values_list('year', flat=True))
+    year = years[1] if len(years) > 1 else (years[0] if years else 0)
+    area_level = AreaLevel.objects.filter(is_default_pop_level=True).first() \
+        or AreaLevel.objects.order_by('id').first()
+    scenario = Scenario.objects.order_by('id').first()
+    place_id = Capacity.objects.filter(service=service, capacity__gt=0,
+                                       scenario__isnull=True)\
+        .order_by('place_id').values_list('place_id', flat=True).first()
+    rcp = RasterCellPopulation.objects.order_by('id')\
+        .select_related('cell').first()
+    return {'service': service.id,
+            'services': [service.id],
+            'area_level': area_level.id if area_level else None,
+            'year': year,
+            'scenario': scenario.id if scenario else None,
+            'mode': mode.value,
+            'cutoff': 15,
+            'cutoffs': [5, 10, 15],
+            'place': place_id,
+            'places': [place_id] if place_id else [],
+            'cell_code': rcp.cell.cellcode if rcp else None, }
+
+
+def get_cases(params: Dict[str, object],
+              names: List[str] = None) -> List[BenchmarkCase]:
+    """the registered service indicators and the fixed indicators"""
+    service = Service.objects.get(id=params['service'])
+    cases = []
+    for name, indicator_class in sorted(ServiceIndicator.registered.items()):
+        cases.append(BenchmarkCase(
+            name, lambda cls=indicator_class: cls(service, dict(params))))
+    for indicator_class in FIXED_INDICATORS:
+        if issubclass(indicator_class, ServiceIndicator):
+            create = lambda cls=indicator_class: cls(service, dict(params))
+        else:
+            create = lambda cls=indicator_class: cls(dict(params))
+        cases.append(BenchmarkCase(indicator_class.__name__.lower(), create))
+    if names:
+        cases = [case for case in cases if case.name in names]
+    return cases
+
+
+def run_benchmark(cases: List[BenchmarkCase],
+                  repeat: int = 3,
+                  callback: Callable[[str, dict], None] = None
+                  ) -> Dict[str, dict]:
+    """run the cases, failing cases are recorded with their error"""
+    results = {}
+    for case in cases:
+        try:
+            result = case.run(repeat=repeat)
+        except Exception as e:
+            result = {'error': repr(e)}
+        results[case.name] = result
+        if callback:
+            callback(case.name, result)
+    return results
+
+
+def compare(results: Dict[str, dict],
+            baseline: Dict[str, dict],
+            threshold: float = 0.2,
+            min_delta: float = 0.05) -> List[str]:
+    """
+    compare the results with the baseline, return the regressions:
+    failing indicators, more queries or a (warm) time exceeding the
+    baseline by more than the relative threshold and at least `min_delta`
+    seconds (to ignore noise of fast indicators)
+    """
+    regressions = []
+    for name, result in results.items():
+        if 'error' in result:
+            regressions.append(f'{name}: {result["error"]}')
+            continue
+        base = baseline.get(name)
+        if not base or 'error' in base:
+            continue
+        if result['n_queries'] > base['n_queries']:
+            regressions.append(f'{name}: {result["n_queries"]} queries '
+                               f'instead of {base["n_queries"]}')
+        delta = result['time'] - base['time']
+        if delta > min_delta and delta > base['time'] * threshold:
+            regressions.append(f'{name}: {result["time"]:.3f}s instead of '
+                               f'{base["time"]:.3f}s '
+                               f'(+{delta / base["time"]:.0%})')
+    return regressions
+
+
+def load_baseline(path: str) -> Dict[str, dict]:
+    with open(path) as f:
+        return json.load(f)['results']
+
+
+def save_baseline(path: str, results: Dict[str, dict], meta: dict = None):
+    with open(path, 'w') as f:
+        json.dump({'meta': meta or {}, 'results': results}, f, indent=2)
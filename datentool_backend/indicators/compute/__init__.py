@@ -4,3 +4,7 @@ from .population import *
 from .demand import *
 from .assessments import *
 from.reachabilities import *
+from .opportunities import *
+from .distribution import *
+from .closure_impact import *
+from .huff import *
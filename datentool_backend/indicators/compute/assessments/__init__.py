@@ -8,3 +8,5 @@ from .cutoff_area_reachability import CutoffAreaReachability
 from .average_place_reachability import AveragePlaceReachability
 from .max_place_reachability import MaxPlaceReachability
 from .max_raster_reachability import MaxRasterReachability
+from .floating_catchment import TwoStepFloatingCatchment
+from .mode_comparison import ModeComparisonCell, ModeComparisonArea
@@ -4,13 +4,13 @@ from datentool_backend.indicators.compute.base import (register_indicator,
                                                        ResultSerializer)
 from datentool_backend.indicators.compute.population import PopulationIndicatorMixin
 from datentool_backend.indicators.compute.reachabilities import ModeVariantMixin
+from datentool_backend.indicators.compute.sparse import SparseMatrixMixin
 
-from datentool_backend.indicators.models import MatrixCellPlace
-from datentool_backend.places.models import Place, Service
+from datentool_backend.places.models import Place
 
 
 @register_indicator()
-class AccessibleDemandPerPlace(ModeVariantMixin, PopulationIndicatorMixin, ServiceIndicator):
+class AccessibleDemandPerPlace(ModeVariantMixin, SparseMatrixMixin, PopulationIndicatorMixin, ServiceIndicator):
     '''Anzahl der Nachfragenden nach der betrachteten Leistung aus allen
     Gebietseinheiten, für welche die betreffende Einrichtung mit dieser Leistung
     am besten mit einem bestimmten Verkehrsmittel erreichbar ist.'''
@@ -37,13 +37,10 @@ class AccessibleDemandPerPlace(ModeVariantMixin, PopulationIndicatorMixin, Servi
         if not variant:
             return []
 
-        service = Service.objects.get(id=service_id)
-        partition_id = [variant.id, service.infrastructure_id]
-        places = self.get_places_with_capacities(service_id, year, scenario_id)
-        cells_places = MatrixCellPlace.objects.filter(variant=variant,
-                                                      place__in=places,
-                                                      partition_id=partition_id)
-        q_cp, p_cp = cells_places.query.sql_with_params()
+        nearest_places = self.get_nearest_places(service_id, year,
+                                                 scenario_id, variant)
+        q_np, p_np = nearest_places.values(
+            'cell_id', 'place_id', 'minutes').query.sql_with_params()
 
         q_demand, p_demand = self.get_cell_demand(scenario_id, service_id)
 
@@ -53,20 +50,32 @@ class AccessibleDemandPerPlace(ModeVariantMixin, PopulationIndicatorMixin, Servi
         query = f'''SELECT
         c."place_id" AS id,
         sum(d."value") AS "value"
-        FROM (
-        SELECT
-        cp."cell_id",
-        cp."place_id",
-        cp."minutes",
-        row_number() OVER(PARTITION BY cp."cell_id" ORDER BY cp."minutes" ASC) AS rn
-        FROM
-        ({q_cp}) cp
-        ) c,
+        FROM ({q_np}) c,
         ({q_demand}) d
-        WHERE c.rn = 1
-        AND c."cell_id" = d."cell_id"
+        WHERE c."cell_id" = d."cell_id"
         GROUP BY c."place_id"
         '''
-        params = p_cp + p_demand
+        params = p_np + p_demand
         places_with_demand = Place.objects.raw(query, params)
         return places_with_demand
+
+    def compute_sparse(self):
+        service_id = self.data.get('service')
+        year = self.data.get('year', 0)
+        scenario_id = self.data.get('scenario')
+        mode = self.data.get('mode')
+        variant = self.get_mode_variant(mode, scenario_id)
+        if not variant:
+            return []
+
+        matrix = self.get_matrix(service_id, variant.id)
+        place_ids = self.get_open_place_ids(service_id, year, scenario_id)
+        nearest = self.get_nearest_df(matrix, place_ids)
+        demand = self.get_cell_demand_df(scenario_id, service_id)
+        if demand is None:
+            return []
+
+        df = demand.merge(nearest, on='cell_id')
+        values = df.groupby('place_id')['value'].sum()
+        return [{'id': place_id, 'value': value}
+                for place_id, value in values.items()]
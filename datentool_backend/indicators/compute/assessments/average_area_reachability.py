@@ -1,21 +1,25 @@
+from typing import List
+
+import numpy as np
+import pandas as pd
 from django.core.exceptions import BadRequest
 
 from datentool_backend.indicators.compute.base import (register_indicator,
                                                        ServiceIndicator,
-                                                       Service,
                                                        ModeParameter,
                                                        ResultSerializer)
 
 from datentool_backend.indicators.compute.population import PopulationIndicatorMixin
 from datentool_backend.indicators.compute.reachabilities import ModeVariantMixin
-from datentool_backend.population.models import AreaCell
+from datentool_backend.indicators.compute.sparse import SparseMatrixMixin
+from datentool_backend.population.models import (AreaCell,
+                                                 RasterCellPopulation)
 
-from datentool_backend.indicators.models import MatrixCellPlace
 from datentool_backend.area.models import Area
 
 
 @register_indicator()
-class AverageAreaReachability(ModeVariantMixin, PopulationIndicatorMixin, ServiceIndicator):
+class AverageAreaReachability(ModeVariantMixin, SparseMatrixMixin, PopulationIndicatorMixin, ServiceIndicator):
     '''Mittlerer Zeitaufwand der Nachfragenden aus einer Gebietseinheit, um mit
     einem bestimmten Verkehrsmittel die nächste Einrichtung mit der betrachteten
     Leistung zu erreichen'''
@@ -24,6 +28,7 @@ class AverageAreaReachability(ModeVariantMixin, PopulationIndicatorMixin, Servic
     representation = 'colorramp'
     colormap_name = 'Reds'
     result_serializer = ResultSerializer.AREA
+    incremental = 'area'
     unit = 'Minuten'
 
     @property
@@ -42,8 +47,6 @@ class AverageAreaReachability(ModeVariantMixin, PopulationIndicatorMixin, Servic
         variant = self.get_mode_variant(mode, scenario_id)
         if not variant:
             return []
-        service = Service.objects.get(id=service_id)
-        partition_id = [variant.id, service.infrastructure_id]
 
         if area_level_id is None:
             raise BadRequest('No AreaLevel provided')
@@ -53,11 +56,10 @@ class AverageAreaReachability(ModeVariantMixin, PopulationIndicatorMixin, Servic
 
         acells = AreaCell.objects.filter(area__area_level_id=area_level_id)
 
-        places = self.get_places_with_capacities(service_id, year, scenario_id)
-        cells_places = MatrixCellPlace.objects.filter(variant=variant,
-                                                      place__in=places,
-                                                      partition_id=partition_id)
-        q_cp, p_cp = cells_places.query.sql_with_params()
+        nearest_places = self.get_nearest_places(service_id, year,
+                                                 scenario_id, variant)
+        q_np, p_np = nearest_places.values(
+            'cell_id', 'place_id', 'minutes').query.sql_with_params()
 
         q_demand, p_demand = self.get_cell_demand(scenario_id, service_id)
         if not p_demand:
@@ -77,24 +79,122 @@ class AverageAreaReachability(ModeVariantMixin, PopulationIndicatorMixin, Servic
         ELSE sum(c."minutes" * d."value" * ac."share_area_of_cell") /
              sum(d."value" * ac."share_area_of_cell")
         END AS value
-        FROM (
-        SELECT
-        cp."cell_id",
-        cp."place_id",
-        cp."minutes",
-        row_number() OVER(PARTITION BY cp."cell_id" ORDER BY cp."minutes" ASC) AS rn
-        FROM
-        ({q_cp}) cp
-        ) c,
+        FROM ({q_np}) c,
         ({q_demand}) d,
         ({q_acells}) AS ac
-        WHERE c.rn = 1
-        AND c."cell_id" = d."cell_id"
+        WHERE c."cell_id" = d."cell_id"
         AND ac."rastercellpop_id" = d."rastercellpop_id"
         GROUP BY ac."area_id"
         ) val ON (val."area_id" = a."id")
         '''
-        params = p_areas + p_cp + p_demand + p_acells
+        params = p_areas + p_np + p_demand + p_acells
         area_with_average_minutes = Area.objects.raw(query, params)
         return area_with_average_minutes
 
+    def compute_sparse(self):
+        service_id = self.data.get('service')
+        year = self.data.get('year', 0)
+        scenario_id = self.data.get('scenario')
+        area_level_id = self.data.get('area_level')
+        mode = self.data.get('mode')
+        variant = self.get_mode_variant(mode, scenario_id)
+        if not variant:
+            return []
+
+        if area_level_id is None:
+            raise BadRequest('No AreaLevel provided')
+        areas = self.get_areas(area_level_id=area_level_id)
+
+        demand = self.get_cell_demand_df(scenario_id, service_id)
+        if demand is None:
+            return [{'id': area_id, 'label': label, 'value': 0}
+                    for area_id, label in areas.values_list('id', '_label')]
+
+        matrix = self.get_matrix(service_id, variant.id)
+        place_ids = self.get_open_place_ids(service_id, year, scenario_id)
+        nearest = self.get_nearest_df(matrix, place_ids)
+        df = demand.merge(nearest, on='cell_id')\
+            .merge(self.get_area_cells_df(area_level_id), on='rastercellpop_id')
+        df['weight'] = df['value'] * df['share_area_of_cell']
+
+        values = self.weighted_mean(df, 'area_id', 'minutes', 'weight')
+        return self.get_area_results(areas, values)
+
+    @classmethod
+    def compute_sparse_batch(cls,
+                             indicators: List['AverageAreaReachability']
+                             ) -> List[List[dict]]:
+        """
+        the results of several years, scenarios or modes in one pass: the
+        minutes are weighted with the demand of all combinations at once
+        """
+        first = indicators[0]
+        area_level_id = first.data.get('area_level')
+        if area_level_id is None:
+            raise BadRequest('No AreaLevel provided')
+        areas = first.get_areas(area_level_id=area_level_id)
+        area_cells = first.get_area_cells_df(area_level_id)
+        area_ids, area_idx = np.unique(area_cells['area_id'].to_numpy(),
+                                       return_inverse=True)
+        rcp_ids = area_cells['rastercellpop_id'].to_numpy()
+        cell_of_rcp = dict(RasterCellPopulation.objects
+                           .filter(id__in=np.unique(rcp_ids).tolist())
+                           .values_list('id', 'cell_id'))
+        cell_ids = np.array([cell_of_rcp.get(rcp_id, -1)
+                             for rcp_id in rcp_ids], dtype=np.int64)
+
+        nearest = cls.get_nearest_minutes_batch(indicators)
+        # demand weighted with the share of the area and the minutes of the
+        # area cells (combinations x area cells)
+        n_pairs = len(area_cells)
+        weights = np.zeros((len(indicators), n_pairs))
+        minutes = np.zeros((len(indicators), n_pairs))
+        no_demand = np.zeros(len(indicators), dtype=bool)
+        rows_by_matrix = {}
+        for i, indicator in enumerate(indicators):
+            if nearest[i] is None:
+                continue
+            data = indicator.data
+            demand = indicator.get_cell_demand_df(data.get('scenario'),
+                                                  data.get('service'))
+            if demand is None:
+                no_demand[i] = True
+                continue
+            matrix, cell_minutes = nearest[i]
+            if id(matrix) not in rows_by_matrix:
+                rows_by_matrix[id(matrix)] = matrix.get_rows(cell_ids)
+            rows = rows_by_matrix[id(matrix)]
+            pair_minutes = np.where(rows >= 0, cell_minutes[rows], np.nan)
+            pair_demand = demand.groupby('rastercellpop_id')['value'].sum()\
+                .reindex(rcp_ids, fill_value=0).to_numpy()
+            reachable = ~np.isnan(pair_minutes)
+            weights[i] = np.where(
+                reachable,
+                pair_demand * area_cells['share_area_of_cell'].to_numpy(), 0)
+            minutes[i] = np.where(reachable, pair_minutes, 0)
+
+        # sum up the weights and the weighted minutes of all combinations
+        n_areas = len(area_ids)
+        index = (np.arange(len(indicators))[:, None] * n_areas
+                 + area_idx[None, :]).ravel()
+        size = len(indicators) * n_areas
+        shape = (len(indicators), n_areas)
+        weighted = np.bincount(index, weights=(weights * minutes).ravel(),
+                               minlength=size).reshape(shape)
+        total = np.bincount(index, weights=weights.ravel(),
+                            minlength=size).reshape(shape)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = np.where(total != 0, weighted / total, np.nan)
+
+        results = []
+        for i in range(len(indicators)):
+            if nearest[i] is None:
+                results.append([])
+            elif no_demand[i]:
+                results.append(
+                    [{'id': area_id, 'label': label, 'value': 0}
+                     for area_id, label in areas.values_list('id', '_label')])
+            else:
+                results.append(first.get_area_results(
+                    areas, pd.Series(means[i], index=area_ids)))
+        return results
@@ -1,17 +1,18 @@
+import numpy as np
 from datentool_backend.indicators.compute.base import (register_indicator,
                                                        ServiceIndicator,
                                                        ModeParameter,
                                                        ResultSerializer)
 from datentool_backend.indicators.compute.population import PopulationIndicatorMixin
 from datentool_backend.indicators.compute.reachabilities import ModeVariantMixin
+from datentool_backend.indicators.compute.sparse import SparseMatrixMixin
 
-from datentool_backend.indicators.models import MatrixCellPlace
 from datentool_backend.infrastructure.models import Service
 from datentool_backend.places.models import Place
 
 
 @register_indicator()
-class AveragePlaceReachability(ModeVariantMixin, PopulationIndicatorMixin, ServiceIndicator):
+class AveragePlaceReachability(ModeVariantMixin, SparseMatrixMixin, PopulationIndicatorMixin, ServiceIndicator):
     '''Mittlere Wegezeit der Nachfragenden aus allen Gebietseinheiten, für
     welche die betreffende Einrichtung mit einem bestimmten Verkehrsmittel die
     am schnellsten erreichbar ist'''
@@ -50,14 +51,10 @@ class AveragePlaceReachability(ModeVariantMixin, PopulationIndicatorMixin, Servi
         if not variant:
             return []
 
-        service = Service.objects.get(id=service_id)
-        partition_id = [variant.id, service.infrastructure_id]
-
-        places = self.get_places_with_capacities(service_id, year, scenario_id)
-        cells_places = MatrixCellPlace.objects.filter(variant=variant,
-                                                      place__in=places,
-                                                      partition_id=partition_id)
-        q_cp, p_cp = cells_places.query.sql_with_params()
+        nearest_places = self.get_nearest_places(service_id, year,
+                                                 scenario_id, variant)
+        q_np, p_np = nearest_places.values(
+            'cell_id', 'place_id', 'minutes').query.sql_with_params()
 
         q_demand, p_demand = self.get_cell_demand(scenario_id, service_id)
         if not p_demand:
@@ -69,20 +66,32 @@ class AveragePlaceReachability(ModeVariantMixin, PopulationIndicatorMixin, Servi
         THEN NULL
         ELSE sum(c."minutes" * d."value") / sum(d."value")
         END AS value
-        FROM (
-        SELECT
-        cp."cell_id",
-        cp."place_id",
-        cp."minutes",
-        row_number() OVER(PARTITION BY cp."cell_id" ORDER BY cp."minutes" ASC) AS rn
-        FROM
-        ({q_cp}) cp
-        ) c,
+        FROM ({q_np}) c,
         ({q_demand}) d
-        WHERE c.rn = 1
-        AND c."cell_id" = d."cell_id"
+        WHERE c."cell_id" = d."cell_id"
         GROUP BY c."place_id"
         '''
-        params = p_cp + p_demand
+        params = p_np + p_demand
         places_with_average_minutes = Place.objects.raw(query, params)
         return places_with_average_minutes
+
+    def compute_sparse(self):
+        service_id = self.data.get('service')
+        year = self.data.get('year', 0)
+        scenario_id = self.data.get('scenario')
+        mode = self.data.get('mode')
+        variant = self.get_mode_variant(mode, scenario_id)
+        if not variant:
+            return []
+
+        matrix = self.get_matrix(service_id, variant.id)
+        place_ids = self.get_open_place_ids(service_id, year, scenario_id)
+        nearest = self.get_nearest_df(matrix, place_ids)
+        demand = self.get_cell_demand_df(scenario_id, service_id)
+        if demand is None:
+            return []
+
+        df = demand.merge(nearest, on='cell_id')
+        values = self.weighted_mean(df, 'place_id', 'minutes', 'value')
+        return [{'id': place_id, 'value': None if np.isnan(value) else value}
+                for place_id, value in values.items()]
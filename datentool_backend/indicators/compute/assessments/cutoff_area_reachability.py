@@ -7,15 +7,15 @@ from datentool_backend.indicators.compute.base import (register_indicator,
 
 from datentool_backend.indicators.compute.population import PopulationIndicatorMixin
 from datentool_backend.indicators.compute.reachabilities import ModeVariantMixin
+from datentool_backend.indicators.compute.sparse import SparseMatrixMixin
 from datentool_backend.population.models import AreaCell
 
 from datentool_backend.infrastructure.models import Service
-from datentool_backend.indicators.models import MatrixCellPlace
 from datentool_backend.area.models import Area
 
 
 @register_indicator()
-class CutoffAreaReachability(ModeVariantMixin, PopulationIndicatorMixin, ServiceIndicator):
+class CutoffAreaReachability(ModeVariantMixin, SparseMatrixMixin, PopulationIndicatorMixin, ServiceIndicator):
     '''Anteil der Nachfragenden aus einer Gebietseinheit, welche die nächste
     Einrichtung mit der betrachteten Leistung innerhalb oder außerhalb der
     Gebietseinheit in maximal … Minuten mit einem bestimmter Verkehrsmittel
@@ -30,6 +30,7 @@ class CutoffAreaReachability(ModeVariantMixin, PopulationIndicatorMixin, Service
     representation = 'colorramp'
     colormap_name = 'Greens'
     result_serializer = ResultSerializer.AREA
+    incremental = 'area'
 
     @property
     def description(self):
@@ -58,8 +59,6 @@ class CutoffAreaReachability(ModeVariantMixin, PopulationIndicatorMixin, Service
         if not variant:
             return []
         cutoff = self.data.get('cutoff')
-        service = Service.objects.get(id=service_id)
-        partition_id = [variant.id, service.infrastructure_id]
 
         if area_level_id is None:
             raise BadRequest('No AreaLevel provided')
@@ -69,11 +68,10 @@ class CutoffAreaReachability(ModeVariantMixin, PopulationIndicatorMixin, Service
 
         acells = AreaCell.objects.filter(area__area_level_id=area_level_id)
 
-        places = self.get_places_with_capacities(service_id, year, scenario_id)
-        cells_places = MatrixCellPlace.objects.filter(variant=variant,
-                                                      place__in=places,
-                                                      partition_id=partition_id)
-        q_cp, p_cp = cells_places.query.sql_with_params()
+        nearest_places = self.get_nearest_places(service_id, year,
+                                                 scenario_id, variant)
+        q_np, p_np = nearest_places.values(
+            'cell_id', 'place_id', 'minutes').query.sql_with_params()
 
         q_acells, p_acells = acells.values(
             'area_id', 'rastercellpop_id', 'share_area_of_cell').query.sql_with_params()
@@ -94,24 +92,46 @@ class CutoffAreaReachability(ModeVariantMixin, PopulationIndicatorMixin, Service
         ELSE sum((c."minutes" <= %s)::INTEGER::DOUBLE PRECISION * d."value" * ac."share_area_of_cell") /
              sum(d."value" * ac."share_area_of_cell") * 100
         END AS value
-        FROM (
-        SELECT
-        cp."cell_id",
-        cp."place_id",
-        cp."minutes",
-        row_number() OVER(PARTITION BY cp."cell_id" ORDER BY cp."minutes" ASC) AS rn
-        FROM
-        ({q_cp}) cp
-        ) c,
+        FROM ({q_np}) c,
         ({q_demand}) d,
         ({q_acells}) AS ac
-        WHERE c.rn = 1
-        AND c."cell_id" = d."cell_id"
+        WHERE c."cell_id" = d."cell_id"
         AND ac."rastercellpop_id" = d."rastercellpop_id"
         GROUP BY ac."area_id"
         ) val ON (val."area_id" = a."id")
         '''
-        params = p_areas + (cutoff, ) + p_cp + p_demand + p_acells
+        params = p_areas + (cutoff, ) + p_np + p_demand + p_acells
 
         share_of_area_demand_below_cutoff = Area.objects.raw(query, params)
         return share_of_area_demand_below_cutoff
+
+    def compute_sparse(self):
+        service_id = self.data.get('service')
+        year = self.data.get('year', 0)
+        scenario_id = self.data.get('scenario')
+        area_level_id = self.data.get('area_level')
+        mode = self.data.get('mode')
+        variant = self.get_mode_variant(mode, scenario_id)
+        if not variant:
+            return []
+        cutoff = self.data.get('cutoff')
+
+        if area_level_id is None:
+            raise BadRequest('No AreaLevel provided')
+        areas = self.get_areas(area_level_id=area_level_id)
+
+        demand = self.get_cell_demand_df(scenario_id, service_id)
+        if demand is None:
+            return [{'id': area_id, 'label': label, 'value': 0}
+                    for area_id, label in areas.values_list('id', '_label')]
+
+        matrix = self.get_matrix(service_id, variant.id)
+        place_ids = self.get_open_place_ids(service_id, year, scenario_id)
+        nearest = self.get_nearest_df(matrix, place_ids)
+        df = demand.merge(nearest, on='cell_id')\
+            .merge(self.get_area_cells_df(area_level_id), on='rastercellpop_id')
+        df['weight'] = df['value'] * df['share_area_of_cell']
+        df['below_cutoff'] = (df['minutes'] <= float(cutoff)).astype(float)
+
+        values = self.weighted_mean(df, 'area_id', 'below_cutoff', 'weight')
+        return self.get_area_results(areas, values * 100)
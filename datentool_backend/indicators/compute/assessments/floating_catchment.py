@@ -0,0 +1,176 @@
+import numpy as np
+import pandas as pd
+from django.core.exceptions import BadRequest
+
+from datentool_backend.indicators.compute.base import (register_indicator,
+                                                       ServiceIndicator,
+                                                       ModeParameter,
+                                                       IndicatorNumberParameter,
+                                                       IndicatorChoiceParameter,
+                                                       ResultSerializer)
+from datentool_backend.indicators.compute.population import PopulationIndicatorMixin
+from datentool_backend.indicators.compute.reachabilities import (
+    ModeVariantMixin, get_cutoff_time)
+from datentool_backend.indicators.compute.sparse import SparseMatrixMixin
+from datentool_backend.indicators.models import MatrixCellPlace
+from datentool_backend.modes.models import ModeVariant
+from datentool_backend.population.models import RasterCell
+
+
+@register_indicator()
+class TwoStepFloatingCatchment(ModeVariantMixin, SparseMatrixMixin, PopulationIndicatorMixin, ServiceIndicator):
+    '''Kapazitätseinheiten der betrachteten Leistung pro 100 Nachfragenden,
+    die von jedem Wohnstandort aus innerhalb von maximal … Minuten erreichbar
+    sind. Die Kapazität jeder Einrichtung wird dabei auf alle Nachfragenden
+    in ihrem Einzugsbereich aufgeteilt (Two-Step Floating Catchment Area,
+    mit Distanzgewichtung als Enhanced 2SFCA)'''
+    title = 'Versorgungsgrad im Einzugsbereich (2SFCA)'
+    capacity_required = True
+    params = (
+        ModeParameter(),
+        IndicatorNumberParameter('cutoff', 'maximale Wegezeit (in Minuten)',
+                                 min=5, max=240, integer_only=True),
+        IndicatorChoiceParameter('decay',
+                                 [('none', 'keine (2SFCA)'),
+                                  ('gaussian', 'Gauß-Funktion (E2SFCA)')],
+                                 title='Gewichtung nach Wegezeit'),
+    )
+    representation = 'colorramp'
+    colormap_name = 'Greens'
+    digits = 2
+    result_serializer = ResultSerializer.RASTER
+
+    @property
+    def description(self):
+        return (f'{self.service.capacity_plural_unit} '
+                f'pro 100 {self.service.demand_plural_unit}, '
+                'die innerhalb von [...] Minuten erreichbar sind, unter '
+                'Berücksichtigung der Nachfrage im Einzugsbereich')
+
+    def get_cutoff(self, variant: ModeVariant) -> float:
+        """
+        the requested cut-off time, defaults to the one of the mode variant
+        """
+        cutoff = self.data.get('cutoff')
+        if cutoff in (None, ''):
+            cutoff = get_cutoff_time(variant, self.service.infrastructure_id)
+        try:
+            cutoff = float(cutoff)
+        except (TypeError, ValueError):
+            raise BadRequest('cutoff has to be a number')
+        if cutoff <= 0:
+            raise BadRequest('cutoff has to be positive')
+        return cutoff
+
+    def compute(self):
+        service_id = self.data.get('service')
+        year = self.data.get('year', 0)
+        scenario_id = self.data.get('scenario')
+        mode = self.data.get('mode')
+        variant = self.get_mode_variant(mode, scenario_id)
+        if not variant:
+            return []
+        cutoff = self.get_cutoff(variant)
+        decay = self.data.get('decay')
+
+        q_demand, p_demand = self.get_cell_demand(scenario_id, service_id)
+        if q_demand is None:
+            return []
+
+        matrix = MatrixCellPlace.objects\
+            .in_partitions(variant, self.service.infrastructure_id)\
+            .filter(minutes__lte=cutoff)\
+            .values('cell_id', 'place_id', 'minutes')
+        q_matrix, p_matrix = matrix.query.sql_with_params()
+        q_cap, p_cap = self.get_capacities(service_id, year, scenario_id)\
+            .query.sql_with_params()
+
+        if decay == 'gaussian':
+            weight = '''(exp(-0.5 * power(m."minutes" / %s, 2)) - exp(-0.5))
+            / (1 - exp(-0.5))'''
+            p_weight = (cutoff, )
+        else:
+            weight = '1.0'
+            p_weight = ()
+
+        query = f'''WITH
+        w AS (
+        SELECT m."cell_id", m."place_id", {weight} AS "weight"
+        FROM (
+        SELECT mm."cell_id", mm."place_id", min(mm."minutes") AS "minutes"
+        FROM ({q_matrix}) mm
+        GROUP BY mm."cell_id", mm."place_id"
+        ) m
+        ),
+        d AS (
+        SELECT dd."cell_id", sum(dd."value") AS "value"
+        FROM ({q_demand}) dd
+        GROUP BY dd."cell_id"
+        ),
+        r AS (
+        SELECT w."place_id",
+        max(s."total_capacity") / sum(w."weight" * d."value") AS "ratio"
+        FROM w
+        JOIN d ON d."cell_id" = w."cell_id"
+        JOIN ({q_cap}) s ON s."place_id" = w."place_id"
+        GROUP BY w."place_id"
+        HAVING sum(w."weight" * d."value") > 0
+        )
+        SELECT rc."id", rc."cellcode" AS "cell_code",
+        COALESCE(a."value", 0) * 100 AS "value"
+        FROM d
+        JOIN "{RasterCell._meta.db_table}" rc ON rc."id" = d."cell_id"
+        LEFT JOIN (
+        SELECT w."cell_id", sum(w."weight" * r."ratio") AS "value"
+        FROM w
+        JOIN r ON r."place_id" = w."place_id"
+        GROUP BY w."cell_id"
+        ) a ON a."cell_id" = d."cell_id"
+        WHERE d."value" > 0
+        '''
+        params = p_weight + p_matrix + p_demand + p_cap
+        return RasterCell.objects.raw(query, params)
+
+    def compute_sparse(self):
+        service_id = self.data.get('service')
+        year = self.data.get('year', 0)
+        scenario_id = self.data.get('scenario')
+        mode = self.data.get('mode')
+        variant = self.get_mode_variant(mode, scenario_id)
+        if not variant:
+            return []
+        cutoff = self.get_cutoff(variant)
+        decay = self.data.get('decay')
+
+        demand = self.get_cell_demand_df(scenario_id, service_id)
+        if demand is None:
+            return []
+        demand = demand.groupby('cell_id')['value'].sum()
+        demand = demand[demand > 0]
+
+        matrix = self.get_matrix(service_id, variant.id)
+        capacities = pd.Series(
+            dict(self.get_capacities(service_id, year, scenario_id)
+                 .values_list('place_id', 'total_capacity')), dtype=float)
+        supply = capacities.reindex(matrix.place_ids, fill_value=0)\
+            .to_numpy()
+        cell_demand = demand.reindex(matrix.cell_ids, fill_value=0)\
+            .to_numpy()
+        access = matrix.floating_catchment(supply, cell_demand,
+                                           cutoff=cutoff, decay=decay)
+
+        # cells with demand, that are not in the matrix, reach no place
+        rows = matrix.get_rows(demand.index.to_numpy())
+        in_matrix = rows >= 0
+        values = np.zeros(len(rows))
+        values[in_matrix] = access[rows[in_matrix]] * 100
+        cell_codes = np.empty(len(rows), dtype=object)
+        cell_codes[in_matrix] = matrix.cell_codes[rows[in_matrix]]
+        if not in_matrix.all():
+            missing = dict(RasterCell.objects
+                           .filter(id__in=demand.index[~in_matrix].tolist())
+                           .values_list('id', 'cellcode'))
+            cell_codes[~in_matrix] = [missing[cell_id] for cell_id
+                                      in demand.index[~in_matrix]]
+        return [{'cell_code': cell_code, 'value': value}
+                for cell_code, value in zip(cell_codes, values.tolist())]
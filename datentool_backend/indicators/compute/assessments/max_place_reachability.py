@@ -3,14 +3,14 @@ from datentool_backend.indicators.compute.base import (register_indicator,
                                                        ModeParameter,
                                                        ResultSerializer)
 
-from datentool_backend.indicators.models import MatrixCellPlace
 from datentool_backend.infrastructure.models import Service
 from datentool_backend.places.models import Place
 from datentool_backend.indicators.compute.reachabilities import ModeVariantMixin
+from datentool_backend.indicators.compute.sparse import SparseMatrixMixin
 
 
 @register_indicator()
-class MaxPlaceReachability(ModeVariantMixin, ServiceIndicator):
+class MaxPlaceReachability(ModeVariantMixin, SparseMatrixMixin, ServiceIndicator):
     '''Maximale Wegezeit der Nachfragenden aus allen Gebietseinheiten, für
     welche die betreffende Einrichtung mit einem bestimmten Verkehrsmittel
     die am schnellsten erreichbar ist'''
@@ -51,15 +51,10 @@ class MaxPlaceReachability(ModeVariantMixin, ServiceIndicator):
         if not variant:
             return []
 
-        service = Service.objects.get(id=service_id)
-        partition_id = [variant.id, service.infrastructure_id]
-
-        places = self.get_places_with_capacities(service_id, year, scenario_id)
-        cells_places = MatrixCellPlace.objects.filter(variant=variant,
-                                                      place__in=places,
-                                                      partition_id=partition_id)
-
-        q_cp, p_cp = cells_places.query.sql_with_params()
+        nearest_places = self.get_nearest_places(service_id, year,
+                                                 scenario_id, variant)
+        q_np, p_np = nearest_places.values(
+            'cell_id', 'place_id', 'minutes').query.sql_with_params()
 
         query = f'''SELECT
         p."place_id" AS id,
@@ -69,19 +64,27 @@ class MaxPlaceReachability(ModeVariantMixin, ServiceIndicator):
         c."place_id",
         c."minutes",
         row_number() OVER(PARTITION BY c."place_id" ORDER BY c."minutes" DESC) AS rn
-        FROM(
-        SELECT
-        cp."cell_id",
-        cp."place_id",
-        cp."minutes",
-        row_number() OVER(PARTITION BY cp."cell_id" ORDER BY cp."minutes" ASC) AS rn
-        FROM
-        ({q_cp}) cp
-        ) c
-        WHERE c.rn = 1
+        FROM ({q_np}) c
         ) p
         WHERE p.rn = 1
         '''
-        params = p_cp
+        params = p_np
         places_with_maximum_minutes = Place.objects.raw(query, params)
         return places_with_maximum_minutes
+
+    def compute_sparse(self):
+        service_id = self.data.get('service')
+        year = self.data.get('year', 0)
+        scenario_id = self.data.get('scenario')
+        mode = self.data.get('mode')
+        variant = self.get_mode_variant(mode, scenario_id)
+        if not variant:
+            return []
+
+        matrix = self.get_matrix(service_id, variant.id)
+        place_ids = self.get_open_place_ids(service_id, year, scenario_id)
+        nearest = self.get_nearest_df(matrix, place_ids)
+
+        values = nearest.groupby('place_id')['minutes'].max()
+        return [{'id': place_id, 'value': value}
+                for place_id, value in values.items()]
@@ -1,15 +1,19 @@
+from typing import List
+
+import numpy as np
+
 from datentool_backend.indicators.compute.base import (register_indicator,
                                                        ServiceIndicator,
                                                        ModeParameter,
                                                        ResultSerializer)
-from django.db.models import Min, F
-from datentool_backend.indicators.models import MatrixCellPlace
+from django.db.models import F
 from datentool_backend.infrastructure.models import Service
 from datentool_backend.indicators.compute.reachabilities import ModeVariantMixin
+from datentool_backend.indicators.compute.sparse import SparseMatrixMixin
 
 
 @register_indicator()
-class MaxRasterReachability(ModeVariantMixin, ServiceIndicator):
+class MaxRasterReachability(ModeVariantMixin, SparseMatrixMixin, ServiceIndicator):
     '''Wegezeit mit Verkehrsmittel zur nächsten Einrichtung mit ….
     für alle Wohnstandorte'''
     title = 'Wegezeit Wohnstandort zur nächsten Einrichtung'
@@ -19,6 +23,7 @@ class MaxRasterReachability(ModeVariantMixin, ServiceIndicator):
     inverse = True
     digits = 0
     result_serializer = ResultSerializer.RASTER
+    incremental = 'cell'
     unit = 'Minuten'
 
     @property
@@ -46,8 +51,42 @@ class MaxRasterReachability(ModeVariantMixin, ServiceIndicator):
         if not variant:
             return []
 
-        places = self.get_places_with_capacities(service_id, year, scenario_id)
-        cells_places = MatrixCellPlace.objects.filter(variant=variant, place__in=places)
-        cells_places_min = cells_places.values('cell').annotate(value=Min('minutes'))
-        cells_places_min = cells_places_min.annotate(cell_code=F('cell__cellcode'))
+        nearest_places = self.get_nearest_places(service_id, year,
+                                                 scenario_id, variant)
+        cells_places_min = nearest_places.values('cell')\
+            .annotate(value=F('minutes'), cell_code=F('cell__cellcode'))
         return cells_places_min
+
+    def compute_sparse(self):
+        service_id = self.data.get('service')
+        year = self.data.get('year', 0)
+        scenario_id = self.data.get('scenario')
+        mode = self.data.get('mode')
+        variant = self.get_mode_variant(mode, scenario_id)
+        if not variant:
+            return []
+
+        matrix = self.get_matrix(service_id, variant.id)
+        place_ids = self.get_open_place_ids(service_id, year, scenario_id)
+        rows, cols, minutes = matrix.nearest(place_ids)
+        return [{'cell_code': cell_code, 'value': value}
+                for cell_code, value
+                in zip(matrix.cell_codes[rows], minutes.astype(float).tolist())]
+
+    @classmethod
+    def compute_sparse_batch(cls,
+                             indicators: List['MaxRasterReachability']
+                             ) -> List[List[dict]]:
+        """the results of several years, scenarios or modes in one pass"""
+        results = []
+        for nearest in cls.get_nearest_minutes_batch(indicators):
+            if nearest is None:
+                results.append([])
+                continue
+            matrix, minutes = nearest
+            rows = np.flatnonzero(~np.isnan(minutes))
+            results.append([{'cell_code': cell_code, 'value': value}
+                            for cell_code, value
+                            in zip(matrix.cell_codes[rows],
+                                   minutes[rows].tolist())])
+        return results
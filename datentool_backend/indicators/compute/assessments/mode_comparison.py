@@ -0,0 +1,281 @@
+from typing import Tuple
+
+import pandas as pd
+from django.core.exceptions import BadRequest
+
+from datentool_backend.indicators.compute.base import (register_indicator,
+                                                       ServiceIndicator,
+                                                       ModeParameter,
+                                                       IndicatorChoiceParameter,
+                                                       ResultSerializer)
+from datentool_backend.indicators.compute.population import PopulationIndicatorMixin
+from datentool_backend.indicators.compute.reachabilities import ModeVariantMixin
+from datentool_backend.indicators.compute.sparse import SparseMatrixMixin
+from datentool_backend.indicators.models import MatrixCellPlace
+from datentool_backend.modes.models import Mode, ModeVariant
+from datentool_backend.population.models import RasterCell, AreaCell
+from datentool_backend.area.models import Area
+
+
+class ModeComparisonMixin:
+    """
+    compare the travel times to the nearest place with two modes,
+    the cells are compared only if they reach a place with both modes
+    """
+    measures = ('ratio', 'difference')
+    default_compare_mode = Mode.CAR
+    representation = 'colorramp'
+    colormap_name = 'RdYlGn'
+    inverse = True
+    digits = 2
+    params = (
+        ModeParameter(),
+        IndicatorChoiceParameter('compare_mode', Mode.choices,
+                                 title='Vergleichsverkehrsmittel'),
+        IndicatorChoiceParameter('measure',
+                                 [('ratio', 'Verhältnis der Wegezeiten'),
+                                  ('difference', 'Differenz der Wegezeiten')],
+                                 title='Vergleich'),
+    )
+
+    @property
+    def measure(self) -> str:
+        measure = (self.data or {}).get('measure') or 'ratio'
+        if measure not in self.measures:
+            raise BadRequest(f'measure has to be one of {self.measures}')
+        return measure
+
+    @property
+    def unit(self) -> str:
+        return 'Minuten' if self.measure == 'difference' else ''
+
+    def get_mode_variants(self,
+                          scenario_id: int) -> Tuple[ModeVariant, ModeVariant]:
+        """the variants of the mode and of the mode to compare with"""
+        mode = self.data.get('mode')
+        compare_mode = self.data.get('compare_mode') or \
+            self.default_compare_mode
+        return (self.get_mode_variant(mode, scenario_id),
+                self.get_mode_variant(compare_mode, scenario_id))
+
+    def get_minutes_sql(self,
+                        variant: ModeVariant,
+                        compare_variant: ModeVariant,
+                        service_id: int,
+                        year: int,
+                        scenario_id: int) -> Tuple[str, Tuple]:
+        """
+        the common table expressions "a" and "b" with the minutes to the
+        nearest open place per cell of the mode and the mode to compare with,
+        each read from the single partition of the matrix of its variant
+        """
+        places = self.get_places_with_capacities(service_id, year, scenario_id)
+        q_places, p_places = places.values('id').query.sql_with_params()
+        infrastructure_id = self.service.infrastructure_id
+        q_a, p_a = MatrixCellPlace.objects\
+            .in_partitions(variant, infrastructure_id)\
+            .values('cell_id', 'place_id', 'minutes')\
+            .query.sql_with_params()
+        q_b, p_b = MatrixCellPlace.objects\
+            .in_partitions(compare_variant, infrastructure_id)\
+            .values('cell_id', 'place_id', 'minutes')\
+            .query.sql_with_params()
+        query = f'''
+        p AS ({q_places}),
+        a AS (
+        SELECT mm."cell_id", min(mm."minutes") AS "minutes"
+        FROM ({q_a}) mm
+        JOIN p ON p."id" = mm."place_id"
+        GROUP BY mm."cell_id"
+        ),
+        b AS (
+        SELECT mm."cell_id", min(mm."minutes") AS "minutes"
+        FROM ({q_b}) mm
+        JOIN p ON p."id" = mm."place_id"
+        GROUP BY mm."cell_id"
+        )'''
+        return query, p_places + p_a + p_b
+
+    def get_minutes_df(self,
+                       variant: ModeVariant,
+                       compare_variant: ModeVariant,
+                       service_id: int,
+                       year: int,
+                       scenario_id: int) -> pd.DataFrame:
+        """
+        the minutes to the nearest open place with both modes per cell,
+        with columns cell_id, cell_code, minutes and compare_minutes
+        """
+        place_ids = self.get_open_place_ids(service_id, year, scenario_id)
+        matrix = self.get_matrix(service_id, variant.id)
+        compare_matrix = self.get_matrix(service_id, compare_variant.id)
+        nearest = self.get_nearest_df(matrix, place_ids)
+        nearest['cell_code'] = matrix.cell_codes[
+            matrix.get_rows(nearest['cell_id'].to_numpy())]
+        compare_nearest = self.get_nearest_df(compare_matrix, place_ids)\
+            .rename(columns={'minutes': 'compare_minutes'})
+        return nearest[['cell_id', 'cell_code', 'minutes']]\
+            .merge(compare_nearest[['cell_id', 'compare_minutes']],
+                   on='cell_id')
+
+
+@register_indicator()
+class ModeComparisonCell(ModeComparisonMixin, ModeVariantMixin, SparseMatrixMixin, ServiceIndicator):
+    '''Verhältnis oder Differenz der Wegezeiten zur nächsten Einrichtung
+    mit zwei Verkehrsmitteln (z.B. ÖPNV im Vergleich zum Pkw) für alle
+    Wohnstandorte, die mit beiden Verkehrsmitteln eine Einrichtung
+    erreichen'''
+    title = 'Vergleich der Wegezeiten zweier Verkehrsmittel je Wohnstandort'
+    result_serializer = ResultSerializer.RASTER
+
+    @property
+    def description(self):
+        if self.measure == 'difference':
+            return ('Zusätzliche Wegezeit zur nächsten '
+                    f'{self.service.facility_singular_unit} gegenüber dem '
+                    'Vergleichsverkehrsmittel je Wohnstandort')
+        return (f'Wegezeit zur nächsten {self.service.facility_singular_unit} '
+                'im Verhältnis zur Wegezeit mit dem Vergleichsverkehrsmittel '
+                'je Wohnstandort')
+
+    def compute(self):
+        service_id = self.data.get('service')
+        year = self.data.get('year', 0)
+        scenario_id = self.data.get('scenario')
+        variant, compare_variant = self.get_mode_variants(scenario_id)
+        if not (variant and compare_variant):
+            return []
+        if self.measure == 'difference':
+            value = 'a."minutes" - b."minutes"'
+        else:
+            value = 'a."minutes" / NULLIF(b."minutes", 0)'
+
+        q_minutes, p_minutes = self.get_minutes_sql(
+            variant, compare_variant, service_id, year, scenario_id)
+        query = f'''WITH {q_minutes}
+        SELECT rc."id", rc."cellcode" AS "cell_code", {value} AS "value"
+        FROM a
+        JOIN b ON b."cell_id" = a."cell_id"
+        JOIN "{RasterCell._meta.db_table}" rc ON rc."id" = a."cell_id"
+        '''
+        return RasterCell.objects.raw(query, p_minutes)
+
+    def compute_sparse(self):
+        service_id = self.data.get('service')
+        year = self.data.get('year', 0)
+        scenario_id = self.data.get('scenario')
+        variant, compare_variant = self.get_mode_variants(scenario_id)
+        if not (variant and compare_variant):
+            return []
+
+        df = self.get_minutes_df(variant, compare_variant,
+                                 service_id, year, scenario_id)
+        if self.measure == 'difference':
+            values = df['minutes'] - df['compare_minutes']
+        else:
+            values = df['minutes'] / df['compare_minutes']\
+                .where(df['compare_minutes'] != 0)
+        return [{'cell_code': cell_code, 'value': value}
+                for cell_code, value in zip(df['cell_code'], values.tolist())]
+
+
+@register_indicator()
+class ModeComparisonArea(ModeComparisonMixin, ModeVariantMixin, SparseMatrixMixin, PopulationIndicatorMixin, ServiceIndicator):
+    '''Verhältnis oder Differenz der mittleren Wegezeiten der Nachfragenden
+    aus einer Gebietseinheit zur nächsten Einrichtung mit zwei
+    Verkehrsmitteln (z.B. ÖPNV im Vergleich zum Pkw). Berücksichtigt werden
+    die Nachfragenden, die mit beiden Verkehrsmitteln eine Einrichtung
+    erreichen'''
+    title = 'Vergleich der Wegezeiten zweier Verkehrsmittel im Gebiet'
+    result_serializer = ResultSerializer.AREA
+
+    @property
+    def description(self):
+        if self.measure == 'difference':
+            return ('Mittlere zusätzliche Wegezeit zur nächsten '
+                    f'{self.service.facility_singular_unit} gegenüber dem '
+                    'Vergleichsverkehrsmittel')
+        return ('Mittlere Wegezeit zur nächsten '
+                f'{self.service.facility_singular_unit} im Verhältnis zur '
+                'Wegezeit mit dem Vergleichsverkehrsmittel')
+
+    def compute(self):
+        service_id = self.data.get('service')
+        year = self.data.get('year', 0)
+        scenario_id = self.data.get('scenario')
+        area_level_id = self.data.get('area_level')
+        variant, compare_variant = self.get_mode_variants(scenario_id)
+        if not (variant and compare_variant):
+            return []
+
+        if area_level_id is None:
+            raise BadRequest('No AreaLevel provided')
+        areas = self.get_areas(area_level_id=area_level_id)
+        q_areas, p_areas = areas.values('id', '_label').query.sql_with_params()
+
+        q_demand, p_demand = self.get_cell_demand(scenario_id, service_id)
+        if q_demand is None:
+            return self.get_areas_without_values(q_areas, p_areas)
+
+        acells = AreaCell.objects.filter(area__area_level_id=area_level_id)
+        q_acells, p_acells = acells.values(
+            'area_id', 'rastercellpop_id', 'share_area_of_cell')\
+            .query.sql_with_params()
+
+        weight = 'd."value" * ac."share_area_of_cell"'
+        if self.measure == 'difference':
+            value = f'''sum((a."minutes" - b."minutes") * {weight})
+            / NULLIF(sum({weight}), 0)'''
+        else:
+            value = f'''sum(a."minutes" * {weight})
+            / NULLIF(sum(b."minutes" * {weight}), 0)'''
+
+        q_minutes, p_minutes = self.get_minutes_sql(
+            variant, compare_variant, service_id, year, scenario_id)
+        query = f'''WITH {q_minutes}
+        SELECT ar."id", ar."_label", val."value"
+        FROM ({q_areas}) ar
+        LEFT JOIN (
+        SELECT ac."area_id", {value} AS "value"
+        FROM a
+        JOIN b ON b."cell_id" = a."cell_id"
+        JOIN ({q_demand}) d ON d."cell_id" = a."cell_id"
+        JOIN ({q_acells}) ac ON ac."rastercellpop_id" = d."rastercellpop_id"
+        GROUP BY ac."area_id"
+        ) val ON val."area_id" = ar."id"
+        '''
+        params = p_minutes + p_areas + p_demand + p_acells
+        return Area.objects.raw(query, params)
+
+    def compute_sparse(self):
+        service_id = self.data.get('service')
+        year = self.data.get('year', 0)
+        scenario_id = self.data.get('scenario')
+        area_level_id = self.data.get('area_level')
+        variant, compare_variant = self.get_mode_variants(scenario_id)
+        if not (variant and compare_variant):
+            return []
+
+        if area_level_id is None:
+            raise BadRequest('No AreaLevel provided')
+        areas = self.get_areas(area_level_id=area_level_id)
+
+        demand = self.get_cell_demand_df(scenario_id, service_id)
+        if demand is None:
+            return [{'id': area_id, 'label': label, 'value': 0}
+                    for area_id, label in areas.values_list('id', '_label')]
+
+        minutes = self.get_minutes_df(variant, compare_variant,
+                                      service_id, year, scenario_id)
+        df = demand.merge(minutes, on='cell_id')\
+            .merge(self.get_area_cells_df(area_level_id), on='rastercellpop_id')
+        df['weight'] = df['value'] * df['share_area_of_cell']
+        if self.measure == 'difference':
+            df['delta'] = df['minutes'] - df['compare_minutes']
+            values = self.weighted_mean(df, 'area_id', 'delta', 'weight')
+        else:
+            # the ratio of the weighted means equals the ratio of the sums
+            values = self.weighted_mean(df, 'area_id', 'minutes', 'weight') \
+                / self.weighted_mean(df, 'area_id', 'compare_minutes', 'weight')\
+                .replace(0, float('nan'))
+        return self.get_area_results(areas, values)
@@ -3,19 +3,32 @@ from typing import Callable, Dict, List, Tuple
 from enum import Enum
 import numpy as np
 
+from django.conf import settings
 from django.http.request import QueryDict
-from django.db.models import OuterRef
+from django.db import OperationalError
+from django.db.models import OuterRef, QuerySet, Sum
 from sql_util.utils import Exists
 from datentool_backend.places.models import Place, Capacity
 
 from datentool_backend.modes.models import Mode, ModeVariant
 from datentool_backend.infrastructure.models import Service
+from datentool_backend.indicators.models import NearestPlaceCache
 from datentool_backend.indicators.serializers import (
     IndicatorAreaResultSerializer,
     IndicatorRasterResultSerializer,
     IndicatorPlaceResultSerializer,
-    IndicatorPopulationSerializer)
+    IndicatorPopulationSerializer,
+    IndicatorRasterCutoffResultSerializer,
+    IndicatorAreaCutoffResultSerializer,
+    IndicatorPlaceClosureResultSerializer,
+    IndicatorPlaceUtilizationResultSerializer)
 from datentool_backend.indicators.legend import get_colors, get_percentiles
+from datentool_backend.logging.profiling import profile
+from datentool_backend.utils.query_cancel import (statement_timeout,
+                                                  DisconnectWatchdog,
+                                                  is_query_canceled,
+                                                  QueryTimeout,
+                                                  QueryCancelled)
 
 
 class IndicatorParameter:
@@ -74,6 +87,10 @@ class ResultSerializer(Enum):
     PLACE = IndicatorPlaceResultSerializer
     RASTER = IndicatorRasterResultSerializer
     POP = IndicatorPopulationSerializer
+    RASTER_CUTOFFS = IndicatorRasterCutoffResultSerializer
+    AREA_CUTOFFS = IndicatorAreaCutoffResultSerializer
+    PLACE_CLOSURE = IndicatorPlaceClosureResultSerializer
+    PLACE_UTILIZATION = IndicatorPlaceUtilizationResultSerializer
 
 
 class ComputeIndicator(metaclass=ABCMeta):
@@ -81,6 +98,9 @@ class ComputeIndicator(metaclass=ABCMeta):
     result_serializer: ResultSerializer = None
     params: List[IndicatorParameter] = []
     description: str = ''
+    # seconds after which the queries are aborted, defaults to
+    # settings.INDICATOR_STATEMENT_TIMEOUT
+    statement_timeout: float = None
 
     def __init__(self, data: QueryDict = None):
         self.data = data
@@ -93,6 +113,63 @@ class ComputeIndicator(metaclass=ABCMeta):
     def compute(self):
         """compute the indicator"""
 
+    def evaluate(self):
+        """compute the indicator"""
+        return self.compute()
+
+    def get_statement_timeout(self) -> float:
+        """the timeout of the queries in seconds (0 or None for no timeout)"""
+        timeouts = getattr(settings, 'INDICATOR_STATEMENT_TIMEOUTS', {})
+        if self.name in timeouts:
+            return timeouts[self.name]
+        if self.statement_timeout is not None:
+            return self.statement_timeout
+        return getattr(settings, 'INDICATOR_STATEMENT_TIMEOUT', None)
+
+    def result(self,
+               user: 'Profile' = None,
+               explain: bool = False,
+               disconnected: 'threading.Event' = None,
+               timeout: float = None) -> dict:
+        """
+        evaluate and serialize the indicator, the call is profiled
+        if profiling is enabled in the settings.
+        The queries are aborted after the statement timeout (the one of the
+        indicator, if `timeout` is not given) or when the
+        `disconnected` event is set by a disconnecting client
+        """
+        return self.run(lambda: self.serialize(self.evaluate()),
+                        user=user, explain=explain,
+                        disconnected=disconnected, timeout=timeout)
+
+    def run(self,
+            func: Callable,
+            user: 'Profile' = None,
+            explain: bool = False,
+            disconnected: 'threading.Event' = None,
+            timeout: float = None):
+        """
+        call func profiled and with the queries aborted after the timeout or
+        on a disconnect of the client (see result)
+        """
+        params = self.data.dict() if hasattr(self.data, 'dict') else self.data
+        if timeout is None:
+            timeout = self.get_statement_timeout()
+        with profile('indicator', self.name, params=params, user=user,
+                     explain=explain):
+            watchdog = DisconnectWatchdog(disconnected)
+            try:
+                with watchdog, statement_timeout(timeout):
+                    return func()
+            except OperationalError as e:
+                if not is_query_canceled(e):
+                    raise
+                if watchdog.cancelled:
+                    raise QueryCancelled()
+                raise QueryTimeout(
+                    f'Die Berechnung des Indikators "{self.title or self.name}" wurde '
+                    f'nach {timeout:n} Sekunden abgebrochen')
+
     def __str__(self):
         return f'{self.__class__.__name__}: {self.title}'
 
@@ -101,13 +178,19 @@ class ComputeIndicator(metaclass=ABCMeta):
             raise Exception('no serializer defined')
         serializer = self.result_serializer.value
         serializer._digits_to_round = getattr(self, 'digits', None)
-        values = serializer(queryset, many=True).data
-        legend = self.get_legend(values)
+        list_serializer = serializer(queryset, many=True)
+        values = list_serializer.data
+        # derive the legend from the rounded values collected while serializing
+        legend = self.get_legend(list_serializer.values_array)
         return {'legend': legend,
                 'values': values, }
 
-    def get_legend(self, values):
-        """get the legend based on the values"""
+    def get_legend(self, values, mode_bins: bool = True):
+        """
+        get the legend based on the values (rows or array),
+        with mode_bins=False the bins of the mode are not used
+        (e.g. for values of several modes)
+        """
         if getattr(self, 'representation', None) != 'colorramp':
             return {}
 
@@ -116,6 +199,8 @@ class ComputeIndicator(metaclass=ABCMeta):
             bins = self.bins
         except AttributeError:
             try:
+                if not mode_bins:
+                    raise AttributeError('bins of the mode not used')
                 bins_my_mode = self.bins_by_mode
                 mode = self.data['mode']
                 mode_variant = ModeVariant.objects.filter(mode=mode).first()
@@ -153,20 +238,64 @@ class ComputeIndicator(metaclass=ABCMeta):
 
 
 
+def _normalize_param(value):
+    """the value of a request parameter as number, if possible"""
+    if value in ('', 'null', None):
+        return None
+    if isinstance(value, (bool, int, float)):
+        return value
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        pass
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return value
+
+
 class ServiceIndicator(ComputeIndicator):
     registered: Dict[str, 'AssessmentIndicator'] = {}
     capacity_required: bool = False
+    # the parameters every service indicator may be requested with
+    cache_keys = ('service', 'year', 'scenario', 'mode', 'area_level')
+    # the part of the results to recompute if places change:
+    # 'cell' if the value of a cell depends only on the places reachable
+    # from the cell, 'area' if the value of an area depends only on its cells,
+    # None if all results have to be recomputed
+    incremental: str = None
 
     def __init__(self, service: Service, query_params: QueryDict = None):
         super().__init__(query_params)
         self.service = service
 
+    def get_cache_params(self) -> dict:
+        """
+        the normalized parameters identifying a precomputed result,
+        None if the request contains other parameters than the known ones
+        """
+        data = self.data.dict() if hasattr(self.data, 'dict') \
+            else dict(self.data or {})
+        data.pop('indicator', None)
+        data.pop('as_tiles', None)
+        data.pop('async', None)
+        keys = set(self.cache_keys) | {param.name for param in self.params}
+        if set(data) - keys:
+            return None
+        return {key: _normalize_param(data.get(key)) for key in sorted(keys)}
+
     @property
     @abstractmethod
     def description(self) -> str:
         """computed title"""
         return ''
 
+    def evaluate(self):
+        """compute the indicator with the engine configured for it"""
+        if getattr(self, 'engine', 'sql') == 'sparse':
+            return self.compute_sparse()
+        return self.compute()
+
     def get_places_with_capacities(self,
                                    service_id: int,
                                    year: int,
@@ -189,6 +318,35 @@ class ServiceIndicator(ComputeIndicator):
             .filter(has_capacity=True)
         return places_with_capacity
 
+    def get_capacities(self,
+                       service_id: int,
+                       year: int,
+                       scenario_id: int) -> QuerySet:
+        """the total capacities of the places open in the year"""
+        capacities = Capacity.filter_queryset(Capacity.objects.all(),
+                                              service_ids=[service_id],
+                                              scenario_id=scenario_id,
+                                              year=year)
+        return capacities.filter(capacity__gt=0)\
+            .values('place_id')\
+            .annotate(total_capacity=Sum('capacity'))
+
+    def get_nearest_places(self,
+                           service_id: int,
+                           year: int,
+                           scenario_id: int,
+                           variant: ModeVariant) -> QuerySet:
+        """
+        get the nearest place with capacity and its travel time for each cell
+        """
+        service = Service.objects.get(id=service_id)
+        places = self.get_places_with_capacities(service_id, year, scenario_id)
+        return NearestPlaceCache.get_nearest_places(service=service,
+                                                    variant=variant,
+                                                    scenario_id=scenario_id,
+                                                    year=year,
+                                                    places=places)
+
 def register_indicator() -> Callable:
     """register the indicator with the ComputeIndicators"""
 
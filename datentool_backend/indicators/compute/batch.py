@@ -0,0 +1,109 @@
+from itertools import product
+from typing import Dict, List, Type
+
+import numpy as np
+
+from datentool_backend.infrastructure.models import Service
+from datentool_backend.indicators.compute.base import (ServiceIndicator,
+                                                       ResultSerializer)
+
+
+class IndicatorBatch:
+    """
+    compute a service indicator for all combinations of years, scenarios and
+    modes and collect the results in one multidimensional array
+
+    indicators implementing compute_sparse_batch evaluate all combinations
+    in one pass over the sparse matrices of the modes (unless the sql engine
+    is requested explicitly): the nearest places of all sets of open places
+    are found together and weighted with the demand of all combinations at
+    once. The other indicators evaluate the combinations one after another,
+    sharing only the loaded matrices, the materialized nearest places and
+    the materialized demand
+    """
+    dims = ('year', 'scenario', 'mode')
+
+    def __init__(self,
+                 indicator_class: Type[ServiceIndicator],
+                 service: Service,
+                 data: Dict[str, object],
+                 years: List[int],
+                 scenarios: List[int],
+                 modes: List[int]):
+        self.indicator_class = indicator_class
+        self.service = service
+        self.data = data
+        self.coords = {'year': years or [data.get('year', 0)],
+                       'scenario': scenarios or [data.get('scenario')],
+                       'mode': modes or [data.get('mode')], }
+
+    @property
+    def is_single_pass(self) -> bool:
+        """True, if the combinations are evaluated in one pass"""
+        return (hasattr(self.indicator_class, 'compute_sparse_batch') and
+                self.data.get('engine') != 'sql')
+
+    def compute(self, **result_kwargs) -> Dict[str, object]:
+        """
+        compute all combinations, return the values with dimensions
+        year, scenario, mode and id (place, area or cell code).
+        The result_kwargs (user, explain, disconnected, timeout) are passed to
+        ComputeIndicator.result or ComputeIndicator.run for the single pass
+        """
+        combinations = list(product(*self.coords.values()))
+        indicators = []
+        for year, scenario, mode in combinations:
+            data = dict(self.data)
+            data.update(year=year, scenario=scenario, mode=mode)
+            indicators.append(self.indicator_class(self.service, data))
+        indicator = indicators[0] if indicators else None
+
+        if indicator and self.is_single_pass:
+            rows = indicator.run(
+                lambda: self.indicator_class.compute_sparse_batch(indicators),
+                **result_kwargs)
+            serialized = [ind.serialize(r)['values']
+                          for ind, r in zip(indicators, rows)]
+        else:
+            serialized = [ind.result(**result_kwargs)['values']
+                          for ind in indicators]
+
+        results = {}
+        labels = {}
+        for combination, ind, rows in zip(combinations, indicators,
+                                          serialized):
+            serializer = ind.result_serializer.value
+            id_field = serializer.Meta.fields[0]
+            results[combination] = {row[id_field]: row['value']
+                                    for row in rows}
+            if 'label' in serializer.Meta.fields:
+                labels.update((row[id_field], row['label']) for row in rows)
+
+        ids = sorted(set().union(*(r.keys() for r in results.values())))
+        id_index = {id_: i for i, id_ in enumerate(ids)}
+        shape = [len(c) for c in self.coords.values()] + [len(ids)]
+        values = np.full(shape, np.nan)
+        for (year, scenario, mode), result in results.items():
+            pos = (self.coords['year'].index(year),
+                   self.coords['scenario'].index(scenario),
+                   self.coords['mode'].index(mode))
+            for id_, value in result.items():
+                if value is not None:
+                    values[pos + (id_index[id_], )] = value
+
+        # one legend for the values of all combinations, the bins of a mode
+        # apply only if there is a single mode
+        legend = indicator.get_legend(
+            values[~np.isnan(values)],
+            mode_bins=len(self.coords['mode']) == 1) if indicator else []
+
+        missing = np.isnan(values)
+        values = values.astype(object)
+        values[missing] = None
+        ret = {'dims': list(self.dims) + ['id'],
+               'coords': {**self.coords, 'id': ids},
+               'values': values.tolist(),
+               'legend': legend, }
+        if indicator and indicator.result_serializer == ResultSerializer.AREA:
+            ret['labels'] = [labels.get(id_) for id_ in ids]
+        return ret
@@ -0,0 +1,151 @@
+import numpy as np
+import pandas as pd
+
+from datentool_backend.indicators.compute.base import (ServiceIndicator,
+                                                       ResultSerializer)
+from datentool_backend.indicators.compute.population import PopulationIndicatorMixin
+from datentool_backend.indicators.compute.reachabilities import (
+    ModeVariantMixin, get_cutoff_time)
+from datentool_backend.indicators.compute.sparse import SparseMatrixMixin
+from datentool_backend.indicators.models import MatrixCellPlace
+from datentool_backend.places.models import Place
+
+
+class ClosureImpact(ModeVariantMixin, SparseMatrixMixin, PopulationIndicatorMixin, ServiceIndicator):
+    '''Zunahme der mittleren Wegezeit aller Nachfragenden zur nächsten
+    Einrichtung, wenn allein die jeweilige Einrichtung geschlossen würde.
+    Die Nachfragenden, für welche die Einrichtung die nächste ist, weichen
+    auf die zweitnächste aus. Wegezeiten über der maximalen Wegezeit des
+    Verkehrsmittels werden mit dieser gezählt'''
+    title = 'Auswirkung der Schließung je Einrichtung'
+    unit = 'min'
+    digits = 2
+    result_serializer = ResultSerializer.PLACE_CLOSURE
+
+    @property
+    def description(self):
+        if not self.service:
+            return ('Zunahme der mittleren Wegezeit der Nachfragenden, wenn '
+                    'die Einrichtung geschlossen würde')
+        return (f'Zunahme der mittleren Wegezeit '
+                f'{self.service.demand_plural_unit}, wenn die '
+                f'{self.service.facility_singular_unit} geschlossen würde')
+
+    def compute(self):
+        service_id = self.data.get('service')
+        year = self.data.get('year', 0)
+        scenario_id = self.data.get('scenario')
+        mode = self.data.get('mode')
+        variant = self.get_mode_variant(mode, scenario_id)
+        if not variant:
+            return []
+        cutoff = get_cutoff_time(variant, self.service.infrastructure_id)
+
+        q_demand, p_demand = self.get_cell_demand(scenario_id, service_id)
+        if q_demand is None:
+            return []
+        places = self.get_places_with_capacities(service_id, year, scenario_id)
+        q_places, p_places = places.values('id').query.sql_with_params()
+        matrix = MatrixCellPlace.objects\
+            .in_partitions(variant, self.service.infrastructure_id)\
+            .values('cell_id', 'place_id', 'minutes')
+        q_matrix, p_matrix = matrix.query.sql_with_params()
+
+        # the nearest and the second nearest place per cell
+        query = f'''WITH
+        m AS (
+        SELECT mm."cell_id", mm."place_id", min(mm."minutes") AS "minutes"
+        FROM ({q_matrix}) mm
+        JOIN ({q_places}) p ON p."id" = mm."place_id"
+        GROUP BY mm."cell_id", mm."place_id"
+        ),
+        n AS (
+        SELECT r."cell_id",
+        max(r."place_id") FILTER (WHERE r."rn" = 1) AS "place_id",
+        max(r."minutes") FILTER (WHERE r."rn" = 1) AS "first_minutes",
+        max(r."minutes") FILTER (WHERE r."rn" = 2) AS "second_minutes"
+        FROM (
+        SELECT m."cell_id", m."place_id", m."minutes",
+        row_number() OVER (PARTITION BY m."cell_id"
+                           ORDER BY m."minutes", m."place_id") AS "rn"
+        FROM m
+        ) r
+        WHERE r."rn" <= 2
+        GROUP BY r."cell_id"
+        ),
+        d AS (
+        SELECT dd."cell_id", sum(dd."value") AS "value"
+        FROM ({q_demand}) dd
+        GROUP BY dd."cell_id"
+        ),
+        total AS (
+        SELECT sum(d."value") AS "value" FROM d
+        ),
+        c AS (
+        SELECT n."place_id",
+        sum(d."value") AS "demand",
+        sum(d."value") FILTER (
+        WHERE n."first_minutes" <= %s
+        AND (n."second_minutes" IS NULL OR n."second_minutes" > %s))
+        AS "unserved_demand",
+        sum(d."value" * (LEAST(COALESCE(n."second_minutes", %s), %s)
+                         - LEAST(n."first_minutes", %s))) AS "loss"
+        FROM n
+        JOIN d ON d."cell_id" = n."cell_id"
+        GROUP BY n."place_id"
+        )
+        SELECT p."id",
+        COALESCE(c."demand", 0) AS "demand",
+        COALESCE(c."unserved_demand", 0) AS "unserved_demand",
+        CASE WHEN total."value" > 0
+        THEN COALESCE(c."loss", 0) / total."value"
+        ELSE 0 END AS "value",
+        rank() OVER (ORDER BY COALESCE(c."loss", 0) DESC) AS "rank"
+        FROM ({q_places}) p
+        CROSS JOIN total
+        LEFT JOIN c ON c."place_id" = p."id"
+        ORDER BY "rank", p."id"
+        '''
+        params = (p_matrix + p_places + p_demand
+                  + (cutoff, ) * 5 + p_places)
+        return Place.objects.raw(query, params)
+
+    def compute_sparse(self):
+        service_id = self.data.get('service')
+        year = self.data.get('year', 0)
+        scenario_id = self.data.get('scenario')
+        mode = self.data.get('mode')
+        variant = self.get_mode_variant(mode, scenario_id)
+        if not variant:
+            return []
+        cutoff = get_cutoff_time(variant, self.service.infrastructure_id)
+
+        demand = self.get_cell_demand_df(scenario_id, service_id)
+        if demand is None:
+            return []
+        demand = demand.groupby('cell_id')['value'].sum()
+
+        matrix = self.get_matrix(service_id, variant.id)
+        place_ids = self.get_open_place_ids(service_id, year, scenario_id)
+        rows, cols, minutes, second_cols, second_minutes = \
+            matrix.two_nearest(place_ids)
+        weights = demand.reindex(matrix.cell_ids[rows], fill_value=0)\
+            .to_numpy(dtype=np.float64)
+        minutes = minutes.astype(np.float64)
+        loss = weights * (np.minimum(np.nan_to_num(second_minutes, nan=cutoff),
+                                     cutoff)
+                          - np.minimum(minutes, cutoff))
+        unserved = (minutes <= cutoff) & ~(second_minutes <= cutoff)
+        df = pd.DataFrame({'id': matrix.place_ids[cols],
+                           'demand': weights,
+                           'unserved_demand': weights * unserved,
+                           'loss': loss, })\
+            .groupby('id').sum()\
+            .reindex(pd.Index(np.sort(place_ids), name='id'), fill_value=0)
+        total = demand.sum()
+        df['value'] = df['loss'] / total if total > 0 else 0
+        df['rank'] = df['loss'].rank(method='min', ascending=False)\
+            .astype(int)
+        df = df.reset_index().sort_values(['rank', 'id'])
+        return df[['id', 'rank', 'demand', 'unserved_demand', 'value']]\
+            .to_dict('records')
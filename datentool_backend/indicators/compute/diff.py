@@ -0,0 +1,164 @@
+from typing import Dict, List, Type
+
+import numpy as np
+
+from datentool_backend.infrastructure.models import Service
+from datentool_backend.indicators.compute.base import ServiceIndicator
+from datentool_backend.indicators.compute.sparse import CellPlaceMatrix
+from datentool_backend.population.models import AreaCell
+
+
+class ScenarioDiff:
+    """
+    compare the results of a service indicator in two scenarios
+
+    if the indicator can be evaluated incrementally and the scenarios differ
+    only in their places and capacities, the indicator is evaluated only for
+    the cells in the catchment of the changed places (and for the areas with
+    such cells) instead of twice for the whole planning area
+    """
+
+    def __init__(self,
+                 indicator_class: Type[ServiceIndicator],
+                 service: Service,
+                 data: Dict[str, object],
+                 base_scenario_id: int,
+                 scenario_id: int):
+        self.indicator_class = indicator_class
+        self.service = service
+        self.data = data
+        self.base_scenario_id = base_scenario_id
+        self.scenario_id = scenario_id
+
+    def get_indicator(self, scenario_id: int) -> ServiceIndicator:
+        data = dict(self.data)
+        data['scenario'] = scenario_id
+        return self.indicator_class(self.service, data)
+
+    def get_capacities(self, scenario_id: int) -> Dict[int, float]:
+        """the total capacity of the service per open place in the scenario"""
+        capacities = self.get_indicator(scenario_id).get_capacities(
+            self.service.id, self.data.get('year', 0), scenario_id)
+        return dict(capacities.values_list('place_id', 'total_capacity'))
+
+    def get_changed_places(self) -> List[int]:
+        """the places opened, closed or with changed capacity"""
+        base = self.get_capacities(self.base_scenario_id)
+        scenario = self.get_capacities(self.scenario_id)
+        return sorted(place_id for place_id in set(base) | set(scenario)
+                      if base.get(place_id) != scenario.get(place_id))
+
+    def is_incremental(self,
+                       base: ServiceIndicator,
+                       scenario: ServiceIndicator) -> bool:
+        """
+        True, if the indicator can be evaluated incrementally and the
+        scenarios share the mode variant, the population and the demand rates
+        """
+        if self.indicator_class.incremental not in ('cell', 'area'):
+            return False
+        mode = self.data.get('mode')
+        if base.get_mode_variant(mode, self.base_scenario_id) != \
+           scenario.get_mode_variant(mode, self.scenario_id):
+            return False
+        if hasattr(base, 'get_population_ids'):
+            if sorted(base.get_population_ids()) != \
+               sorted(scenario.get_population_ids()):
+                return False
+            service_id = self.service.id
+            if base.get_demand_rate_set(self.base_scenario_id, service_id) != \
+               scenario.get_demand_rate_set(self.scenario_id, service_id):
+                return False
+        return True
+
+    def get_reaching_cells(self,
+                           indicator: ServiceIndicator,
+                           place_ids: List[int]) -> np.ndarray:
+        """the cells reaching one of the places"""
+        variant = indicator.get_mode_variant(self.data.get('mode'),
+                                             self.scenario_id)
+        matrix = CellPlaceMatrix.load(variant.id,
+                                      self.service.infrastructure_id)
+        reaching = matrix.get_place_mask(place_ids)[matrix.indices]
+        return np.unique(matrix.cell_ids[matrix.rows[reaching]])
+
+    def get_area_cells(self) -> AreaCell:
+        """the cells of the areas of the requested area level"""
+        return AreaCell.objects.filter(
+            area__area_level_id=self.data.get('area_level'))
+
+    def compute(self) -> Dict[str, object]:
+        """
+        the values of both scenarios and their difference (scenario - base)
+        for all places, areas or cells whose value differs
+        """
+        base = self.get_indicator(self.base_scenario_id)
+        scenario = self.get_indicator(self.scenario_id)
+        changed_places = self.get_changed_places()
+        incremental = self.is_incremental(base, scenario)
+        if incremental:
+            if not changed_places:
+                return {'incremental': True,
+                        'changed_places': [],
+                        'values': [], }
+            cell_ids = self.get_reaching_cells(scenario, changed_places)
+            if self.indicator_class.incremental == 'area':
+                # the areas have to be evaluated with all of their cells
+                area_ids = set(
+                    self.get_area_cells()
+                    .filter(rastercellpop__cell_id__in=cell_ids.tolist())
+                    .values_list('area_id', flat=True))
+                cell_ids = np.fromiter(
+                    self.get_area_cells()
+                    .filter(area_id__in=area_ids)
+                    .values_list('rastercellpop__cell_id', flat=True)
+                    .distinct(),
+                    dtype=np.int64)
+            for indicator in (base, scenario):
+                indicator.data['engine'] = 'sparse'
+                indicator.restrict_to_cells = cell_ids
+
+        serializer = self.indicator_class.result_serializer.value
+        serializer._digits_to_round = getattr(base, 'digits', None)
+        list_serializer = serializer(base.evaluate(), many=True)
+        base_rows = list_serializer.data
+        # round the values of both scenarios to the same digits
+        digits = list_serializer.child._digits_to_round
+        serializer._digits_to_round = digits
+        scenario_rows = serializer(scenario.evaluate(), many=True).data
+
+        key_fields = [f for f in serializer.Meta.fields if f != 'value']
+        base_values = {tuple(row[f] for f in key_fields): row['value']
+                       for row in base_rows}
+        scenario_values = {tuple(row[f] for f in key_fields): row['value']
+                           for row in scenario_rows}
+        if incremental and self.indicator_class.incremental == 'area':
+            # other areas sharing cells with the affected areas
+            # are evaluated with a part of their cells only
+            id_pos = key_fields.index('area_id')
+            base_values = {k: v for k, v in base_values.items()
+                           if k[id_pos] in area_ids}
+            scenario_values = {k: v for k, v in scenario_values.items()
+                               if k[id_pos] in area_ids}
+
+        values = []
+        keys = list(base_values) + [key for key in scenario_values
+                                    if key not in base_values]
+        for key in keys:
+            base_value = base_values.get(key)
+            scenario_value = scenario_values.get(key)
+            if base_value == scenario_value:
+                continue
+            delta = None
+            if base_value is not None and scenario_value is not None:
+                delta = scenario_value - base_value
+                if digits is not None:
+                    delta = round(delta, digits)
+            row = dict(zip(key_fields, key))
+            row.update(base_value=base_value,
+                       scenario_value=scenario_value,
+                       value=delta)
+            values.append(row)
+        return {'incremental': incremental,
+                'changed_places': changed_places,
+                'values': values, }
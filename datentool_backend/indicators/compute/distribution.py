@@ -0,0 +1,156 @@
+import numpy as np
+from django.core.exceptions import BadRequest
+
+from datentool_backend.indicators.compute.base import (ServiceIndicator,
+                                                       ResultSerializer)
+from datentool_backend.indicators.compute.population import PopulationIndicatorMixin
+from datentool_backend.indicators.compute.reachabilities import (
+    ModeVariantMixin, get_cutoff_time)
+from datentool_backend.indicators.compute.sparse import SparseMatrixMixin
+from datentool_backend.modes.models import ModeVariant
+from datentool_backend.population.models import AreaCell
+from datentool_backend.area.models import Area
+
+
+class ReachabilityDistribution(ModeVariantMixin, SparseMatrixMixin, PopulationIndicatorMixin, ServiceIndicator):
+    '''Anteil der Nachfragenden aus einer Gebietseinheit, welche die nächste
+    Einrichtung mit der betrachteten Leistung in maximal 1, 2, 3, …
+    Minuten erreichen, als kumulierte Verteilung der Wegezeiten für alle
+    Minuten bis zur maximalen Wegezeit des Verkehrsmittels'''
+    title = 'Verteilung der Wegezeiten im Gebiet'
+    unit = '%'
+    digits = 1
+    result_serializer = ResultSerializer.AREA_CUTOFFS
+    # upper limit of the distribution
+    max_cutoff = 240
+
+    @property
+    def description(self):
+        if not self.service:
+            return ('Anteil der Nachfragenden, die die nächste Einrichtung '
+                    'innerhalb der jeweiligen Minutenzahl erreichen')
+        return (f'Anteil {self.service.demand_plural_unit}, die die nächste '
+                f'{self.service.facility_singular_unit} innerhalb der '
+                'jeweiligen Minutenzahl erreichen')
+
+    def get_max_minutes(self, variant: ModeVariant) -> int:
+        """
+        the requested maximum of the distribution, defaults to the cut-off
+        time of the mode variant for the infrastructure or the upper
+        reachability class of the mode
+        """
+        max_minutes = self.data.get('max_minutes')
+        if not max_minutes:
+            max_minutes = get_cutoff_time(variant,
+                                          self.service.infrastructure_id)
+        try:
+            max_minutes = int(np.ceil(float(max_minutes)))
+        except (TypeError, ValueError):
+            raise BadRequest('max_minutes has to be a number')
+        return min(max(max_minutes, 1), self.max_cutoff)
+
+    def compute(self):
+        service_id = self.data.get('service')
+        year = self.data.get('year', 0)
+        scenario_id = self.data.get('scenario')
+        area_level_id = self.data.get('area_level')
+        mode = self.data.get('mode')
+        variant = self.get_mode_variant(mode, scenario_id)
+        if not variant:
+            return []
+        if area_level_id is None:
+            raise BadRequest('No AreaLevel provided')
+        max_minutes = self.get_max_minutes(variant)
+
+        areas = self.get_areas(area_level_id=area_level_id)
+        q_areas, p_areas = areas.values('id', '_label').query.sql_with_params()
+        q_demand, p_demand = self.get_cell_demand(scenario_id, service_id)
+        if q_demand is None:
+            return []
+
+        nearest_places = self.get_nearest_places(service_id, year,
+                                                 scenario_id, variant)
+        q_np, p_np = nearest_places.values(
+            'cell_id', 'place_id', 'minutes').query.sql_with_params()
+        acells = AreaCell.objects.filter(area__area_level_id=area_level_id)
+        q_acells, p_acells = acells.values(
+            'area_id', 'rastercellpop_id', 'share_area_of_cell')\
+            .query.sql_with_params()
+
+        # the demand weights are summed up per area and full minute first,
+        # the cumulative shares are derived from these bins
+        query = f'''WITH
+        b AS (
+        SELECT ac."area_id",
+        LEAST(GREATEST(ceil(c."minutes"), 0), %s + 1)::integer AS "minute",
+        sum(d."value" * ac."share_area_of_cell") AS "weight"
+        FROM ({q_np}) c
+        JOIN ({q_demand}) d ON d."cell_id" = c."cell_id"
+        JOIN ({q_acells}) ac ON ac."rastercellpop_id" = d."rastercellpop_id"
+        GROUP BY ac."area_id", 2
+        ),
+        total AS (
+        SELECT b."area_id", sum(b."weight") AS "weight"
+        FROM b
+        GROUP BY b."area_id"
+        )
+        SELECT a."id", a."_label", t."cutoff",
+        CASE WHEN COALESCE(total."weight", 0) = 0 THEN NULL
+        ELSE COALESCE(sum(b."weight"), 0) / total."weight" * 100
+        END AS "value"
+        FROM ({q_areas}) a
+        CROSS JOIN generate_series(1, %s) AS t("cutoff")
+        LEFT JOIN total ON total."area_id" = a."id"
+        LEFT JOIN b ON b."area_id" = a."id" AND b."minute" <= t."cutoff"
+        GROUP BY a."id", a."_label", t."cutoff", total."weight"
+        '''
+        params = ((max_minutes, ) + p_np + p_demand + p_acells + p_areas
+                  + (max_minutes, ))
+        return Area.objects.raw(query, params)
+
+    def compute_sparse(self):
+        service_id = self.data.get('service')
+        year = self.data.get('year', 0)
+        scenario_id = self.data.get('scenario')
+        area_level_id = self.data.get('area_level')
+        mode = self.data.get('mode')
+        variant = self.get_mode_variant(mode, scenario_id)
+        if not variant:
+            return []
+        if area_level_id is None:
+            raise BadRequest('No AreaLevel provided')
+        max_minutes = self.get_max_minutes(variant)
+
+        areas = self.get_areas(area_level_id=area_level_id)
+        demand = self.get_cell_demand_df(scenario_id, service_id)
+        if demand is None:
+            return []
+
+        matrix = self.get_matrix(service_id, variant.id)
+        place_ids = self.get_open_place_ids(service_id, year, scenario_id)
+        nearest = self.get_nearest_df(matrix, place_ids)
+        df = demand.merge(nearest, on='cell_id')\
+            .merge(self.get_area_cells_df(area_level_id), on='rastercellpop_id')
+        df['weight'] = df['value'] * df['share_area_of_cell']
+        df['minute'] = np.ceil(df['minutes']).clip(lower=0).astype(int)
+
+        totals = df.groupby('area_id')['weight'].sum()
+        minutes = range(1, max_minutes + 1)
+        cumulated = df[df['minute'] <= max_minutes]\
+            .groupby(['area_id', 'minute'])['weight'].sum()\
+            .unstack(fill_value=0)\
+            .reindex(index=totals.index, columns=range(0, max_minutes + 1),
+                     fill_value=0)\
+            .cumsum(axis=1)[list(minutes)]
+        shares = cumulated.div(totals.where(totals != 0), axis=0) * 100
+
+        results = []
+        for area_id, label in areas.values_list('id', '_label'):
+            has_values = area_id in shares.index
+            for minute in minutes:
+                value = shares.at[area_id, minute] if has_values else None
+                if value is not None and np.isnan(value):
+                    value = None
+                results.append({'id': area_id, 'label': label,
+                                'cutoff': minute, 'value': value})
+        return results
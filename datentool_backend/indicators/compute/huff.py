@@ -0,0 +1,159 @@
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+from django.core.exceptions import BadRequest
+
+from datentool_backend.indicators.compute.base import (ServiceIndicator,
+                                                       ResultSerializer)
+from datentool_backend.indicators.compute.population import PopulationIndicatorMixin
+from datentool_backend.indicators.compute.reachabilities import (
+    ModeVariantMixin, get_cutoff_time)
+from datentool_backend.indicators.compute.sparse import SparseMatrixMixin
+from datentool_backend.indicators.models import MatrixCellPlace
+from datentool_backend.modes.models import ModeVariant
+from datentool_backend.places.models import Place
+
+
+class HuffModel(ModeVariantMixin, SparseMatrixMixin, PopulationIndicatorMixin, ServiceIndicator):
+    '''Erwartete Auslastung jeder Einrichtung nach dem Huff-Modell. Die
+    Nachfrage jeder Rasterzelle wird auf alle innerhalb der maximalen
+    Wegezeit erreichbaren Einrichtungen aufgeteilt, mit einer
+    Wahrscheinlichkeit proportional zur Attraktivität (Kapazität hoch alpha)
+    und exponentiell abnehmend mit der Wegezeit (exp(-beta * Minuten)).
+    Die Auslastung ist die erwartete Nachfrage je 100 Kapazitätseinheiten'''
+    title = 'Erwartete Auslastung je Einrichtung (Huff-Modell)'
+    unit = '%'
+    digits = 1
+    capacity_required = True
+    result_serializer = ResultSerializer.PLACE_UTILIZATION
+    # default attractiveness exponent and decay per minute
+    default_alpha = 1
+    default_beta = 0.1
+
+    @property
+    def description(self):
+        if not self.service:
+            return ('Erwartete Nachfrage je 100 Kapazitätseinheiten der '
+                    'Einrichtung nach dem Huff-Modell')
+        return (f'Erwartete {self.service.demand_plural_unit} je 100 '
+                f'{self.service.capacity_plural_unit} der '
+                f'{self.service.facility_singular_unit} nach dem Huff-Modell')
+
+    def get_model_params(self,
+                         variant: ModeVariant) -> Tuple[float, float, float]:
+        """
+        the requested cut-off time (defaults to the one of the mode variant),
+        the attractiveness exponent alpha and the decay per minute beta
+        """
+        cutoff = self.data.get('cutoff')
+        if not cutoff:
+            cutoff = get_cutoff_time(variant, self.service.infrastructure_id)
+        alpha = self.data.get('alpha')
+        beta = self.data.get('beta')
+        try:
+            cutoff = float(cutoff)
+            alpha = self.default_alpha if alpha in (None, '') \
+                else float(alpha)
+            beta = self.default_beta if beta in (None, '') else float(beta)
+        except (TypeError, ValueError):
+            raise BadRequest('cutoff, alpha and beta have to be numbers')
+        if cutoff <= 0 or alpha < 0 or beta < 0:
+            raise BadRequest('cutoff has to be positive, '
+                             'alpha and beta must not be negative')
+        return cutoff, alpha, beta
+
+    def compute(self):
+        service_id = self.data.get('service')
+        year = self.data.get('year', 0)
+        scenario_id = self.data.get('scenario')
+        mode = self.data.get('mode')
+        variant = self.get_mode_variant(mode, scenario_id)
+        if not variant:
+            return []
+        cutoff, alpha, beta = self.get_model_params(variant)
+
+        q_demand, p_demand = self.get_cell_demand(scenario_id, service_id)
+        if q_demand is None:
+            return []
+        q_cap, p_cap = self.get_capacities(service_id, year, scenario_id)\
+            .query.sql_with_params()
+        matrix = MatrixCellPlace.objects\
+            .in_partitions(variant, self.service.infrastructure_id)\
+            .filter(minutes__lte=cutoff)\
+            .values('cell_id', 'place_id', 'minutes')
+        q_matrix, p_matrix = matrix.query.sql_with_params()
+
+        query = f'''WITH
+        s AS ({q_cap}),
+        w AS (
+        SELECT m."cell_id", m."place_id",
+        power(s."total_capacity", %s) * exp(-%s * m."minutes") AS "weight"
+        FROM (
+        SELECT mm."cell_id", mm."place_id", min(mm."minutes") AS "minutes"
+        FROM ({q_matrix}) mm
+        GROUP BY mm."cell_id", mm."place_id"
+        ) m
+        JOIN s ON s."place_id" = m."place_id"
+        ),
+        p AS (
+        SELECT w."cell_id", w."place_id",
+        w."weight" / NULLIF(sum(w."weight") OVER (PARTITION BY w."cell_id"), 0)
+        AS "probability"
+        FROM w
+        ),
+        d AS (
+        SELECT dd."cell_id", sum(dd."value") AS "value"
+        FROM ({q_demand}) dd
+        GROUP BY dd."cell_id"
+        ),
+        e AS (
+        SELECT p."place_id", sum(p."probability" * d."value") AS "demand"
+        FROM p
+        JOIN d ON d."cell_id" = p."cell_id"
+        GROUP BY p."place_id"
+        )
+        SELECT s."place_id" AS "id",
+        s."total_capacity" AS "capacity",
+        COALESCE(e."demand", 0) AS "demand",
+        COALESCE(e."demand", 0) / s."total_capacity" * 100 AS "value"
+        FROM s
+        LEFT JOIN e ON e."place_id" = s."place_id"
+        ORDER BY s."place_id"
+        '''
+        params = p_cap + (alpha, beta) + p_matrix + p_demand
+        return Place.objects.raw(query, params)
+
+    def compute_sparse(self):
+        service_id = self.data.get('service')
+        year = self.data.get('year', 0)
+        scenario_id = self.data.get('scenario')
+        mode = self.data.get('mode')
+        variant = self.get_mode_variant(mode, scenario_id)
+        if not variant:
+            return []
+        cutoff, alpha, beta = self.get_model_params(variant)
+
+        demand = self.get_cell_demand_df(scenario_id, service_id)
+        if demand is None:
+            return []
+        demand = demand.groupby('cell_id')['value'].sum()
+
+        matrix = self.get_matrix(service_id, variant.id)
+        capacities = pd.Series(
+            dict(self.get_capacities(service_id, year, scenario_id)
+                 .values_list('place_id', 'total_capacity')), dtype=float)\
+            .sort_index()
+        supply = capacities.reindex(matrix.place_ids, fill_value=0)\
+            .to_numpy()
+        cell_demand = demand.reindex(matrix.cell_ids, fill_value=0)\
+            .to_numpy(dtype=np.float64)
+        expected = matrix.huff(supply, cell_demand,
+                               cutoff=cutoff, alpha=alpha, beta=beta)
+
+        df = pd.DataFrame({'capacity': capacities})
+        df['demand'] = pd.Series(expected, index=matrix.place_ids)\
+            .reindex(capacities.index, fill_value=0)
+        df['value'] = df['demand'] / df['capacity'] * 100
+        df = df.rename_axis('id').reset_index()
+        return df[['id', 'capacity', 'demand', 'value']].to_dict('records')
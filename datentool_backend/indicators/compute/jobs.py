@@ -0,0 +1,55 @@
+import logging
+
+from django.conf import settings
+
+from datentool_backend.indicators.compute.base import ServiceIndicator
+from datentool_backend.indicators.models import IndicatorJob, IndicatorResult
+
+
+def get_result_params(indicator: ServiceIndicator) -> dict:
+    """
+    the parameters the result of the indicator is stored with, the ones of
+    the precomputed results if possible to share the results with them
+    """
+    cache_params = indicator.get_cache_params()
+    if cache_params is not None:
+        return cache_params
+    data = indicator.data.dict() if hasattr(indicator.data, 'dict') \
+        else dict(indicator.data)
+    data.pop('indicator', None)
+    return data
+
+
+def get_job_result_params(indicator: ServiceIndicator, job_id: int) -> dict:
+    """
+    the parameters the result of a job is stored with. The results of the
+    jobs are kept apart from the precomputed results served to the
+    synchronous requests, so that a result of a job computed while the data
+    changed is never served as the current one
+    """
+    return dict(get_result_params(indicator), job=job_id)
+
+
+def compute_indicator_job(job_id: int, logger: logging.Logger):
+    """compute the indicator of the job and store the result"""
+    job = IndicatorJob.objects.get(id=job_id)
+    indicator_class = ServiceIndicator.registered[job.indicator]
+    indicator = indicator_class(job.service, dict(job.params))
+    title = indicator.title or indicator.name
+    logger.info(f'Berechnung des Indikators "{title}" für die Leistung '
+                f'"{job.service.name}" gestartet')
+    try:
+        serialized = indicator.result(
+            user=job.user, timeout=settings.INDICATOR_JOB_STATEMENT_TIMEOUT)
+        IndicatorResult.cache(job.indicator,
+                              get_job_result_params(indicator, job.id),
+                              indicator.result_serializer.name.lower(),
+                              serialized)
+    except Exception as e:
+        job.error = repr(e)
+        raise
+    finally:
+        job.is_finished = True
+        job.save()
+    logger.info(f'Indikator "{title}" berechnet '
+                f'({len(serialized["values"])} Werte)')
@@ -0,0 +1,308 @@
+import heapq
+import logging
+from typing import Callable, List, Tuple
+
+import numpy as np
+import pandas as pd
+from django.db import connection
+
+from datentool_backend.indicators.compute.base import ServiceIndicator
+from datentool_backend.indicators.compute.population import PopulationIndicatorMixin
+from datentool_backend.indicators.compute.reachabilities import (
+    ModeVariantMixin, get_cutoff_time)
+from datentool_backend.indicators.compute.sparse import (SparseMatrixMixin,
+                                                         CellPlaceMatrix)
+from datentool_backend.indicators.models import LocationSuggestion
+from datentool_backend.modes.models import (Mode,
+                                            ModeVariant,
+                                            MODE_SPEED,
+                                            MODE_MAX_DISTANCE)
+from datentool_backend.places.models import Place
+from datentool_backend.population.models import RasterCell
+
+
+class LocationSuggestionError(Exception):
+    """the locations can not be suggested with the given parameters"""
+
+
+def get_sorted_rows(sorted_ids: np.ndarray, ids: np.ndarray) -> np.ndarray:
+    """the index of the ids in the sorted ids, -1 if not found"""
+    ids = np.asarray(ids, dtype=np.int64)
+    if not len(sorted_ids):
+        return np.full(len(ids), -1, dtype=np.int64)
+    rows = np.searchsorted(sorted_ids, ids)
+    rows = np.minimum(rows, len(sorted_ids) - 1)
+    rows[sorted_ids[rows] != ids] = -1
+    return rows
+
+
+def lazy_greedy(rows: np.ndarray,
+                cols: np.ndarray,
+                costs: np.ndarray,
+                current: np.ndarray,
+                weights: np.ndarray,
+                n_sites: int,
+                callback: Callable[[int, int, float], None] = None
+                ) -> List[Tuple[int, float]]:
+    """
+    choose up to n_sites of the candidates (columns) one after another, each
+    time the one reducing the demand-weighted costs the most.
+    The reduction by a candidate can only decrease with every chosen site
+    (the objective is submodular), so the reductions are kept in a max-heap
+    and only the candidate on top has to be reevaluated (lazy greedy)
+
+    rows, cols, costs: the costs of the relations between the demand (rows)
+    and the candidates (columns), each pair at most once
+    current: the costs of the rows without new sites, updated in place
+    weights: the demand of the rows
+    callback: called with the number of chosen sites, the column and
+    the reduction after each choice
+
+    returns the chosen columns and the reductions of the costs
+    """
+    n_candidates = int(cols.max()) + 1 if len(cols) else 0
+    order = np.argsort(cols, kind='stable')
+    rows, cols, costs = rows[order], cols[order], costs[order]
+    colptr = np.zeros(n_candidates + 1, dtype=np.int64)
+    np.cumsum(np.bincount(cols, minlength=n_candidates), out=colptr[1:])
+
+    def get_gain(col: int) -> float:
+        r = rows[colptr[col]:colptr[col + 1]]
+        c = costs[colptr[col]:colptr[col + 1]]
+        return float((weights[r] * np.maximum(current[r] - c, 0)).sum())
+
+    gains = np.bincount(cols,
+                        weights=weights[rows]
+                        * np.maximum(current[rows] - costs, 0),
+                        minlength=n_candidates)
+    heap = [(-gain, col) for col, gain in enumerate(gains.tolist())
+            if gain > 0]
+    heapq.heapify(heap)
+
+    chosen = []
+    while heap and len(chosen) < n_sites:
+        stale, col = heapq.heappop(heap)
+        gain = get_gain(col)
+        # the gain decreased since it was computed, reinsert the candidate
+        if heap and gain < -heap[0][0]:
+            if gain > 0:
+                heapq.heappush(heap, (-gain, col))
+            continue
+        if gain <= 0:
+            break
+        r = rows[colptr[col]:colptr[col + 1]]
+        current[r] = np.minimum(current[r], costs[colptr[col]:colptr[col + 1]])
+        chosen.append((col, gain))
+        if callback:
+            callback(len(chosen), col, gain)
+    return chosen
+
+
+class LocationSuggester(ModeVariantMixin, SparseMatrixMixin, PopulationIndicatorMixin, ServiceIndicator):
+    '''Vorschlag neuer Standorte aus den Kandidaten (geplante Standorte oder
+    Rasterzellen), welche die mittlere Wegezeit der Nachfragenden zur
+    nächsten Einrichtung minimieren (p-Median) oder den Anteil der
+    Nachfragenden innerhalb der maximalen Wegezeit maximieren'''
+    title = 'Standortvorschläge'
+
+    def __init__(self,
+                 suggestion: LocationSuggestion,
+                 logger: logging.Logger = None):
+        data = {'service': suggestion.service_id,
+                'mode': suggestion.mode,
+                'year': suggestion.year,
+                'scenario': suggestion.scenario_id, }
+        super().__init__(suggestion.service, data)
+        self.suggestion = suggestion
+        self.logger = logger or logging.getLogger('analysis')
+
+    @property
+    def description(self):
+        return (f'Neue Standorte für {self.service.facility_plural_unit}, '
+                f'die {self.service.demand_plural_unit} am besten erreichen')
+
+    @property
+    def is_coverage(self) -> bool:
+        return self.suggestion.objective == LocationSuggestion.Objective.COVERAGE
+
+    def get_costs(self, minutes: np.ndarray, cutoff: float) -> np.ndarray:
+        """
+        the costs of the travel times, the minutes up to the cutoff for the
+        p-median, 1 beyond the cutoff and 0 within for the maximal coverage
+        """
+        if self.is_coverage:
+            return (minutes > cutoff).astype(np.float64)
+        return np.minimum(minutes, cutoff)
+
+    def get_value(self, costs: np.ndarray, weights: np.ndarray) -> float:
+        """
+        the mean travel time (the cells with no place within the cutoff count
+        with the cutoff) or the covered share of the demand in percent
+        """
+        mean = float((costs * weights).sum() / weights.sum())
+        if self.is_coverage:
+            return (1 - mean) * 100
+        return mean
+
+    def get_place_candidates(self,
+                             matrix: CellPlaceMatrix,
+                             cutoff: float) -> Tuple[List[dict],
+                                                     np.ndarray,
+                                                     np.ndarray,
+                                                     np.ndarray]:
+        """
+        the candidate places with travel times in the matrix, the cells,
+        the candidates and the minutes of the relations within the cutoff
+        """
+        place_ids = np.unique(np.asarray(self.suggestion.places,
+                                         dtype=np.int64))
+        routed = place_ids[np.isin(place_ids, matrix.place_ids)]
+        if len(routed) < len(place_ids):
+            self.logger.warning(
+                f'Für {len(place_ids) - len(routed)} der Standorte wurden '
+                'keine Reisezeiten berechnet. Sie werden nicht berücksichtigt.')
+        valid = matrix.get_place_mask(routed)[matrix.indices] \
+            & (matrix.minutes <= cutoff)
+        cell_ids = matrix.cell_ids[matrix.rows[valid]]
+        cols = np.searchsorted(routed, matrix.place_ids[matrix.indices[valid]])
+        names = dict(Place.objects.filter(id__in=routed.tolist())
+                     .values_list('id', 'name'))
+        candidates = [{'place_id': place_id, 'name': names.get(place_id)}
+                      for place_id in routed.tolist()]
+        return candidates, cell_ids, cols, matrix.minutes[valid]
+
+    def get_cell_candidates(self,
+                            variant: ModeVariant,
+                            cell_ids: np.ndarray,
+                            cutoff: float) -> Tuple[List[dict],
+                                                    np.ndarray,
+                                                    np.ndarray,
+                                                    np.ndarray]:
+        """
+        the candidate raster cells, the cells, the candidates and the minutes
+        of the relations within the cutoff, derived from the air distance
+        like the air distance routing
+        """
+        mode = Mode(variant.mode)
+        if mode not in MODE_SPEED:
+            raise LocationSuggestionError(
+                f'Rasterzellen können für das Verkehrsmittel "{mode.label}" '
+                'nicht als Kandidaten verwendet werden')
+        speed = MODE_SPEED[mode]
+        # the distance reachable within the cutoff in meters
+        max_distance = min(MODE_MAX_DISTANCE[mode], cutoff * speed * 1000 / 60)
+        cell_tbl = RasterCell._meta.db_table
+
+        query = f'''SELECT
+        k."cellcode", c."id" AS "cell_id",
+        min(st_distance(st_transform(c."pnt", 25832), k."pnt_25832"))
+        / %s * (60.0/1000) AS "minutes"
+        FROM "{cell_tbl}" AS c
+        JOIN (
+        SELECT k."cellcode", k."pnt",
+        st_transform(k."pnt", 25832) AS "pnt_25832",
+        cosd(st_y(st_transform(k."pnt", 4326))) AS "kf"
+        FROM "{cell_tbl}" AS k
+        WHERE k."cellcode" = ANY(%s)
+        ) AS k
+        ON st_dwithin(c."pnt", k."pnt", %s / k."kf")
+        WHERE c."id" = ANY(%s)
+        GROUP BY k."cellcode", c."id"
+        '''
+        params = (speed, list(self.suggestion.cells), max_distance,
+                  cell_ids.tolist())
+        with connection.cursor() as cursor:
+            cursor.execute(query, params)
+            df = pd.DataFrame(cursor.fetchall(),
+                              columns=['cellcode', 'cell_id', 'minutes'])
+
+        cellcodes = sorted(set(self.suggestion.cells))
+        cols = pd.Categorical(df['cellcode'], categories=cellcodes).codes
+        candidates = [{'cell_code': cellcode} for cellcode in cellcodes]
+        return (candidates,
+                df['cell_id'].to_numpy(dtype=np.int64),
+                cols.astype(np.int64),
+                df['minutes'].to_numpy(dtype=np.float64))
+
+    def compute(self) -> List[dict]:
+        """choose the sites and store them with the suggestion"""
+        suggestion = self.suggestion
+        service_id = suggestion.service_id
+        year = suggestion.year
+        scenario_id = suggestion.scenario_id
+        variant = self.get_mode_variant(suggestion.mode, scenario_id)
+        if not variant:
+            raise LocationSuggestionError(
+                'Für das Verkehrsmittel ist keine Variante vorhanden')
+        cutoff = suggestion.cutoff or get_cutoff_time(
+            variant, self.service.infrastructure_id)
+
+        demand = self.get_cell_demand_df(scenario_id, service_id)
+        if demand is None:
+            raise LocationSuggestionError('Es ist keine Nachfrage vorhanden')
+        demand = demand.groupby('cell_id')['value'].sum()
+        demand = demand[demand > 0]
+        if not len(demand):
+            raise LocationSuggestionError('Es ist keine Nachfrage vorhanden')
+        cell_ids = demand.index.to_numpy(dtype=np.int64)
+        weights = demand.to_numpy(dtype=np.float64)
+
+        # the travel times to the nearest of the existing places
+        matrix = self.get_matrix(service_id, variant.id)
+        place_ids = np.setdiff1d(
+            self.get_open_place_ids(service_id, year, scenario_id),
+            np.asarray(suggestion.places, dtype=np.int64))
+        rows, cols, minutes = matrix.nearest(place_ids)
+        current = np.full(len(cell_ids), np.inf)
+        demand_rows = get_sorted_rows(cell_ids, matrix.cell_ids[rows])
+        in_demand = demand_rows >= 0
+        current[demand_rows[in_demand]] = minutes[in_demand]
+        current = self.get_costs(current, cutoff)
+
+        candidates, c_cells, c_cols, c_minutes = \
+            self.get_place_candidates(matrix, cutoff)
+        if suggestion.cells:
+            cell_candidates, cc_cells, cc_cols, cc_minutes = \
+                self.get_cell_candidates(variant, cell_ids, cutoff)
+            c_cells = np.concatenate([c_cells, cc_cells])
+            c_cols = np.concatenate([c_cols, cc_cols + len(candidates)])
+            c_minutes = np.concatenate([c_minutes, cc_minutes])
+            candidates = candidates + cell_candidates
+        if not candidates:
+            raise LocationSuggestionError('Es sind keine Kandidaten vorhanden')
+
+        c_rows = get_sorted_rows(cell_ids, c_cells)
+        in_demand = c_rows >= 0
+        c_rows = c_rows[in_demand]
+        c_cols = c_cols[in_demand].astype(np.int64)
+        c_costs = self.get_costs(c_minutes[in_demand].astype(np.float64),
+                                 cutoff)
+
+        n_sites = min(suggestion.n_sites, len(candidates))
+        suggestion.initial_value = self.get_value(current, weights)
+        suggestion.sites = []
+        self.logger.info(f'Suche {n_sites} Standorte unter '
+                         f'{len(candidates)} Kandidaten')
+
+        def add_site(n: int, col: int, gain: float):
+            site = dict(candidates[col])
+            site['value'] = self.get_value(current, weights)
+            suggestion.sites.append(site)
+            label = site.get('name') or site.get('cell_code') \
+                or site.get('place_id')
+            self.logger.info(f'{n}/{n_sites} Standorte gewählt ({label})')
+
+        chosen = lazy_greedy(c_rows, c_cols, c_costs, current, weights,
+                             n_sites, callback=add_site)
+        if len(chosen) < n_sites:
+            self.logger.info('Die übrigen Kandidaten verbessern die '
+                             'Erreichbarkeit nicht')
+        suggestion.is_finished = True
+        suggestion.save()
+        return suggestion.sites
+
+
+def suggest_locations(suggestion_id: int, logger: logging.Logger):
+    """compute the location suggestion (as a background process)"""
+    suggestion = LocationSuggestion.objects.get(id=suggestion_id)
+    LocationSuggester(suggestion, logger=logger).compute()
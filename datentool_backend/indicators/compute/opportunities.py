@@ -0,0 +1,283 @@
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+from django.core.exceptions import BadRequest
+from django.db.models import Count, Sum, QuerySet
+
+from datentool_backend.indicators.compute.base import (ComputeIndicator,
+                                                       ResultSerializer)
+from datentool_backend.indicators.compute.population import PopulationIndicatorMixin
+from datentool_backend.indicators.compute.reachabilities import ModeVariantMixin
+from datentool_backend.indicators.compute.sparse import (SparseMatrixMixin,
+                                                         CellPlaceMatrix)
+from datentool_backend.indicators.models import MatrixCellPlace
+from datentool_backend.modes.models import Mode
+from datentool_backend.places.models import Capacity
+from datentool_backend.infrastructure.models import Service
+from datentool_backend.population.models import RasterCell, AreaCell
+from datentool_backend.area.models import Area
+
+
+class CumulativeOpportunitiesMixin(ModeVariantMixin,
+                                   SparseMatrixMixin,
+                                   PopulationIndicatorMixin):
+    """
+    number of places or total capacity of a service reachable within each
+    of a list of travel times ("cutoffs"), binned in one pass over the matrix
+    """
+    measures = ('places', 'capacity')
+
+    def evaluate(self):
+        """compute the indicator with the engine configured for it"""
+        if self.engine == 'sparse':
+            return self.compute_sparse()
+        return self.compute()
+
+    def get_cutoffs(self) -> List[float]:
+        """the requested cutoffs in ascending order"""
+        cutoffs = self.data.getlist('cutoffs') \
+            if hasattr(self.data, 'getlist') else self.data.get('cutoffs')
+        try:
+            cutoffs = sorted({float(cutoff) for cutoff in cutoffs or []})
+        except (TypeError, ValueError):
+            raise BadRequest('cutoffs have to be numbers')
+        if not cutoffs:
+            raise BadRequest('No cutoffs provided')
+        return cutoffs
+
+    def get_measure(self) -> str:
+        measure = self.data.get('measure') or 'places'
+        if measure not in self.measures:
+            raise BadRequest(f'measure has to be one of {self.measures}')
+        return measure
+
+    def get_place_values(self, service_id: int, year: int,
+                         scenario_id: int) -> QuerySet:
+        """the value of each open place (1 or its capacity)"""
+        capacities = Capacity.filter_queryset(Capacity.objects.all(),
+                                              service_ids=[service_id],
+                                              scenario_id=scenario_id,
+                                              year=year)
+        capacities = capacities.filter(capacity__gt=0).values('place_id')
+        if self.get_measure() == 'capacity':
+            return capacities.annotate(value=Sum('capacity'))
+        return capacities.annotate(value=Count('place_id', distinct=True))
+
+    def get_cell_values_query(self,
+                              service_id: int,
+                              year: int,
+                              scenario_id: int,
+                              variant,
+                              cutoffs: List[float]) -> Tuple[str, tuple]:
+        """
+        the query of the values reachable per cell and cutoff.
+        width_bucket on the negated cutoffs counts the cutoffs a travel time
+        is within, the relations are aggregated by that count first
+        and summed up for all cutoffs afterwards
+        """
+        infrastructure_id = Service.objects.get(id=service_id)\
+            .infrastructure_id
+        matrix = MatrixCellPlace.objects\
+            .in_partitions(variant, infrastructure_id)\
+            .filter(minutes__lte=cutoffs[-1])\
+            .values('cell_id', 'place_id', 'minutes')
+        q_matrix, p_matrix = matrix.query.sql_with_params()
+        q_places, p_places = self.get_place_values(service_id, year,
+                                                   scenario_id)\
+            .query.sql_with_params()
+        bounds = sorted(-cutoff for cutoff in cutoffs)
+
+        query = f'''WITH
+        b AS (
+        SELECT m."cell_id",
+        width_bucket(-m."minutes", %s::double precision[]) AS "n_cutoffs",
+        sum(p."value") AS "value"
+        FROM (
+        SELECT mm."cell_id", mm."place_id", min(mm."minutes") AS "minutes"
+        FROM ({q_matrix}) mm
+        GROUP BY mm."cell_id", mm."place_id"
+        ) m
+        JOIN ({q_places}) p ON p."place_id" = m."place_id"
+        GROUP BY m."cell_id", "n_cutoffs"
+        )
+        SELECT b."cell_id", t."cutoff", sum(b."value") AS "value"
+        FROM b
+        JOIN unnest(%s::double precision[]) WITH ORDINALITY AS t("cutoff", "i")
+        ON b."n_cutoffs" > %s - t."i"
+        GROUP BY b."cell_id", t."cutoff"
+        '''
+        params = (bounds, ) + p_matrix + p_places + (cutoffs, len(cutoffs))
+        return query, params
+
+    def get_sparse_cell_values(self,
+                               service_id: int,
+                               year: int,
+                               scenario_id: int,
+                               variant,
+                               cutoffs: List[float]) -> Tuple[CellPlaceMatrix,
+                                                              np.ndarray]:
+        """the matrix and the values reachable per row and cutoff"""
+        matrix = self.get_matrix(service_id, variant.id)
+        place_values = pd.Series(
+            dict(self.get_place_values(service_id, year, scenario_id)
+                 .values_list('place_id', 'value')), dtype=float)
+        values = place_values.reindex(matrix.place_ids, fill_value=0)\
+            .to_numpy()
+        return matrix, matrix.cumulative(values, cutoffs)
+
+
+class CumulativeOpportunitiesCell(CumulativeOpportunitiesMixin,
+                                  ComputeIndicator):
+    '''Anzahl der Einrichtungen oder Summe ihrer Kapazitäten, die von jedem
+    Wohnstandort (= Rasterzelle) aus innerhalb der angegebenen Wegezeiten
+    erreichbar sind'''
+    title = 'Erreichbare Einrichtungen je Wohnstandort'
+    description = ('Anzahl der Einrichtungen oder Summe ihrer Kapazitäten, '
+                   'die von jedem Wohnstandort aus innerhalb der angegebenen '
+                   'Wegezeiten erreichbar sind')
+    result_serializer = ResultSerializer.RASTER_CUTOFFS
+
+    def compute(self):
+        mode = self.data.get('mode', Mode.WALK)
+        service_id = self.data.get('service')
+        year = self.data.get('year')
+        scenario_id = self.data.get('scenario')
+        variant = self.get_mode_variant(mode, scenario_id)
+        if not variant:
+            return []
+        cutoffs = self.get_cutoffs()
+
+        q_cells, p_cells = self.get_cell_values_query(
+            service_id, year, scenario_id, variant, cutoffs)
+        query = f'''SELECT
+        rc."id", rc."cellcode" AS "cell_code", v."cutoff", v."value"
+        FROM ({q_cells}) v
+        JOIN "{RasterCell._meta.db_table}" rc ON rc."id" = v."cell_id"
+        '''
+        return RasterCell.objects.raw(query, p_cells)
+
+    def compute_sparse(self):
+        mode = self.data.get('mode', Mode.WALK)
+        service_id = self.data.get('service')
+        year = self.data.get('year')
+        scenario_id = self.data.get('scenario')
+        variant = self.get_mode_variant(mode, scenario_id)
+        if not variant:
+            return []
+        cutoffs = self.get_cutoffs()
+
+        matrix, values = self.get_sparse_cell_values(
+            service_id, year, scenario_id, variant, cutoffs)
+        rows, cols = np.nonzero(values > 0)
+        return [{'cell_code': cell_code, 'cutoff': cutoffs[col],
+                 'value': value}
+                for cell_code, col, value
+                in zip(matrix.cell_codes[rows], cols,
+                       values[rows, cols].tolist())]
+
+
+class CumulativeOpportunitiesArea(CumulativeOpportunitiesMixin,
+                                  ComputeIndicator):
+    '''Durchschnittliche Anzahl der Einrichtungen oder Summe ihrer
+    Kapazitäten, die von den Nachfragenden einer Gebietseinheit aus
+    innerhalb der angegebenen Wegezeiten erreichbar sind'''
+    title = 'Erreichbare Einrichtungen je Gebiet'
+    description = ('Durchschnittliche Anzahl der Einrichtungen oder Summe '
+                   'ihrer Kapazitäten, die von den Nachfragenden im Gebiet '
+                   'innerhalb der angegebenen Wegezeiten erreichbar sind')
+    result_serializer = ResultSerializer.AREA_CUTOFFS
+
+    def compute(self):
+        mode = self.data.get('mode', Mode.WALK)
+        service_id = self.data.get('service')
+        year = self.data.get('year')
+        scenario_id = self.data.get('scenario')
+        area_level_id = self.data.get('area_level')
+        if area_level_id is None:
+            raise BadRequest('No AreaLevel provided')
+        variant = self.get_mode_variant(mode, scenario_id)
+        if not variant:
+            return []
+        cutoffs = self.get_cutoffs()
+
+        areas = self.get_areas(area_level_id=area_level_id)
+        q_areas, p_areas = areas.values('id', '_label').query.sql_with_params()
+        q_demand, p_demand = self.get_cell_demand(scenario_id, service_id)
+        if q_demand is None:
+            return []
+        q_acells, p_acells = self.get_area_cells(area_level_id)\
+            .query.sql_with_params()
+        q_cells, p_cells = self.get_cell_values_query(
+            service_id, year, scenario_id, variant, cutoffs)
+
+        query = f'''WITH
+        w AS (
+        SELECT ac."area_id", d."cell_id",
+        d."value" * ac."share_area_of_cell" AS "weight"
+        FROM ({q_demand}) d
+        JOIN ({q_acells}) ac ON ac."rastercellpop_id" = d."rastercellpop_id"
+        ),
+        v AS ({q_cells})
+        SELECT a."id", a."_label", t."cutoff",
+        CASE WHEN sum(w."weight") = 0 THEN NULL
+        ELSE sum(COALESCE(v."value", 0) * w."weight") / sum(w."weight")
+        END AS "value"
+        FROM ({q_areas}) a
+        CROSS JOIN unnest(%s::double precision[]) AS t("cutoff")
+        LEFT JOIN w ON w."area_id" = a."id"
+        LEFT JOIN v ON v."cell_id" = w."cell_id" AND v."cutoff" = t."cutoff"
+        GROUP BY a."id", a."_label", t."cutoff"
+        '''
+        params = p_demand + p_acells + p_cells + p_areas + (cutoffs, )
+        return Area.objects.raw(query, params)
+
+    def compute_sparse(self):
+        mode = self.data.get('mode', Mode.WALK)
+        service_id = self.data.get('service')
+        year = self.data.get('year')
+        scenario_id = self.data.get('scenario')
+        area_level_id = self.data.get('area_level')
+        if area_level_id is None:
+            raise BadRequest('No AreaLevel provided')
+        variant = self.get_mode_variant(mode, scenario_id)
+        if not variant:
+            return []
+        cutoffs = self.get_cutoffs()
+
+        areas = self.get_areas(area_level_id=area_level_id)
+        demand = self.get_cell_demand_df(scenario_id, service_id)
+        if demand is None:
+            return []
+        df = demand.merge(self.get_area_cells_df(area_level_id),
+                          on='rastercellpop_id')
+        weights = (df['value'] * df['share_area_of_cell']).to_numpy()
+
+        matrix, values = self.get_sparse_cell_values(
+            service_id, year, scenario_id, variant, cutoffs)
+        rows = matrix.get_rows(df['cell_id'].to_numpy())
+        cell_values = np.zeros((len(df), len(cutoffs)))
+        in_matrix = rows >= 0
+        cell_values[in_matrix] = values[rows[in_matrix]]
+
+        weighted = pd.DataFrame(cell_values * weights[:, np.newaxis])\
+            .groupby(df['area_id'].to_numpy()).sum()
+        total_weights = pd.Series(weights).groupby(df['area_id'].to_numpy())\
+            .sum()
+        means = weighted.div(total_weights.where(total_weights != 0), axis=0)
+
+        results = []
+        for area_id, label in areas.values_list('id', '_label'):
+            for i, cutoff in enumerate(cutoffs):
+                value = means.at[area_id, i] if area_id in means.index \
+                    else None
+                if value is not None and np.isnan(value):
+                    value = None
+                results.append({'id': area_id, 'label': label,
+                                'cutoff': cutoff, 'value': value})
+        return results
+
+    def get_area_cells(self, area_level_id: int) -> QuerySet:
+        return AreaCell.objects\
+            .filter(area__area_level_id=area_level_id)\
+            .values('area_id', 'rastercellpop_id', 'share_area_of_cell')
@@ -1,6 +1,7 @@
 from typing import Dict, List, Tuple
+from hashlib import md5
 
-from django.db import connection
+from django.db import connection, transaction
 from django.db.models import Count, Q, F, Value, FloatField
 from django.core.exceptions import BadRequest
 
@@ -18,7 +19,10 @@ from datentool_backend.population.models import (RasterCellPopulationAgeGender,
                                                  Year,
                                                  )
 from datentool_backend.places.models import Scenario, ScenarioService
-from datentool_backend.demand.models import DemandRateSet, DemandRate
+from datentool_backend.demand.models import (DemandRateSet,
+                                             DemandRate,
+                                             CellDemandCache,
+                                             CellDemand)
 from datentool_backend.infrastructure.models import Service
 
 
@@ -105,19 +109,28 @@ class PopulationIndicatorMixin:
             .filter(**area_filter)
         return areas
 
-    def get_demand_rates(self, scenario_id: int, service_id: int) -> DemandRate:
-        """get the demand rates for a scenario, year and service"""
-        service = Service.objects.get(id=service_id)
+    def get_demand_rate_set(self,
+                            scenario_id: int,
+                            service_id: int) -> DemandRateSet:
+        """get the demand rate set of the service in the scenario"""
         try:
             scenario_service = ScenarioService.objects.get(scenario=scenario_id,
                                                            service_id=service_id)
-            drs = scenario_service.demandrateset
+            return scenario_service.demandrateset
         except ScenarioService.DoesNotExist:
             try:
-                drs = DemandRateSet.objects.get(service=service, is_default=True)
+                return DemandRateSet.objects.get(service_id=service_id,
+                                                 is_default=True)
             except DemandRateSet.DoesNotExist:
                 return None
 
+    def get_demand_rates(self, scenario_id: int, service_id: int) -> DemandRate:
+        """get the demand rates for a scenario, year and service"""
+        service = Service.objects.get(id=service_id)
+        drs = self.get_demand_rate_set(scenario_id, service_id)
+        if drs is None:
+            return None
+
         year = self.data.get('year')
         if year:
             year = Year.objects.get(year=year)
@@ -170,6 +183,11 @@ class PopulationIndicatorMixin:
             population=population,
             area_level_id=area_level_id)
 
+        cell_demand = None
+        if not pop_arealevel.up_to_date:
+            cell_demand = self.get_materialized_cell_demand(scenario_id,
+                                                            service_id)
+
         #  check if the area-population is precalculated
         if pop_arealevel.up_to_date:
 
@@ -220,6 +238,31 @@ class PopulationIndicatorMixin:
 
                 params = p_areas + p_areapop + p_drs
 
+        elif cell_demand is not None:
+            # sum up the materialized demand of the cells to areas
+            acells = AreaCell.objects.filter(area__area_level_id=area_level_id)
+            q_acells, p_acells = acells.values(
+                'area_id', 'rastercellpop_id', 'share_area_of_cell').query.sql_with_params()
+            q_cd, p_cd = cell_demand.values('rastercellpop_id', 'value')\
+                .query.sql_with_params()
+
+            query = f'''SELECT
+            a."id", a."_label", val."value"
+            FROM ({q_areas}) AS a
+            LEFT JOIN (
+              SELECT
+                ac."area_id",
+                SUM(cd."value" * ac."share_area_of_cell") AS "value"
+              FROM
+                ({q_acells}) AS ac,
+                ({q_cd}) AS cd
+              WHERE ac."rastercellpop_id" = cd."rastercellpop_id"
+              GROUP BY ac."area_id"
+            ) val ON (val."area_id" = a."id")
+            '''
+
+            params = p_areas + p_acells + p_cd
+
         else:
             # calculate it from the raster cells
             rcp = RasterCellPopulation.objects.all()
@@ -295,8 +338,76 @@ class PopulationIndicatorMixin:
     def get_cell_demand(self,
                         scenario_id: int,
                         service_id: int) -> Tuple[str, Tuple[float]]:
-
         """get the demand per rastercell for service in scenario"""
+        cell_demand = self.get_materialized_cell_demand(scenario_id, service_id)
+        if cell_demand is None:
+            return self.calc_cell_demand(scenario_id, service_id)
+        if not cell_demand.exists():
+            return None, ()
+        return cell_demand.values('rastercellpop_id', 'cell_id', 'value')\
+            .query.sql_with_params()
+
+    def get_materialized_cell_demand(self,
+                                     scenario_id: int,
+                                     service_id: int) -> CellDemand:
+        """
+        get the materialized demand per rastercell, refresh it if the
+        population or the demand rates changed since the last refresh.
+        Returns None, if the demand can not be materialized, because the
+        population is filtered by gender or age group or no single year is
+        requested
+        """
+        filter_params = self.get_filter_params()
+        if 'gender__in' in filter_params or 'age_group__in' in filter_params:
+            return None
+        population_ids = self.get_population_ids()
+        if len(population_ids) != 1:
+            return None
+
+        service = Service.objects.get(id=service_id)
+        demand_is_uniform = service.demand_type == Service.DemandType.UNIFORM
+        demand_rates = self.get_demand_rates(scenario_id, service_id)
+        if not demand_rates and not demand_is_uniform:
+            return CellDemand.objects.none()
+        if demand_is_uniform:
+            drs = None
+            rates = []
+        else:
+            drs = self.get_demand_rate_set(scenario_id, service_id)
+            rates = sorted(demand_rates.values_list('age_group_id',
+                                                    'gender_id',
+                                                    'factor'))
+        demand_rates_hash = md5(
+            f'{service.demand_type}{rates}'.encode()).hexdigest()
+
+        with transaction.atomic():
+            cache, created = CellDemandCache.objects.select_for_update()\
+                .get_or_create(population_id=population_ids[0],
+                               service=service,
+                               demand_rate_set=drs)
+            if (not cache.up_to_date
+                or cache.demand_rates_hash != demand_rates_hash):
+                qs_old = CellDemand.objects.filter(cache=cache)
+                qs_old._raw_delete(using=qs_old.db)
+                q_demand, p_demand = self.calc_cell_demand(scenario_id,
+                                                           service_id)
+                if q_demand is not None:
+                    query = f'''INSERT INTO "{CellDemand._meta.db_table}"
+                    ("cache_id", "rastercellpop_id", "cell_id", "value")
+                    SELECT %s, d."rastercellpop_id", d."cell_id", d."value"
+                    FROM ({q_demand}) d
+                    '''
+                    with connection.cursor() as cursor:
+                        cursor.execute(query, (cache.pk, ) + p_demand)
+                cache.demand_rates_hash = demand_rates_hash
+                cache.up_to_date = True
+                cache.save()
+        return CellDemand.objects.filter(cache=cache)
+
+    def calc_cell_demand(self,
+                         scenario_id: int,
+                         service_id: int) -> Tuple[str, Tuple[float]]:
+        """calculate the demand per rastercell for service in scenario"""
         # calculate it from the raster cells
         service = Service.objects.get(id=service_id)
         demand_is_uniform = service.demand_type == Service.DemandType.UNIFORM
@@ -2,10 +2,10 @@ from django.db.models import F, Min
 
 from datentool_backend.indicators.compute.base import (ComputeIndicator,
                                                        ResultSerializer)
-from datentool_backend.modes.models import Mode, ModeVariant
+from datentool_backend.modes.models import Mode, ModeVariant, CutOffTime
 from datentool_backend.places.models import ScenarioMode
 from datentool_backend.indicators.models import MatrixCellPlace
-from datentool_backend.places.models import Place, Capacity, Service
+from datentool_backend.places.models import Place, Capacity
 
 
 class ModeVariantMixin:
@@ -41,6 +41,21 @@ reachability_bins_by_mode = {
     Mode.TRANSIT: [None, 10, 15, 20, 30, 45, 60, None],
 }
 
+
+def get_cutoff_time(variant: ModeVariant, infrastructure_id: int) -> float:
+    """
+    the cut-off time of the mode variant for the infrastructure, defaults to
+    the upper reachability class of the mode
+    """
+    cutoff_time = CutOffTime.objects\
+        .filter(mode_variant=variant, infrastructure=infrastructure_id)\
+        .first()
+    if cutoff_time:
+        return cutoff_time.minutes
+    return max(b for b in reachability_bins_by_mode[Mode(variant.mode)]
+               if b is not None)
+
+
 reachability_colors = ['#006837', '#64bc61', '#d7ee8e',
                        '#fedd8d', '#f16e43', '#a50027', '#000000']
 
@@ -63,9 +78,7 @@ class ReachabilityPlace(ModeVariantMixin, ComputeIndicator):
             return []
 
         place = Place.objects.get(id=self.data.get('place'))
-        cells = MatrixCellPlace.objects.filter(
-            variant=variant.id, place=place,
-            partition_id=[variant.id, place.infrastructure_id])
+        cells = MatrixCellPlace.objects.for_places(place, variants=variant)
         cells = cells.annotate(cell_code=F('cell__cellcode'), value=F('minutes'))
         return cells
 
@@ -90,13 +103,10 @@ class ReachabilityCell(ModeVariantMixin, ComputeIndicator):
             return []
 
         service_id = self.data.get('service')
-        service = Service.objects.get(id=service_id)
-        partition_id = [variant.id, service.infrastructure_id]
         cell_code = self.data.get('cell_code')
-        places = MatrixCellPlace.objects.filter(variant=variant,
-                                                cell__cellcode=cell_code,
-                                                partition_id=partition_id,
-                                                )
+        places = MatrixCellPlace.objects\
+            .for_services(variant, service_id)\
+            .filter(cell__cellcode=cell_code)
         places = places.values('place_id', 'minutes')\
             .annotate(id=F('place_id'), value=F('minutes'))
         return places
@@ -118,12 +128,10 @@ class ReachabilityNextPlace(ModeVariantMixin, ComputeIndicator):
     def compute(self):
         mode = self.data.get('mode', Mode.WALK)
         service_ids = self.data.get('services')
-        services = Service.objects.filter(id__in=service_ids)
         year = self.data.get('year')
         scenario_id = self.data.get('scenario')
         variant = self.get_mode_variant(mode, scenario_id)
         place_id = self.data.get('places')
-        partition_ids = [[variant.id, service.infrastructure_id] for service in services]
 
         if not variant:
             return []
@@ -141,9 +149,9 @@ class ReachabilityNextPlace(ModeVariantMixin, ComputeIndicator):
             capacities = capacities.filter(place_id__in=place_id)
 
         place_ids = capacities.distinct('place_id').values_list('place_id', flat=True)
-        mcp = MatrixCellPlace.objects.filter(variant=variant,
-                                             place__in=place_ids,
-                                             partition_id__in=partition_ids)
+        mcp = MatrixCellPlace.objects\
+            .for_services(variant, service_ids)\
+            .filter(place__in=place_ids)
         cells = mcp.values('cell_id')\
             .annotate(value=Min('minutes'))\
             .annotate(cell_code=F('cell__cellcode'))
@@ -127,6 +127,9 @@ class TravelTimeRouterMixin:
             logger.error(msg)
             raise Exception(msg)
         else:
+            # once for the whole run, not for each written chunk
+            MatrixCellPlace.invalidate_caches(
+                variant_ids=[variant.pk for variant in variants])
             logger.info('Berechnung der Reisezeitmatrizen erfolgreich abgeschlossen')
 
     def store_to_database(self,
@@ -503,11 +506,11 @@ class MatrixCellPlaceRouter(TravelTimeRouterMixin):
                             for variant in mode_variants.exclude(mode=Mode.TRANSIT)]
         transit_variants = [variant.pk
                             for variant in mode_variants.filter(mode=Mode.TRANSIT)]
-        qs = MatrixCellPlace.objects.filter(Q(variant__in=private_transport_variants) |
-                                            Q(variant__in=transit_variants,
-                                              access_variant_id=access_variant_id))
-        if place_ids:
-            qs = qs.filter(place_id__in=place_ids)
+        qs = MatrixCellPlace.objects.for_places(place_ids, variant_ids) \
+            if place_ids else MatrixCellPlace.objects.in_partitions(variant_ids)
+        qs = qs.filter(Q(variant__in=private_transport_variants) |
+                       Q(variant__in=transit_variants,
+                         access_variant_id=access_variant_id))
         return qs
 
     def get_sources(self, place_ids, **kwargs):
@@ -537,20 +540,9 @@ class MatrixCellPlaceRouter(TravelTimeRouterMixin):
                                      id_columns=['place_id', 'cell_id'],
                                      **kwargs) -> pd.DataFrame:
         # travel time place to stop
-        qs = MatrixPlaceStop.objects.filter(
-            stop__variant=transit_variant,
-            access_variant=access_variant,
-            )
-        if place_ids:
-            infrastructure_ids = Place.objects\
-                .filter(id__in=place_ids)\
-                .order_by('infrastructure_id')\
-                .distinct('infrastructure_id')\
-                .values_list('infrastructure_id', flat=True)
-            partition_ids = [[transit_variant.id, infrastructure_id]
-                             for infrastructure_id in infrastructure_ids]
-            qs = qs.filter(place_id__in=place_ids,
-                           partition_id__in=partition_ids)
+        qs = MatrixPlaceStop.objects.for_places(place_ids, transit_variant) \
+            if place_ids else MatrixPlaceStop.objects.in_partitions(transit_variant)
+        qs = qs.filter(access_variant=access_variant)
 
         q_placestop, p_placestop = qs.query.sql_with_params()
 
@@ -566,12 +558,9 @@ class MatrixCellPlaceRouter(TravelTimeRouterMixin):
             ).query.sql_with_params()
 
         # direct traveltime by foot (or other access mode), if it is shorter than max_direct_walktime
-        qs = MatrixCellPlace.objects.filter(
-            variant=access_variant,
-            minutes__lt=max_direct_walktime,
-        )
-        if place_ids:
-            qs = qs.filter(place_id__in=place_ids)
+        qs = MatrixCellPlace.objects.for_places(place_ids, access_variant) \
+            if place_ids else MatrixCellPlace.objects.in_partitions(access_variant)
+        qs = qs.filter(minutes__lt=max_direct_walktime)
 
         q_cellplace, p_cellplace = qs.query.sql_with_params()
 
@@ -899,11 +888,9 @@ class MatrixPlaceStopRouter(AccessTimeRouterMixin):
                               access_variant_id: int,
                               place_ids: List[int] = None,
                               **kwargs) -> QuerySet:
-        qs = MatrixPlaceStop.objects.filter(stop__variant_id__in=variant_ids,
-                                            access_variant_id=access_variant_id)
-        if place_ids:
-            qs = qs.filter(place_id__in=place_ids)
-        return qs
+        qs = MatrixPlaceStop.objects.for_places(place_ids, variant_ids) \
+            if place_ids else MatrixPlaceStop.objects.in_partitions(variant_ids)
+        return qs.filter(access_variant_id=access_variant_id)
 
     def get_sources(self, place_ids, **kwargs) -> Place:
         sources = Place.objects.all()
@@ -1,11 +1,10 @@
 from abc import ABCMeta, abstractmethod
 from django.db.models import OuterRef, Subquery, Count, IntegerField, Sum
 from django.db.models.functions import Coalesce
-from sql_util.utils import Exists
 
 from datentool_backend.indicators.compute.base import ComputeIndicator, ResultSerializer
 from datentool_backend.area.models import Area, AreaLevel
-from datentool_backend.places.models import Place, Capacity
+from datentool_backend.places.models import Capacity, PlaceArea
 
 
 class ComputeAreaIndicator(ComputeIndicator, metaclass=ABCMeta):
@@ -29,17 +28,17 @@ class ComputeAreaIndicator(ComputeIndicator, metaclass=ABCMeta):
                                               )
         # only those with capacity - value > 0
         capacities = capacities.filter(capacity__gt=0)
-        places = Place.objects.all()
-        areas = self.aggregate_places(places, capacities, areas)
+        place_areas = PlaceArea.get_area_level(area_level)
+        areas = self.aggregate_places(place_areas, capacities, areas)
         return areas
 
     @abstractmethod
     def aggregate_places(self,
-                         places: Place,
+                         place_areas: PlaceArea,
                          capacities: Capacity,
                          areas: Area) -> Area:
         """annotate the areas-queryset with a value-Field, that is an aggregate
-        of places and capacities"""
+        of the places assigned to the areas and their capacities"""
 
 
 class NumberOfLocations(ComputeAreaIndicator):
@@ -49,20 +48,14 @@ class NumberOfLocations(ComputeAreaIndicator):
     colormap_name = 'Blues'
 
     def aggregate_places(self,
-                         places: Place,
+                         place_areas: PlaceArea,
                          capacities: Capacity,
                          areas: Area) -> Area:
         """Counts the number of places per area"""
-        places_with_capacity = places.annotate(
-            has_capacity=Exists(capacities.filter(place=OuterRef('pk'))))\
-            .filter(has_capacity=True)
-
-        places_with_area = places_with_capacity\
-            .filter(geom__intersects=OuterRef('geom'))\
-            .annotate(area_id=OuterRef('id'))\
-            .values('area_id')
-
-        places_in_area = places_with_area\
+        places_in_area = place_areas\
+            .filter(area=OuterRef('pk'),
+                    place__in=capacities.values('place'))\
+            .values('area')\
             .annotate(n_places=Count('*'))\
             .values('n_places')
         areas = areas.annotate(
@@ -78,28 +71,24 @@ class TotalCapacityInArea(ComputeAreaIndicator):
     colormap_name = 'Blues'
 
     def aggregate_places(self,
-                         places: Place,
+                         place_areas: PlaceArea,
                          capacities: Capacity,
                          areas: Area) -> Area:
         """Sums up the capacity per area"""
 
         # sum up the capacity per place over all services
-        places_with_capacity = places.annotate(
+        place_areas_with_capacity = place_areas.annotate(
             service_cap=capacities
-            .filter(place=OuterRef('pk'))\
+            .filter(place=OuterRef('place'))\
             .values('place')\
             .annotate(place_capacity=Sum('capacity'))\
             .values('place_capacity'))
 
-        # intersect with areas and annotate area_id
-        places_with_area = places_with_capacity\
-            .filter(geom__intersects=OuterRef('geom'))\
-            .annotate(area_id=OuterRef('id'))\
-                    .values('area_id')
-
-        # group by area_id and sum the capacity of the places
+        # group by area and sum the capacity of the places in the area
         # if no place in an area, set to 0 instead of NULL with Coalesce
-        sq1 = places_with_area\
+        sq1 = place_areas_with_capacity\
+            .filter(area=OuterRef('pk'))\
+            .values('area')\
             .annotate(total_capacity=Coalesce(Sum('service_cap'), 0.0))\
             .values('total_capacity')
 
@@ -0,0 +1,489 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from django.conf import settings
+from django.db import connection
+
+from datentool_backend.indicators.models import MatrixCellPlace
+from datentool_backend.population.models import AreaCell, RasterCell
+
+
+def get_decay_weights(minutes: np.ndarray,
+                      cutoff: float,
+                      decay: str = None) -> np.ndarray:
+    """
+    the weights of the travel times within the cutoff, 1 without decay,
+    a gaussian decreasing from 1 to 0 at the cutoff for decay 'gaussian'
+    """
+    minutes = np.asarray(minutes, dtype=np.float64)
+    if decay != 'gaussian':
+        return np.ones(len(minutes))
+    w0 = np.exp(-0.5)
+    return (np.exp(-0.5 * (minutes / cutoff) ** 2) - w0) / (1 - w0)
+
+
+class CellPlaceMatrix:
+    """
+    travel times of one partition of the MatrixCellPlace (mode variant and
+    infrastructure) as compressed sparse row matrix with the cells as rows and
+    the places as columns
+
+    the arrays are written to .npy-files in settings.MATRIX_CACHE_DIR once
+    and memory mapped afterwards, so that all worker processes share them.
+    The files are removed when the matrix changes and their modification
+    time is the only signal for the workers to reload a matrix, so all
+    workers have to share the MATRIX_CACHE_DIR.
+    Each process keeps the settings.MATRIX_CACHE_MAX_LOADED matrices used
+    last (one version per partition)
+    """
+    arrays = ('cell_ids', 'cell_codes', 'place_ids', 'indptr', 'indices',
+              'minutes')
+    _loaded: 'OrderedDict[Tuple[int, int], Tuple[int, CellPlaceMatrix]]' = \
+        OrderedDict()
+    _lock = threading.Lock()
+
+    def __init__(self,
+                 cell_ids: np.ndarray,
+                 cell_codes: np.ndarray,
+                 place_ids: np.ndarray,
+                 indptr: np.ndarray,
+                 indices: np.ndarray,
+                 minutes: np.ndarray):
+        self.cell_ids = cell_ids
+        self.cell_codes = cell_codes
+        self.place_ids = place_ids
+        self.indptr = indptr
+        self.indices = indices
+        self.minutes = minutes
+        self._rows = None
+
+    @property
+    def n_cells(self) -> int:
+        return len(self.cell_ids)
+
+    @property
+    def n_places(self) -> int:
+        return len(self.place_ids)
+
+    @property
+    def rows(self) -> np.ndarray:
+        """the row index of each entry"""
+        if self._rows is None:
+            self._rows = np.repeat(np.arange(self.n_cells, dtype=np.int32),
+                                   np.diff(self.indptr))
+        return self._rows
+
+    @classmethod
+    def load(cls, variant_id: int, infrastructure_id: int) -> 'CellPlaceMatrix':
+        """
+        get the matrix of the partition, read it from the database only if it
+        is not cached yet or the cache was invalidated since
+        """
+        key = (variant_id, infrastructure_id)
+        path = MatrixCellPlace.get_cache_dir(variant_id, infrastructure_id)
+        # the minutes are written last and mark a complete matrix
+        stamp = os.path.join(path, 'minutes.npy')
+        with cls._lock:
+            try:
+                mtime = os.stat(stamp).st_mtime_ns
+            except FileNotFoundError:
+                mtime = None
+            loaded = cls._loaded.get(key)
+            if mtime is not None and loaded and loaded[0] == mtime:
+                cls._loaded.move_to_end(key)
+                return loaded[1]
+            if mtime is None:
+                matrix = cls.from_database(variant_id, infrastructure_id)
+                matrix.save(path)
+                mtime = os.stat(stamp).st_mtime_ns
+            matrix = cls.from_files(path)
+            # replaces an outdated version of the partition
+            cls._loaded.pop(key, None)
+            cls._loaded[key] = (mtime, matrix)
+            max_loaded = max(getattr(settings, 'MATRIX_CACHE_MAX_LOADED', 8),
+                             1)
+            while len(cls._loaded) > max_loaded:
+                cls._loaded.popitem(last=False)
+        return matrix
+
+    @classmethod
+    def from_database(cls,
+                      variant_id: int,
+                      infrastructure_id: int) -> 'CellPlaceMatrix':
+        """read the partition of the matrix from the database"""
+        qs = MatrixCellPlace.objects\
+            .in_partitions(variant_id, infrastructure_id)\
+            .values('cell_id', 'place_id', 'minutes')
+        q_cp, p_cp = qs.query.sql_with_params()
+        dtype = np.dtype([('cell_id', np.int64),
+                          ('place_id', np.int64),
+                          ('minutes', np.float32)])
+        chunks = []
+        with connection.cursor() as cursor:
+            cursor.execute(q_cp, p_cp)
+            while True:
+                rows = cursor.fetchmany(settings.STEPSIZE)
+                if not rows:
+                    break
+                chunks.append(np.array(rows, dtype=dtype))
+        entries = np.concatenate(chunks) if chunks else np.empty(0, dtype=dtype)
+
+        cell_ids, rows = np.unique(entries['cell_id'], return_inverse=True)
+        place_ids, cols = np.unique(entries['place_id'], return_inverse=True)
+        minutes = entries['minutes']
+
+        # sort by cell, place and minutes and keep only the fastest relation
+        # (transit matrices may contain entries for several access modes)
+        order = np.lexsort((minutes, cols, rows))
+        rows, cols, minutes = rows[order], cols[order], minutes[order]
+        first = np.ones(len(rows), dtype=bool)
+        first[1:] = (rows[1:] != rows[:-1]) | (cols[1:] != cols[:-1])
+        rows, cols, minutes = rows[first], cols[first], minutes[first]
+
+        indptr = np.zeros(len(cell_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(cell_ids)), out=indptr[1:])
+
+        cellcodes = dict(RasterCell.objects.filter(id__in=cell_ids.tolist())
+                         .values_list('id', 'cellcode'))
+        cell_codes = np.array([cellcodes[cell_id] for cell_id in cell_ids],
+                              dtype=str)
+        return cls(cell_ids=cell_ids,
+                   cell_codes=cell_codes,
+                   place_ids=place_ids,
+                   indptr=indptr,
+                   indices=cols.astype(np.int32),
+                   minutes=minutes.astype(np.float32))
+
+    @classmethod
+    def from_files(cls, path: str) -> 'CellPlaceMatrix':
+        """memory map the arrays written to the path"""
+        arrays = {name: np.load(os.path.join(path, f'{name}.npy'),
+                                mmap_mode='r')
+                  for name in cls.arrays}
+        return cls(**arrays)
+
+    def save(self, path: str):
+        """write the arrays to the path"""
+        os.makedirs(path, exist_ok=True)
+        for name in self.arrays:
+            fn = os.path.join(path, f'{name}.npy')
+            tmp = f'{fn}.{os.getpid()}.tmp'
+            with open(tmp, 'wb') as f:
+                np.save(f, getattr(self, name))
+            os.replace(tmp, fn)
+
+    def get_place_mask(self, place_ids: List[int]) -> np.ndarray:
+        """boolean mask of the columns of the given places"""
+        return np.isin(self.place_ids, np.asarray(place_ids, dtype=np.int64))
+
+    def nearest(self, place_ids: List[int]) -> Tuple[np.ndarray,
+                                                    np.ndarray,
+                                                    np.ndarray]:
+        """
+        the row index, the column index and the minutes of the nearest of the
+        given places for each cell with at least one of them reachable
+        """
+        valid = self.get_place_mask(place_ids)[self.indices]
+        rows = self.rows[valid]
+        cols = self.indices[valid]
+        minutes = self.minutes[valid]
+        # rows are already sorted, sort the minutes within the rows
+        order = np.lexsort((cols, minutes, rows))
+        rows, cols, minutes = rows[order], cols[order], minutes[order]
+        first = np.ones(len(rows), dtype=bool)
+        first[1:] = rows[1:] != rows[:-1]
+        return rows[first], cols[first], minutes[first]
+
+    def nearest_minutes(self, place_masks: np.ndarray) -> np.ndarray:
+        """
+        the minutes to the nearest open place per cell for several sets of
+        open places at once (sets x cells), NaN if no open place is reachable.
+        The sets are given as rows of boolean masks of the columns and are
+        evaluated together in one pass over the entries (per chunk of sets
+        limited by settings.MATRIX_BATCH_MAX_VALUES)
+        """
+        masks = np.atleast_2d(np.asarray(place_masks, dtype=bool))
+        result = np.full((len(masks), self.n_cells), np.nan)
+        lengths = np.diff(self.indptr)
+        non_empty = np.flatnonzero(lengths > 0)
+        if not len(non_empty) or not len(masks):
+            return result
+        # empty rows between the non-empty ones have no entries, so the
+        # segments start at the first entry of each non-empty row
+        starts = self.indptr[non_empty]
+        max_values = getattr(settings, 'MATRIX_BATCH_MAX_VALUES', 50_000_000)
+        chunk = max(int(max_values // len(self.indices)), 1)
+        for i in range(0, len(masks), chunk):
+            part = masks[i:i + chunk]
+            values = np.where(part[:, self.indices], self.minutes, np.inf)
+            nearest = np.minimum.reduceat(values, starts, axis=1)
+            result[i:i + chunk, non_empty] = np.where(np.isinf(nearest),
+                                                      np.nan, nearest)
+        return result
+
+    def two_nearest(self, place_ids: List[int]) -> Tuple[np.ndarray,
+                                                        np.ndarray,
+                                                        np.ndarray,
+                                                        np.ndarray,
+                                                        np.ndarray]:
+        """
+        the row index, the column index and the minutes of the nearest and
+        the column index and the minutes of the second nearest of the given
+        places for each cell with at least one of them reachable
+        (-1 and NaN if there is no second place)
+        """
+        valid = self.get_place_mask(place_ids)[self.indices]
+        rows = self.rows[valid]
+        cols = self.indices[valid]
+        minutes = self.minutes[valid]
+        order = np.lexsort((cols, minutes, rows))
+        rows, cols, minutes = rows[order], cols[order], minutes[order]
+        first = np.ones(len(rows), dtype=bool)
+        first[1:] = rows[1:] != rows[:-1]
+        idx = np.flatnonzero(first)
+        nxt = np.minimum(idx + 1, max(len(rows) - 1, 0))
+        has_second = (idx + 1 < len(rows)) & (rows[nxt] == rows[idx])
+        second_cols = np.where(has_second, cols[nxt], -1)
+        second_minutes = np.where(has_second, minutes[nxt], np.nan)
+        return (rows[idx], cols[idx], minutes[idx],
+                second_cols, second_minutes)
+
+    def count_within(self, place_ids: List[int], cutoff: float) -> np.ndarray:
+        """number of the given places reachable within the cutoff per cell"""
+        valid = self.get_place_mask(place_ids)[self.indices]
+        valid &= self.minutes <= cutoff
+        return np.bincount(self.rows[valid], minlength=self.n_cells)
+
+    def floating_catchment(self,
+                           supply: np.ndarray,
+                           demand: np.ndarray,
+                           cutoff: float,
+                           decay: str = None) -> np.ndarray:
+        """
+        the supply per demand reachable from each cell with the two-step
+        floating catchment area method (enhanced by a distance decay of the
+        weights, if decay is 'gaussian'), computed as two sparse
+        matrix-vector products:
+        the supply of each place is shared by the weighted demand of the
+        cells in its catchment, the shares of the places reachable from a cell
+        are summed up weighted the same way
+
+        supply: the capacity per column (place), demand: the demand per row
+        """
+        valid = self.minutes <= cutoff
+        rows = self.rows[valid]
+        cols = self.indices[valid]
+        weights = get_decay_weights(self.minutes[valid], cutoff, decay)
+        place_demand = np.bincount(cols, weights=weights * demand[rows],
+                                   minlength=self.n_places)
+        supply = np.asarray(supply, dtype=np.float64)
+        ratio = np.divide(supply, place_demand,
+                          out=np.zeros_like(supply),
+                          where=place_demand > 0)
+        return np.bincount(rows, weights=weights * ratio[cols],
+                           minlength=self.n_cells)
+
+    def huff(self,
+             supply: np.ndarray,
+             demand: np.ndarray,
+             cutoff: float,
+             alpha: float = 1,
+             beta: float = 0.1) -> np.ndarray:
+        """
+        the demand expected per place with the Huff model: the demand of each
+        cell is split among the places reachable within the cutoff in
+        proportion to their attractiveness (supply ** alpha) weighted with the
+        exponential decay exp(-beta * minutes) of the travel time
+
+        supply: the capacity per column (place), demand: the demand per row
+        """
+        supply = np.asarray(supply, dtype=np.float64)
+        valid = (self.minutes <= cutoff) & (supply[self.indices] > 0)
+        rows = self.rows[valid]
+        cols = self.indices[valid]
+        weights = supply[cols] ** alpha \
+            * np.exp(-beta * self.minutes[valid].astype(np.float64))
+        # normalize the weights row by row to the probabilities
+        row_sums = np.bincount(rows, weights=weights, minlength=self.n_cells)
+        row_sums = row_sums[rows]
+        probabilities = np.divide(weights, row_sums,
+                                  out=np.zeros_like(weights),
+                                  where=row_sums > 0)
+        return np.bincount(cols, weights=probabilities * demand[rows],
+                           minlength=self.n_places)
+
+    def cumulative(self,
+                   place_values: np.ndarray,
+                   cutoffs: np.ndarray) -> np.ndarray:
+        """
+        the sum of the values of the places reachable within each of the
+        ascending cutoffs per cell (cells x cutoffs), computed in one pass
+        binning the travel times by the cutoffs
+        """
+        cutoffs = np.asarray(cutoffs, dtype=np.float64)
+        n_cutoffs = len(cutoffs)
+        valid = self.minutes <= cutoffs[-1]
+        values = np.asarray(place_values, dtype=np.float64)[self.indices[valid]]
+        # the index of the smallest cutoff the travel time is within
+        bins = np.searchsorted(cutoffs, self.minutes[valid], side='left')
+        binned = np.bincount(
+            self.rows[valid].astype(np.int64) * n_cutoffs + bins,
+            weights=values, minlength=self.n_cells * n_cutoffs)
+        return binned.reshape(self.n_cells, n_cutoffs).cumsum(axis=1)
+
+    def subset(self, cell_ids: np.ndarray) -> 'CellPlaceMatrix':
+        """the matrix with the rows of the given cells only"""
+        rows = self.get_rows(cell_ids)
+        rows = np.unique(rows[rows >= 0])
+        lengths = self.indptr[rows + 1] - self.indptr[rows]
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        # the position of the entries of the rows in this matrix
+        entries = np.repeat(self.indptr[rows] - indptr[:-1], lengths) \
+            + np.arange(indptr[-1])
+        return CellPlaceMatrix(cell_ids=self.cell_ids[rows],
+                               cell_codes=self.cell_codes[rows],
+                               place_ids=self.place_ids,
+                               indptr=indptr,
+                               indices=self.indices[entries],
+                               minutes=self.minutes[entries])
+
+    def get_rows(self, cell_ids: np.ndarray) -> np.ndarray:
+        """the row index of the cells, -1 if the cell is not in the matrix"""
+        cell_ids = np.asarray(cell_ids, dtype=np.int64)
+        if not self.n_cells:
+            return np.full(len(cell_ids), -1, dtype=np.int64)
+        rows = np.searchsorted(self.cell_ids, cell_ids)
+        rows = np.minimum(rows, self.n_cells - 1)
+        rows[self.cell_ids[rows] != cell_ids] = -1
+        return rows
+
+
+class SparseMatrixMixin:
+    """
+    evaluate nearest-place indicators on the in-memory matrix
+    as an alternative to the sql-queries
+    """
+    # evaluate the indicator for these cells only (None for all cells)
+    restrict_to_cells: np.ndarray = None
+
+    @property
+    def engine(self) -> str:
+        """the engine to compute the indicator with"""
+        engine = self.data.get('engine') if self.data else None
+        if not engine:
+            engine = settings.INDICATOR_ENGINES.get(self.name, 'sql')
+        return engine
+
+    def get_matrix(self, service_id: int, variant_id: int) -> CellPlaceMatrix:
+        """the matrix of the variant for the infrastructure of the service"""
+        from datentool_backend.infrastructure.models import Service
+        service = Service.objects.get(id=service_id)
+        matrix = CellPlaceMatrix.load(variant_id, service.infrastructure_id)
+        if self.restrict_to_cells is not None:
+            matrix = matrix.subset(self.restrict_to_cells)
+        return matrix
+
+    def get_open_place_ids(self,
+                           service_id: int,
+                           year: int,
+                           scenario_id: int) -> np.ndarray:
+        places = self.get_places_with_capacities(service_id, year, scenario_id)
+        return np.fromiter(places.values_list('id', flat=True), dtype=np.int64)
+
+    def get_cell_demand_df(self,
+                           scenario_id: int,
+                           service_id: int) -> pd.DataFrame:
+        """the demand per cell with columns rastercellpop_id, cell_id, value"""
+        columns = ['rastercellpop_id', 'cell_id', 'value']
+        q_demand, p_demand = self.get_cell_demand(scenario_id, service_id)
+        if q_demand is None:
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(q_demand, p_demand)
+            df = pd.DataFrame(cursor.fetchall(), columns=columns)
+        df['value'] = df['value'].astype(float)
+        if self.restrict_to_cells is not None:
+            df = df[df['cell_id'].isin(self.restrict_to_cells)]
+        return df
+
+    def get_area_cells_df(self, area_level_id: int) -> pd.DataFrame:
+        """the share of the area in the cells of the area level"""
+        acells = AreaCell.objects\
+            .filter(area__area_level_id=area_level_id)\
+            .values_list('area_id', 'rastercellpop_id', 'share_area_of_cell')
+        return pd.DataFrame(acells, columns=['area_id', 'rastercellpop_id',
+                                             'share_area_of_cell'])
+
+    @staticmethod
+    def get_area_results(areas, values: pd.Series) -> List[dict]:
+        """all areas with the values (None where there is no value)"""
+        results = []
+        for area_id, label in areas.values_list('id', '_label'):
+            value = values.get(area_id)
+            if value is not None and np.isnan(value):
+                value = None
+            results.append({'id': area_id, 'label': label, 'value': value})
+        return results
+
+    @staticmethod
+    def get_nearest_df(matrix: CellPlaceMatrix,
+                       place_ids: np.ndarray) -> pd.DataFrame:
+        """the nearest of the places and the minutes to it per cell"""
+        rows, cols, minutes = matrix.nearest(place_ids)
+        return pd.DataFrame({'cell_id': matrix.cell_ids[rows],
+                             'place_id': matrix.place_ids[cols],
+                             'minutes': minutes.astype(float), })
+
+    @staticmethod
+    def get_nearest_minutes_batch(indicators: List['SparseMatrixMixin']
+                                  ) -> List[Tuple[CellPlaceMatrix,
+                                                  np.ndarray]]:
+        """
+        the matrix and the minutes to the nearest open place per row of the
+        matrix for each of the indicators with the same service and different
+        years, scenarios or modes, None where the mode has no variant.
+        The indicators sharing a mode variant are evaluated in one pass over
+        its matrix, sets of open places shared by several of them only once
+        """
+        results = [None] * len(indicators)
+        groups = {}
+        for i, indicator in enumerate(indicators):
+            data = indicator.data
+            scenario_id = data.get('scenario')
+            variant = indicator.get_mode_variant(data.get('mode'), scenario_id)
+            if not variant:
+                continue
+            place_ids = indicator.get_open_place_ids(
+                data.get('service'), data.get('year', 0), scenario_id)
+            groups.setdefault(variant.id, []).append((i, place_ids))
+
+        for variant_id, members in groups.items():
+            first = indicators[members[0][0]]
+            matrix = first.get_matrix(first.data.get('service'), variant_id)
+            masks = np.stack([matrix.get_place_mask(place_ids)
+                              for i, place_ids in members])
+            if matrix.n_places:
+                masks, inverse = np.unique(masks, axis=0, return_inverse=True)
+                inverse = inverse.ravel()
+            else:
+                masks, inverse = masks[:1], np.zeros(len(members), dtype=int)
+            minutes = matrix.nearest_minutes(masks)
+            for (i, place_ids), j in zip(members, inverse):
+                results[i] = (matrix, minutes[j])
+        return results
+
+    @staticmethod
+    def weighted_mean(df: pd.DataFrame,
+                      by: str,
+                      column: str,
+                      weight: str) -> pd.Series:
+        """the weighted mean of the column grouped by `by`, NaN if no weight"""
+        weighted = (df[column] * df[weight]).groupby(df[by]).sum()
+        weights = df[weight].groupby(df[by]).sum()
+        return weighted / weights.where(weights != 0)
@@ -41,24 +41,60 @@ def round_legend(value: float, down: bool = True) -> float:
     return rounded
 
 
-def get_percentiles(iterable,
-                    percentiles: List[int]) -> List[float]:
-    """get the percentiles of the values"""
+def get_values(iterable) -> np.ndarray:
+    """
+    get the values of the rows (dicts or objects with a value-attribute)
+    as float array in one pass, missing values are NaN
+    """
+    if isinstance(iterable, np.ndarray):
+        return iterable.astype(float, copy=False)
     try:
         first_item = iterable[0]
     except IndexError:
-        return None
+        return np.empty(0)
+    except TypeError:
+        iterable = list(iterable)
+        if not iterable:
+            return np.empty(0)
+        first_item = iterable[0]
 
     if isinstance(first_item, dict):
-        values = np.array([row['value'] for row in iterable
-                            if not row['value'] is None])
+        values = [row['value'] for row in iterable]
+    else:
+        values = [row.value for row in iterable]
+    return np.array([np.nan if value is None else value for value in values],
+                    dtype=float)
+
+
+def get_digits(values: np.ndarray) -> int:
+    """get the number of digits to round the values to by their median"""
+    values = get_values(values)
+    if not np.any(~np.isnan(values)):
+        return None
+    median_value = np.nanmedian(values)
+    if median_value < 10:
+        digits = 2
+    elif median_value < 100:
+        digits = 1
     else:
-        values = np.array([row.value for row in iterable
-                           if not row.value is None])
+        digits = 0
+    return digits
+
+
+def get_percentiles(iterable,
+                    percentiles: List[int]) -> List[float]:
+    """get the percentiles of the values (rows or array)"""
+    if not isinstance(iterable, np.ndarray):
+        try:
+            iterable[0]
+        except IndexError:
+            return None
+    values = get_values(iterable)
+    values = values[~np.isnan(values)]
 
     if not len(values):
         return values
-    result = np.nanpercentile(values, percentiles, method='closest_observation')
+    result = np.percentile(values, percentiles, method='closest_observation')
     rounded_results = np.array([round_legend(value, down=i==0)
                                 for i, value in enumerate(result)])
     unique_results = np.unique(rounded_results)
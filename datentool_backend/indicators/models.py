@@ -1,11 +1,23 @@
+import os
+import numbers
+import json
+import glob
+import shutil
+from datetime import timedelta
 from abc import abstractclassmethod
+from hashlib import md5
+from typing import List, Set
 
 import pandas as pd
 
-from django.db import models
-from django.db.models import Count
+from django.conf import settings
+from django.utils import timezone
+from django.db import models, transaction, connection
+from django.db.models import Count, QuerySet
+from django.db.models.signals import post_save, post_delete
 from django.contrib.gis.db import models as gis_models
 from django.contrib.postgres.fields import ArrayField
+from django.core.serializers.json import DjangoJSONEncoder
 
 from psqlextra.types import PostgresPartitioningMethod
 from psqlextra.models import PostgresPartitionedModel
@@ -14,13 +26,20 @@ from datentool_backend.base import NamedModel, DatentoolModelMixin
 from datentool_backend.utils.protect_cascade import PROTECT_CASCADE
 from datentool_backend.utils.copy_postgres import DirectCopyManager
 
-from datentool_backend.places.models import Place
-from datentool_backend.modes.models import (ModeVariant,
+from datentool_backend.places.models import (Place, PlaceAttribute,
+                                             Capacity, Scenario,
+                                             ScenarioService, ScenarioMode)
+from datentool_backend.demand.models import DemandRate, DemandRateSet
+from datentool_backend.infrastructure.models import Infrastructure, Service
+from datentool_backend.modes.models import (Mode,
+                                            ModeVariant,
                                             ModeVariantStatistic,
                                             get_default_access_variant,
                                             )
 
 from datentool_backend.population.models import RasterCell
+from datentool_backend.area.models import Area
+from datentool_backend.user.models import Profile
 
 
 class Stop(DatentoolModelMixin, NamedModel, models.Model):
@@ -37,6 +56,66 @@ class Stop(DatentoolModelMixin, NamedModel, models.Model):
         unique_together = [['variant', 'hstnr']]
 
 
+def _get_ids(objs) -> List[int]:
+    """the ids of a model instance, an id or an iterable of them"""
+    if isinstance(objs, QuerySet):
+        return list(objs.values_list('pk', flat=True))
+    if isinstance(objs, (numbers.Integral, models.Model)):
+        objs = [objs]
+    return [int(getattr(obj, 'pk', obj)) for obj in objs]
+
+
+class PartitionedMatrixQuerySet(QuerySet):
+    """
+    queryset of a matrix partitioned by mode variant and infrastructure with
+    filters supplying the partition keys, so that PostgreSQL scans only the
+    partitions of the requested variants and infrastructures
+    """
+
+    def in_partitions(self, variants, infrastructures=None) -> QuerySet:
+        """
+        the entries of the variants for the infrastructures
+        (all infrastructures if not given)
+        """
+        variant_ids = _get_ids(variants)
+        if infrastructures is None:
+            infrastructure_ids = list(Infrastructure.objects.order_by('id')
+                                      .values_list('id', flat=True))
+        else:
+            infrastructure_ids = _get_ids(infrastructures)
+        partition_ids = [[variant_id, infrastructure_id]
+                         for variant_id in variant_ids
+                         for infrastructure_id in infrastructure_ids]
+        if len(partition_ids) == 1:
+            return self.filter(partition_id=partition_ids[0])
+        return self.filter(partition_id__in=partition_ids)
+
+    def for_services(self, variants, services) -> QuerySet:
+        """the entries of the variants for the infrastructures of the services"""
+        infrastructure_ids = list(Service.objects
+                                  .filter(id__in=_get_ids(services))
+                                  .order_by('infrastructure_id')
+                                  .distinct('infrastructure_id')
+                                  .values_list('infrastructure_id', flat=True))
+        return self.in_partitions(variants, infrastructure_ids)
+
+    def for_places(self, places, variants=None) -> QuerySet:
+        """
+        the entries of the places with the variants (all variants if not
+        given)
+        """
+        place_ids = _get_ids(places)
+        infrastructure_ids = list(Place.objects
+                                  .filter(id__in=place_ids)
+                                  .order_by('infrastructure_id')
+                                  .distinct('infrastructure_id')
+                                  .values_list('infrastructure_id', flat=True))
+        if variants is None:
+            variants = ModeVariant.objects.all()
+        return self.in_partitions(variants, infrastructure_ids)\
+            .filter(place_id__in=place_ids)
+
+
 class MatrixMixin:
     _statistic: str = ''
     _variant_col = 'variant_id'
@@ -125,19 +204,198 @@ class MatrixCellPlace(MatrixMixin,
             )
         ]
 
-    objects = models.Manager()
+    objects = PartitionedMatrixQuerySet.as_manager()
     copymanager = DirectCopyManager()
 
     @classmethod
     def _get_n_rels(cls, variant: ModeVariant) -> int:
-        qs = cls.objects.filter(variant=variant)
+        qs = cls.objects.in_partitions(variant)
         return qs.count()
 
+    @staticmethod
+    def get_cache_dir(variant_id: int, infrastructure_id: int) -> str:
+        """directory of the memory mapped arrays of a partition"""
+        return os.path.join(settings.MATRIX_CACHE_DIR,
+                            f'mode_{variant_id}_infrastructure_{infrastructure_id}')
+
+    @classmethod
+    def invalidate_caches(cls, variant_ids: List[int] = None):
+        """
+        mark everything derived from the matrix of the given variants
+        (all variants if not given) as outdated.
+        To be called once after writing or deleting the entries of the
+        variants (e.g. after a routing run), not for each chunk
+        """
+        from datentool_backend.indicators.prewarm import schedule_prewarm
+        NearestPlaceCache.invalidate(variant_ids=variant_ids)
+        if variant_ids is None:
+            IndicatorResult.invalidate()
+        else:
+            modes = list(ModeVariant.objects.filter(id__in=variant_ids)
+                         .order_by('mode').distinct('mode')
+                         .values_list('mode', flat=True))
+            IndicatorResult.invalidate(mode=modes)
+            IndicatorResult.invalidate(compare_mode=modes)
+        schedule_prewarm()
+        patterns = ([cls.get_cache_dir(variant_id, '*')
+                     for variant_id in variant_ids]
+                    if variant_ids is not None
+                    else [cls.get_cache_dir('*', '*')])
+        for pattern in patterns:
+            for path in glob.glob(pattern):
+                shutil.rmtree(path, ignore_errors=True)
+
     def save(self, **kwargs):
         self.partition_id = [self.variant_id, self.place.infrastructure_id]
         return super().save(**kwargs)
 
 
+class NearestPlaceCache(DatentoolModelMixin, models.Model):
+    """
+    state of the materialized nearest places per cell for a service,
+    mode variant, scenario and year
+    """
+    service = models.ForeignKey(Service, on_delete=models.CASCADE)
+    variant = models.ForeignKey(ModeVariant, on_delete=models.CASCADE)
+    scenario = models.ForeignKey(Scenario, null=True, on_delete=models.CASCADE)
+    year = models.IntegerField(default=0)
+    place_ids = ArrayField(models.IntegerField(), default=list,
+                           help_text='ids of the open places the nearest '
+                           'places were derived from')
+    up_to_date = models.BooleanField(default=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                name='nearestplacecache_service_variant_scenario_year_uniq',
+                fields=('service', 'variant', 'scenario', 'year')
+            ),
+            models.UniqueConstraint(
+                name='nearestplacecache_service_variant_noscenario_year_uniq',
+                fields=('service', 'variant', 'year'),
+                condition=models.Q(scenario__isnull=True)
+            )
+        ]
+
+    @classmethod
+    def invalidate(cls, variant_ids=None):
+        """mark the nearest places of the given variants as outdated"""
+        qs = cls.objects.all()
+        if variant_ids is not None:
+            qs = qs.filter(variant__in=variant_ids)
+        qs.update(up_to_date=False)
+
+    @classmethod
+    def get_nearest_places(cls,
+                           service: Service,
+                           variant: ModeVariant,
+                           scenario_id: int,
+                           year: int,
+                           places: QuerySet) -> QuerySet:
+        """
+        get the nearest of the given places for each cell,
+        rebuild the materialized entries, if the matrix changed since the
+        last refresh, update the cells affected by opened or closed places,
+        if the places are not the same as before
+        """
+        place_ids = set(places.values_list('id', flat=True))
+        cache_params = dict(service=service,
+                            variant=variant,
+                            scenario_id=scenario_id,
+                            year=year or 0)
+        # reading an unchanged cache needs no lock
+        cache = cls.objects.filter(**cache_params).first()
+        if (cache is not None and cache.up_to_date
+            and set(cache.place_ids) == place_ids):
+            return NearestPlace.objects.filter(cache=cache)
+
+        with transaction.atomic():
+            cache, created = cls.objects.select_for_update()\
+                .get_or_create(**cache_params)
+            cached_place_ids = set(cache.place_ids)
+            if not cache.up_to_date:
+                cache.refresh(place_ids)
+            elif cached_place_ids != place_ids:
+                cache.update(opened=place_ids - cached_place_ids,
+                             closed=cached_place_ids - place_ids,
+                             place_ids=place_ids)
+            cache.place_ids = sorted(place_ids)
+            cache.up_to_date = True
+            cache.save()
+        return NearestPlace.objects.filter(cache=cache)
+
+    def refresh(self, place_ids: Set[int]):
+        """write the nearest place of the given places for each cell"""
+        qs_old = NearestPlace.objects.filter(cache=self)
+        qs_old._raw_delete(using=qs_old.db)
+        self.insert_nearest_places(place_ids)
+
+    def update(self, opened: Set[int], closed: Set[int], place_ids: Set[int]):
+        """
+        update only the cells whose nearest place was closed
+        or which reach an opened place
+        """
+        if closed:
+            qs_closed = NearestPlace.objects.filter(cache=self,
+                                                    place__in=closed)
+            cell_ids = list(qs_closed.values_list('cell_id', flat=True))
+            qs_closed._raw_delete(using=qs_closed.db)
+            if cell_ids:
+                self.insert_nearest_places(place_ids, cell_ids=cell_ids)
+        if opened:
+            self.insert_nearest_places(opened, replace_farther=True)
+
+    def insert_nearest_places(self,
+                              place_ids: Set[int],
+                              cell_ids: List[int] = None,
+                              replace_farther: bool = False):
+        """
+        insert the nearest of the given places for each (given) cell,
+        with replace_farther existing entries are replaced by nearer places
+        """
+        if not place_ids:
+            return
+        cells_places = MatrixCellPlace.objects\
+            .in_partitions(self.variant_id, self.service.infrastructure_id)\
+            .filter(place__in=place_ids)
+        if cell_ids is not None:
+            cells_places = cells_places.filter(cell__in=cell_ids)
+        q_cp, p_cp = cells_places.query.sql_with_params()
+
+        query = f'''INSERT INTO "{NearestPlace._meta.db_table}" AS np
+        ("cache_id", "cell_id", "place_id", "minutes")
+        SELECT DISTINCT ON (cp."cell_id")
+        %s, cp."cell_id", cp."place_id", cp."minutes"
+        FROM ({q_cp}) cp
+        ORDER BY cp."cell_id", cp."minutes" ASC, cp."place_id"
+        '''
+        if replace_farther:
+            # same order as in the full refresh
+            query += '''ON CONFLICT ("cache_id", "cell_id") DO UPDATE
+        SET "place_id" = EXCLUDED."place_id", "minutes" = EXCLUDED."minutes"
+        WHERE EXCLUDED."minutes" < np."minutes"
+        OR (EXCLUDED."minutes" = np."minutes"
+            AND EXCLUDED."place_id" < np."place_id")
+        '''
+        params = (self.pk, ) + p_cp
+        with connection.cursor() as cursor:
+            cursor.execute(query, params)
+
+
+class NearestPlace(DatentoolModelMixin, models.Model):
+    """nearest open place of a service for a raster cell"""
+    cache = models.ForeignKey(NearestPlaceCache, on_delete=models.CASCADE,
+                              related_name='nearest_places')
+    cell = models.ForeignKey(RasterCell, on_delete=models.CASCADE,
+                             related_name='nearest_place')
+    place = models.ForeignKey(Place, on_delete=models.CASCADE,
+                              related_name='nearest_cell')
+    minutes = models.FloatField()
+
+    class Meta:
+        unique_together = ['cache', 'cell']
+
+
 class MatrixStopStopCopyManager(DirectCopyManager):
     """"""
 
@@ -210,12 +468,12 @@ class MatrixPlaceStop(MatrixMixin,
     class Meta:
         unique_together = ['partition_id', 'access_variant', 'place', 'stop']
 
-    objects = models.Manager()
+    objects = PartitionedMatrixQuerySet.as_manager()
     copymanager = DirectCopyManager()
 
     @classmethod
     def _get_n_rels(cls, variant: ModeVariant) -> int:
-        qs = cls.objects.filter(stop__variant=variant)
+        qs = cls.objects.in_partitions(variant)
         return qs.count()
 
     def save(self, **kwargs):
@@ -266,3 +524,288 @@ class Router(NamedModel, models.Model):
     gtfs_file = models.TextField()
     build_date = models.DateField()
     buffer = models.IntegerField()
+
+
+class IndicatorResult(DatentoolModelMixin, models.Model):
+    """
+    result of an indicator computed with a set of parameters,
+    stored to be served as vector tiles or as a precomputed response
+    """
+    key = models.TextField(unique=True,
+                           help_text='hash of the indicator and the parameters')
+    indicator = models.TextField()
+    params = models.JSONField(default=dict)
+    result_type = models.TextField()
+    legend = models.JSONField(default=list)
+    calculated = models.DateTimeField(auto_now=True)
+    cached_values = models.JSONField(
+        null=True, encoder=DjangoJSONEncoder,
+        help_text='serialized values of a precomputed result')
+
+    @staticmethod
+    def get_key(indicator_name: str, params: dict) -> str:
+        """the hash of the indicator and the parameters"""
+        definition = json.dumps({'indicator': indicator_name,
+                                 'params': params, },
+                                sort_keys=True, default=str)
+        return md5(definition.encode()).hexdigest()
+
+    @classmethod
+    def invalidate(cls, **params):
+        """
+        remove the stored results, all of them or only the ones computed with
+        the given parameters, e.g. invalidate(service=[1, 2], scenario=[3])
+        removes the results of service 1 or 2 in scenario 3
+        """
+        if not params:
+            cls.truncate()
+            return
+        qs = cls.objects.all()
+        for name, values in params.items():
+            if not isinstance(values, (list, tuple, set)):
+                values = [values]
+            if not values:
+                return
+            # the parameters of the results stored as tiles are not normalized
+            values = list(values) + [str(v) for v in values]
+            qs = qs.filter(**{f'params__{name}__in': values})
+        result_ids = list(qs.values_list('id', flat=True))
+        if not result_ids:
+            return
+        qs_values = IndicatorResultValue.objects\
+            .filter(result_id__in=result_ids)
+        qs_values._raw_delete(using=qs_values.db)
+        qs_results = cls.objects.filter(id__in=result_ids)
+        qs_results._raw_delete(using=qs_results.db)
+
+    @staticmethod
+    def post_change(sender, instance, *args, **kwargs):
+        """
+        remove the results depending on the saved or deleted instance
+        (capacities, places, demand rates, scenario settings, areas)
+        """
+        from datentool_backend.indicators.prewarm import schedule_prewarm
+        params = get_dependent_result_params(instance)
+        if params is None:
+            return
+        IndicatorResult.invalidate(**params)
+        schedule_prewarm()
+
+    @classmethod
+    def store(cls,
+              indicator_name: str,
+              params: dict,
+              result_type: str,
+              legend: List[dict],
+              values: List[dict]) -> 'IndicatorResult':
+        """
+        store the serialized values of an indicator with raster or area
+        results, replace the values of a previous calculation
+        """
+        key = cls.get_key(indicator_name, params)
+        with transaction.atomic():
+            result, created = cls.objects.select_for_update()\
+                .get_or_create(key=key,
+                               defaults=dict(indicator=indicator_name,
+                                             params=params,
+                                             result_type=result_type))
+            result.legend = legend
+            result.save()
+            qs_old = IndicatorResultValue.objects.filter(result=result)
+            qs_old._raw_delete(using=qs_old.db)
+            result_values = [row['value'] for row in values]
+            if result_type == 'raster':
+                cellcodes = [row['cell_code'] for row in values]
+                query = f'''INSERT INTO "{IndicatorResultValue._meta.db_table}"
+                ("result_id", "cell_id", "value")
+                SELECT %s, rc."id", v."value"
+                FROM unnest(%s::text[], %s::float8[]) AS v("cellcode", "value")
+                JOIN "{RasterCell._meta.db_table}" rc
+                ON rc."cellcode" = v."cellcode"
+                '''
+                params = (result.pk, cellcodes, result_values)
+            elif result_type == 'area':
+                area_ids = [row['area_id'] for row in values]
+                query = f'''INSERT INTO "{IndicatorResultValue._meta.db_table}"
+                ("result_id", "area_id", "value")
+                SELECT %s, v."area_id", v."value"
+                FROM unnest(%s::int[], %s::float8[]) AS v("area_id", "value")
+                '''
+                params = (result.pk, area_ids, result_values)
+            else:
+                raise ValueError(f'results of type {result_type} '
+                                 'can not be stored as tiles')
+            with connection.cursor() as cursor:
+                cursor.execute(query, params)
+        return result
+
+    @classmethod
+    def cache(cls,
+              indicator_name: str,
+              params: dict,
+              result_type: str,
+              serialized: dict) -> 'IndicatorResult':
+        """store the serialized result to be served without recomputing it"""
+        key = cls.get_key(indicator_name, params)
+        result, created = cls.objects.update_or_create(
+            key=key,
+            defaults=dict(indicator=indicator_name,
+                          params=params,
+                          result_type=result_type,
+                          legend=serialized['legend'],
+                          cached_values=serialized['values']))
+        return result
+
+    @classmethod
+    def get_cached(cls, indicator_name: str, params: dict) -> dict:
+        """the cached serialized result, None if it was not precomputed"""
+        return cls.get_cached_by_key(cls.get_key(indicator_name, params))
+
+    @classmethod
+    def get_cached_by_key(cls, key: str) -> dict:
+        """the cached serialized result with the key, None if there is none"""
+        result = cls.objects.filter(key=key, cached_values__isnull=False)\
+            .values('legend', 'cached_values')\
+            .first()
+        if result is None:
+            return None
+        return {'legend': result['legend'],
+                'values': result['cached_values'], }
+
+
+class IndicatorResultValue(models.Model):
+    """value of a stored indicator result in a raster cell or area"""
+    result = models.ForeignKey(IndicatorResult, on_delete=models.CASCADE,
+                               related_name='result_values')
+    cell = models.ForeignKey(RasterCell, null=True, on_delete=models.CASCADE,
+                             related_name='indicator_values')
+    area = models.ForeignKey(Area, null=True, on_delete=models.CASCADE,
+                             related_name='indicator_values')
+    value = models.FloatField(null=True)
+
+
+class LocationSuggestion(DatentoolModelMixin, models.Model):
+    """
+    new sites for a service, chosen from the candidate places or raster cells
+    to minimize the demand-weighted travel times (p-median) or to maximize
+    the demand within the cut-off time (maximal coverage)
+    """
+    class Objective(models.TextChoices):
+        MEDIAN = 'median', 'mittlere Wegezeit minimieren'
+        COVERAGE = 'coverage', 'Versorgte innerhalb der Wegezeit maximieren'
+
+    service = models.ForeignKey(Service, on_delete=models.CASCADE)
+    mode = models.IntegerField(choices=Mode.choices)
+    scenario = models.ForeignKey(Scenario, null=True, on_delete=models.CASCADE)
+    year = models.IntegerField(default=0)
+    n_sites = models.IntegerField()
+    objective = models.TextField(choices=Objective.choices,
+                                 default=Objective.MEDIAN)
+    cutoff = models.FloatField(null=True, help_text='cut-off time in minutes, '
+                               'defaults to the cut-off time of the mode')
+    places = ArrayField(models.IntegerField(), default=list,
+                        help_text='ids of the candidate places')
+    cells = ArrayField(models.TextField(), default=list,
+                       help_text='cellcodes of the candidate raster cells')
+    user = models.ForeignKey(Profile, null=True, on_delete=models.SET_NULL)
+    created = models.DateTimeField(auto_now_add=True)
+    is_finished = models.BooleanField(default=False)
+    initial_value = models.FloatField(
+        null=True, help_text='mean travel time or covered share of the demand '
+        'without the new sites')
+    sites = models.JSONField(default=list,
+                             help_text='the chosen sites in the order of '
+                             'their selection')
+
+
+class IndicatorJob(DatentoolModelMixin, models.Model):
+    """
+    computation of an indicator in the background, the serialized result is
+    stored as IndicatorResult with the key to be retrieved and reused
+    """
+    indicator = models.TextField()
+    service = models.ForeignKey(Service, on_delete=models.CASCADE)
+    params = models.JSONField(default=dict,
+                              help_text='the parameters of the request')
+    key = models.TextField(help_text='key of the stored IndicatorResult')
+    user = models.ForeignKey(Profile, null=True, on_delete=models.SET_NULL)
+    created = models.DateTimeField(auto_now_add=True)
+    is_finished = models.BooleanField(default=False)
+    error = models.TextField(null=True)
+
+    @property
+    def result(self) -> dict:
+        """
+        the serialized result, None if it is not computed yet or was
+        invalidated by changes of the data since
+        """
+        return IndicatorResult.get_cached_by_key(self.key)
+
+    @staticmethod
+    def remove_result(sender, instance, *args, **kwargs):
+        """
+        remove the result computed for the deleted job, the shared results
+        precomputed in the background are kept
+        """
+        IndicatorResult.objects.filter(key=instance.key,
+                                       params__job=instance.id).delete()
+
+    @classmethod
+    def remove_outdated(cls):
+        """
+        remove the finished jobs older than INDICATOR_JOB_MAX_AGE days
+        together with their results
+        """
+        max_age = settings.INDICATOR_JOB_MAX_AGE
+        if not max_age:
+            return
+        created_before = timezone.now() - timedelta(days=max_age)
+        cls.objects.filter(is_finished=True,
+                           created__lt=created_before).delete()
+
+
+def get_dependent_result_params(instance: models.Model) -> dict:
+    """
+    the parameters of the stored results depending on the instance,
+    None if there are none
+    """
+    if isinstance(instance, PlaceAttribute):
+        instance = Place.objects.filter(id=instance.place_id).first()
+        if instance is None:
+            return None
+    if isinstance(instance, Place):
+        params = {'service': list(Service.objects
+                                  .filter(infrastructure=instance.infrastructure_id)
+                                  .values_list('id', flat=True))}
+        if instance.scenario_id:
+            params['scenario'] = [instance.scenario_id]
+        return params
+    if isinstance(instance, Capacity):
+        # the capacities of the status quo apply to all scenarios
+        params = {'service': [instance.service_id]}
+        if instance.scenario_id:
+            params['scenario'] = [instance.scenario_id]
+        return params
+    if isinstance(instance, DemandRate):
+        service_ids = list(DemandRateSet.objects
+                           .filter(id=instance.demand_rate_set_id)
+                           .values_list('service_id', flat=True))
+        return {'service': service_ids} if service_ids else None
+    if isinstance(instance, DemandRateSet):
+        return {'service': [instance.service_id]}
+    if isinstance(instance, ScenarioService):
+        return {'service': [instance.service_id],
+                'scenario': [instance.scenario_id]}
+    if isinstance(instance, ScenarioMode):
+        return {'scenario': [instance.scenario_id]}
+    if isinstance(instance, Area):
+        return {'area_level': [instance.area_level_id]}
+    return None
+
+
+for model in (Capacity, Place, PlaceAttribute, DemandRate, DemandRateSet,
+              ScenarioService, ScenarioMode, Area):
+    post_save.connect(IndicatorResult.post_change, sender=model)
+    post_delete.connect(IndicatorResult.post_change, sender=model)
+
+post_delete.connect(IndicatorJob.remove_result, sender=IndicatorJob)
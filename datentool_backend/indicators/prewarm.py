@@ -0,0 +1,152 @@
+import time
+import logging
+from datetime import timedelta
+from typing import Dict, List
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from datentool_backend.site.models import Year, ProcessState
+from datentool_backend.area.models import AreaLevel
+from datentool_backend.modes.models import ModeVariant
+from datentool_backend.infrastructure.models import Service
+from datentool_backend.indicators.models import IndicatorResult
+# the package registers all indicators
+from datentool_backend.indicators.compute import (ServiceIndicator,
+                                                  ResultSerializer)
+
+logger = logging.getLogger('indicators')
+
+PREWARM_TASK = 'datentool_backend.indicators.prewarm.prewarm_indicators'
+PREWARM_SCHEDULE = 'Indikatoren vorberechnen'
+# seconds to wait for the interactive queries to finish before each indicator
+IDLE_WAIT = 60
+
+
+def schedule_prewarm(delay: float = None):
+    """
+    schedule the precomputation of the default indicators with django_q.
+    Repeated calls postpone the single scheduled run, so that it starts
+    `delay` seconds after the last change of the data
+    """
+    if not (settings.USE_DJANGO_Q and
+            getattr(settings, 'INDICATOR_PREWARM', False)):
+        return
+    from django_q.models import Schedule
+    if delay is None:
+        delay = getattr(settings, 'INDICATOR_PREWARM_DELAY', 60)
+    Schedule.objects.update_or_create(
+        name=PREWARM_SCHEDULE,
+        defaults=dict(func=PREWARM_TASK,
+                      schedule_type=Schedule.ONCE,
+                      repeats=1,
+                      next_run=timezone.now() + timedelta(seconds=delay)))
+
+
+def get_default_params() -> Dict[str, object]:
+    """
+    the parameters of the default view of the services: the default year,
+    the default area level and the base scenario
+    """
+    year = Year.objects.filter(is_default=True).first()
+    area_level = AreaLevel.objects.filter(is_default_pop_level=True).first()
+    return {'year': year.year if year else None,
+            'area_level': area_level.id if area_level else None,
+            'scenario': None, }
+
+
+def get_prewarm_params(indicator_class: ServiceIndicator,
+                       service: Service,
+                       defaults: dict,
+                       modes: List[int]) -> List[dict]:
+    """
+    the request parameters of the default results of the indicator,
+    empty if the indicator requires other parameters
+    """
+    param_names = {param.name for param in indicator_class.params}
+    if param_names - {'mode'}:
+        return []
+    params = dict(defaults, service=service.id)
+    if indicator_class.result_serializer != ResultSerializer.AREA:
+        params.pop('area_level')
+    elif params['area_level'] is None:
+        return []
+    if 'mode' not in param_names:
+        return [params]
+    return [dict(params, mode=mode) for mode in modes]
+
+
+def wait_for_idle_database(max_wait: float = IDLE_WAIT, interval: float = 1):
+    """
+    wait until no other client of the database runs a query,
+    so that the precomputation yields to the interactive work
+    """
+    query = '''SELECT count(*) FROM pg_stat_activity
+    WHERE datname = current_database()
+    AND pid <> pg_backend_pid()
+    AND state = 'active'
+    AND backend_type = 'client backend'
+    '''
+    waited = 0
+    while waited < max_wait:
+        with connection.cursor() as cursor:
+            cursor.execute(query)
+            n_active = cursor.fetchone()[0]
+        if not n_active:
+            return
+        time.sleep(interval)
+        waited += interval
+
+
+def prewarm_indicators(service_ids: List[int] = None,
+                       idle_wait: float = IDLE_WAIT) -> int:
+    """
+    precompute and cache the results of the registered indicators shown in
+    the default view of the services (default year, default mode variants,
+    base scenario and default area level).
+    Results already cached are skipped, the run is postponed while
+    a data upload or calculation is running.
+    Returns the number of computed results
+    """
+    if ProcessState.objects.filter(is_running=True).exists():
+        logger.debug('Vorberechnung der Indikatoren verschoben, '
+                     'da ein Prozess läuft')
+        schedule_prewarm()
+        return 0
+
+    defaults = get_default_params()
+    if defaults['year'] is None:
+        logger.debug('Kein Standardjahr für die Vorberechnung definiert')
+        return 0
+    modes = sorted(set(ModeVariant.objects.filter(is_default=True)
+                       .values_list('mode', flat=True)))
+    services = Service.objects.all()
+    if service_ids is not None:
+        services = services.filter(id__in=service_ids)
+
+    n_computed = 0
+    for service in services.order_by('id'):
+        for name, indicator_class in ServiceIndicator.registered.items():
+            for params in get_prewarm_params(indicator_class, service,
+                                             defaults, modes):
+                indicator = indicator_class(service, params)
+                cache_params = indicator.get_cache_params()
+                if IndicatorResult.get_cached(name, cache_params):
+                    continue
+                if idle_wait:
+                    wait_for_idle_database(max_wait=idle_wait)
+                try:
+                    serialized = indicator.result()
+                    IndicatorResult.cache(
+                        name, cache_params,
+                        indicator.result_serializer.name.lower(),
+                        serialized)
+                except Exception as e:
+                    logger.warning(f'Vorberechnung von "{name}" für '
+                                   f'Leistung {service.name} '
+                                   f'fehlgeschlagen: {e!r}')
+                    continue
+                n_computed += 1
+    logger.info(f'{n_computed} Indikatoren vorberechnet')
+    return n_computed
@@ -0,0 +1,103 @@
+import re
+import json
+import base64
+from typing import Dict, List
+
+import numpy as np
+from rest_framework import renderers
+from rest_framework.settings import api_settings
+from djangorestframework_camel_case.render import CamelCaseJSONRenderer
+from djangorestframework_camel_case.util import camelize
+
+
+LAEA_CELLCODE = re.compile(r'^(?P<prefix>.*)N(?P<north>\d+)E(?P<east>\d+)$')
+INT32 = np.iinfo(np.int32)
+
+
+def pack_array(values: np.ndarray, dtype: str) -> str:
+    """the values as base64-encoded little endian typed array"""
+    return base64.b64encode(
+        np.ascontiguousarray(values, dtype=dtype).tobytes()).decode('ascii')
+
+
+def pack_int_array(values: List[int]) -> dict:
+    """
+    the integers as int32-array, as int64-array if any of them exceeds the
+    range of int32 (e.g. big ids)
+    """
+    if all(INT32.min <= v <= INT32.max for v in values):
+        return {'dtype': 'int32', 'data': pack_array(values, '<i4')}
+    return {'dtype': 'int64', 'data': pack_array(values, '<i8')}
+
+
+class PackedIndicatorRenderer(renderers.BaseRenderer):
+    """
+    render indicator results column by column instead of one object per row
+
+    the values are packed into a base64-encoded float32-array (NaN for missing
+    values), integer ids into int32-arrays (int64-arrays if they exceed the
+    range of int32) and LAEA-cellcodes into the common prefix and two
+    int32-arrays with the north and east coordinates.
+    Other columns are returned as plain lists.
+    Responses that are no indicator results are rendered as JSON
+    """
+    media_type = 'application/vnd.datentool.packed+json'
+    format = 'packed'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not (isinstance(data, dict) and isinstance(data.get('values'), list)):
+            return CamelCaseJSONRenderer().render(
+                data, accepted_media_type=CamelCaseJSONRenderer.media_type,
+                renderer_context=renderer_context)
+        packed = {key: value for key, value in data.items() if key != 'values'}
+        packed['count'] = len(data['values'])
+        packed['columns'] = self.pack_columns(data['values'])
+        return json.dumps(camelize(packed), separators=(',', ':'))\
+            .encode('utf-8')
+
+    def pack_columns(self, rows: List[dict]) -> Dict[str, dict]:
+        """pack the columns of the rows"""
+        if not rows:
+            return {}
+        columns = {}
+        for name in rows[0].keys():
+            column = [row[name] for row in rows]
+            if name == 'value':
+                values = np.array([np.nan if v is None else v for v in column],
+                                  dtype=float)
+                columns[name] = {'dtype': 'float32',
+                                 'data': pack_array(values, '<f4')}
+            elif all(isinstance(v, int) for v in column):
+                columns[name] = pack_int_array(column)
+            elif name == 'cell_code':
+                columns[name] = self.pack_cellcodes(column)
+            else:
+                columns[name] = {'dtype': 'str', 'data': column}
+        return columns
+
+    @staticmethod
+    def pack_cellcodes(cellcodes: List[str]) -> dict:
+        """
+        pack cellcodes like "100mN26840E43366" into the prefix and the
+        coordinates, if all of them share the prefix and the number of digits
+        """
+        matches = [LAEA_CELLCODE.match(code or '') for code in cellcodes]
+        formats = {(m.group('prefix'), len(m.group('north')),
+                    len(m.group('east'))) if m else None
+                   for m in matches}
+        if len(formats) != 1 or None in formats:
+            return {'dtype': 'str', 'data': cellcodes}
+        prefix, north_digits, east_digits = formats.pop()
+        north = [int(m.group('north')) for m in matches]
+        east = [int(m.group('east')) for m in matches]
+        return {'dtype': 'cellcode',
+                'prefix': prefix,
+                'north_digits': north_digits,
+                'east_digits': east_digits,
+                'north': pack_array(north, '<i4'),
+                'east': pack_array(east, '<i4'), }
+
+
+INDICATOR_RENDERER_CLASSES = list(api_settings.DEFAULT_RENDERER_CLASSES) + [
+    PackedIndicatorRenderer]
@@ -0,0 +1,158 @@
+import time
+import logging
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+from django.contrib.gis.db.models import Extent
+from django.db.models import Model
+
+from datentool_backend.modes.models import Mode, ModeVariant
+from datentool_backend.places.models import Place
+from datentool_backend.population.models import RasterCell
+from datentool_backend.indicators.models import (Stop,
+                                                 MatrixCellPlace,
+                                                 MatrixCellStop,
+                                                 MatrixStopStop)
+from datentool_backend.indicators.compute.routing import (
+    MatrixCellPlaceRouter,
+    MatrixCellStopRouter,
+)
+from datentool_backend.utils.osrm_standin import osrm_standins
+from datentool_backend.utils.synthetic_project import copy_dataframe
+
+
+logger = logging.getLogger('routing')
+
+ROUTING_CASES = ['cellplace', 'cellstop', 'transit']
+TRANSIT_LABEL = 'Benchmark'
+# km/h between the stops and minutes per transfer
+TRANSIT_SPEED = 20
+TRANSIT_WAIT = 5
+EARTH_RADIUS = 6378137
+
+
+def create_transit_stops(n_stops: int, seed: int = 0) -> ModeVariant:
+    """
+    create a transit variant with stops placed randomly in the extent of the
+    inhabited cells and travel times between all stops, an existing
+    benchmark variant is replaced
+    """
+    for variant in ModeVariant.objects.filter(mode=Mode.TRANSIT,
+                                              label=TRANSIT_LABEL):
+        variant.delete()
+    variant = ModeVariant(mode=Mode.TRANSIT, label=TRANSIT_LABEL)
+    variant.save()
+
+    extent = RasterCell.objects.filter(rastercellpopulation__isnull=False)\
+        .aggregate(extent=Extent('pnt'))['extent']
+    if not extent:
+        raise ValueError('no inhabited cells found')
+    x0, y0, x1, y1 = extent
+    rng = np.random.default_rng(seed)
+    x = rng.uniform(x0, x1, n_stops)
+    y = rng.uniform(y0, y1, n_stops)
+    copy_dataframe(Stop, pd.DataFrame({
+        'hstnr': np.arange(1, n_stops + 1),
+        'name': [f'Haltestelle {i + 1}' for i in range(n_stops)],
+        'geom': [f'SRID=3857;POINT({xi:.2f} {yi:.2f})'
+                 for xi, yi in zip(x, y)],
+        'variant_id': variant.id, }))
+    stop_ids = np.fromiter(Stop.objects.filter(variant=variant)
+                           .order_by('hstnr').values_list('id', flat=True),
+                           dtype=np.int64)
+
+    # scale the distances in web mercator to meters
+    lat = 2 * np.arctan(np.exp(y / EARTH_RADIUS)) - np.pi / 2
+    meters = np.hypot(x[:, None] - x, y[:, None] - y) * np.cos(lat)[:, None]
+    minutes = meters / (TRANSIT_SPEED * 1000 / 60) + TRANSIT_WAIT
+    from_idx, to_idx = np.nonzero(~np.eye(n_stops, dtype=bool))
+    copy_dataframe(MatrixStopStop, pd.DataFrame({
+        'from_stop_id': stop_ids[from_idx],
+        'to_stop_id': stop_ids[to_idx],
+        'minutes': minutes[from_idx, to_idx],
+        'variant_id': variant.id, }))
+    return variant
+
+
+class RoutingCase:
+    """a router calculating a matrix"""
+
+    def __init__(self,
+                 name: str,
+                 model: Model,
+                 calc: Callable[[logging.Logger], None]):
+        self.name = name
+        self.model = model
+        self.calc = calc
+
+    def run(self, standins: dict) -> Dict[str, object]:
+        """
+        calculate the matrix, return the time, the number of
+        source-destination-pairs requested from the router and the number
+        of rows of the matrix afterwards
+        """
+        n_pairs = sum(standin.n_pairs for standin in standins.values())
+        n_requests = sum(standin.n_requests for standin in standins.values())
+        start = time.perf_counter()
+        self.calc(logger)
+        seconds = time.perf_counter() - start
+        n_pairs = sum(standin.n_pairs for standin in standins.values()) \
+            - n_pairs
+        n_requests = sum(standin.n_requests
+                         for standin in standins.values()) - n_requests
+        return {'time': seconds,
+                'n_requests': n_requests,
+                'n_pairs': n_pairs,
+                'pairs_per_second': n_pairs / seconds if seconds else 0,
+                'n_rows': self.model.objects.count(), }
+
+
+def get_routing_cases(mode: Mode = Mode.WALK,
+                      transit_variant: ModeVariant = None,
+                      names: List[str] = None) -> List[RoutingCase]:
+    """the routers with the default variant of the mode as (access) mode"""
+    variant = ModeVariant.objects.get(mode=mode, is_default=True)
+    cases = [RoutingCase(
+        'cellplace', MatrixCellPlace,
+        lambda logger: MatrixCellPlaceRouter().calc(
+            variant_ids=[variant.id], place_ids=[],
+            drop_constraints=False, logger=logger))]
+    if transit_variant:
+        # the stops are routed to all cells once, independent of the places
+        place_ids = list(Place.objects.order_by('id')
+                         .values_list('id', flat=True)[:1])
+        cases.append(RoutingCase(
+            'cellstop', MatrixCellStop,
+            lambda logger: MatrixCellStopRouter().calc(
+                variant_ids=[transit_variant.id], place_ids=place_ids,
+                drop_constraints=False, logger=logger,
+                access_variant_id=variant.id)))
+        cases.append(RoutingCase(
+            'transit', MatrixCellPlace,
+            lambda logger: MatrixCellPlaceRouter().calc(
+                variant_ids=[transit_variant.id], place_ids=[],
+                drop_constraints=False, logger=logger,
+                access_variant_id=variant.id)))
+    if names:
+        cases = [case for case in cases if case.name in names]
+    return cases
+
+
+def run_routing_benchmark(cases: List[RoutingCase],
+                          latency: float = 0,
+                          detour: float = 1.3,
+                          callback: Callable[[str, dict], None] = None
+                          ) -> Dict[str, dict]:
+    """run the cases against local OSRM stand-ins"""
+    results = {}
+    with osrm_standins(latency=latency, detour=detour) as standins:
+        for case in cases:
+            try:
+                result = case.run(standins)
+            except Exception as e:
+                result = {'error': repr(e)}
+            results[case.name] = result
+            if callback:
+                callback(case.name, result)
+    return results
@@ -1,3 +1,5 @@
 from .indicators import *
 from .stops import *
-from .traveltime import *
\ No newline at end of file
+from .traveltime import *
+from .location_suggestion import *
+from .indicator_job import *
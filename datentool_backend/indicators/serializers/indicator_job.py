@@ -0,0 +1,16 @@
+from rest_framework import serializers
+
+from datentool_backend.indicators.models import IndicatorJob
+
+
+class IndicatorJobSerializer(serializers.ModelSerializer):
+    has_result = serializers.SerializerMethodField()
+
+    class Meta:
+        model = IndicatorJob
+        fields = ('id', 'indicator', 'service', 'params', 'created',
+                  'is_finished', 'error', 'has_result')
+        read_only_fields = fields
+
+    def get_has_result(self, obj) -> bool:
+        return obj.is_finished and obj.result is not None
@@ -1,10 +1,12 @@
 from typing import List
+from operator import attrgetter, itemgetter
 import numpy as np
 
 from rest_framework import serializers
 from django.db import models
 
 from datentool_backend.indicators.models import Router
+from datentool_backend.indicators.legend import get_values, get_digits
 from datentool_backend.area.models import Area
 from datentool_backend.population.models import RasterCell
 from datentool_backend.places.models.places import Place
@@ -49,47 +51,46 @@ class IndicatorListSerializer(serializers.ListSerializer):
     def to_representation(self, data):
         """
         List of object instances -> List of dicts of primitive datatypes.
-        but calculate the median of the values first
-        and store them in the child-serializer-attribute `_digits_to_round`
+        The rows are read column by column in one pass. The digits to round to
+        are derived from the median of the value-column first and stored in
+        the child-serializer-attribute `_digits_to_round`, the rounded values
+        are kept in `values_array` to derive the legend from
         """
         # Dealing with nested relationships, data can be a Manager,
         # so, first get a queryset from the Manager if needed
         iterable = data.all() if isinstance(data, models.Manager) else data
+        rows = list(iterable)
+        values = get_values(rows)
 
         if self.child._digits_to_round is None:
-            self.child._digits_to_round = self.get_digits(iterable)
-
-        return [
-            self.child.to_representation(item) for item in iterable
-        ]
-
-    def get_digits(self, iterable) -> int:
-        """
-        get the number of digits to round the values
-        """
-        try:
-            first_item = iterable[0]
-        except IndexError:
-            return None
-
-        if isinstance(first_item, dict):
-            values = np.array([row['value'] for row in iterable
-                                if not row['value'] is None])
+            self.child._digits_to_round = get_digits(values)
+        digits = self.child._digits_to_round
+
+        if digits is not None:
+            rounded = [None if np.isnan(value) else round(value, digits)
+                       for value in values.tolist()]
+            self.values_array = np.array(
+                [np.nan if value is None else value for value in rounded],
+                dtype=float)
         else:
-            values = np.array([row.value for row in iterable
-                               if not row.value is None])
-
-        if len(values) == 0:
-            return None
-
-        median_value = np.nanmedian(values)
-        if median_value < 10:
-            digits = 2
-        elif median_value < 100:
-            digits = 1
-        else:
-            digits = 0
-        return digits
+            rounded = [None if np.isnan(value) else value
+                       for value in values.tolist()]
+            self.values_array = values
+
+        is_dict = bool(rows) and isinstance(rows[0], dict)
+        columns = []
+        for name, field in self.child.fields.items():
+            if name == 'value':
+                columns.append(rounded)
+                continue
+            get = itemgetter(field.source) if is_dict \
+                else attrgetter(field.source)
+            column = map(get, rows)
+            columns.append([None if value is None
+                            else field.to_representation(value)
+                            for value in column])
+        names = list(self.child.fields.keys())
+        return [dict(zip(names, row)) for row in zip(*columns)]
 
 
 class IndicatorDetailSerializer(serializers.Serializer):
@@ -131,6 +132,25 @@ class IndicatorRasterResultSerializer(IndicatorDetailSerializer,
         fields = ('cell_code', 'value')
 
 
+class IndicatorRasterCutoffResultSerializer(IndicatorDetailSerializer,
+                                          serializers.ModelSerializer):
+    cell_code = serializers.CharField()
+    cutoff = serializers.FloatField()
+    class Meta(IndicatorDetailSerializer.Meta):
+        model = RasterCell
+        fields = ('cell_code', 'cutoff', 'value')
+
+
+class IndicatorAreaCutoffResultSerializer(IndicatorDetailSerializer,
+                                        serializers.ModelSerializer):
+    label = serializers.CharField()
+    area_id = serializers.IntegerField(source='id')
+    cutoff = serializers.FloatField()
+    class Meta(IndicatorDetailSerializer.Meta):
+        model = Area
+        fields = ('area_id', 'label', 'cutoff', 'value')
+
+
 class IndicatorPlaceResultSerializer(IndicatorDetailSerializer,
                                     serializers.ModelSerializer):
     place_id = serializers.IntegerField(source='id')
@@ -139,6 +159,27 @@ class IndicatorPlaceResultSerializer(IndicatorDetailSerializer,
         fields = ('place_id', 'value')
 
 
+class IndicatorPlaceClosureResultSerializer(IndicatorDetailSerializer,
+                                            serializers.ModelSerializer):
+    place_id = serializers.IntegerField(source='id')
+    rank = serializers.IntegerField()
+    demand = serializers.FloatField()
+    unserved_demand = serializers.FloatField()
+    class Meta(IndicatorDetailSerializer.Meta):
+        model = Place
+        fields = ('place_id', 'rank', 'demand', 'unserved_demand', 'value')
+
+
+class IndicatorPlaceUtilizationResultSerializer(IndicatorDetailSerializer,
+                                                serializers.ModelSerializer):
+    place_id = serializers.IntegerField(source='id')
+    capacity = serializers.FloatField()
+    demand = serializers.FloatField()
+    class Meta(IndicatorDetailSerializer.Meta):
+        model = Place
+        fields = ('place_id', 'capacity', 'demand', 'value')
+
+
 class IndicatorPopulationSerializer(IndicatorDetailSerializer):
     year = serializers.IntegerField()
     gender = serializers.IntegerField()
@@ -0,0 +1,21 @@
+from rest_framework import serializers
+
+from datentool_backend.indicators.models import LocationSuggestion
+
+
+class LocationSuggestionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = LocationSuggestion
+        fields = ('id', 'service', 'mode', 'scenario', 'year', 'n_sites',
+                  'objective', 'cutoff', 'places', 'cells', 'created',
+                  'is_finished', 'initial_value', 'sites')
+        read_only_fields = ('created', 'is_finished', 'initial_value',
+                            'sites')
+        extra_kwargs = {'n_sites': {'min_value': 1},
+                        'cutoff': {'min_value': 0}, }
+
+    def validate(self, data):
+        if not data.get('places') and not data.get('cells'):
+            raise serializers.ValidationError(
+                'Es wurden keine Kandidaten angegeben')
+        return data
@@ -1,7 +1,15 @@
+import json
+import base64
+from datetime import timedelta
+from unittest import TestCase
 import pandas as pd
 import numpy as np
+import mapbox_vector_tile
 from django.urls import reverse
+from django.test import override_settings
+from django.utils import timezone
 from test_plus import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
 import logging
 
 from datentool_backend.api_test import LoginTestCase
@@ -9,12 +17,22 @@ from datentool_backend.api_test import LoginTestCase
 from datentool_backend.user.factories import ProfileFactory
 from datentool_backend.indicators.tests.setup_testdata import CreateTestdataMixin
 from datentool_backend.indicators.views.routing import MatrixCellPlaceRouter
+from datentool_backend.indicators.renderers import PackedIndicatorRenderer
 from datentool_backend.modes.factories import ModeVariantFactory, Mode, ModeVariant
-from datentool_backend.indicators.models import MatrixCellPlace
+from datentool_backend.indicators.models import (MatrixCellPlace,
+                                                 NearestPlaceCache,
+                                                 NearestPlace,
+                                                 IndicatorResult,
+                                                 IndicatorResultValue,
+                                                 IndicatorJob)
 from datentool_backend.places.models import Capacity
-from datentool_backend.population.models import RasterCell
-from datentool_backend.places.models import ScenarioMode
+from datentool_backend.places.factories import ScenarioFactory
+from datentool_backend.population.models import RasterCell, Prognosis
+from datentool_backend.places.models import ScenarioMode, ScenarioService
+from datentool_backend.indicators.compute import ServiceIndicator
+from datentool_backend.indicators.compute.sparse import CellPlaceMatrix
 from datentool_backend.indicators.compute.reachabilities import (
+    get_cutoff_time,
     reachability_bins_by_mode,
     reachability_colors,
 )
@@ -123,6 +141,822 @@ class TestAccessibilityIndicatorAPI(CreateTestdataMixin,
         # and none decreased
         self.assertEqual((result2 < result).sum()[0], 0)
 
+    def test_packed_raster_result(self):
+        """Test the packed format of the raster results"""
+        self.client.force_login(self.profile.user)
+        variant = ModeVariant.objects.get(id=self.variant_id)
+
+        query_params = {
+            'indicator': 'maxrasterreachability',
+            'year': 2022,
+            'mode': variant.mode,
+        }
+        url = reverse(self.url_key, kwargs={'pk': self.service1.pk})
+        response = self.post(url, data=query_params, extra={'format': 'json'})
+        self.assert_http_200_ok(response)
+        expected = pd.DataFrame(response.data['values'])
+
+        response = self.post(
+            url, data=query_params,
+            extra={'format': 'json',
+                   'HTTP_ACCEPT': PackedIndicatorRenderer.media_type})
+        self.assert_http_200_ok(response)
+        self.assertEqual(response['Content-Type'],
+                         PackedIndicatorRenderer.media_type)
+        packed = json.loads(response.content)
+        self.assertEqual(packed['count'], len(expected))
+        self.assertEqual(len(packed['legend']), len(response.data['legend']))
+
+        columns = packed['columns']
+        values = np.frombuffer(base64.b64decode(columns['value']['data']),
+                               dtype='<f4')
+        cellcodes = columns['cellCode']
+        if cellcodes['dtype'] == 'cellcode':
+            north = np.frombuffer(base64.b64decode(cellcodes['north']),
+                                  dtype='<i4')
+            east = np.frombuffer(base64.b64decode(cellcodes['east']),
+                                 dtype='<i4')
+            n, e = cellcodes['northDigits'], cellcodes['eastDigits']
+            cellcodes = [f"{cellcodes['prefix']}N{y:0{n}d}E{x:0{e}d}"
+                         for y, x in zip(north, east)]
+        else:
+            cellcodes = cellcodes['data']
+        self.assertListEqual(cellcodes, expected['cell_code'].tolist())
+        np.testing.assert_allclose(values, expected['value'], rtol=1e-6)
+
+    def test_indicator_result_tiles(self):
+        """Test serving the raster results as vector tiles"""
+        self.client.force_login(self.profile.user)
+        variant = ModeVariant.objects.get(id=self.variant_id)
+
+        query_params = {
+            'indicator': 'maxrasterreachability',
+            'year': 2022,
+            'mode': variant.mode,
+        }
+        url = reverse(self.url_key, kwargs={'pk': self.service1.pk})
+        response = self.post(url, data=query_params, extra={'format': 'json'})
+        expected = pd.DataFrame(response.data['values']).set_index('cell_code')
+
+        query_params['as_tiles'] = True
+        response = self.post(url, data=query_params, extra={'format': 'json'})
+        self.assert_http_200_ok(response)
+        key = response.data['key']
+        self.assertNotIn('values', response.data)
+        self.assertEqual(response.data['tiles'],
+                         f'/tiles/indicators/{key}/{{z}}/{{x}}/{{y}}/')
+        result = IndicatorResult.objects.get(key=key)
+        self.assertEqual(result.result_type, 'raster')
+        self.assertEqual(
+            IndicatorResultValue.objects.filter(result=result).count(),
+            len(expected))
+
+        # the same parameters replace the stored values
+        calculated = result.calculated
+        response = self.post(url, data=query_params, extra={'format': 'json'})
+        self.assertEqual(response.data['key'], key)
+        result.refresh_from_db()
+        self.assertGreater(result.calculated, calculated)
+        self.assertEqual(
+            IndicatorResultValue.objects.filter(result=result).count(),
+            len(expected))
+
+        tile_url = reverse('indicator-tile',
+                           kwargs={'key': key, 'z': 0, 'x': 0, 'y': 0})
+        response = self.get(tile_url)
+        self.assert_http_200_ok(response)
+        features = mapbox_vector_tile.decode(response.content)['indicator']\
+            ['features']
+        self.assertEqual(len(features), len(expected))
+        for feature in features:
+            properties = feature['properties']
+            self.assertAlmostEqual(properties['value'],
+                                   expected.loc[properties['cellcode'],
+                                                'value'], places=1)
+
+        # only users with access to the infrastructure get the tiles
+        self.client.logout()
+        self.assert_http_403_forbidden(self.get(tile_url))
+        self.client.force_login(self.profile2.user)
+        self.assert_http_403_forbidden(self.get(tile_url))
+        self.client.force_login(self.profile3.user)
+        self.assert_http_200_ok(self.get(tile_url))
+        # the token of the frontend authenticates as well
+        self.client.logout()
+        token = RefreshToken.for_user(self.profile3.user).access_token
+        self.assert_http_200_ok(self.client.get(
+            tile_url, HTTP_AUTHORIZATION=f'Bearer {token}'))
+        self.assert_http_403_forbidden(self.client.get(
+            tile_url, HTTP_AUTHORIZATION='Bearer invalid'))
+
+        # the tiles of a scenario only for the users of the planning process
+        self.client.force_login(self.profile.user)
+        query_params['scenario'] = self.scenario.pk
+        response = self.post(url, data=query_params, extra={'format': 'json'})
+        self.assert_http_200_ok(response)
+        scenario_tile_url = reverse(
+            'indicator-tile',
+            kwargs={'key': response.data['key'], 'z': 0, 'x': 0, 'y': 0})
+        self.client.force_login(self.profile3.user)
+        self.assert_http_403_forbidden(self.get(scenario_tile_url))
+        self.client.force_login(self.profile5.user)
+        self.assert_http_403_forbidden(self.get(scenario_tile_url))
+        self.client.force_login(self.profile4.user)
+        self.assert_http_200_ok(self.get(scenario_tile_url))
+
+        # changed matrices remove the stored results
+        MatrixCellPlace.invalidate_caches()
+        self.assertFalse(IndicatorResult.objects.exists())
+        self.assert_http_404_not_found(self.get(tile_url))
+
+    def test_nearest_place_cache(self):
+        """Test the materialized nearest places and their invalidation"""
+
+        self.client.force_login(self.profile.user)
+        variant = ModeVariant.objects.get(id=self.variant_id)
+
+        query_params = {
+            'indicator': 'maxrasterreachability',
+            'year': 2022,
+            'mode': variant.mode,
+        }
+        url = reverse(self.url_key, kwargs={'pk': self.service1.pk})
+        response = self.post(url, data=query_params, extra={'format': 'json'})
+        self.assert_http_200_ok(response)
+
+        cache = NearestPlaceCache.objects.get(service=self.service1,
+                                              variant=variant,
+                                              scenario=None,
+                                              year=2022)
+        self.assertTrue(cache.up_to_date)
+        nearest_places = NearestPlace.objects.filter(cache=cache)
+        self.assertEqual(nearest_places.count(), 8)
+        # the entries are the minimum traveltimes per cell
+        for nearest_place in nearest_places:
+            min_minutes = MatrixCellPlace.objects\
+                .filter(variant=variant, cell=nearest_place.cell,
+                        place__infrastructure=self.service1.infrastructure)\
+                .order_by('minutes').first().minutes
+            self.assertAlmostEqual(nearest_place.minutes, min_minutes)
+
+        # a second request reuses the cache
+        place_ids = cache.place_ids
+        nearest = {row['cell_id']: row for row in nearest_places.values()}
+        response = self.post(url, data=query_params, extra={'format': 'json'})
+        self.assert_http_200_ok(response)
+        cache.refresh_from_db()
+        self.assertEqual(cache.place_ids, place_ids)
+        self.assertIn(self.place1.pk, place_ids)
+
+        # changes to the capacities are detected even without signals
+        capacities = list(Capacity.objects.filter(place=self.place1))
+        original_capacities = [capacity.capacity for capacity in capacities]
+        for capacity in capacities:
+            capacity.capacity = 0
+        Capacity.objects.bulk_update(capacities, ['capacity'])
+        response = self.post(url, data=query_params, extra={'format': 'json'})
+        self.assert_http_200_ok(response)
+        cache.refresh_from_db()
+        self.assertNotIn(self.place1.pk, cache.place_ids)
+        self.assertFalse(NearestPlace.objects.filter(
+            cache=cache, place=self.place1).exists())
+        # only the cells of the closed place are updated
+        for nearest_place in NearestPlace.objects.filter(cache=cache):
+            expected = MatrixCellPlace.objects\
+                .filter(variant=variant, cell=nearest_place.cell,
+                        place_id__in=cache.place_ids)\
+                .order_by('minutes', 'place_id').first()
+            self.assertEqual(nearest_place.place_id, expected.place_id)
+            self.assertAlmostEqual(nearest_place.minutes, expected.minutes)
+            if nearest[nearest_place.cell_id]['place_id'] != self.place1.pk:
+                self.assertEqual(nearest_place.pk,
+                                 nearest[nearest_place.cell_id]['id'])
+
+        # reopening the place restores the nearest places
+        for capacity, original in zip(capacities, original_capacities):
+            capacity.capacity = original
+        Capacity.objects.bulk_update(capacities, ['capacity'])
+        response = self.post(url, data=query_params, extra={'format': 'json'})
+        self.assert_http_200_ok(response)
+        cache.refresh_from_db()
+        self.assertEqual(cache.place_ids, place_ids)
+        self.assertDictEqual(
+            {row['cell_id']: (row['place_id'], row['minutes'])
+             for row in NearestPlace.objects.filter(cache=cache).values()},
+            {cell_id: (row['place_id'], row['minutes'])
+             for cell_id, row in nearest.items()})
+
+        # a routing run writing to the matrix marks the cache as outdated
+        MatrixCellPlaceRouter().calc([variant.pk], [self.place1.pk], False,
+                                     logging.getLogger('routing'),
+                                     max_distance=5000,
+                                     air_distance_routing=True)
+        cache.refresh_from_db()
+        self.assertFalse(cache.up_to_date)
+
+    def test_sparse_engine(self):
+        """Test that the sparse matrix engine gives the same results as sql"""
+        self.client.force_login(self.profile.user)
+        variant = ModeVariant.objects.get(id=self.variant_id)
+        MatrixCellPlace.invalidate_caches(variant_ids=[variant.pk])
+
+        indicators = {
+            'maxrasterreachability': ('cell_code', {}),
+            'maxplacereachability': ('place_id', {}),
+            'averageplacereachability': ('place_id', {}),
+            'accessibledemandperplace': ('place_id', {}),
+            'averageareareachability': ('area_id',
+                                        {'area_level': self.area_level2.pk}),
+            'cutoffareareachability': ('area_id',
+                                       {'area_level': self.area_level2.pk,
+                                        'cutoff': 5}),
+            'twostepfloatingcatchment': ('cell_code',
+                                         {'cutoff': 10,
+                                          'decay': 'gaussian'}),
+        }
+        url = reverse(self.url_key, kwargs={'pk': self.service1.pk})
+        for indicator, (index, params) in indicators.items():
+            query_params = {
+                'indicator': indicator,
+                'year': 2022,
+                'mode': variant.mode,
+                **params,
+            }
+            results = {}
+            for engine in ['sql', 'sparse']:
+                query_params['engine'] = engine
+                response = self.post(url, data=query_params,
+                                     extra={'format': 'json'})
+                self.assert_http_200_ok(response)
+                results[engine] = pd.DataFrame(response.data['values'])\
+                    .set_index(index).sort_index()
+            pd.testing.assert_frame_equal(results['sql'], results['sparse'],
+                                          check_dtype=False)
+
+    def test_floating_catchment_cutoff(self):
+        """Test the default and invalid cut-off times of the 2SFCA"""
+        self.client.force_login(self.profile.user)
+        variant = ModeVariant.objects.get(id=self.variant_id)
+        MatrixCellPlace.invalidate_caches(variant_ids=[variant.pk])
+        cutoff = get_cutoff_time(variant, self.service1.infrastructure_id)
+
+        url = reverse(self.url_key, kwargs={'pk': self.service1.pk})
+        query_params = {
+            'indicator': 'twostepfloatingcatchment',
+            'year': 2022,
+            'mode': variant.mode,
+        }
+        for engine in ['sql', 'sparse']:
+            query_params['engine'] = engine
+            # without cut-off time the one of the mode variant is taken
+            response = self.post(url, data=query_params,
+                                 extra={'format': 'json'})
+            self.assert_http_200_ok(response)
+            expected = self.post(url, data={**query_params, 'cutoff': cutoff},
+                                 extra={'format': 'json'})
+            self.assert_http_200_ok(expected)
+            self.assertListEqual(response.data['values'],
+                                 expected.data['values'])
+
+            for invalid in ['abc', 0]:
+                response = self.post(url,
+                                     data={**query_params, 'cutoff': invalid},
+                                     extra={'format': 'json'})
+                self.assert_http_400_bad_request(response)
+
+    def test_cumulative_opportunities(self):
+        """Test the places reachable within several cutoffs with both engines"""
+        self.client.force_login(self.profile.user)
+        variant = ModeVariant.objects.get(id=self.variant_id)
+        MatrixCellPlace.invalidate_caches(variant_ids=[variant.pk])
+
+        cutoffs = [3, 5, 10]
+        indicators = {
+            'fixedindicators-cumulative-opportunities': ('cell_code', {}),
+            'fixedindicators-cumulative-opportunities-area': (
+                'area_id', {'area_level': self.area_level2.pk}),
+        }
+        for url, (index, params) in indicators.items():
+            for measure in ['places', 'capacity']:
+                query_params = {
+                    'service': self.service1.pk,
+                    'year': 2022,
+                    'mode': variant.mode,
+                    'cutoffs': cutoffs,
+                    'measure': measure,
+                    **params,
+                }
+                results = {}
+                for engine in ['sql', 'sparse']:
+                    query_params['engine'] = engine
+                    response = self.post(url, data=query_params,
+                                         extra={'format': 'json'})
+                    self.assert_http_200_ok(response)
+                    results[engine] = pd.DataFrame(response.data['values'])\
+                        .set_index([index, 'cutoff']).sort_index()
+                pd.testing.assert_frame_equal(results['sql'],
+                                              results['sparse'],
+                                              check_dtype=False)
+                # the values do not decrease with the cutoff
+                values = results['sql']['value'].unstack('cutoff').fillna(0)
+                self.assertTrue((values.diff(axis=1).fillna(0) >= 0)
+                                .all().all())
+
+    def test_reachability_distribution(self):
+        """Test the distribution of the travel times in the areas"""
+        self.client.force_login(self.profile.user)
+        variant = ModeVariant.objects.get(id=self.variant_id)
+        MatrixCellPlace.invalidate_caches(variant_ids=[variant.pk])
+
+        url = 'fixedindicators-reachability-distribution-area'
+        query_params = {
+            'service': self.service1.pk,
+            'year': 2022,
+            'mode': variant.mode,
+            'area_level': self.area_level2.pk,
+            'max_minutes': 30,
+        }
+        results = {}
+        for engine in ['sql', 'sparse']:
+            query_params['engine'] = engine
+            response = self.post(url, data=query_params,
+                                 extra={'format': 'json'})
+            self.assert_http_200_ok(response)
+            results[engine] = pd.DataFrame(response.data['values'])\
+                .set_index(['area_id', 'cutoff']).sort_index()
+        pd.testing.assert_frame_equal(results['sql'], results['sparse'],
+                                      check_dtype=False)
+        df = results['sql']
+        self.assertListEqual(
+            sorted(df.index.get_level_values('cutoff').unique()),
+            list(range(1, 31)))
+        # the shares do not decrease with the minutes
+        values = df['value'].unstack('cutoff').fillna(0)
+        self.assertTrue((values.diff(axis=1).fillna(0) >= 0).all().all())
+
+        # the distribution answers the indicator for a single cutoff
+        url = reverse(self.url_key, kwargs={'pk': self.service1.pk})
+        response = self.post(url,
+                             data={'indicator': 'cutoffareareachability',
+                                   'year': 2022,
+                                   'mode': variant.mode,
+                                   'area_level': self.area_level2.pk,
+                                   'cutoff': 5},
+                             extra={'format': 'json'})
+        self.assert_http_200_ok(response)
+        expected = pd.DataFrame(response.data['values'])\
+            .set_index('area_id')['value']
+        actual = df.xs(5, level='cutoff')['value']
+        pd.testing.assert_series_equal(actual.sort_index(),
+                                       expected.sort_index(),
+                                       check_dtype=False, check_names=False,
+                                       check_exact=False, atol=0.1)
+
+    def test_closure_impact(self):
+        """Test the impact of the closure of each place with both engines"""
+        self.client.force_login(self.profile.user)
+        variant = ModeVariant.objects.get(id=self.variant_id)
+        MatrixCellPlace.invalidate_caches(variant_ids=[variant.pk])
+
+        url = 'fixedindicators-closure-impact'
+        query_params = {
+            'service': self.service1.pk,
+            'year': 2022,
+            'mode': variant.mode,
+        }
+        results = {}
+        for engine in ['sql', 'sparse']:
+            query_params['engine'] = engine
+            response = self.post(url, data=query_params,
+                                 extra={'format': 'json'})
+            self.assert_http_200_ok(response)
+            df = pd.DataFrame(response.data['values'])
+            # the places are ranked by the increase of the travel time
+            self.assertListEqual(list(df['rank']),
+                                 sorted(df['rank']))
+            self.assertTrue((df['value'].diff().fillna(0) <= 0).all())
+            results[engine] = df.set_index('place_id').sort_index()
+        pd.testing.assert_frame_equal(
+            results['sql'][['demand', 'unserved_demand', 'value']],
+            results['sparse'][['demand', 'unserved_demand', 'value']],
+            check_dtype=False, check_exact=False, atol=0.01)
+        # closing a place never shortens the travel times
+        self.assertTrue((results['sql']['value'] >= 0).all())
+        self.assertTrue((results['sql']['unserved_demand']
+                         <= results['sql']['demand']).all())
+
+    def test_huff_model(self):
+        """Test the expected utilization of the places with both engines"""
+        self.client.force_login(self.profile.user)
+        variant = ModeVariant.objects.get(id=self.variant_id)
+        MatrixCellPlace.invalidate_caches(variant_ids=[variant.pk])
+
+        url = 'fixedindicators-huff-model'
+        query_params = {
+            'service': self.service1.pk,
+            'year': 2022,
+            'mode': variant.mode,
+            'alpha': 1,
+            'beta': 0.2,
+        }
+        response = self.get(url, data=query_params)
+        self.assert_http_200_ok(response)
+
+        results = {}
+        for engine in ['sql', 'sparse']:
+            query_params['engine'] = engine
+            response = self.post(url, data=query_params,
+                                 extra={'format': 'json'})
+            self.assert_http_200_ok(response)
+            df = pd.DataFrame(response.data['values'])
+            results[engine] = df.set_index('place_id').sort_index()
+        pd.testing.assert_frame_equal(results['sql'], results['sparse'],
+                                      check_dtype=False, check_exact=False,
+                                      atol=0.1)
+        df = results['sql']
+        self.assertTrue((df['capacity'] > 0).all())
+        self.assertTrue((df['demand'] >= 0).all())
+        np.testing.assert_allclose(df['value'],
+                                   df['demand'] / df['capacity'] * 100,
+                                   atol=0.1)
+
+        # the demand is only split, never multiplied
+        query_params['engine'] = 'sparse'
+        query_params['beta'] = 0
+        response = self.post(url, data=query_params,
+                             extra={'format': 'json'})
+        self.assert_http_200_ok(response)
+        demand = pd.DataFrame(response.data['values'])['demand'].sum()
+        query_params['cutoff'] = 10000
+        response = self.post(url, data=query_params,
+                             extra={'format': 'json'})
+        self.assert_http_200_ok(response)
+        self.assertGreaterEqual(
+            pd.DataFrame(response.data['values'])['demand'].sum() + 0.1,
+            demand)
+
+        query_params['alpha'] = 'much'
+        response = self.post(url, data=query_params,
+                             extra={'format': 'json'})
+        self.assert_http_400_bad_request(response)
+
+    def test_mode_comparison(self):
+        """Test comparing the travel times of two modes with both engines"""
+        self.client.force_login(self.profile.user)
+        variant = ModeVariant.objects.get(id=self.variant_id)
+        # bikes are three times as fast as walking in the test matrix
+        bike = ModeVariantFactory(mode=Mode.BIKE, is_default=True)
+        infrastructure_id = self.service1.infrastructure.pk
+        add_partition(MatrixCellPlace,
+                      f'mode_{bike.pk}_infrastructure_{infrastructure_id}',
+                      [bike.pk, infrastructure_id])
+        MatrixCellPlace.objects.bulk_create([
+            MatrixCellPlace(cell_id=mcp.cell_id, place_id=mcp.place_id,
+                            variant=bike, minutes=mcp.minutes / 3,
+                            partition_id=[bike.pk, infrastructure_id])
+            for mcp in MatrixCellPlace.objects.in_partitions(
+                variant, infrastructure_id)])
+        MatrixCellPlace.invalidate_caches(variant_ids=[variant.pk, bike.pk])
+
+        url = reverse(self.url_key, kwargs={'pk': self.service1.pk})
+        query_params = {
+            'indicator': 'modecomparisoncell',
+            'year': 2022,
+            'mode': variant.mode,
+            'compare_mode': Mode.BIKE.value,
+        }
+        results = {}
+        for engine in ['sql', 'sparse']:
+            query_params['engine'] = engine
+            response = self.post(url, data=query_params,
+                                 extra={'format': 'json'})
+            self.assert_http_200_ok(response)
+            df = pd.DataFrame(response.data['values'])
+            self.assertTrue(len(df) > 0)
+            results[engine] = df.set_index('cell_code').sort_index()
+        pd.testing.assert_frame_equal(results['sql'], results['sparse'],
+                                      check_dtype=False, check_exact=False,
+                                      atol=0.01)
+        ratios = results['sql']['value'].dropna()
+        np.testing.assert_allclose(ratios, 3, atol=0.01)
+
+        query_params['measure'] = 'difference'
+        query_params['engine'] = 'sql'
+        response = self.post(url, data=query_params, extra={'format': 'json'})
+        self.assert_http_200_ok(response)
+        df = pd.DataFrame(response.data['values'])
+        self.assertTrue((df['value'] >= 0).all())
+
+        query_params['indicator'] = 'modecomparisonarea'
+        query_params['measure'] = 'ratio'
+        query_params['area_level'] = self.area_level2.pk
+        results = {}
+        for engine in ['sql', 'sparse']:
+            query_params['engine'] = engine
+            response = self.post(url, data=query_params,
+                                 extra={'format': 'json'})
+            self.assert_http_200_ok(response)
+            results[engine] = pd.DataFrame(response.data['values'])\
+                .set_index('area_id').sort_index()
+        pd.testing.assert_frame_equal(results['sql'], results['sparse'],
+                                      check_dtype=False, check_exact=False,
+                                      atol=0.01)
+        np.testing.assert_allclose(results['sql']['value'].dropna(), 3,
+                                   atol=0.01)
+
+        query_params['measure'] = 'sum'
+        response = self.post(url, data=query_params, extra={'format': 'json'})
+        self.assert_http_400_bad_request(response)
+
+    def test_compute_indicator_batch(self):
+        """Test computing an indicator for several years and scenarios"""
+        self.client.force_login(self.profile.user)
+        variant = ModeVariant.objects.get(id=self.variant_id)
+
+        query_params = {
+            'indicator': 'averageareareachability',
+            'years': [2022, 2023],
+            'scenarios': [None, self.scenario.pk],
+            'modes': [variant.mode],
+            'area_level': self.area_level2.pk,
+        }
+        url = reverse('services-compute-indicator-batch',
+                      kwargs={'pk': self.service1.pk})
+        response = self.post(url, data=query_params, extra={'format': 'json'})
+        self.assert_http_200_ok(response)
+        self.assertEqual(response.data['dims'],
+                         ['year', 'scenario', 'mode', 'id'])
+        ids = response.data['coords']['id']
+        self.assertEqual(len(ids), 2)
+        self.assertEqual(len(response.data['labels']), 2)
+        values = np.array(response.data['values'], dtype=float)
+        self.assertEqual(values.shape, (2, 2, 1, 2))
+
+        # the single pass over all combinations equals the sql queries
+        response = self.post(url, data={**query_params, 'engine': 'sql'},
+                             extra={'format': 'json'})
+        self.assert_http_200_ok(response)
+        np.testing.assert_array_almost_equal(
+            values, np.array(response.data['values'], dtype=float))
+
+        # the values are the same as the ones computed one by one
+        for i, year in enumerate(query_params['years']):
+            for j, scenario in enumerate(query_params['scenarios']):
+                params = {
+                    'indicator': 'averageareareachability',
+                    'year': year,
+                    'mode': variant.mode,
+                    'area_level': self.area_level2.pk,
+                }
+                if scenario:
+                    params['scenario'] = scenario
+                url = reverse(self.url_key, kwargs={'pk': self.service1.pk})
+                response = self.post(url, data=params, extra={'format': 'json'})
+                self.assert_http_200_ok(response)
+                result = pd.DataFrame(response.data['values'])\
+                    .set_index('area_id')['value'].astype(float)
+                np.testing.assert_array_almost_equal(
+                    values[i, j, 0], result.loc[ids].values)
+
+    def test_compute_indicator_batch_permissions(self):
+        """Test that all requested scenarios have to be readable"""
+        self.client.force_login(self.profile.user)
+        variant = ModeVariant.objects.get(id=self.variant_id)
+        # a scenario of a planning process of another user
+        other_scenario = ScenarioFactory(planning_process__owner=self.profile2)
+        url = reverse('services-compute-indicator-batch',
+                      kwargs={'pk': self.service1.pk})
+        query_params = {
+            'indicator': 'averageareareachability',
+            'years': [2022],
+            'modes': [variant.mode],
+            'area_level': self.area_level2.pk,
+        }
+        # form data with the scenarios as repeated keys
+        response = self.post(url, data={
+            **query_params, 'scenarios': [other_scenario.pk, self.scenario.pk]})
+        self.assert_http_403_forbidden(response)
+        response = self.post(url, data={
+            **query_params, 'scenarios': [other_scenario.pk]},
+            extra={'format': 'json'})
+        self.assert_http_403_forbidden(response)
+        response = self.post(url, data={
+            **query_params, 'scenarios': [self.scenario.pk]})
+        self.assert_http_200_ok(response)
+
+        # unknown scenarios are forbidden, not an error
+        unknown = other_scenario.pk + 1000
+        response = self.post(url, data={**query_params, 'scenarios': [unknown]},
+                             extra={'format': 'json'})
+        self.assert_http_403_forbidden(response)
+        url = reverse('services-compute-indicator-diff',
+                      kwargs={'pk': self.service1.pk})
+        response = self.post(url, data={'indicator': 'averageareareachability',
+                                        'year': 2022,
+                                        'mode': variant.mode,
+                                        'area_level': self.area_level2.pk,
+                                        'scenario': self.scenario.pk,
+                                        'base_scenario': unknown},
+                             extra={'format': 'json'})
+        self.assert_http_403_forbidden(response)
+
+    def test_compute_indicator_diff(self):
+        """Test the difference of indicators between two scenarios"""
+        self.client.force_login(self.profile.user)
+        variant = ModeVariant.objects.get(id=self.variant_id)
+        MatrixCellPlace.invalidate_caches(variant_ids=[variant.pk])
+        # close place1 in the scenario, population and demand rates
+        # are the same as in the base scenario
+        Capacity.objects.create(place=self.place1, service=self.service1,
+                                scenario=self.scenario, capacity=0)
+        ScenarioService.objects.filter(scenario=self.scenario)\
+            .update(demandrateset=self.drs_s1)
+        Prognosis.objects.update(is_default=False)
+        Prognosis.objects.filter(pk=self.scenario.prognosis_id)\
+            .update(is_default=True)
+
+        indicators = {
+            'maxrasterreachability': (['cell_code'], {}, True),
+            'averageareareachability': (['area_id', 'label'],
+                                        {'area_level': self.area_level2.pk},
+                                        True),
+            'cutoffareareachability': (['area_id', 'label'],
+                                       {'area_level': self.area_level2.pk,
+                                        'cutoff': 10},
+                                       True),
+            'demandpercapacity': (['area_id', 'label'],
+                                  {'area_level': self.area_level2.pk},
+                                  False),
+        }
+        for indicator, (index, params, incremental) in indicators.items():
+            query_params = {
+                'indicator': indicator,
+                'year': 2022,
+                'mode': variant.mode,
+                **params,
+            }
+            url = reverse('services-compute-indicator-diff',
+                          kwargs={'pk': self.service1.pk})
+            response = self.post(url,
+                                 data={**query_params,
+                                       'scenario': self.scenario.pk,
+                                       'base_scenario': None, },
+                                 extra={'format': 'json'})
+            self.assert_http_200_ok(response)
+            self.assertEqual(response.data['incremental'], incremental)
+            self.assertListEqual(response.data['changed_places'],
+                                 [self.place1.pk, self.place2.pk])
+            diff = pd.DataFrame(response.data['values'],
+                                columns=index + ['base_value',
+                                                 'scenario_value', 'value'])
+            diff = diff.set_index(index).sort_index()
+
+            # the same as the difference of two full runs
+            url = reverse(self.url_key, kwargs={'pk': self.service1.pk})
+            results = {}
+            for scenario in [None, self.scenario.pk]:
+                response = self.post(url,
+                                     data={**query_params,
+                                           'scenario': scenario},
+                                     extra={'format': 'json'})
+                self.assert_http_200_ok(response)
+                results[scenario] = pd.DataFrame(response.data['values'])\
+                    .set_index(index)['value']
+            full = pd.concat([results[None], results[self.scenario.pk]],
+                             axis=1, keys=['base_value', 'scenario_value'])
+            full = full[(full['base_value'] != full['scenario_value'])
+                        & full.notna().any(axis=1)].sort_index()
+            self.assertListEqual(list(diff.index), list(full.index))
+            np.testing.assert_array_almost_equal(
+                diff['value'].astype(float),
+                full['scenario_value'] - full['base_value'])
+
+    def test_compute_indicator_async(self):
+        """Test computing an indicator in the background"""
+        self.client.force_login(self.profile.user)
+        variant = ModeVariant.objects.get(id=self.variant_id)
+        IndicatorResult.invalidate()
+
+        query_params = {
+            'indicator': 'maxrasterreachability',
+            'year': 2022,
+            'mode': variant.mode,
+        }
+        url = reverse(self.url_key, kwargs={'pk': self.service1.pk})
+        response = self.post(url, data={**query_params, 'async': True},
+                             extra={'format': 'json'})
+        self.assert_http_202_accepted(response)
+        job_id = response.data['id']
+        self.assertTrue(response.data['is_finished'])
+        self.assertTrue(response.data['has_result'])
+        self.assertIsNone(response.data['error'])
+
+        result_url = reverse('indicatorjobs-result', kwargs={'pk': job_id})
+        response = self.get(result_url)
+        self.assert_http_200_ok(response)
+        job_values = response.data['values']
+
+        # the result of the job is not served to the synchronous requests
+        self.assertFalse(IndicatorResult.objects.exclude(
+            params__job=job_id).exists())
+        response = self.post(url, data={**query_params, 'async': 'false'},
+                             extra={'format': 'json'})
+        self.assert_http_200_ok(response)
+        self.assertListEqual(job_values, response.data['values'])
+
+        # a second job computes its own result
+        response = self.post(url, data={**query_params, 'async': 'true'},
+                             extra={'format': 'json'})
+        self.assert_http_202_accepted(response)
+        self.assertNotEqual(response.data['id'], job_id)
+        self.assertTrue(response.data['has_result'])
+
+        # results precomputed in the background are reused by the jobs
+        indicator = ServiceIndicator.registered['maxrasterreachability'](
+            self.service1, dict(query_params, service=self.service1.pk))
+        IndicatorResult.cache('maxrasterreachability',
+                              indicator.get_cache_params(),
+                              'raster', {'legend': [], 'values': ['cached']})
+        response = self.post(url, data={**query_params, 'async': True},
+                             extra={'format': 'json'})
+        self.assert_http_200_ok(response)
+        self.assertTrue(response.data['has_result'])
+
+        # results invalidated by changes of the data are gone
+        IndicatorResult.invalidate()
+        response = self.get(result_url)
+        self.assert_http_404_not_found(response)
+
+        # the jobs are visible to their user only
+        self.client.force_login(self.profile3.user)
+        response = self.get(reverse('indicatorjobs-detail',
+                                    kwargs={'pk': job_id}))
+        self.assert_http_404_not_found(response)
+
+    def test_indicator_job_cleanup(self):
+        """Test removing the jobs and their results"""
+        self.client.force_login(self.profile.user)
+        variant = ModeVariant.objects.get(id=self.variant_id)
+        IndicatorResult.invalidate()
+
+        query_params = {
+            'indicator': 'maxrasterreachability',
+            'year': 2022,
+            'mode': variant.mode,
+            'async': True,
+        }
+        url = reverse(self.url_key, kwargs={'pk': self.service1.pk})
+        response = self.post(url, data=query_params, extra={'format': 'json'})
+        self.assert_http_202_accepted(response)
+        job_id = response.data['id']
+        self.assertTrue(IndicatorResult.objects.filter(
+            params__job=job_id).exists())
+
+        # deleting the job removes its result
+        response = self.delete(reverse('indicatorjobs-detail',
+                                       kwargs={'pk': job_id}))
+        self.assert_http_204_no_content(response)
+        self.assertFalse(IndicatorResult.objects.filter(
+            params__job=job_id).exists())
+
+        # but not the results precomputed in the background
+        indicator = ServiceIndicator.registered['maxrasterreachability'](
+            self.service1, {**query_params, 'service': self.service1.pk})
+        IndicatorResult.cache('maxrasterreachability',
+                              indicator.get_cache_params(),
+                              'raster', {'legend': [], 'values': ['cached']})
+        response = self.post(url, data=query_params, extra={'format': 'json'})
+        self.assert_http_200_ok(response)
+        shared_job = IndicatorJob.objects.get(id=response.data['id'])
+        shared_job.delete()
+        self.assertTrue(IndicatorResult.objects.filter(
+            key=shared_job.key).exists())
+
+        # finished jobs are removed after INDICATOR_JOB_MAX_AGE days
+        IndicatorResult.invalidate()
+        response = self.post(url, data=query_params, extra={'format': 'json'})
+        old_job_id = response.data['id']
+        running_job = IndicatorJob.objects.create(
+            indicator='maxrasterreachability', service=self.service1,
+            key='running', user=self.profile)
+        IndicatorJob.objects.filter(id__in=[old_job_id, running_job.id])\
+            .update(created=timezone.now() - timedelta(days=8))
+        with override_settings(INDICATOR_JOB_MAX_AGE=0):
+            response = self.post(url, data=query_params,
+                                 extra={'format': 'json'})
+            self.assertTrue(IndicatorJob.objects.filter(
+                id=old_job_id).exists())
+        with override_settings(INDICATOR_JOB_MAX_AGE=7):
+            response = self.post(url, data=query_params,
+                                 extra={'format': 'json'})
+        self.assertTrue(IndicatorJob.objects.filter(
+            id=response.data['id']).exists())
+        self.assertFalse(IndicatorJob.objects.filter(id=old_job_id).exists())
+        self.assertFalse(IndicatorResult.objects.filter(
+            params__job=old_job_id).exists())
+        self.assertTrue(IndicatorJob.objects.filter(
+            id=running_job.id).exists())
+
     def test_max_place_reachability(self):
         """Test max place reachability"""
 
@@ -438,3 +1272,131 @@ class TestAccessibilityIndicatorAPI(CreateTestdataMixin,
         response = self.post(url, data=query_params, extra={'format': 'json'})
         self.assert_http_403_forbidden(response)
 
+
+class TestCellPlaceMatrix(TestCase):
+    """the methods of the sparse matrix"""
+
+    def setUp(self):
+        # cell 0 reaches place 0 in 5 and place 1 in 20 minutes,
+        # cell 1 reaches place 0 in 8 minutes
+        self.matrix = CellPlaceMatrix(cell_ids=np.array([1, 2]),
+                                      cell_codes=np.array(['a', 'b']),
+                                      place_ids=np.array([10, 20]),
+                                      indptr=np.array([0, 2, 3]),
+                                      indices=np.array([0, 1, 0]),
+                                      minutes=np.array([5, 20, 8], dtype='f4'))
+
+    def test_floating_catchment(self):
+        """the two-step floating catchment area method"""
+        matrix = self.matrix
+        supply = np.array([4., 2.])
+        demand = np.array([10., 30.])
+
+        # place 1 is out of reach and its capacity ignored
+        access = matrix.floating_catchment(supply, demand, cutoff=10)
+        np.testing.assert_allclose(access, [0.1, 0.1])
+        access = matrix.floating_catchment(supply, demand, cutoff=30)
+        np.testing.assert_allclose(access, [0.1 + 0.2, 0.1])
+
+        # with distance decay, the nearer cell gets the bigger share,
+        # the total capacity is still distributed completely
+        access = matrix.floating_catchment(supply, demand, cutoff=10,
+                                           decay='gaussian')
+        self.assertGreater(access[0], access[1])
+        self.assertAlmostEqual((access * demand).sum(), 4)
+
+    def test_nearest_minutes(self):
+        """the nearest places of several sets of places in one pass"""
+        matrix = self.matrix
+        masks = np.array([[True, True], [False, True], [False, False]])
+        expected = [[5, 8], [20, np.nan], [np.nan, np.nan]]
+        np.testing.assert_array_equal(matrix.nearest_minutes(masks), expected)
+        # evaluated in chunks of sets
+        with override_settings(MATRIX_BATCH_MAX_VALUES=1):
+            np.testing.assert_array_equal(matrix.nearest_minutes(masks),
+                                          expected)
+
+    def test_huff(self):
+        """the demand split among the places with the Huff model"""
+        matrix = self.matrix
+        supply = np.array([4., 2.])
+        demand = np.array([10., 30.])
+
+        # only place 0 is within reach
+        expected = matrix.huff(supply, demand, cutoff=10)
+        np.testing.assert_allclose(expected, [40, 0])
+        # without decay, cell 0 is split by the capacities
+        expected = matrix.huff(supply, demand, cutoff=30, beta=0)
+        np.testing.assert_allclose(expected, [30 + 10 * 4 / 6, 10 * 2 / 6])
+        # with decay, the farther place gets less
+        expected = matrix.huff(supply, demand, cutoff=30, beta=0.1)
+        w0, w1 = 4 * np.exp(-0.5), 2 * np.exp(-2)
+        np.testing.assert_allclose(expected, [30 + 10 * w0 / (w0 + w1),
+                                              10 * w1 / (w0 + w1)])
+        self.assertAlmostEqual(expected.sum(), 40)
+        # places without capacity attract nothing
+        expected = matrix.huff(np.array([4., 0.]), demand, cutoff=30)
+        np.testing.assert_allclose(expected, [40, 0])
+
+    def test_cumulative(self):
+        """the values reachable within several cutoffs"""
+        values = self.matrix.cumulative(np.array([1., 3.]), [5, 10, 30])
+        np.testing.assert_array_equal(values, [[1, 1, 4],
+                                               [0, 1, 1]])
+        values = self.matrix.cumulative(np.array([1., 3.]), [4])
+        np.testing.assert_array_equal(values, [[0], [0]])
+
+    def test_two_nearest(self):
+        """the nearest and the second nearest place"""
+        rows, cols, minutes, second_cols, second_minutes = \
+            self.matrix.two_nearest([10, 20])
+        np.testing.assert_array_equal(rows, [0, 1])
+        np.testing.assert_array_equal(cols, [0, 0])
+        np.testing.assert_array_equal(minutes, [5, 8])
+        np.testing.assert_array_equal(second_cols, [1, -1])
+        np.testing.assert_array_equal(second_minutes, [20, np.nan])
+
+        rows, cols, minutes, second_cols, second_minutes = \
+            self.matrix.two_nearest([20])
+        np.testing.assert_array_equal(rows, [0])
+        np.testing.assert_array_equal(cols, [1])
+        np.testing.assert_array_equal(second_cols, [-1])
+
+    def test_subset(self):
+        """the rows of some cells only"""
+        matrix = self.matrix.subset(np.array([2, 3]))
+        np.testing.assert_array_equal(matrix.cell_ids, [2])
+        np.testing.assert_array_equal(matrix.cell_codes, ['b'])
+        np.testing.assert_array_equal(matrix.indptr, [0, 1])
+        np.testing.assert_array_equal(matrix.minutes, [8])
+        rows, cols, minutes = matrix.nearest([10, 20])
+        np.testing.assert_array_equal(minutes, [8])
+
+    def test_load_evicts(self):
+        """only the matrices used last stay loaded"""
+        for variant_id in (-1, -2):
+            self.matrix.save(MatrixCellPlace.get_cache_dir(variant_id, -1))
+        CellPlaceMatrix._loaded.clear()
+        with override_settings(MATRIX_CACHE_MAX_LOADED=1):
+            first = CellPlaceMatrix.load(-1, -1)
+            self.assertIs(CellPlaceMatrix.load(-1, -1), first)
+            CellPlaceMatrix.load(-2, -1)
+        self.assertListEqual(list(CellPlaceMatrix._loaded), [(-2, -1)])
+        np.testing.assert_array_equal(first.minutes, self.matrix.minutes)
+
+
+class TestPackedIndicatorRenderer(TestCase):
+    """packing the columns of the results"""
+
+    def test_big_ids(self):
+        """ids beyond the range of int32 are packed as int64"""
+        renderer = PackedIndicatorRenderer()
+        big_id = 2 ** 40
+        columns = renderer.pack_columns([{'place_id': 1, 'value': 1.},
+                                         {'place_id': big_id, 'value': 2.}])
+        self.assertEqual(columns['place_id']['dtype'], 'int64')
+        ids = np.frombuffer(base64.b64decode(columns['place_id']['data']),
+                            dtype='<i8')
+        np.testing.assert_array_equal(ids, [1, big_id])
+        columns = renderer.pack_columns([{'place_id': 1, 'value': 1.}])
+        self.assertEqual(columns['place_id']['dtype'], 'int32')
@@ -0,0 +1,64 @@
+import os
+import json
+import tempfile
+from io import StringIO
+from unittest import TestCase
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from test_plus import APITestCase
+
+from datentool_backend.indicators.benchmark import compare
+
+
+class TestBenchmarkCompare(TestCase):
+    """test the detection of regressions"""
+
+    def test_compare(self):
+        baseline = {'fast': {'time': 0.01, 'n_queries': 3},
+                    'slow': {'time': 1.0, 'n_queries': 3},
+                    'new': None, }
+        results = {'fast': {'time': 0.03, 'n_queries': 3},
+                   'slow': {'time': 1.1, 'n_queries': 3},
+                   'new': {'time': 5, 'n_queries': 100}, }
+        # the fast indicator is within the noise, the slow one
+        # within the threshold, the new one has no baseline
+        self.assertEqual(compare(results, baseline), [])
+
+        results['slow']['time'] = 1.3
+        results['fast']['n_queries'] = 4
+        results['failing'] = {'error': 'ValueError()'}
+        regressions = compare(results, baseline)
+        self.assertEqual(len(regressions), 3)
+        self.assertTrue(regressions[0].startswith('fast: 4 queries'))
+        self.assertTrue(regressions[1].startswith('slow: 1.300s'))
+        self.assertTrue(regressions[2].startswith('failing'))
+
+
+class TestBenchmarkCommand(APITestCase):
+    """run the benchmark on a small synthetic project"""
+
+    def test_benchmark(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'baseline.json')
+            call_command('benchmarkindicators', setup=True, cells=100,
+                         places=10, repeat=2, save=True, baseline=path,
+                         stdout=StringIO())
+            with open(path) as f:
+                results = json.load(f)['results']
+            self.assertIn('numberoflocations', results)
+            for name, result in results.items():
+                self.assertNotIn('error', result, name)
+
+            # a generous threshold should not fail
+            call_command('benchmarkindicators', repeat=2, baseline=path,
+                         threshold=10, min_delta=10, stdout=StringIO())
+
+            # every indicator "gets slower" compared to a zero-baseline
+            for result in results.values():
+                result['time'] = 0
+            with open(path, 'w') as f:
+                json.dump({'results': results}, f)
+            with self.assertRaises(CommandError):
+                call_command('benchmarkindicators', repeat=2, baseline=path,
+                             min_delta=0, threshold=0, stdout=StringIO())
@@ -1,7 +1,9 @@
 from typing import List
 from test_plus import APITestCase
+from django.contrib.gis.geos import Point
 
 from datentool_backend.api_test import LoginTestCase, BasicModelCompareMixin
+from datentool_backend.places.models import PlaceArea
 from .setup_testdata import CreateTestdataMixin
 
 
@@ -86,6 +88,36 @@ class TestAreaIndicatorAPI(CreateTestdataMixin,
         self.count_capacities([34, 44, 0], service=self.service1,
                                scenario=self.scenario, year=2022)
 
+    def test_place_area_assignment(self):
+        """Test that the places are assigned to the areas they are in"""
+        self.suffix = '-number-of-locations'
+        area_level = self.area1.area_level
+        self.count_capacities([2, 1, 0], service=self.service1)
+        area_level.refresh_from_db()
+        self.assertFalse(area_level.place_cache_dirty)
+        place_areas = PlaceArea.objects.filter(area_level=area_level)
+        self.assertQuerysetEqual(
+            place_areas.filter(area=self.area1).values_list('place_id',
+                                                            flat=True),
+            [self.place1.pk, self.place2.pk], ordered=False)
+        # place 5 is in no area
+        self.assertFalse(place_areas.filter(place=self.place5).exists())
+
+        # moving a place to another area updates the assignment
+        self.place2.geom = Point(x=1000150, y=6500153, srid=3857)
+        self.place2.save()
+        self.assertEqual(
+            place_areas.get(place=self.place2).area_id, self.area2.pk)
+        self.count_capacities([1, 2, 0], service=self.service1)
+
+        # changing an area triggers a new assignment of the area level
+        self.area2.save()
+        area_level.refresh_from_db()
+        self.assertTrue(area_level.place_cache_dirty)
+        self.count_capacities([1, 2, 0], service=self.service1)
+        area_level.refresh_from_db()
+        self.assertFalse(area_level.place_cache_dirty)
+
     def count_capacities(self,
                        expected_values: List[int],
                        service: int = None,
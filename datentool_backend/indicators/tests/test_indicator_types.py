@@ -17,6 +17,9 @@ from datentool_backend.indicators.factories import (
     MatrixStopStopFactory)
 
 from datentool_backend.infrastructure.factories import ServiceFactory, Service
+from datentool_backend.indicators.legend import get_percentiles
+from datentool_backend.indicators.serializers import (
+    IndicatorRasterResultSerializer)
 
 
 class TestIndicator(TestCase):
@@ -41,6 +44,29 @@ class TestIndicator(TestCase):
         MatrixStopStopFactory()
 
 
+class TestIndicatorSerialization(TestCase):
+
+    def test_columnar_serialization(self):
+        """the rows are rounded by the median and the legend is unchanged"""
+        rows = [{'cell_code': f'cell{i}', 'value': value}
+                for i, value in enumerate([12.345, None, 7.25, 150.55, 33.333])]
+        IndicatorRasterResultSerializer._digits_to_round = None
+        serializer = IndicatorRasterResultSerializer(rows, many=True)
+        data = serializer.data
+        # the median is between 10 and 100, so round to one digit
+        self.assertListEqual(
+            [dict(row) for row in data],
+            [{'cell_code': 'cell0', 'value': 12.3},
+             {'cell_code': 'cell1', 'value': None},
+             {'cell_code': 'cell2', 'value': 7.2},
+             {'cell_code': 'cell3', 'value': 150.6},
+             {'cell_code': 'cell4', 'value': 33.3}, ])
+        percentiles = [0, 10, 20, 40, 60, 80, 90, 100]
+        self.assertListEqual(
+            list(get_percentiles(serializer.values_array, percentiles)),
+            list(get_percentiles(data, percentiles)))
+
+
 class TestIndicatorDescription(LoginTestCase,
                                APITestCase,
                                ):
@@ -0,0 +1,108 @@
+from unittest import TestCase
+
+import numpy as np
+from django.urls import reverse
+from test_plus import APITestCase
+
+from datentool_backend.api_test import LoginTestCase
+from datentool_backend.modes.models import Mode
+from datentool_backend.infrastructure.models import Service
+from datentool_backend.places.models import Place
+from datentool_backend.population.models import RasterCell
+from datentool_backend.indicators.models import LocationSuggestion
+from datentool_backend.indicators.compute.location_suggestion import lazy_greedy
+from datentool_backend.utils.synthetic_project import SyntheticProject
+
+
+class TestLazyGreedy(TestCase):
+    """the greedy choice of the candidates"""
+
+    def test_lazy_greedy(self):
+        rows = np.array([0, 1, 2, 1, 2])
+        cols = np.array([0, 0, 1, 2, 2])
+        costs = np.array([0., 0., 0., 5., 5.])
+        current = np.full(3, 10.)
+        weights = np.ones(3)
+        chosen = lazy_greedy(rows, cols, costs, current, weights, n_sites=2)
+        self.assertListEqual(chosen, [(0, 20.), (1, 10.)])
+        np.testing.assert_array_equal(current, [0., 0., 0.])
+
+        # no candidate improves the costs any more
+        chosen = lazy_greedy(rows, cols, costs, current, weights, n_sites=2)
+        self.assertListEqual(chosen, [])
+
+    def test_same_as_exhaustive_search(self):
+        """the first choice is the best single candidate"""
+        rng = np.random.default_rng(0)
+        n_rows, n_cols = 50, 20
+        rows, cols = np.nonzero(rng.random((n_rows, n_cols)) < 0.3)
+        costs = rng.random(len(rows)) * 30
+        weights = rng.random(n_rows)
+        current = np.full(n_rows, 30.)
+        best = max(range(n_cols), key=lambda col: (
+            weights[rows[cols == col]] * (30 - costs[cols == col])).sum())
+
+        chosen = lazy_greedy(rows, cols, costs, current, weights, n_sites=5)
+        self.assertEqual(chosen[0][0], best)
+        # the gains decrease
+        gains = [gain for col, gain in chosen]
+        self.assertListEqual(gains, sorted(gains, reverse=True))
+
+
+class TestLocationSuggestion(LoginTestCase, APITestCase):
+    """suggest locations in a small synthetic project"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        SyntheticProject(n_cells=400, n_places=40, n_services=1,
+                         modes=[Mode.WALK]).create()
+        cls.service = Service.objects.order_by('id').first()
+        cls.service.infrastructure.accessible_by.add(cls.profile)
+
+    def test_suggest_locations(self):
+        self.client.force_login(self.profile.user)
+        candidates = list(Place.objects
+                          .filter(infrastructure=self.service.infrastructure,
+                                  scenario__isnull=False)
+                          .values_list('id', flat=True))
+        cells = list(RasterCell.objects.order_by('id')
+                     .values_list('cellcode', flat=True)[:50])
+        url = reverse('locationsuggestions-list')
+        for objective in LocationSuggestion.Objective.values:
+            data = {'service': self.service.id,
+                    'mode': Mode.WALK.value,
+                    'year': 2022,
+                    'n_sites': 3,
+                    'objective': objective,
+                    'places': candidates,
+                    'cells': cells, }
+            response = self.post(url, data=data, extra={'format': 'json'})
+            self.assert_http_201_created(response)
+            self.assertTrue(response.data['is_finished'])
+            sites = response.data['sites']
+            self.assertLessEqual(len(sites), 3)
+            self.assertGreater(len(sites), 0)
+            values = [response.data['initial_value']] + \
+                [site['value'] for site in sites]
+            # every new site improves the accessibility
+            if objective == LocationSuggestion.Objective.COVERAGE:
+                self.assertListEqual(values, sorted(values))
+            else:
+                self.assertListEqual(values, sorted(values, reverse=True))
+            self.assertEqual(len(values), len(set(values)))
+
+            response = self.get('locationsuggestions-detail',
+                                pk=response.data['id'])
+            self.assert_http_200_ok(response)
+
+        # no candidates
+        data['places'], data['cells'] = [], []
+        response = self.post(url, data=data, extra={'format': 'json'})
+        self.assert_http_400_bad_request(response)
+
+        # only for the services of the accessible infrastructures
+        self.service.infrastructure.accessible_by.remove(self.profile)
+        data['places'] = candidates
+        response = self.post(url, data=data, extra={'format': 'json'})
+        self.assert_http_403_forbidden(response)
@@ -1,5 +1,5 @@
 import os
-from unittest import skipIf
+from unittest import skipIf, mock
 import urllib
 from typing import List
 import logging
@@ -80,9 +80,14 @@ class TestMatrixCreation(CreateTestdataMixin,
                 'drop_constraints': False,
                 'air_distance_routing': True}
 
-        res= self.post('matrixcellplaces-precalculate-traveltime', data=data,
-                       extra={'format': 'json'})
+        with mock.patch.object(MatrixCellPlace, 'invalidate_caches') as invalidate:
+            res= self.post('matrixcellplaces-precalculate-traveltime', data=data,
+                           extra={'format': 'json'})
         self.assert_http_202_accepted(res)
+        # the cached matrices are invalidated once for the whole run
+        invalidate.assert_called_once()
+        self.assertCountEqual(invalidate.call_args.kwargs['variant_ids'],
+                              [walk.pk, car.pk, bike.pk])
         logger.debug(res.content)
         logger.debug(MatrixCellPlace.objects.filter(variant=walk.pk).count())
         logger.debug(MatrixCellPlace.objects.filter(variant=car.pk).count())
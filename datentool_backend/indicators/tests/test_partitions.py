@@ -0,0 +1,101 @@
+from typing import Set
+
+from django.db import connection
+from django.db.models import QuerySet
+from test_plus import APITestCase
+
+from datentool_backend.modes.models import Mode
+from datentool_backend.modes.factories import ModeVariantFactory
+from datentool_backend.infrastructure.factories import ServiceFactory
+from datentool_backend.places.factories import PlaceFactory
+from datentool_backend.population.factories import RasterCellFactory
+from datentool_backend.indicators.models import MatrixCellPlace
+from datentool_backend.indicators.compute.reachabilities import (
+    ReachabilityPlace, ReachabilityCell)
+from datentool_backend.places.serializers import PlaceSerializer
+
+
+def get_partition_name(variant_id: int, infrastructure_id: int) -> str:
+    return connection.schema_editor().create_partition_table_name(
+        MatrixCellPlace, f'mode_{variant_id}_infrastructure_{infrastructure_id}')
+
+
+def get_scanned_partitions(qs: QuerySet) -> Set[str]:
+    """the partitions of the MatrixCellPlace in the query plan"""
+    sql, params = qs.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    prefix = f'{MatrixCellPlace._meta.db_table}_'
+    relations = set()
+
+    def collect(node: dict):
+        relation = node.get('Relation Name')
+        if relation and relation.startswith(prefix):
+            relations.add(relation)
+        for child in node.get('Plans', []):
+            collect(child)
+
+    collect(plan[0]['Plan'])
+    return relations
+
+
+class TestMatrixPartitions(APITestCase):
+    """test that the queries on the matrix touch only the needed partitions"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.service1 = ServiceFactory()
+        cls.service2 = ServiceFactory()
+        cls.infra1 = cls.service1.infrastructure
+        cls.infra2 = cls.service2.infrastructure
+        cls.walk = ModeVariantFactory(mode=Mode.WALK, is_default=True)
+        cls.car = ModeVariantFactory(mode=Mode.CAR, is_default=True)
+        cls.cell = RasterCellFactory()
+        cls.place1 = PlaceFactory(infrastructure=cls.infra1)
+        cls.place2 = PlaceFactory(infrastructure=cls.infra2)
+        for variant in [cls.walk, cls.car]:
+            for place in [cls.place1, cls.place2]:
+                MatrixCellPlace.objects.create(cell=cls.cell, place=place,
+                                               variant=variant, minutes=5)
+
+    def test_query_builder(self):
+        walk1 = get_partition_name(self.walk.id, self.infra1.id)
+        walk2 = get_partition_name(self.walk.id, self.infra2.id)
+        car2 = get_partition_name(self.car.id, self.infra2.id)
+
+        qs = MatrixCellPlace.objects.in_partitions(self.walk, self.infra1)
+        self.assertEqual(get_scanned_partitions(qs), {walk1})
+        self.assertEqual(qs.count(), 1)
+
+        qs = MatrixCellPlace.objects.in_partitions(self.walk)
+        self.assertEqual(get_scanned_partitions(qs), {walk1, walk2})
+
+        qs = MatrixCellPlace.objects.for_services(
+            self.walk.id, [self.service1.id, self.service2.id])
+        self.assertEqual(get_scanned_partitions(qs), {walk1, walk2})
+
+        qs = MatrixCellPlace.objects.for_places(self.place2)
+        self.assertEqual(get_scanned_partitions(qs), {walk2, car2})
+        self.assertEqual(qs.count(), 2)
+
+        qs = MatrixCellPlace.objects.for_places([])
+        self.assertEqual(qs.count(), 0)
+
+    def test_indicators(self):
+        walk1 = get_partition_name(self.walk.id, self.infra1.id)
+        walk2 = get_partition_name(self.walk.id, self.infra2.id)
+        qs = ReachabilityPlace({'mode': Mode.WALK,
+                                'place': self.place1.id}).compute()
+        self.assertEqual(get_scanned_partitions(qs), {walk1})
+        qs = ReachabilityCell({'mode': Mode.WALK,
+                               'service': self.service2.id,
+                               'cell_code': self.cell.cellcode}).compute()
+        self.assertEqual(get_scanned_partitions(qs), {walk2})
+
+    def test_delete_place_entries(self):
+        PlaceSerializer().delete_existing_martixentries_for_place(self.place1)
+        self.assertFalse(MatrixCellPlace.objects.filter(
+            place=self.place1).exists())
+        self.assertEqual(MatrixCellPlace.objects.count(), 2)
@@ -10,15 +10,29 @@ from test_plus import APITestCase
 
 from datentool_backend.api_test import LoginTestCase
 
-from datentool_backend.area.factories import AreaLevelFactory
+from django.contrib.gis.geos import Polygon, MultiPolygon
+
+from datentool_backend.area.factories import AreaLevelFactory, AreaFactory
 
 from datentool_backend.indicators.tests.setup_testdata import CreateTestdataMixin
-from datentool_backend.demand.models import AgeGroup, Gender
-from datentool_backend.area.models import Area, AreaAttribute, AreaLevel
+from datentool_backend.demand.models import (AgeGroup,
+                                             Gender,
+                                             DemandRate,
+                                             CellDemandCache,
+                                             CellDemand)
+from datentool_backend.area.models import (Area, AreaAttribute, AreaLevel,
+                                           AreaOverlap)
 from datentool_backend.population.models import (Population,
                                                  RasterCellPopulation,
                                                  PopulationEntry,
-                                                 PopulationAreaLevel, )
+                                                 PopulationAreaLevel,
+                                                 AreaPopulationAgeGender, )
+from datentool_backend.utils.pop_aggregation import (
+    intersect_areas_with_raster,
+    intersect_area_levels,
+    get_nested_area_level,
+    aggregate_population,
+    aggregate_population_from_cells)
 
 
 class TestAreaIndicatorAPI(CreateTestdataMixin,
@@ -327,6 +341,77 @@ class TestAreaIndicatorAPI(CreateTestdataMixin,
         pd.testing.assert_series_equal(df.value, expected, check_names=False,
                                        rtol=0.01)
 
+    def test_rollup_population(self):
+        """Test rolling up the population from a nested area level"""
+        population: Population = self.population
+        # one area covering both districts
+        combined_level = AreaLevelFactory(name='Combined')
+        coords = np.array([(-500, 0),
+                           (-500, 100),
+                           (200, 100),
+                           (200, 0),
+                           (-500, 0)])\
+            + np.array([1000000, 6500000])
+        combined = AreaFactory(area_level=combined_level,
+                               geom=MultiPolygon(Polygon(coords), srid=3857))
+        intersect_areas_with_raster(
+            Area.objects.filter(area_level=combined_level))
+        intersect_area_levels(Area.objects.filter(
+            area_level__in=[combined_level, self.area_level2, self.obj]))
+
+        # the districts lie completely in the combined area
+        district1, district2 = [
+            Area.objects.get(area_level=self.area_level2,
+                             areaattribute__str_value=name)
+            for name in ['district1', 'district2']]
+        shares = dict(AreaOverlap.objects
+                      .filter(overlapping_area=combined)
+                      .values_list('area_id', 'share'))
+        self.assertAlmostEqual(shares[district1.pk], 1)
+        self.assertAlmostEqual(shares[district2.pk], 1)
+        share = AreaOverlap.objects.get(area=combined,
+                                        overlapping_area=district1).share
+        self.assertAlmostEqual(share, 4 / 7, places=3)
+
+        # without the population of the districts there is nothing to roll up
+        PopulationAreaLevel.objects.filter(population=population)\
+            .update(up_to_date=False)
+        self.assertIsNone(get_nested_area_level(combined_level, population))
+        aggregate_population(self.area_level2, population)
+        self.assertEqual(get_nested_area_level(combined_level, population),
+                         self.area_level2)
+        # area1 is split up by the districts
+        self.assertIsNone(get_nested_area_level(self.obj, population))
+
+        # the rolled up population is the one aggregated from the cells
+        aggregate_population(combined_level, population)
+        rolled_up = pd.DataFrame.from_records(
+            AreaPopulationAgeGender.objects
+            .filter(population=population, area=combined)
+            .values('age_group_id', 'gender_id', 'value'))\
+            .set_index(['age_group_id', 'gender_id'])['value'].sort_index()
+        columns = ['population_id', 'area_id', 'age_group_id', 'gender_id',
+                   'value']
+        from_cells = pd.DataFrame(
+            aggregate_population_from_cells(combined_level, population),
+            columns=columns)\
+            .set_index(['age_group_id', 'gender_id'])['value'].sort_index()
+        pd.testing.assert_series_equal(rolled_up, from_cells,
+                                       check_dtype=False)
+
+        # changed areas remove the overlaps of their area level
+        coords[2:4, 0] -= 1
+        combined.geom = MultiPolygon(Polygon(coords), srid=3857)
+        combined.save()
+        self.assertFalse(AreaOverlap.objects
+                         .filter(area__area_level=combined_level).exists())
+        self.assertFalse(AreaOverlap.objects
+                         .filter(overlapping_area__area_level=combined_level)
+                         .exists())
+        # a district sticking out by a fraction of a percent is not nested
+        intersect_area_levels(Area.objects.filter(area_level=combined_level))
+        self.assertIsNone(get_nested_area_level(combined_level, population))
+
     def test_get_population_by_year_agegroup_gender(self):
         """Test to get the population by year, agegroup, and gender"""
 
@@ -457,6 +542,53 @@ class TestAreaIndicatorAPI(CreateTestdataMixin,
                                    values_service2_quadrants.value.sum(),
                                    decimal=1)
 
+    def test_materialized_cell_demand(self):
+        """test that the demand per cell is materialized and refreshed"""
+        query_params = {'area_level': self.area_level2.pk,
+                        'service': self.service1.pk,
+                        'year': 2022,
+                        }
+        response = self.post(self.url_key + '-demand', data=query_params,
+                             extra={'format': 'json'})
+        self.assert_http_200_ok(response)
+        values = pd.DataFrame(response.data['values']).set_index('id')
+
+        cache = CellDemandCache.objects.get(service=self.service1,
+                                            demand_rate_set=self.drs_s1)
+        population = cache.population
+        self.assertEqual(population.year.year, 2022)
+        self.assertTrue(cache.up_to_date)
+        self.assertTrue(CellDemand.objects.filter(cache=cache).exists())
+        demands_hash = cache.demand_rates_hash
+
+        # the materialized demand is reused
+        response = self.post(self.url_key + '-demand', data=query_params,
+                             extra={'format': 'json'})
+        cached_values = pd.DataFrame(response.data['values']).set_index('id')
+        nptest.assert_allclose(cached_values.value, values.value)
+
+        # changing the demand rates triggers a refresh
+        demand_rates = DemandRate.objects.filter(demand_rate_set=self.drs_s1,
+                                                 year__year=2022)
+        for demand_rate in demand_rates:
+            demand_rate.value *= 2
+            demand_rate.save()
+        response = self.post(self.url_key + '-demand', data=query_params,
+                             extra={'format': 'json'})
+        doubled_values = pd.DataFrame(response.data['values']).set_index('id')
+        nptest.assert_allclose(doubled_values.value, values.value * 2)
+        cache.refresh_from_db()
+        self.assertNotEqual(cache.demand_rates_hash, demands_hash)
+
+        # an outdated population triggers a refresh, too
+        CellDemandCache.invalidate(population_ids=[population.pk])
+        cache.refresh_from_db()
+        self.assertFalse(cache.up_to_date)
+        response = self.post(self.url_key + '-demand', data=query_params,
+                             extra={'format': 'json'})
+        cache.refresh_from_db()
+        self.assertTrue(cache.up_to_date)
+
     def test_max_population_in_arealevel(self):
         """test the maximum population per area level"""
         area_level: AreaLevel = self.obj
@@ -0,0 +1,86 @@
+from django.urls import reverse
+from test_plus import APITestCase
+
+from datentool_backend.api_test import LoginTestCase
+from datentool_backend.modes.models import Mode
+from datentool_backend.infrastructure.models import Service
+from datentool_backend.places.models import Capacity
+from datentool_backend.indicators.models import IndicatorResult
+from datentool_backend.indicators.compute import ServiceIndicator
+from datentool_backend.indicators.prewarm import (prewarm_indicators,
+                                                  get_default_params)
+from datentool_backend.utils.synthetic_project import SyntheticProject
+
+
+class TestPrewarmIndicators(LoginTestCase, APITestCase):
+    """precompute the default indicators of a small synthetic project"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        SyntheticProject(n_cells=100, n_places=10, n_services=1,
+                         modes=[Mode.WALK]).create()
+        cls.service = Service.objects.order_by('id').first()
+        cls.service.infrastructure.accessible_by.add(cls.profile)
+
+    def test_prewarm(self):
+        n_computed = prewarm_indicators(service_ids=[self.service.id],
+                                        idle_wait=0)
+        self.assertGreater(n_computed, 0)
+        # the results are cached now
+        self.assertEqual(prewarm_indicators(service_ids=[self.service.id],
+                                            idle_wait=0), 0)
+
+        defaults = get_default_params()
+        data = {'indicator': 'maxplacereachability',
+                'year': str(defaults['year']),
+                'mode': str(Mode.WALK.value)}
+        indicator = ServiceIndicator.registered['maxplacereachability'](
+            self.service, dict(data, service=str(self.service.id)))
+        cached = IndicatorResult.get_cached('maxplacereachability',
+                                            indicator.get_cache_params())
+        self.assertEqual(cached['values'], indicator.result()['values'])
+
+        # the view serves the cached result
+        IndicatorResult.cache('maxplacereachability',
+                              indicator.get_cache_params(), 'place',
+                              {'legend': [], 'values': ['cached']})
+        self.client.force_login(self.profile.user)
+        url = reverse('services-compute-indicator',
+                      kwargs={'pk': self.service.id})
+        response = self.post(url, data=data, extra={'format': 'json'})
+        self.assert_http_200_ok(response)
+        self.assertEqual(response.data['values'], ['cached'])
+
+        # other parameters are computed
+        response = self.post(url,
+                             data=dict(data, year=str(defaults['year'] + 1)),
+                             extra={'format': 'json'})
+        self.assert_http_200_ok(response)
+        self.assertNotEqual(response.data['values'], ['cached'])
+
+        IndicatorResult.invalidate()
+        self.assertIsNone(IndicatorResult.get_cached(
+            'maxplacereachability', indicator.get_cache_params()))
+
+    def test_invalidate_on_change(self):
+        """changed capacities remove the results of their service only"""
+        defaults = get_default_params()
+        data = {'service': str(self.service.id),
+                'year': str(defaults['year']),
+                'mode': str(Mode.WALK.value)}
+        indicator = ServiceIndicator.registered['maxplacereachability'](
+            self.service, data)
+        cache_params = indicator.get_cache_params()
+        other_params = dict(cache_params, service=self.service.id + 1)
+        for params in (cache_params, other_params):
+            IndicatorResult.cache('maxplacereachability', params, 'place',
+                                  {'legend': [], 'values': ['cached']})
+
+        capacity = Capacity.objects.filter(service=self.service).first()
+        capacity.capacity += 1
+        capacity.save()
+        self.assertIsNone(IndicatorResult.get_cached(
+            'maxplacereachability', cache_params))
+        self.assertIsNotNone(IndicatorResult.get_cached(
+            'maxplacereachability', other_params))
@@ -0,0 +1,51 @@
+from io import StringIO
+from unittest import TestCase
+
+import numpy as np
+from django.core.management import call_command
+from test_plus import APITestCase
+
+from datentool_backend.modes.models import Mode, MODE_SPEED
+from datentool_backend.indicators.models import MatrixCellStop
+from datentool_backend.utils.routers import OSRMRouter
+from datentool_backend.utils.osrm_standin import osrm_standins, haversine
+
+
+class TestOSRMStandin(TestCase):
+    """the stand-in answers the requests of the router"""
+
+    def test_matrix(self):
+        sources = [(9.9, 53.5), (10.0, 53.55)]
+        destinations = [(9.95, 53.52), (10.1, 53.6), (9.9, 53.5)]
+        with osrm_standins(modes=[Mode.WALK], detour=1.5) as standins:
+            router = OSRMRouter(Mode.WALK)
+            self.assertTrue(router.is_running)
+            self.assertTrue(router.run())
+            matrix = router.matrix_calculation(sources, destinations)
+            self.assertEqual(standins[Mode.WALK].n_pairs, 6)
+
+        distances = np.array(matrix.distances)
+        durations = np.array(matrix.durations)
+        self.assertEqual(distances.shape, (2, 3))
+        src, dst = np.array(sources), np.array(destinations)
+        expected = haversine(src[:, :1], src[:, 1:],
+                             dst[:, 0], dst[:, 1]) * 1.5
+        np.testing.assert_allclose(distances, expected, atol=0.1)
+        self.assertEqual(distances[0, 2], 0)
+        np.testing.assert_allclose(
+            durations, expected / (MODE_SPEED[Mode.WALK] / 3.6), atol=0.1)
+
+
+class TestRoutingBenchmark(APITestCase):
+    """run the routers on a small synthetic project"""
+
+    def test_benchmark(self):
+        out = StringIO()
+        call_command('benchmarkrouting', setup=True, cells=100, places=4,
+                     stops=5, stdout=out)
+        lines = out.getvalue().splitlines()
+        for router in ['cellplace', 'cellstop', 'transit']:
+            line = [line for line in lines if line.startswith(f'{router}:')]
+            self.assertEqual(len(line), 1, router)
+            self.assertIn('pairs/s', line[0])
+        self.assertTrue(MatrixCellStop.objects.exists())
@@ -1,3 +1,6 @@
 from .fixed_indicators import *
 from .routing import *
-from .stops import *
\ No newline at end of file
+from .stops import *
+from .tiles import *
+from .location_suggestion import *
+from .indicator_job import *
@@ -1,4 +1,5 @@
 from django.db import models
+from django.core.exceptions import BadRequest
 from rest_framework import viewsets, serializers
 from rest_framework.response import Response
 from rest_framework.decorators import action
@@ -13,15 +14,28 @@ from datentool_backend.indicators.compute import (
     ReachabilityPlace,
     ReachabilityCell,
     ReachabilityNextPlace,
+    CumulativeOpportunitiesCell,
+    CumulativeOpportunitiesArea,
+    ReachabilityDistribution,
+    ClosureImpact,
+    HuffModel,
 )
 
 from datentool_backend.places.models import Scenario
+from datentool_backend.infrastructure.models import Service
 from datentool_backend.indicators.serializers import (IndicatorSerializer)
+from datentool_backend.indicators.renderers import INDICATOR_RENDERER_CLASSES
+from datentool_backend.logging.profiling import request_profiling_kwargs
+from datentool_backend.utils.query_cancel import get_disconnect_event
 
 from .parameters import (arealevel_year_service_scenario_serializer,
                          area_agegroup_gender_prognosis_year_fields,
                          arealevel_area_agegroup_gender_prognosis_year_fields,
-                         mode_year_service_scenario_serializer)
+                         mode_year_service_scenario_serializer,
+                         cumulative_opportunities_fields,
+                         reachability_distribution_fields,
+                         closure_impact_fields,
+                         huff_model_fields)
 
 
 class FixedIndicatorViewSet(viewsets.GenericViewSet):
@@ -42,13 +56,15 @@ class FixedIndicatorViewSet(viewsets.GenericViewSet):
         responses=ComputePopulationAreaIndicator.result_serializer.value(many=True),
         methods=['POST']
     )
-    @action(methods=['GET', 'POST'], detail=False)
+    @action(methods=['GET', 'POST'], detail=False,
+            renderer_classes=INDICATOR_RENDERER_CLASSES)
     def aggregate_population(self, request, **kwargs):
         indicator = ComputePopulationAreaIndicator(self.request.data)
         if request.method == 'GET':
             return Response(IndicatorSerializer(indicator).data)
-        qs = indicator.compute()
-        return Response(indicator.serialize(qs))
+        return Response(
+            indicator.result(disconnected=get_disconnect_event(request),
+                             **request_profiling_kwargs(request)))
 
     @extend_schema(
         description='Indicator description',
@@ -60,14 +76,16 @@ class FixedIndicatorViewSet(viewsets.GenericViewSet):
         responses=NumberOfLocations.result_serializer.value(many=True),
         methods=['POST']
     )
-    @action(methods=['GET', 'POST'], detail=False)
+    @action(methods=['GET', 'POST'], detail=False,
+            renderer_classes=INDICATOR_RENDERER_CLASSES)
     def number_of_locations(self, request, **kwargs):
         """get the number of locations with a certain service for selected areas"""
         indicator = NumberOfLocations(self.request.data)
         if request.method == 'GET':
             return Response(IndicatorSerializer(indicator).data)
-        qs = indicator.compute()
-        return Response(indicator.serialize(qs))
+        return Response(
+            indicator.result(disconnected=get_disconnect_event(request),
+                             **request_profiling_kwargs(request)))
 
     @extend_schema(
         description='Indicator description',
@@ -79,14 +97,16 @@ class FixedIndicatorViewSet(viewsets.GenericViewSet):
         responses=TotalCapacityInArea.result_serializer.value(many=True),
         methods=['POST']
     )
-    @action(methods=['GET', 'POST'], detail=False)
+    @action(methods=['GET', 'POST'], detail=False,
+            renderer_classes=INDICATOR_RENDERER_CLASSES)
     def capacity(self, request, **kwargs):
         """get the total capacity of a certain service for selected areas"""
         indicator = TotalCapacityInArea(self.request.data)
         if request.method == 'GET':
             return Response(IndicatorSerializer(indicator).data)
-        qs = indicator.compute()
-        return Response(indicator.serialize(qs))
+        return Response(
+            indicator.result(disconnected=get_disconnect_event(request),
+                             **request_profiling_kwargs(request)))
 
     @extend_schema(
         description='Indicator description',
@@ -98,14 +118,16 @@ class FixedIndicatorViewSet(viewsets.GenericViewSet):
         responses=DemandAreaIndicator.result_serializer.value(many=True),
         methods=['POST']
     )
-    @action(methods=['GET', 'POST'], detail=False)
+    @action(methods=['GET', 'POST'], detail=False,
+            renderer_classes=INDICATOR_RENDERER_CLASSES)
     def demand(self, request, **kwargs):
         """get the total demand for selected services in selected areas"""
         indicator = DemandAreaIndicator(self.request.data)
         if request.method == 'GET':
             return Response(IndicatorSerializer(indicator).data)
-        qs = indicator.compute()
-        return Response(indicator.serialize(qs))
+        return Response(
+            indicator.result(disconnected=get_disconnect_event(request),
+                             **request_profiling_kwargs(request)))
 
     @extend_schema(
         description='Indicator description',
@@ -120,14 +142,16 @@ class FixedIndicatorViewSet(viewsets.GenericViewSet):
         responses=ComputePopulationDetailIndicator.result_serializer.value(many=True),
         methods=['POST']
     )
-    @action(methods=['GET', 'POST'], detail=False)
+    @action(methods=['GET', 'POST'], detail=False,
+            renderer_classes=INDICATOR_RENDERER_CLASSES)
     def population_details(self, request, **kwargs):
         """get the population details by year, gender and agegroup for the selected areas"""
         indicator = ComputePopulationDetailIndicator(self.request.data)
         if request.method == 'GET':
             return Response(IndicatorSerializer(indicator).data)
-        qs = indicator.compute()
-        return Response(indicator.serialize(qs))
+        return Response(
+            indicator.result(disconnected=get_disconnect_event(request),
+                             **request_profiling_kwargs(request)))
 
     @extend_schema(
         description='Indicator description',
@@ -148,14 +172,16 @@ class FixedIndicatorViewSet(viewsets.GenericViewSet):
         responses=ReachabilityPlace.result_serializer.value(many=True),
         methods=['POST']
     )
-    @action(methods=['GET', 'POST'], detail=False)
+    @action(methods=['GET', 'POST'], detail=False,
+            renderer_classes=INDICATOR_RENDERER_CLASSES)
     def reachability_place(self, request, **kwargs):
         """get cells with reachabilities to given place"""
         indicator = ReachabilityPlace(self.request.data)
         if request.method == 'GET':
             return Response(IndicatorSerializer(indicator).data)
-        qs = indicator.compute()
-        return Response(indicator.serialize(qs))
+        return Response(
+            indicator.result(disconnected=get_disconnect_event(request),
+                             **request_profiling_kwargs(request)))
 
     @extend_schema(
         description='Indicator description',
@@ -176,14 +202,16 @@ class FixedIndicatorViewSet(viewsets.GenericViewSet):
         responses=ReachabilityCell.result_serializer.value(many=True),
         methods=['POST']
     )
-    @action(methods=['GET', 'POST'], detail=False)
+    @action(methods=['GET', 'POST'], detail=False,
+            renderer_classes=INDICATOR_RENDERER_CLASSES)
     def reachability_cell(self, request, **kwargs):
         """get places with reachabilities to cell closest to given coordinate"""
         indicator = ReachabilityCell(self.request.data)
         if request.method == 'GET':
             return Response(IndicatorSerializer(indicator).data)
-        qs = indicator.compute()
-        return Response(indicator.serialize(qs))
+        return Response(
+            indicator.result(disconnected=get_disconnect_event(request),
+                             **request_profiling_kwargs(request)))
 
 
     @extend_schema(
@@ -196,11 +224,164 @@ class FixedIndicatorViewSet(viewsets.GenericViewSet):
         responses=ReachabilityNextPlace.result_serializer.value(many=True),
         methods=['POST']
     )
-    @action(methods=['GET', 'POST'], detail=False)
+    @action(methods=['GET', 'POST'], detail=False,
+            renderer_classes=INDICATOR_RENDERER_CLASSES)
     def reachability_next_place(self, request, **kwargs):
         """get cells with reachabilities to the next place of given service"""
         indicator = ReachabilityNextPlace(self.request.data)
         if request.method == 'GET':
             return Response(IndicatorSerializer(indicator).data)
-        qs = indicator.compute()
-        return Response(indicator.serialize(qs))
+        return Response(
+            indicator.result(disconnected=get_disconnect_event(request),
+                             **request_profiling_kwargs(request)))
+
+    @extend_schema(
+        description='Indicator description',
+        responses=IndicatorSerializer(many=False),
+        methods=['GET']
+    )
+    @extend_schema(
+        request=inline_serializer(
+            name='CumulativeOpportunitiesSerializer',
+            fields=cumulative_opportunities_fields,
+        ),
+        responses=CumulativeOpportunitiesCell.result_serializer.value(many=True),
+        methods=['POST']
+    )
+    @action(methods=['GET', 'POST'], detail=False,
+            renderer_classes=INDICATOR_RENDERER_CLASSES)
+    def cumulative_opportunities(self, request, **kwargs):
+        """
+        get the number of places or their capacity reachable from the cells
+        within each of the given travel times
+        """
+        indicator = CumulativeOpportunitiesCell(self.request.data)
+        if request.method == 'GET':
+            return Response(IndicatorSerializer(indicator).data)
+        return Response(
+            indicator.result(disconnected=get_disconnect_event(request),
+                             **request_profiling_kwargs(request)))
+
+    @extend_schema(
+        description='Indicator description',
+        responses=IndicatorSerializer(many=False),
+        methods=['GET']
+    )
+    @extend_schema(
+        request=inline_serializer(
+            name='CumulativeOpportunitiesAreaSerializer',
+            fields=dict(cumulative_opportunities_fields,
+                        area_level=serializers.IntegerField(
+                            help_text='area_level_id')),
+        ),
+        responses=CumulativeOpportunitiesArea.result_serializer.value(many=True),
+        methods=['POST']
+    )
+    @action(methods=['GET', 'POST'], detail=False,
+            renderer_classes=INDICATOR_RENDERER_CLASSES)
+    def cumulative_opportunities_area(self, request, **kwargs):
+        """
+        get the number of places or their capacity reachable within each of
+        the given travel times, averaged over the demand in the areas
+        """
+        indicator = CumulativeOpportunitiesArea(self.request.data)
+        if request.method == 'GET':
+            return Response(IndicatorSerializer(indicator).data)
+        return Response(
+            indicator.result(disconnected=get_disconnect_event(request),
+                             **request_profiling_kwargs(request)))
+
+    @extend_schema(
+        description='Indicator description',
+        responses=IndicatorSerializer(many=False),
+        methods=['GET']
+    )
+    @extend_schema(
+        request=inline_serializer(
+            name='ReachabilityDistributionSerializer',
+            fields=reachability_distribution_fields,
+        ),
+        responses=ReachabilityDistribution.result_serializer.value(many=True),
+        methods=['POST']
+    )
+    @action(methods=['GET', 'POST'], detail=False,
+            renderer_classes=INDICATOR_RENDERER_CLASSES)
+    def reachability_distribution_area(self, request, **kwargs):
+        """
+        get the cumulative share of the demand in the areas reaching the
+        nearest place within 1, 2, 3 ... minutes
+        """
+        service = Service.objects.filter(
+            id=self.request.data.get('service')).first()
+        indicator = ReachabilityDistribution(service, self.request.data)
+        if request.method == 'GET':
+            return Response(IndicatorSerializer(indicator).data)
+        if not service:
+            raise BadRequest('No Service provided')
+        return Response(
+            indicator.result(disconnected=get_disconnect_event(request),
+                             **request_profiling_kwargs(request)))
+
+    @extend_schema(
+        description='Indicator description',
+        responses=IndicatorSerializer(many=False),
+        methods=['GET']
+    )
+    @extend_schema(
+        request=inline_serializer(
+            name='ClosureImpactSerializer',
+            fields=closure_impact_fields,
+        ),
+        responses=ClosureImpact.result_serializer.value(many=True),
+        methods=['POST']
+    )
+    @action(methods=['GET', 'POST'], detail=False,
+            renderer_classes=INDICATOR_RENDERER_CLASSES)
+    def closure_impact(self, request, **kwargs):
+        """
+        get the increase of the mean travel time to the nearest place if a
+        place alone was closed for all places of the service, ranked by the
+        increase
+        """
+        service = Service.objects.filter(
+            id=self.request.data.get('service')).first()
+        indicator = ClosureImpact(service, self.request.data)
+        if request.method == 'GET':
+            return Response(IndicatorSerializer(indicator).data)
+        if not service:
+            raise BadRequest('No Service provided')
+        return Response(
+            indicator.result(disconnected=get_disconnect_event(request),
+                             **request_profiling_kwargs(request)))
+
+    @extend_schema(
+        description='Indicator description',
+        responses=IndicatorSerializer(many=False),
+        methods=['GET']
+    )
+    @extend_schema(
+        request=inline_serializer(
+            name='HuffModelSerializer',
+            fields=huff_model_fields,
+        ),
+        responses=HuffModel.result_serializer.value(many=True),
+        methods=['POST']
+    )
+    @action(methods=['GET', 'POST'], detail=False,
+            renderer_classes=INDICATOR_RENDERER_CLASSES)
+    def huff_model(self, request, **kwargs):
+        """
+        get the expected demand and utilization of all places of the service,
+        splitting the demand of each cell among the reachable places by
+        their capacity and the travel time (Huff model)
+        """
+        service = Service.objects.filter(
+            id=self.request.data.get('service')).first()
+        indicator = HuffModel(service, self.request.data)
+        if request.method == 'GET':
+            return Response(IndicatorSerializer(indicator).data)
+        if not service:
+            raise BadRequest('No Service provided')
+        return Response(
+            indicator.result(disconnected=get_disconnect_event(request),
+                             **request_profiling_kwargs(request)))
@@ -0,0 +1,43 @@
+from rest_framework import viewsets, mixins, serializers
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from drf_spectacular.utils import extend_schema, inline_serializer
+
+from datentool_backend.indicators.models import IndicatorJob
+from datentool_backend.indicators.serializers import IndicatorJobSerializer
+
+
+class IndicatorJobViewSet(mixins.RetrieveModelMixin,
+                          mixins.DestroyModelMixin,
+                          mixins.ListModelMixin,
+                          viewsets.GenericViewSet):
+    """
+    indicators computed in the background (compute_indicator with "async"),
+    the progress is logged in the room "analysis"
+    """
+    serializer_class = IndicatorJobSerializer
+
+    def get_queryset(self):
+        return IndicatorJob.objects\
+            .filter(user=self.request.user.profile)\
+            .order_by('-created')
+
+    @extend_schema(
+        description='the stored result of the job, structure depends on the '
+        '"result_type" of the indicator',
+        responses=inline_serializer(
+            name='IndicatorJobResultSerializer',
+            fields={'legend': serializers.ListField(),
+                    'values': serializers.ListField(), }),
+    )
+    @action(methods=['GET'], detail=True)
+    def result(self, request, **kwargs):
+        job: IndicatorJob = self.get_object()
+        if not job.is_finished:
+            raise NotFound('Die Berechnung des Indikators läuft noch')
+        result = job.result
+        if result is None:
+            raise NotFound('Das Ergebnis liegt nicht (mehr) vor, bitte '
+                           'berechnen Sie den Indikator erneut')
+        return Response(result)
@@ -0,0 +1,68 @@
+from rest_framework import viewsets, mixins, status
+from rest_framework.response import Response
+from drf_spectacular.utils import extend_schema, OpenApiResponse
+
+from datentool_backend.utils.processes import RunProcessMixin, ProcessScope
+from datentool_backend.utils.permissions import HasAdminAccess
+from datentool_backend.places.permissions import HasPermissionForScenario
+from datentool_backend.utils.serializers import MessageSerializer
+from datentool_backend.indicators.models import LocationSuggestion
+from datentool_backend.indicators.serializers import LocationSuggestionSerializer
+from datentool_backend.indicators.compute.location_suggestion import (
+    suggest_locations)
+
+
+class LocationSuggestionViewSet(RunProcessMixin,
+                                mixins.CreateModelMixin,
+                                mixins.RetrieveModelMixin,
+                                mixins.DestroyModelMixin,
+                                mixins.ListModelMixin,
+                                viewsets.GenericViewSet):
+    """
+    suggestions of new sites for a service, computed in the background,
+    the progress is logged in the room "analysis"
+    """
+    serializer_class = LocationSuggestionSerializer
+
+    def get_queryset(self):
+        return LocationSuggestion.objects\
+            .filter(user=self.request.user.profile)\
+            .order_by('-created')
+
+    def get_permissions(self):
+        if self.action == 'create':
+            # the service and the scenario come with the data
+            permission_classes = [HasAdminAccess | HasPermissionForScenario]
+            return [permission() for permission in permission_classes]
+        return super().get_permissions()
+
+    @extend_schema(
+        description='choose the given number of sites out of the candidate '
+        'places or raster cells (lazy greedy p-median or maximal coverage)',
+        responses={201: OpenApiResponse(LocationSuggestionSerializer,
+                                        'Calculation successful'),
+                   202: OpenApiResponse(LocationSuggestionSerializer,
+                                        'Calculation started'),
+                   406: OpenApiResponse(MessageSerializer,
+                                        'Calculation failed')})
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        suggestion = serializer.save(user=request.user.profile)
+        response = self.run_sync_or_async(
+            func=suggest_locations,
+            user=request.user,
+            scope=ProcessScope.ANALYSIS,
+            message_async='Standortsuche gestartet',
+            message_sync='Standortsuche beendet',
+            ret_status=status.HTTP_201_CREATED,
+            suggestion_id=suggestion.id)
+        if response.status_code == status.HTTP_201_CREATED:
+            # computed synchronously, return the finished suggestion
+            suggestion.refresh_from_db()
+            return Response(self.get_serializer(suggestion).data,
+                            status=status.HTTP_201_CREATED)
+        if response.status_code == status.HTTP_202_ACCEPTED:
+            suggestion.refresh_from_db()
+            response.data.update(self.get_serializer(suggestion).data)
+        return response
@@ -71,3 +71,78 @@ mode_year_service_scenario_serializer = inline_serializer(
         'mode': serializers.IntegerField(),
     },
 )
+
+
+cumulative_opportunities_fields = {
+    'service': serializers.PrimaryKeyRelatedField(
+        queryset=Service.objects.all(),
+        required=True, help_text='service_id'),
+    'mode': serializers.IntegerField(),
+    'year': serializers.IntegerField(required=False,
+                                     help_text='Jahr (z.B. 2010)'),
+    'scenario': serializers.PrimaryKeyRelatedField(
+        queryset=Scenario.objects.all(),
+        required=False, help_text='scenario_id'),
+    'cutoffs': serializers.ListField(
+        child=serializers.FloatField(), required=True,
+        help_text='maximum travel times in minutes'),
+    'measure': serializers.ChoiceField(
+        choices=['places', 'capacity'], required=False,
+        help_text='count the places (default) or sum up their capacities'),
+}
+
+
+reachability_distribution_fields = {
+    'service': serializers.PrimaryKeyRelatedField(
+        queryset=Service.objects.all(),
+        required=True, help_text='service_id'),
+    'mode': serializers.IntegerField(),
+    'year': serializers.IntegerField(required=False,
+                                     help_text='Jahr (z.B. 2010)'),
+    'scenario': serializers.PrimaryKeyRelatedField(
+        queryset=Scenario.objects.all(),
+        required=False, help_text='scenario_id'),
+    'area_level': serializers.PrimaryKeyRelatedField(
+        queryset=AreaLevel.objects.all(),
+        required=True, help_text='area_level_id'),
+    'max_minutes': serializers.IntegerField(
+        required=False,
+        help_text='upper limit of the distribution in minutes, defaults to '
+        'the cut-off time of the mode'),
+}
+
+
+closure_impact_fields = {
+    'service': serializers.PrimaryKeyRelatedField(
+        queryset=Service.objects.all(),
+        required=True, help_text='service_id'),
+    'mode': serializers.IntegerField(),
+    'year': serializers.IntegerField(required=False,
+                                     help_text='Jahr (z.B. 2010)'),
+    'scenario': serializers.PrimaryKeyRelatedField(
+        queryset=Scenario.objects.all(),
+        required=False, help_text='scenario_id'),
+}
+
+
+huff_model_fields = {
+    'service': serializers.PrimaryKeyRelatedField(
+        queryset=Service.objects.all(),
+        required=True, help_text='service_id'),
+    'mode': serializers.IntegerField(),
+    'year': serializers.IntegerField(required=False,
+                                     help_text='Jahr (z.B. 2010)'),
+    'scenario': serializers.PrimaryKeyRelatedField(
+        queryset=Scenario.objects.all(),
+        required=False, help_text='scenario_id'),
+    'cutoff': serializers.FloatField(
+        required=False,
+        help_text='maximale Wegezeit in Minuten, Standard ist die '
+        'Wegezeit des Verkehrsmittels'),
+    'alpha': serializers.FloatField(
+        required=False,
+        help_text='Exponent der Attraktivität (Kapazität), Standard 1'),
+    'beta': serializers.FloatField(
+        required=False,
+        help_text='Abnahme der Gewichtung je Minute Wegezeit, Standard 0.1'),
+}
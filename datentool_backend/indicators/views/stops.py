@@ -96,14 +96,18 @@ class StopViewSet(ExcelTemplateMixin, ProtectCascadeMixin, viewsets.ModelViewSet
         in the database first to improve performance
         """
         stop_id = instance.pk
-        qs = MatrixCellStop.objects.filter(stop=stop_id)
+        variant_id = instance.variant_id
+        qs = MatrixCellStop.objects.filter(transit_variant_id=variant_id,
+                                           stop=stop_id)
         qs.delete()
 
-        qs = MatrixPlaceStop.objects.filter(stop=stop_id)
+        qs = MatrixPlaceStop.objects.in_partitions(variant_id)\
+            .filter(stop=stop_id)
         qs.delete()
 
         qs = MatrixStopStop.objects.filter(Q(from_stop=stop_id) |
-                                           Q(to_stop=stop_id))
+                                           Q(to_stop=stop_id),
+                                           variant_id=variant_id)
         qs.delete()
 
         instance.delete()
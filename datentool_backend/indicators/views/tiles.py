@@ -0,0 +1,85 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.http import HttpResponse, HttpResponseForbidden
+from django.shortcuts import get_object_or_404
+from django.views.generic import ListView
+from vectortiles.postgis.views import MVTView, BaseVectorTileView
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+
+from datentool_backend.indicators.models import IndicatorResult
+from datentool_backend.population.models import RasterCell
+from datentool_backend.area.models import Area
+from datentool_backend.places.permissions import has_access_to_scenarios
+
+
+class IndicatorResultTileView(MVTView, ListView):
+    """
+    vector tiles with the stored values of an indicator joined to the
+    raster cells or areas, the tiles are cached until the result is
+    calculated again, only users who may read the scenario of the result
+    get the tiles
+    """
+    vector_tile_layer_name = 'indicator'
+
+    def get_queryset(self):
+        if self.result.result_type == 'raster':
+            qs = RasterCell.objects.filter(
+                indicator_values__result=self.result)\
+                .annotate(value=F('indicator_values__value'))
+        else:
+            qs = Area.objects.filter(
+                indicator_values__result=self.result)\
+                .annotate(value=F('indicator_values__value'))
+        return qs
+
+    def get_user(self, request):
+        """
+        the user of the session or of the JWT-token in the header
+        (the tile views are plain django views)
+        """
+        if request.user.is_authenticated:
+            return request.user
+        try:
+            authenticated = JWTAuthentication().authenticate(request)
+        except (InvalidToken, AuthenticationFailed):
+            authenticated = None
+        if authenticated is None:
+            return request.user
+        return authenticated[0]
+
+    def get(self, request, *args, **kwargs):
+        self.result = get_object_or_404(IndicatorResult, key=kwargs.get('key'))
+        # same permissions as for the computation of the indicator
+        params = self.result.params
+        if not has_access_to_scenarios(self.get_user(request),
+                                       params.get('service'),
+                                       [params.get('scenario'),
+                                        params.get('base_scenario')]):
+            return HttpResponseForbidden()
+        if self.result.result_type == 'raster':
+            self.vector_tile_geom_name = 'poly'
+            self.vector_tile_fields = ('id', 'cellcode', 'value')
+        else:
+            self.vector_tile_geom_name = 'geom'
+            self.vector_tile_fields = ('id', 'value')
+
+        z, x, y = kwargs.get('z'), kwargs.get('x'), kwargs.get('y')
+        timeout = settings.INDICATOR_TILE_CACHE_TIMEOUT
+        # a new calculation of the result changes the cache key
+        cache_key = (f'indicator_tile_{self.result.key}_'
+                     f'{self.result.calculated.timestamp()}_{z}_{x}_{y}')
+        if timeout:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                tile, content_type = cached
+                return HttpResponse(tile, content_type=content_type)
+        response = BaseVectorTileView.get(self, request=request,
+                                          z=z, x=x, y=y)
+        if timeout and response.status_code == 200:
+            cache.set(cache_key,
+                      (response.content, response['Content-Type']),
+                      timeout)
+        return response
@@ -1,15 +1,18 @@
 from django.db.models import Max, Count, Sum
-from rest_framework import viewsets, serializers
+from rest_framework import viewsets, serializers, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotAuthenticated
 from drf_spectacular.utils import (extend_schema,
                                    OpenApiParameter,
                                    inline_serializer,
                                    )
 from django.core.exceptions import BadRequest
 from django.conf import settings
+from django.urls import reverse
 
 from datentool_backend.utils.views import ProtectCascadeMixin
+from datentool_backend.utils.processes import RunProcessMixin, ProcessScope
 from datentool_backend.utils.permissions import (HasAdminAccess,
                                                  HasAdminAccessOrReadOnly,
                                                  CanEditBasedata,
@@ -26,11 +29,22 @@ from datentool_backend.places.serializers import ServiceCapacityByScenarioSerial
 from datentool_backend.indicators.compute.base import (
     ServiceIndicator,
     ResultSerializer)
+from datentool_backend.indicators.compute.batch import IndicatorBatch
+from datentool_backend.indicators.compute.diff import ScenarioDiff
+from datentool_backend.indicators.compute.jobs import (compute_indicator_job,
+                                                       get_result_params,
+                                                       get_job_result_params)
+from datentool_backend.indicators.models import IndicatorResult, IndicatorJob
 
-from datentool_backend.indicators.serializers import IndicatorSerializer
+from datentool_backend.indicators.serializers import (IndicatorSerializer,
+                                                      IndicatorJobSerializer)
+from datentool_backend.indicators.renderers import INDICATOR_RENDERER_CLASSES
+from datentool_backend.logging.profiling import request_profiling_kwargs
+from datentool_backend.utils.query_cancel import get_disconnect_event
 
 
-class ServiceViewSet(ProtectCascadeMixin, viewsets.ModelViewSet):
+class ServiceViewSet(RunProcessMixin, ProtectCascadeMixin,
+                     viewsets.ModelViewSet):
     queryset = Service.objects.all().annotate(
         max_capacity=Max('capacity__capacity'))
     serializer_class = ServiceSerializer
@@ -40,9 +54,11 @@ class ServiceViewSet(ProtectCascadeMixin, viewsets.ModelViewSet):
 
     def get_permissions(self):
         if (getattr(settings, 'DEMO_MODE') and
-            self.action == 'compute_indicator'):
+            self.action in ['compute_indicator', 'compute_indicator_batch',
+                            'compute_indicator_diff']):
             return []
-        if self.action in ['compute_indicator', 'total_capacity_in_year']:
+        if self.action in ['compute_indicator', 'compute_indicator_batch',
+                           'compute_indicator_diff', 'total_capacity_in_year']:
             permission_classes = [HasAdminAccess | HasPermissionForScenario]
         else:
             permission_classes = [HasAdminAccessOrReadOnly | CanEditBasedata]
@@ -72,10 +88,22 @@ class ServiceViewSet(ProtectCascadeMixin, viewsets.ModelViewSet):
         parameters=[
             OpenApiParameter(
                 name='indicator', required=True, type=str,
-                description=('name of indicator to compute with'))
+                description=('name of indicator to compute with')),
+            OpenApiParameter(
+                name='as_tiles', required=False, type=bool,
+                description=('store raster or area results and return the '
+                             'key and the url of the vector tiles with the '
+                             'values instead of the values')),
+            OpenApiParameter(
+                name='async', required=False, type=bool,
+                description=('compute the indicator in the background and '
+                             'return the job (status 202), the result can be '
+                             'retrieved from the indicator jobs when the job '
+                             'is finished')),
         ]
     )
-    @action(methods=['POST'], detail=True)
+    @action(methods=['POST'], detail=True,
+            renderer_classes=INDICATOR_RENDERER_CLASSES)
     def compute_indicator(self, request, **kwargs):
         indicator_name = request.data.get('indicator')
         if not indicator_name:
@@ -87,10 +115,197 @@ class ServiceViewSet(ProtectCascadeMixin, viewsets.ModelViewSet):
         service: Service = Service.objects.get(id=service_id)
         data = request.data
         data['service'] = service_id
+        if serializers.BooleanField(allow_null=True).to_internal_value(
+            data.get('async', False)):
+            if data.get('as_tiles'):
+                raise BadRequest('results computed in the background can not '
+                                 'be served as tiles')
+            return self.compute_indicator_async(request, indicator_class,
+                                                service)
         indicator = indicator_class(service, data)
-        results = indicator.compute()
+        profiling_kwargs = request_profiling_kwargs(request)
+        # serve the results precomputed in the background
+        cache_params = indicator.get_cache_params()
+        serialized = None
+        if cache_params is not None and not profiling_kwargs['explain']:
+            serialized = IndicatorResult.get_cached(indicator_name,
+                                                    cache_params)
+        if serialized is None:
+            serialized = indicator.result(
+                disconnected=get_disconnect_event(request),
+                **profiling_kwargs)
+        if not data.get('as_tiles'):
+            return Response(serialized)
+
+        result_type = indicator.result_serializer.name.lower()
+        if result_type not in ('raster', 'area'):
+            raise BadRequest(f'results of type {result_type} can not be '
+                             'served as tiles')
+        params = data.dict() if hasattr(data, 'dict') else dict(data)
+        params.pop('as_tiles')
+        result = IndicatorResult.store(indicator_name,
+                                       params,
+                                       result_type,
+                                       serialized['legend'],
+                                       serialized['values'])
+        tiles = reverse('indicator-tile',
+                        kwargs={'key': result.key, 'z': 0, 'x': 0, 'y': 0})
+        tiles = tiles.replace('/0/0/0/', '/{z}/{x}/{y}/')
+        return Response({'key': result.key,
+                         'legend': serialized['legend'],
+                         'tiles': tiles, })
+
+    def compute_indicator_async(self,
+                                request,
+                                indicator_class: ServiceIndicator,
+                                service: Service) -> Response:
+        """
+        start the computation of the indicator in the background,
+        results stored before with the same parameters are reused
+        """
+        if not request.user.is_authenticated:
+            raise NotAuthenticated('Nur angemeldete Nutzer:innen können '
+                                   'Indikatoren im Hintergrund berechnen')
+        params = request.data.dict() if hasattr(request.data, 'dict') \
+            else dict(request.data)
+        params.pop('async')
+        indicator_name = params.pop('indicator')
+        IndicatorJob.remove_outdated()
+        indicator = indicator_class(service, params)
+        # reuse the result precomputed in the background
+        key = IndicatorResult.get_key(indicator_name,
+                                      get_result_params(indicator))
+        job = IndicatorJob.objects.create(indicator=indicator_name,
+                                          service=service,
+                                          params=params,
+                                          key=key,
+                                          user=request.user.profile)
+        if job.result is not None:
+            job.is_finished = True
+            job.save()
+            return Response(IndicatorJobSerializer(job).data)
+        job.key = IndicatorResult.get_key(
+            indicator_name, get_job_result_params(indicator, job.id))
+        job.save()
+
+        response = self.run_sync_or_async(
+            func=compute_indicator_job,
+            user=request.user,
+            scope=ProcessScope.ANALYSIS,
+            message_async='Berechnung des Indikators gestartet',
+            message_sync='Berechnung des Indikators beendet',
+            job_id=job.id)
+        if response.status_code == status.HTTP_202_ACCEPTED:
+            job.refresh_from_db()
+            response.data.update(IndicatorJobSerializer(job).data)
+        return response
+
+    @extend_schema(
+        description=('Compute indicator for this service for all combinations '
+                     'of the given years, scenarios and modes. The values are '
+                     'returned as nested lists with the dimensions year, '
+                     'scenario, mode and id (place, area or cell code)'),
+        request=inline_serializer(
+            name='IndicatorBatchSerializer',
+            fields={
+                'indicator': serializers.CharField(
+                    help_text='name of indicator to compute with'),
+                'years': serializers.ListField(
+                    child=serializers.IntegerField(), required=False,
+                    help_text='years to compute, defaults to "year"'),
+                'scenarios': serializers.ListField(
+                    child=serializers.IntegerField(allow_null=True),
+                    required=False,
+                    help_text='scenarios to compute (null for the base '
+                    'scenario), defaults to "scenario"'),
+                'modes': serializers.ListField(
+                    child=serializers.IntegerField(), required=False,
+                    help_text='modes to compute, defaults to "mode"'),
+            }
+        ),
+        responses=inline_serializer(
+            name='IndicatorBatchResultSerializer',
+            fields={
+                'dims': serializers.ListField(child=serializers.CharField()),
+                'coords': serializers.DictField(),
+                'values': serializers.ListField(),
+                'legend': serializers.ListField(),
+                'labels': serializers.ListField(required=False),
+            }
+        ),
+    )
+    @action(methods=['POST'], detail=True)
+    def compute_indicator_batch(self, request, **kwargs):
+        indicator_name = request.data.get('indicator')
+        if not indicator_name:
+            raise BadRequest('query parameter "indicator" is required')
+        indicator_class = ServiceIndicator.registered.get(indicator_name)
+        if not indicator_class:
+            raise BadRequest(f'indicator "{indicator_name}" unknown')
+        service_id = kwargs.get('pk')
+        service: Service = Service.objects.get(id=service_id)
+        if hasattr(request.data, 'dict'):
+            dims = {dim: request.data.getlist(dim) or None
+                    for dim in ('years', 'scenarios', 'modes')}
+            data = request.data.dict()
+        else:
+            data = dict(request.data)
+            dims = {dim: data.get(dim) for dim in
+                    ('years', 'scenarios', 'modes')}
+        for dim in dims:
+            data.pop(dim, None)
+        data['service'] = service_id
+        batch = IndicatorBatch(indicator_class, service, data, **dims)
+        return Response(batch.compute(
+            disconnected=get_disconnect_event(request),
+            **request_profiling_kwargs(request)))
 
-        return Response(indicator.serialize(results))
+    @extend_schema(
+        description=('Difference of the indicator between the scenario and '
+                     'the base scenario (null for the status quo) for all '
+                     'places, areas or cells whose value changed. If the '
+                     'scenarios differ only in their places and capacities, '
+                     'only the catchments of the changed places are '
+                     'evaluated'),
+        request=inline_serializer(
+            name='IndicatorDiffSerializer',
+            fields={
+                'indicator': serializers.CharField(
+                    help_text='name of indicator to compute with'),
+                'scenario': serializers.IntegerField(
+                    allow_null=True, help_text='scenario id'),
+                'base_scenario': serializers.IntegerField(
+                    allow_null=True, required=False,
+                    help_text='scenario to compare with, defaults to the '
+                    'base scenario'),
+            }
+        ),
+        responses=inline_serializer(
+            name='IndicatorDiffResultSerializer',
+            fields={
+                'incremental': serializers.BooleanField(),
+                'changed_places': serializers.ListField(
+                    child=serializers.IntegerField()),
+                'values': serializers.ListField(),
+            }
+        ),
+    )
+    @action(methods=['POST'], detail=True)
+    def compute_indicator_diff(self, request, **kwargs):
+        indicator_name = request.data.get('indicator')
+        if not indicator_name:
+            raise BadRequest('query parameter "indicator" is required')
+        indicator_class = ServiceIndicator.registered.get(indicator_name)
+        if not indicator_class:
+            raise BadRequest(f'indicator "{indicator_name}" unknown')
+        service_id = kwargs.get('pk')
+        service: Service = Service.objects.get(id=service_id)
+        data = dict(request.data.items())
+        data['service'] = service_id
+        diff = ScenarioDiff(indicator_class, service, data,
+                            base_scenario_id=data.pop('base_scenario', None),
+                            scenario_id=data.pop('scenario', None))
+        return Response(diff.compute())
 
     @extend_schema(
         description='Number of Places and Total capacity in scenarios',
@@ -1,4 +1,5 @@
 from django.contrib import admin
-from .models import LogEntry
+from .models import LogEntry, ProfilingRecord
 
 admin.site.register(LogEntry)
+admin.site.register(ProfilingRecord)
@@ -4,7 +4,8 @@ from django.conf import settings
 
 
 class PersistLogHandler(logging.StreamHandler):
-    loggers = ['areas', 'population', 'infrastructure', 'routing']
+    loggers = ['areas', 'population', 'infrastructure', 'routing',
+               'analysis']
 
     @classmethod
     def register(cls, user: 'Profile'=None) -> 'PersistLogHandler':
@@ -15,3 +15,28 @@ class LogEntry(models.Model):
         indexes = [
             models.Index(fields=['room', 'level', 'date']),
         ]
+
+
+class ProfilingRecord(models.Model):
+    """runtime and queries of an indicator call or a background process"""
+    class Kind(models.TextChoices):
+        INDICATOR = 'indicator', 'Indikator'
+        PROCESS = 'process', 'Prozess'
+
+    kind = models.CharField(max_length=30, choices=Kind.choices)
+    name = models.TextField()
+    params = models.JSONField(null=True)
+    user = models.ForeignKey(Profile, on_delete=models.SET_NULL, null=True)
+    date = models.DateTimeField()
+    wall_time = models.FloatField(help_text='seconds')
+    n_queries = models.IntegerField(default=0)
+    sql_time = models.FloatField(default=0, help_text='seconds')
+    n_rows = models.BigIntegerField(default=0)
+    success = models.BooleanField(default=True)
+    plans = models.JSONField(null=True, help_text='EXPLAIN (ANALYZE, BUFFERS) '
+                             'of the queries, if requested')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['kind', 'name', 'date']),
+        ]
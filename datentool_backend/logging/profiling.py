@@ -0,0 +1,142 @@
+import time
+import json
+from contextlib import contextmanager
+from typing import Dict, List
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+
+class QueryProfiler:
+    """
+    execute wrapper of the database connection counting the queries,
+    the time spent in the database and the rows returned.
+    Optionally the plans of the SELECT-queries are recorded with
+    EXPLAIN (ANALYZE, BUFFERS), which executes them a second time in a
+    transaction rolled back afterwards
+    """
+
+    def __init__(self, explain: bool = False):
+        self.explain = explain
+        self.n_queries = 0
+        self.sql_time = 0.
+        self.n_rows = 0
+        self.plans: List[Dict[str, object]] = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - start
+            self.n_queries += 1
+            rowcount = getattr(context['cursor'], 'rowcount', -1)
+            if rowcount and rowcount > 0:
+                self.n_rows += rowcount
+            if self.explain and not many:
+                self.explain_query(sql, params, context)
+
+    def explain_query(self, sql: str, params, context):
+        """
+        record the plan of a SELECT-query. EXPLAIN ANALYZE executes the
+        statement and a WITH-query may modify data, so the EXPLAIN is always
+        rolled back (to a savepoint inside a transaction)
+        """
+        if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+            return
+        # use a separate cursor, the results of the query are still to fetch
+        in_transaction = context['connection'].in_atomic_block
+        with context['connection'].connection.cursor() as cursor:
+            if in_transaction:
+                cursor.execute('SAVEPOINT profiling_explain')
+            else:
+                cursor.execute('BEGIN')
+            try:
+                cursor.execute(
+                    f'EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}', params)
+                plan = cursor.fetchone()[0]
+            except Exception as e:
+                plan = repr(e)
+            finally:
+                if in_transaction:
+                    cursor.execute('ROLLBACK TO SAVEPOINT profiling_explain')
+                    cursor.execute('RELEASE SAVEPOINT profiling_explain')
+                else:
+                    cursor.execute('ROLLBACK')
+        if isinstance(plan, str):
+            try:
+                plan = json.loads(plan)
+            except ValueError:
+                pass
+        self.plans.append({'sql': sql, 'plan': plan})
+
+
+def is_profiling_enabled() -> bool:
+    return getattr(settings, 'PROFILING', False)
+
+
+def request_profiling_kwargs(request) -> dict:
+    """
+    the user of the request and if the plans of the queries are requested
+    (query parameter "explain", admins only) as keyword arguments for `profile`
+    """
+    profile = getattr(request.user, 'profile', None)
+    explain = str(request.query_params.get('explain', '')).lower() == 'true'
+    is_admin = request.user.is_superuser or \
+        getattr(profile, 'admin_access', False)
+    return {'user': profile, 'explain': explain and is_admin}
+
+
+@contextmanager
+def profile(kind: str,
+            name: str,
+            params: dict = None,
+            user: 'Profile' = None,
+            explain: bool = False):
+    """
+    record wall time, number of queries, sql time and rows of the enclosed
+    code in a ProfilingRecord, if profiling is enabled in the settings.
+    The plans of the queries are recorded, if `explain` is requested or
+    enabled in the settings
+    """
+    if not is_profiling_enabled():
+        yield
+        return
+    from .models import ProfilingRecord
+    explain = explain or getattr(settings, 'PROFILING_EXPLAIN', False)
+    profiler = QueryProfiler(explain=explain)
+    success = False
+    start = time.perf_counter()
+    try:
+        with connection.execute_wrapper(profiler):
+            yield
+        success = True
+    finally:
+        wall_time = time.perf_counter() - start
+        # nothing can be written in a broken transaction
+        if not connection.needs_rollback:
+            ProfilingRecord.objects.create(
+                kind=kind,
+                name=name,
+                params=json.loads(json.dumps(params, default=str))
+                if params is not None else None,
+                user=user,
+                date=timezone.now(),
+                wall_time=wall_time,
+                n_queries=profiler.n_queries,
+                sql_time=profiler.sql_time,
+                n_rows=profiler.n_rows,
+                success=success,
+                plans=profiler.plans or None,
+            )
+            remove_old_records()
+
+
+def remove_old_records():
+    """keep only the latest settings.MAX_N_PROFILES records"""
+    from .models import ProfilingRecord
+    max_n = getattr(settings, 'MAX_N_PROFILES', 1000)
+    outdated = ProfilingRecord.objects.order_by('-date')\
+        .values_list('id', flat=True)[max_n:]
+    ProfilingRecord.objects.filter(id__in=list(outdated)).delete()
@@ -1,6 +1,6 @@
 from rest_framework import serializers
 
-from .models import LogEntry
+from .models import LogEntry, ProfilingRecord
 
 
 class LogEntrySerializer(serializers.ModelSerializer):
@@ -12,3 +12,10 @@ class LogEntrySerializer(serializers.ModelSerializer):
 
     def get_timestamp(self, obj):
         return obj.date.strftime('%d.%m.%Y %H:%M:%S')
+
+
+class ProfilingRecordSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ProfilingRecord
+        fields = ('id', 'kind', 'name', 'params', 'user', 'date', 'wall_time',
+                  'n_queries', 'sql_time', 'n_rows', 'success', 'plans')
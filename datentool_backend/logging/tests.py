@@ -2,11 +2,15 @@ import logging
 from typing import List
 import pandas as pd
 
+from django.db import connection
+from django.test import override_settings
 from test_plus import APITestCase
 from datentool_backend.api_test import LoginTestCase
 
 from datentool_backend.user.factories import ProfileFactory
 from .loggers import PersistLogHandler
+from .models import ProfilingRecord
+from .profiling import profile
 
 
 class TestLogAPI(LoginTestCase, APITestCase):
@@ -130,3 +134,62 @@ class TestLogAPI(LoginTestCase, APITestCase):
         actual = df[['user', 'level', 'room', 'status']]
         expected = pd.DataFrame(data=expected_data, columns=actual.columns)
         pd.testing.assert_frame_equal(actual, expected)
+
+
+class TestProfiling(LoginTestCase, APITestCase):
+    """test the profiling of indicators and processes"""
+
+    def test_profiling(self):
+        """test that only enabled profiling is recorded and bounded"""
+        with profile('indicator', 'disabled'):
+            list(ProfilingRecord.objects.all())
+        self.assertFalse(ProfilingRecord.objects.exists())
+
+        with override_settings(PROFILING=True, MAX_N_PROFILES=2):
+            with profile('indicator', 'test', params={'year': 2022},
+                         user=self.profile, explain=True):
+                list(ProfilingRecord.objects.all())
+                list(ProfilingRecord.objects.all())
+            record = ProfilingRecord.objects.get(name='test')
+            self.assertEqual(record.n_queries, 2)
+            self.assertTrue(record.success)
+            self.assertEqual(record.params, {'year': 2022})
+            self.assertEqual(record.user, self.profile)
+            self.assertEqual(len(record.plans), 2)
+            self.assertIn('Plan', record.plans[0]['plan'][0])
+
+            # the EXPLAIN of a modifying query does not modify the data again
+            admin_access = self.profile.admin_access
+            table = self.profile._meta.db_table
+            with profile('indicator', 'modifying', explain=True):
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f'''WITH u AS (
+                        UPDATE "{table}" SET "admin_access" = NOT "admin_access"
+                        WHERE "id" = %s RETURNING "id")
+                        SELECT count(*) FROM u''', (self.profile.pk, ))
+            self.profile.refresh_from_db()
+            self.assertEqual(self.profile.admin_access, not admin_access)
+            self.assertEqual(
+                len(ProfilingRecord.objects.get(name='modifying').plans), 1)
+
+            with self.assertRaises(ValueError):
+                with profile('process', 'failing'):
+                    raise ValueError('failed')
+            self.assertFalse(ProfilingRecord.objects.get(name='failing').success)
+
+            with profile('process', 'latest'):
+                pass
+            names = set(ProfilingRecord.objects.values_list('name', flat=True))
+            self.assertSetEqual(names, {'failing', 'latest'})
+
+        url = 'profiling-list'
+        res = self.get(url)
+        self.assert_http_403_forbidden(res)
+        self.profile.admin_access = True
+        self.profile.save()
+        res = self.get(url, data={'kind': 'process'})
+        self.assert_http_200_ok(res)
+        self.assertEqual(len(res.data), 2)
+        self.profile.admin_access = False
+        self.profile.save()
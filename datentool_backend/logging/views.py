@@ -1,8 +1,9 @@
 from rest_framework import viewsets
 
-from datentool_backend.utils.permissions import ReadOnlyPermission
-from .models import LogEntry
-from .serializers import LogEntrySerializer
+from datentool_backend.utils.permissions import (ReadOnlyPermission,
+                                                 HasAdminAccess)
+from .models import LogEntry, ProfilingRecord
+from .serializers import LogEntrySerializer, ProfilingRecordSerializer
 
 
 class LogViewSet(viewsets.ReadOnlyModelViewSet):
@@ -24,4 +25,26 @@ class LogViewSet(viewsets.ReadOnlyModelViewSet):
                queryset = queryset.order_by('-date')[:int(n_last)][::-1]
           else:
                queryset = queryset.order_by('date')
-          return queryset
\ No newline at end of file
+          return queryset
+
+
+class ProfilingRecordViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    the profiled indicator calls and processes, filterable by kind and name,
+    the slowest first with query parameter "order=slowest"
+    """
+    queryset = ProfilingRecord.objects.all()
+    serializer_class = ProfilingRecordSerializer
+    permission_classes = [HasAdminAccess]
+
+    def get_queryset(self):
+        queryset = self.queryset
+        kind = self.request.query_params.get('kind')
+        name = self.request.query_params.get('name')
+        if kind is not None:
+            queryset = queryset.filter(kind=kind)
+        if name is not None:
+            queryset = queryset.filter(name=name)
+        if self.request.query_params.get('order') == 'slowest':
+            return queryset.order_by('-wall_time')
+        return queryset.order_by('-date')
@@ -0,0 +1,95 @@
+import os
+import platform
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from datentool_backend.modes.models import Mode
+from datentool_backend.indicators.benchmark import (get_default_params,
+                                                    get_cases,
+                                                    run_benchmark,
+                                                    compare,
+                                                    load_baseline,
+                                                    save_baseline)
+
+
+class Command(BaseCommand):
+    help = ('Time all registered and fixed indicators and compare them '
+            'with a stored baseline')
+
+    def add_arguments(self, parser):
+        """add additional arguments"""
+        parser.add_argument('--baseline', default='indicator_benchmark.json',
+                            help='json-file with the baseline')
+        parser.add_argument('--save', action='store_true',
+                            help='store the results as new baseline '
+                            'instead of comparing them')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='relative increase of the time counted '
+                            'as regression')
+        parser.add_argument('--min-delta', type=float, default=0.05,
+                            help='minimum increase of the time in seconds '
+                            'counted as regression')
+        parser.add_argument('--repeat', type=int, default=3,
+                            help='number of runs per indicator')
+        parser.add_argument('--mode', default='WALK',
+                            choices=['WALK', 'BIKE', 'CAR'])
+        parser.add_argument('--indicators', nargs='+',
+                            help='names of the indicators to run (default: all)')
+        parser.add_argument('--setup', action='store_true',
+                            help='replace the data with a new synthetic '
+                            'benchmark project before')
+        parser.add_argument('--cells', type=int, default=10000,
+                            help='number of raster cells of the '
+                            'benchmark project')
+        parser.add_argument('--places', type=int, default=200,
+                            help='number of places of the benchmark project')
+
+    def handle(self, *args, **options):
+        """handle the command"""
+        if options['setup']:
+            call_command('createbenchmarkproject', truncate=True,
+                         cells=options['cells'], places=options['places'],
+                         stdout=self.stdout)
+
+        try:
+            params = get_default_params(mode=Mode[options['mode']])
+        except ValueError as e:
+            raise CommandError(f'{e}, create a project with --setup or '
+                               'createbenchmarkproject first')
+        cases = get_cases(params, names=options['indicators'])
+
+        def report(name: str, result: dict):
+            if 'error' in result:
+                self.stdout.write(self.style.ERROR(
+                    f'{name}: {result["error"]}'))
+                return
+            self.stdout.write(
+                f'{name}: {result["time"]:.3f}s (first {result["first"]:.3f}s'
+                f', sql {result["sql_time"]:.3f}s), '
+                f'{result["n_queries"]} queries, {result["n_rows"]:n} rows')
+
+        results = run_benchmark(cases, repeat=options['repeat'],
+                                callback=report)
+
+        path = options['baseline']
+        if options['save']:
+            meta = {'mode': options['mode'],
+                    'repeat': options['repeat'],
+                    'python': platform.python_version(),
+                    'machine': platform.node(), }
+            save_baseline(path, results, meta=meta)
+            self.stdout.write(self.style.SUCCESS(f'Baseline saved to {path}'))
+            return
+
+        if not os.path.exists(path):
+            raise CommandError(f'baseline {path} not found, '
+                               'create it with --save')
+        regressions = compare(results, load_baseline(path),
+                              threshold=options['threshold'],
+                              min_delta=options['min_delta'])
+        if regressions:
+            for regression in regressions:
+                self.stdout.write(self.style.ERROR(regression))
+            raise CommandError(f'{len(regressions)} regressions')
+        self.stdout.write(self.style.SUCCESS('No regressions'))
@@ -0,0 +1,84 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from datentool_backend.modes.models import Mode, ModeVariant
+from datentool_backend.places.models import Place
+from datentool_backend.indicators.routing_benchmark import (
+    ROUTING_CASES,
+    create_transit_stops,
+    get_routing_cases,
+    run_routing_benchmark,
+)
+
+
+class Command(BaseCommand):
+    help = ('Measure the throughput of the travel time routers against '
+            'local stand-ins of the OSRM routing servers')
+
+    def add_arguments(self, parser):
+        """add additional arguments"""
+        parser.add_argument('--mode', default='WALK',
+                            choices=['WALK', 'BIKE', 'CAR'],
+                            help='the mode to route and the access mode '
+                            'to the transit stops')
+        parser.add_argument('--routers', nargs='+', choices=ROUTING_CASES,
+                            help='the routers to run (default: all)')
+        parser.add_argument('--stops', type=int, default=100,
+                            help='number of transit stops created for the '
+                            'transit routers, 0 to skip them')
+        parser.add_argument('--latency', type=float, default=0,
+                            help='seconds added to each routing request')
+        parser.add_argument('--detour', type=float, default=1.3,
+                            help='factor applied to the air distance')
+        parser.add_argument('--setup', action='store_true',
+                            help='replace the data with a new synthetic '
+                            'benchmark project before')
+        parser.add_argument('--cells', type=int, default=10000,
+                            help='number of raster cells of the '
+                            'benchmark project')
+        parser.add_argument('--places', type=int, default=200,
+                            help='number of places of the benchmark project')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='seed of the random generator')
+
+    def handle(self, *args, **options):
+        """handle the command"""
+        mode = Mode[options['mode']]
+        if options['setup']:
+            call_command('createbenchmarkproject', truncate=True,
+                         cells=options['cells'], places=options['places'],
+                         modes=[mode.name], seed=options['seed'],
+                         stdout=self.stdout)
+
+        if not (Place.objects.exists() and
+                ModeVariant.objects.filter(mode=mode, is_default=True)
+                .exists()):
+            raise CommandError('no places or mode variant found, create a '
+                               'project with --setup or '
+                               'createbenchmarkproject first')
+
+        transit_variant = create_transit_stops(options['stops'],
+                                               seed=options['seed']) \
+            if options['stops'] else None
+        cases = get_routing_cases(mode=mode,
+                                  transit_variant=transit_variant,
+                                  names=options['routers'])
+
+        def report(name: str, result: dict):
+            if 'error' in result:
+                self.stdout.write(self.style.ERROR(
+                    f'{name}: {result["error"]}'))
+                return
+            self.stdout.write(
+                f'{name}: {result["time"]:.3f}s, '
+                f'{result["pairs_per_second"]:,.0f} pairs/s '
+                f'({result["n_pairs"]:n} pairs in {result["n_requests"]} '
+                f'requests, {result["n_rows"]:n} rows)')
+
+        results = run_routing_benchmark(cases,
+                                        latency=options['latency'],
+                                        detour=options['detour'],
+                                        callback=report)
+        n_failed = sum('error' in result for result in results.values())
+        if n_failed:
+            raise CommandError(f'{n_failed} routers failed')
@@ -0,0 +1,86 @@
+import time
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+
+from datentool_backend.modes.models import Mode
+from datentool_backend.utils.synthetic_project import SyntheticProject
+
+
+class Command(BaseCommand):
+    help = ('Create a reproducible synthetic project of a given size '
+            'to benchmark the indicators')
+
+    def add_arguments(self, parser):
+        """add additional arguments"""
+        parser.add_argument('--cells', type=int, default=10000,
+                            help='number of raster cells')
+        parser.add_argument('--places', type=int, default=200,
+                            help='number of places (without scenario places)')
+        parser.add_argument('--infrastructures', type=int, default=2,
+                            help='number of infrastructures')
+        parser.add_argument('--services', type=int, default=2,
+                            help='number of services per infrastructure')
+        parser.add_argument('--years', type=int, default=10,
+                            help='number of years including the base year')
+        parser.add_argument('--base-year', type=int, default=2022)
+        parser.add_argument('--scenarios', type=int, default=2,
+                            help='number of scenarios')
+        parser.add_argument('--area-levels', type=int, default=3,
+                            help='number of area levels')
+        parser.add_argument('--modes', nargs='+', default=['WALK', 'BIKE', 'CAR'],
+                            choices=['WALK', 'BIKE', 'CAR'],
+                            help='modes to create the travel time matrices for')
+        parser.add_argument('--max-distance', type=float,
+                            help='maximum air distance in meters between cell '
+                            'and place for all modes (default: by mode)')
+        parser.add_argument('--owner', default='benchmark',
+                            help='user owning the scenarios, created if '
+                            'not existing')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='seed of the random generator')
+        parser.add_argument('--truncate', action='store_true',
+                            help='remove the existing cells, areas, places, '
+                            'populations and planning processes before')
+
+    def handle(self, *args, **options):
+        """handle the command"""
+        if options['truncate']:
+            SyntheticProject.truncate()
+        elif SyntheticProject.has_data():
+            raise CommandError('The project already contains data, use '
+                               '--truncate to replace it')
+
+        modes = [Mode[mode] for mode in options['modes']]
+        max_distance = {mode: options['max_distance'] for mode in modes} \
+            if options['max_distance'] else None
+
+        logger = logging.getLogger('benchmark')
+        logger.setLevel(logging.INFO)
+        handler = logging.StreamHandler(self.stdout)
+        logger.addHandler(handler)
+        try:
+            start = time.perf_counter()
+            project = SyntheticProject(
+                n_cells=options['cells'],
+                n_places=options['places'],
+                n_infrastructures=options['infrastructures'],
+                n_services=options['services'],
+                n_years=options['years'],
+                base_year=options['base_year'],
+                n_scenarios=options['scenarios'],
+                n_area_levels=options['area_levels'],
+                modes=modes,
+                max_distance=max_distance,
+                owner=options['owner'],
+                seed=options['seed'],
+                logger=logger)
+            counts = project.create()
+        finally:
+            logger.removeHandler(handler)
+
+        for table, n_rows in counts.items():
+            self.stdout.write(f'{table}: {n_rows:n}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully created benchmark project in '
+            f'{time.perf_counter() - start:.1f}s'))
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.6 on 2026-10-19 09:12
+
+from django.db import migrations, models
+import datentool_backend.base
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('datentool_backend', '0005_merge_0004_profile_is_demo_user_0004_wmslayer_cors'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NearestPlaceCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField(default=0)),
+                ('places_hash', models.TextField(blank=True, default='', help_text='hash of the ids of the open places the nearest places were derived from')),
+                ('up_to_date', models.BooleanField(default=False)),
+                ('scenario', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='datentool_backend.scenario')),
+                ('service', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='datentool_backend.service')),
+                ('variant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='datentool_backend.modevariant')),
+            ],
+            bases=(datentool_backend.base.DatentoolModelMixin, models.Model),
+        ),
+        migrations.CreateModel(
+            name='NearestPlace',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('minutes', models.FloatField()),
+                ('cache', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='nearest_places', to='datentool_backend.nearestplacecache')),
+                ('cell', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='nearest_place', to='datentool_backend.rastercell')),
+                ('place', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='nearest_cell', to='datentool_backend.place')),
+            ],
+            options={
+                'unique_together': {('cache', 'cell')},
+            },
+            bases=(datentool_backend.base.DatentoolModelMixin, models.Model),
+        ),
+        migrations.AddConstraint(
+            model_name='nearestplacecache',
+            constraint=models.UniqueConstraint(fields=('service', 'variant', 'scenario', 'year'), name='nearestplacecache_service_variant_scenario_year_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='nearestplacecache',
+            constraint=models.UniqueConstraint(condition=models.Q(('scenario__isnull', True)), fields=('service', 'variant', 'year'), name='nearestplacecache_service_variant_noscenario_year_uniq'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.6 on 2026-10-19 10:37
+
+from django.db import migrations, models
+import datentool_backend.base
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('datentool_backend', '0006_nearestplacecache_nearestplace'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CellDemandCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('demand_rates_hash', models.TextField(blank=True, default='', help_text='hash of the demand rates the demand was derived from')),
+                ('up_to_date', models.BooleanField(default=False)),
+                ('demand_rate_set', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='datentool_backend.demandrateset')),
+                ('population', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='datentool_backend.population')),
+                ('service', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='datentool_backend.service')),
+            ],
+            bases=(datentool_backend.base.DatentoolModelMixin, models.Model),
+        ),
+        migrations.CreateModel(
+            name='CellDemand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.FloatField()),
+                ('cache', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cell_demands', to='datentool_backend.celldemandcache')),
+                ('cell', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='datentool_backend.rastercell')),
+                ('rastercellpop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='datentool_backend.rastercellpopulation')),
+            ],
+            options={
+                'unique_together': {('cache', 'rastercellpop')},
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='celldemandcache',
+            constraint=models.UniqueConstraint(fields=('population', 'service', 'demand_rate_set'), name='celldemandcache_population_service_drs_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='celldemandcache',
+            constraint=models.UniqueConstraint(condition=models.Q(('demand_rate_set__isnull', True)), fields=('population', 'service'), name='celldemandcache_population_service_nodrs_uniq'),
+        ),
+    ]
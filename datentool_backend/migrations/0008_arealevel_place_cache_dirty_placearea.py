@@ -0,0 +1,31 @@
+# Generated by Django 4.2.6 on 2026-10-19 11:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('datentool_backend', '0007_celldemandcache_celldemand'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='arealevel',
+            name='place_cache_dirty',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.CreateModel(
+            name='PlaceArea',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('area', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='place_areas', to='datentool_backend.area')),
+                ('area_level', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='datentool_backend.arealevel')),
+                ('place', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='place_areas', to='datentool_backend.place')),
+            ],
+            options={
+                'unique_together': {('area_level', 'place', 'area')},
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.6 on 2026-10-19 13:21
+
+from django.db import migrations, models
+import datentool_backend.base
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('datentool_backend', '0008_arealevel_place_cache_dirty_placearea'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndicatorResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.TextField(help_text='hash of the indicator and the parameters', unique=True)),
+                ('indicator', models.TextField()),
+                ('params', models.JSONField(default=dict)),
+                ('result_type', models.TextField()),
+                ('legend', models.JSONField(default=list)),
+                ('calculated', models.DateTimeField(auto_now=True)),
+            ],
+            bases=(datentool_backend.base.DatentoolModelMixin, models.Model),
+        ),
+        migrations.CreateModel(
+            name='IndicatorResultValue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.FloatField(null=True)),
+                ('area', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='indicator_values', to='datentool_backend.area')),
+                ('cell', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='indicator_values', to='datentool_backend.rastercell')),
+                ('result', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='result_values', to='datentool_backend.indicatorresult')),
+            ],
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.6 on 2026-10-19 14:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('datentool_backend', '0009_indicatorresult_indicatorresultvalue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfilingRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('indicator', 'Indikator'), ('process', 'Prozess')], max_length=30)),
+                ('name', models.TextField()),
+                ('params', models.JSONField(null=True)),
+                ('date', models.DateTimeField()),
+                ('wall_time', models.FloatField(help_text='seconds')),
+                ('n_queries', models.IntegerField(default=0)),
+                ('sql_time', models.FloatField(default=0, help_text='seconds')),
+                ('n_rows', models.BigIntegerField(default=0)),
+                ('success', models.BooleanField(default=True)),
+                ('plans', models.JSONField(help_text='EXPLAIN (ANALYZE, BUFFERS) of the queries, if requested', null=True)),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='datentool_backend.profile')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='profilingrecord',
+            index=models.Index(fields=['kind', 'name', 'date'], name='datentool_b_kind_674057_idx'),
+        ),
+    ]
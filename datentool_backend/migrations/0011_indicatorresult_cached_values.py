@@ -0,0 +1,19 @@
+# Generated by Django 4.2.6 on 2026-10-19 16:40
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('datentool_backend', '0010_profilingrecord'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='indicatorresult',
+            name='cached_values',
+            field=models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder, help_text='serialized values of a precomputed result', null=True),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.6 on 2026-10-19 18:12
+
+import datentool_backend.base
+import django.contrib.postgres.fields
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('datentool_backend', '0011_indicatorresult_cached_values'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='processstate',
+            name='scope',
+            field=models.IntegerField(choices=[(1, 'Allgemein'), (2, 'Bevölkerung'), (3, 'Infrastruktur'), (4, 'Routing'), (5, 'Gebiete'), (6, 'Analyse')]),
+        ),
+        migrations.CreateModel(
+            name='LocationSuggestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mode', models.IntegerField(choices=[(1, 'zu Fuß'), (2, 'Fahrrad'), (3, 'Auto'), (4, 'ÖPNV')])),
+                ('year', models.IntegerField(default=0)),
+                ('n_sites', models.IntegerField()),
+                ('objective', models.TextField(choices=[('median', 'mittlere Wegezeit minimieren'), ('coverage', 'Versorgte innerhalb der Wegezeit maximieren')], default='median')),
+                ('cutoff', models.FloatField(help_text='cut-off time in minutes, defaults to the cut-off time of the mode', null=True)),
+                ('places', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), default=list, help_text='ids of the candidate places', size=None)),
+                ('cells', django.contrib.postgres.fields.ArrayField(base_field=models.TextField(), default=list, help_text='cellcodes of the candidate raster cells', size=None)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('is_finished', models.BooleanField(default=False)),
+                ('initial_value', models.FloatField(help_text='mean travel time or covered share of the demand without the new sites', null=True)),
+                ('sites', models.JSONField(default=list, help_text='the chosen sites in the order of their selection')),
+                ('scenario', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='datentool_backend.scenario')),
+                ('service', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='datentool_backend.service')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='datentool_backend.profile')),
+            ],
+            bases=(datentool_backend.base.DatentoolModelMixin, models.Model),
+        ),
+    ]
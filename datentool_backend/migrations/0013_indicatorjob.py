@@ -0,0 +1,30 @@
+# Generated by Django 4.2.6 on 2026-10-19 19:40
+
+import datentool_backend.base
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('datentool_backend', '0012_locationsuggestion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndicatorJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('indicator', models.TextField()),
+                ('params', models.JSONField(default=dict, help_text='the parameters of the request')),
+                ('key', models.TextField(help_text='key of the stored IndicatorResult')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('is_finished', models.BooleanField(default=False)),
+                ('error', models.TextField(null=True)),
+                ('service', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='datentool_backend.service')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='datentool_backend.profile')),
+            ],
+            bases=(datentool_backend.base.DatentoolModelMixin, models.Model),
+        ),
+    ]
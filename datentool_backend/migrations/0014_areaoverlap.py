@@ -0,0 +1,28 @@
+# Generated by Django 4.2.6 on 2026-10-19 20:25
+
+import datentool_backend.base
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('datentool_backend', '0013_indicatorjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AreaOverlap',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('share', models.FloatField(help_text='share of the area lying in the overlapping area')),
+                ('area', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='overlaps', to='datentool_backend.area')),
+                ('overlapping_area', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='datentool_backend.area')),
+            ],
+            options={
+                'unique_together': {('area', 'overlapping_area')},
+            },
+            bases=(datentool_backend.base.DatentoolModelMixin, models.Model),
+        ),
+    ]
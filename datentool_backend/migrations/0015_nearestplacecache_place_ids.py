@@ -0,0 +1,30 @@
+# Generated by Django 4.2.6 on 2026-10-19 21:40
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+
+def mark_outdated(apps, schema_editor):
+    """the cached places are unknown, rebuild the nearest places"""
+    NearestPlaceCache = apps.get_model('datentool_backend', 'NearestPlaceCache')
+    NearestPlaceCache.objects.update(up_to_date=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('datentool_backend', '0014_areaoverlap'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='nearestplacecache',
+            name='places_hash',
+        ),
+        migrations.AddField(
+            model_name='nearestplacecache',
+            name='place_ids',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), default=list, help_text='ids of the open places the nearest places were derived from', size=None),
+        ),
+        migrations.RunPython(mark_outdated, migrations.RunPython.noop),
+    ]
@@ -81,11 +81,17 @@ def delete_depending_matrices(variant_id: int,
         for model in [MatrixCellPlace,
                       MatrixPlaceStop]:
             truncate_partition_table(model, name)
+    MatrixCellPlace.invalidate_caches(variant_ids=[variant_id])
 
     if not only_with_stops:
+        # the entries with an access variant are in the transit partitions
         qs = MatrixCellPlace.objects\
+            .in_partitions(ModeVariant.objects.filter(mode=Mode.TRANSIT))\
             .filter(access_variant=variant_id)
         delete_chunks(qs, logger)
+        MatrixCellPlace.invalidate_caches(
+            variant_ids=list(ModeVariant.objects.filter(mode=Mode.TRANSIT)
+                             .values_list('id', flat=True)))
 
     res = Stop.objects.filter(variant=variant_id).delete()
     logger.info(f'{res[0]} Haltestellen gelöscht')
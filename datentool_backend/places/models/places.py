@@ -1,6 +1,6 @@
 from typing import List
 
-from django.db import models
+from django.db import models, connection, transaction
 from django.db.models.signals import post_save
 from django.db.models import Q
 from django.contrib.gis.db import models as gis_models
@@ -13,7 +13,8 @@ from datentool_backend.utils.protect_cascade import PROTECT_CASCADE
 from datentool_backend.utils.copy_postgres import DirectCopyManager
 
 from datentool_backend.area.models import (FieldType, FieldTypes,
-                                           FieldAttribute)
+                                           FieldAttribute,
+                                           Area, AreaLevel)
 from datentool_backend.infrastructure.models import Infrastructure, Service, PlaceField
 from .process_scenario import Scenario
 
@@ -83,8 +84,83 @@ class Place(DatentoolModelMixin, NamedModel, models.Model):
         if hasattr(instance, '_attr_dict'):
             instance.attributes = instance._attr_dict
 
+    @staticmethod
+    def post_save_geom(sender, instance, *args, **kwargs):
+        """assign the place to the areas it is (now) located in"""
+        PlaceArea.update_place(instance)
+
 
 post_save.connect(Place.post_create, sender=Place)
+post_save.connect(Place.post_save_geom, sender=Place)
+
+
+class PlaceArea(models.Model):
+    """
+    the areas of each area level a place is located in, so that the places
+    can be aggregated to areas without intersecting the geometries
+    """
+    place = models.ForeignKey(Place, on_delete=models.CASCADE,
+                              related_name='place_areas')
+    area = models.ForeignKey(Area, on_delete=models.CASCADE,
+                             related_name='place_areas')
+    area_level = models.ForeignKey(AreaLevel, on_delete=models.CASCADE)
+
+    class Meta:
+        unique_together = ['area_level', 'place', 'area']
+
+    @classmethod
+    def get_area_level(cls, area_level: AreaLevel) -> 'PlaceArea':
+        """
+        the places in the areas of the area level, assign them first if the
+        areas have changed since the last assignment
+        """
+        if area_level.place_cache_dirty:
+            cls.update_area_level(area_level)
+        return cls.objects.filter(area_level=area_level)
+
+    @classmethod
+    def update_area_level(cls, area_level: AreaLevel):
+        """assign all places to the areas of the area level"""
+        with transaction.atomic():
+            # lock the area level, another process might assign it already
+            locked = AreaLevel.objects.select_for_update()\
+                .get(pk=area_level.pk)
+            if locked.place_cache_dirty:
+                qs = cls.objects.filter(area_level=area_level)
+                qs._raw_delete(using=qs.db)
+                cls._insert_place_areas('a."area_level_id" = %s',
+                                        (area_level.pk, ))
+                AreaLevel.objects.filter(pk=area_level.pk)\
+                    .update(place_cache_dirty=False)
+        area_level.place_cache_dirty = False
+
+    @classmethod
+    def update_place(cls, place: Place):
+        """
+        assign the place to the areas of all area levels, that are up to date.
+        The others will be assigned completely when requested
+        """
+        qs = cls.objects.filter(place=place)
+        qs._raw_delete(using=qs.db)
+        cls._insert_place_areas(
+            f'''p."id" = %s AND a."area_level_id" IN (
+            SELECT al."id" FROM "{AreaLevel._meta.db_table}" al
+            WHERE NOT al."place_cache_dirty")''',
+            (place.pk, ))
+
+    @classmethod
+    def _insert_place_areas(cls, where: str, params: tuple):
+        """insert the intersections of places and areas matching `where`"""
+        query = f'''INSERT INTO "{cls._meta.db_table}"
+        ("place_id", "area_id", "area_level_id")
+        SELECT p."id", a."id", a."area_level_id"
+        FROM "{Place._meta.db_table}" p
+        JOIN "{Area._meta.db_table}" a
+        ON ST_Intersects(a."geom", p."geom")
+        WHERE {where}
+        '''
+        with connection.cursor() as cursor:
+            cursor.execute(query, params)
 
 
 class PlaceAttribute(FieldAttribute):
@@ -100,29 +100,57 @@ class CanEditScenarioPlacePermission(BasePermission):
         return obj.scenario.has_write_permission(request.user)
 
 
-class HasPermissionForScenario(BasePermission):
-    def has_permission(self, request, view):
-        self.check_demo_mode(request)
-        if not request.user.is_authenticated:
-            return False
-        # service-id comes with the view (detail-view) or as query_params
-        service_id = view.kwargs.get('pk', request.query_params.get('service'))
-
-        # if no valid service is provided, deny access
-        # check if the infrastructure is permitted for the user
+def has_access_to_scenarios(user, service_id, scenario_ids) -> bool:
+    """
+    check if the user may access the infrastructure of the service and read
+    the scenarios (empty ids for the base scenario)
+    """
+    if not user.is_authenticated:
+        return False
+    # if no valid service is provided, deny access
+    # check if the infrastructure is permitted for the user
+    try:
+        service = Service.objects.get(pk=service_id)
+    except (Service.DoesNotExist, ValueError, TypeError):
+        return False
+    if not service.infrastructure.accessible_by.contains(user.profile):
+        return False
+
+    for scenario_id in scenario_ids:
+        if not scenario_id:
+            # the base scenario can be seen by everyone
+            # with access to the infrastructure
+            continue
+        # a specific scenario only if you may see its planning_process
         try:
-            service = Service.objects.get(pk=service_id)
-        except Service.DoesNotExist:
+            scenario = Scenario.objects.get(pk=scenario_id)
+        except (Scenario.DoesNotExist, ValueError, TypeError):
             return False
-        if not service.infrastructure.accessible_by.contains(request.user.profile):
+        if not scenario.has_read_permission(user):
             return False
+    return True
+
+
+class HasPermissionForScenario(BasePermission):
+    def has_permission(self, request, view):
+        self.check_demo_mode(request)
+        # service-id comes with the view (detail-view), as query_params
+        # or with the data
+        service_id = view.kwargs.get('pk', request.query_params.get(
+            'service', request.data.get('service')))
 
         # check if the planning process of the scenario is permitted for the user
-        scenario_id = request.data.get('scenario', request.query_params.get('scenario'))
-        if not scenario_id:
-            # the base scenario can be seen by everyone
-            # with access to the infrastructure
-            return True
-        # a specific scenario only if you may see its planning_process
-        scenario = Scenario.objects.get(pk=scenario_id)
-        return scenario.has_read_permission(request.user)
+        if hasattr(request.data, 'getlist'):
+            # form data with the scenarios as repeated keys
+            scenario_ids = request.data.getlist('scenarios')
+        else:
+            scenario_ids = request.data.get('scenarios')
+            if scenario_ids is not None and \
+               not isinstance(scenario_ids, (list, tuple)):
+                scenario_ids = [scenario_ids]
+        if not scenario_ids:
+            scenario_ids = [request.data.get(
+                'scenario', request.query_params.get('scenario'))]
+        # the scenario to compare with
+        scenario_ids = list(scenario_ids) + [request.data.get('base_scenario')]
+        return has_access_to_scenarios(request.user, service_id, scenario_ids)
@@ -140,7 +140,8 @@ class PlaceSerializer(serializers.ModelSerializer):
         self.delete_existing_martixentries_for_place(instance)
 
         # calcauats
-        for variant in ModeVariant.objects.order_by('mode'):
+        variants = ModeVariant.objects.order_by('mode')
+        for variant in variants:
             try:
                 if variant.mode == Mode.TRANSIT:
                     df = self.get_transit_df(variant, access_variant, places)
@@ -158,14 +159,16 @@ class PlaceSerializer(serializers.ModelSerializer):
             except (ConnectionError, RoutingError):
                 print(f'Routing für {variant.label} hat nicht funktioniert')
 
+        MatrixCellPlace.invalidate_caches(
+            variant_ids=[variant.pk for variant in variants])
         print(f'Routenberechnung erfolgreich')
 
     def delete_existing_martixentries_for_place(self, instance: Place):
         # delete existing entries for the place in the CellPlace and PlaceStop-Matrix
-        qs_to_delete = MatrixCellPlace.objects.filter(place=instance)
+        qs_to_delete = MatrixCellPlace.objects.for_places(instance)
         if qs_to_delete.exists():
             delete_chunks(qs_to_delete, logger)
-        qs_to_delete = MatrixPlaceStop.objects.filter(place=instance)
+        qs_to_delete = MatrixPlaceStop.objects.for_places(instance)
         if qs_to_delete.exists():
             delete_chunks(qs_to_delete, logger)
 
@@ -44,6 +44,8 @@ from datentool_backend.places.models import (
     Place, Capacity, PlaceAttribute)
 
 from datentool_backend.area.models import FClass
+from datentool_backend.indicators.models import IndicatorResult
+from datentool_backend.indicators.prewarm import schedule_prewarm
 
 from datentool_backend.infrastructure.serializers import infrastructure_id_serializer
 from datentool_backend.places.permissions import CanEditScenarioPlacePermission
@@ -399,6 +401,9 @@ def read_excel_file(excel_filepath, infrastructure_id: int):
                 file,
                 drop_constraints=False, drop_indexes=False,
             )
+    # the stored indicator results are derived from the old capacities
+    IndicatorResult.invalidate()
+    schedule_prewarm()
     logger.info(f'{len(df_places):n} Einträge bearbeitet')
     if n_failed > 0:
         logger.info(f'{n_failed:n} Einträge wurden übersprungen, da ihre '
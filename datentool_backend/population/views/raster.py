@@ -29,7 +29,9 @@ from datentool_backend.utils.permissions import (
 from vectortiles.postgis.views import MVTView
 
 from datentool_backend.indicators.models import (MatrixCellPlace,
-                                                 MatrixCellStop)
+                                                 MatrixCellStop,
+                                                 NearestPlaceCache)
+from datentool_backend.demand.models import CellDemandCache
 from datentool_backend.population.models import (
     Raster,
     PopulationRaster,
@@ -258,6 +260,9 @@ class PopulationRasterViewSet(ProtectCascadeMixin, viewsets.ModelViewSet):
             #qs_rc.delete()
             MatrixCellPlace.truncate()
             MatrixCellStop.truncate()
+            NearestPlaceCache.truncate()
+            MatrixCellPlace.invalidate_caches()
+            CellDemandCache.truncate()
             AreaCell.truncate()
             RasterCellPopulationAgeGender.truncate()
             RasterCellPopulation.truncate()
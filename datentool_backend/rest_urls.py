@@ -28,6 +28,8 @@ from .indicators.views import (RouterViewSet,
                                MatrixCellPlaceViewSet,
                                MatrixCellStopViewSet,
                                MatrixPlaceStopViewSet,
+                               LocationSuggestionViewSet,
+                               IndicatorJobViewSet,
                                )
 
 from .infrastructure.views import (InfrastructureViewSet,
@@ -41,7 +43,7 @@ from .places.views import (PlaceViewSet,
                            ScenarioViewSet,
                            )
 
-from .logging.views import LogViewSet
+from .logging.views import LogViewSet, ProfilingRecordViewSet
 
 from .population.views import (RasterViewSet,
                                RasterCellViewSet,
@@ -94,6 +96,10 @@ router.register(r'matrixcellstops', MatrixCellStopViewSet, basename='matrixcells
 router.register(r'matrixplacestops', MatrixPlaceStopViewSet, basename='matrixplacestops')
 router.register(r'routers', RouterViewSet, basename='routers')
 router.register(r'indicators', FixedIndicatorViewSet, basename='fixedindicators')
+router.register(r'locationsuggestions', LocationSuggestionViewSet,
+                basename='locationsuggestions')
+router.register(r'indicatorjobs', IndicatorJobViewSet,
+                basename='indicatorjobs')
 
 # infrastructure
 router.register(r'scenarios', ScenarioViewSet, basename='scenarios')
@@ -104,6 +110,7 @@ router.register(r'placefields', PlaceFieldViewSet, basename='placefields')
 
 # logging
 router.register(r'logs', LogViewSet, basename='logs')
+router.register(r'profiling', ProfilingRecordViewSet, basename='profiling')
 
 # population
 router.register(r'years', YearViewSet, basename='years')
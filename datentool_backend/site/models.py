@@ -48,6 +48,7 @@ class ProcessScope(models.IntegerChoices):
     INFRASTRUCTURE = 3, 'Infrastruktur'
     ROUTING = 4, 'Routing'
     AREAS = 5, 'Gebiete'
+    ANALYSIS = 6, 'Analyse'
 
 
 class ProcessState(models.Model):
@@ -0,0 +1,243 @@
+import re
+import json
+import time
+import threading
+from contextlib import contextmanager, ExitStack
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+from urllib.parse import parse_qs, unquote
+
+import numpy as np
+import polyline
+from django.conf import settings
+from django.test import override_settings
+
+from datentool_backend.modes.models import Mode, MODE_SPEED, MODE_ROUTERS
+
+
+EARTH_RADIUS = 6371008.8
+# the coordinates are passed as polyline in the url, which can get long
+MAX_REQUEST_LINE = 2 ** 24
+
+
+def haversine(lon0: np.ndarray, lat0: np.ndarray,
+              lon1: np.ndarray, lat1: np.ndarray) -> np.ndarray:
+    """great circle distance in meters, the arrays are broadcasted"""
+    lon0, lat0, lon1, lat1 = map(np.radians, (lon0, lat0, lon1, lat1))
+    a = (np.sin((lat1 - lat0) / 2) ** 2
+         + np.cos(lat0) * np.cos(lat1) * np.sin((lon1 - lon0) / 2) ** 2)
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(a))
+
+
+class OSRMStandinHandler(BaseHTTPRequestHandler):
+    """
+    answers the `/table`-requests of the OSRMRouter with the air distance
+    times a detour factor and durations derived from the speed of the mode,
+    the service commands and the health checks are always successful
+    """
+    server: 'OSRMStandinServer'
+    table_url = re.compile(r'^/table/v1/[^/]+/(?P<coords>.+?)(\?(?P<query>[^)]*))?$')
+
+    def handle_one_request(self):
+        """like the base class, but accept long request lines"""
+        try:
+            self.raw_requestline = self.rfile.readline(MAX_REQUEST_LINE + 1)
+            if len(self.raw_requestline) > MAX_REQUEST_LINE:
+                self.send_error(414)
+                return
+            if not self.raw_requestline:
+                self.close_connection = True
+                return
+            if not self.parse_request():
+                return
+            method = getattr(self, f'do_{self.command}', None)
+            if not method:
+                self.send_error(501)
+                return
+            method()
+            self.wfile.flush()
+        except TimeoutError as e:
+            self.log_error('Request timed out: %r', e)
+            self.close_connection = True
+
+    def do_GET(self):
+        match = self.table_url.match(self.path)
+        if not match:
+            self.send_json({'status': 'running'})
+            return
+        try:
+            body = self.server.table(match.group('coords'),
+                                     parse_qs(match.group('query') or ''))
+        except ValueError as e:
+            self.send_json({'code': 'InvalidQuery', 'message': str(e)},
+                           status=400)
+            return
+        self.send_json(body)
+
+    def do_POST(self):
+        """the commands of the routing service (run, stop, build, remove)"""
+        length = int(self.headers.get('Content-Length') or 0)
+        self.rfile.read(length)
+        self.send_json({'status': 'ok'})
+
+    def send_json(self, body: dict, status: int = 200):
+        content = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        """be quiet"""
+
+
+class OSRMStandinServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self,
+                 address: Tuple[str, int],
+                 speed: float,
+                 detour: float = 1.3,
+                 latency: float = 0):
+        super().__init__(address, OSRMStandinHandler)
+        self.speed = speed
+        self.detour = detour
+        self.latency = latency
+        self.n_requests = 0
+        self.n_pairs = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def decode_coords(coords: str) -> np.ndarray:
+        """the (lon, lat)-coordinates as polyline or separated by `;`"""
+        coords = unquote(coords)
+        if coords.startswith('polyline(') and coords.endswith(')'):
+            return np.array(polyline.decode(coords[9:-1], geojson=True),
+                            dtype=float).reshape(-1, 2)
+        try:
+            return np.array([c.split(',') for c in coords.split(';')],
+                            dtype=float).reshape(-1, 2)
+        except ValueError:
+            raise ValueError(f'invalid coordinates {coords[:50]}')
+
+    @staticmethod
+    def decode_indices(params: Dict[str, List[str]],
+                       key: str,
+                       n_coords: int) -> np.ndarray:
+        value = params.get(key, ['all'])[0]
+        if value == 'all':
+            return np.arange(n_coords)
+        indices = np.array(value.split(';'), dtype=int)
+        if len(indices) and (indices.min() < 0 or indices.max() >= n_coords):
+            raise ValueError(f'{key} out of range')
+        return indices
+
+    def table(self, coords: str, params: Dict[str, List[str]]) -> dict:
+        """the durations (s) and distances (m) between sources and
+        destinations"""
+        if self.latency:
+            time.sleep(self.latency)
+        points = self.decode_coords(coords)
+        sources = self.decode_indices(params, 'sources', len(points))
+        destinations = self.decode_indices(params, 'destinations', len(points))
+        src = points[sources]
+        dst = points[destinations]
+        distances = haversine(src[:, :1], src[:, 1:],
+                              dst[:, 0], dst[:, 1]) * self.detour
+        durations = distances / (self.speed / 3.6)
+        with self._lock:
+            self.n_requests += 1
+            self.n_pairs += distances.size
+        annotations = params.get('annotations', ['duration'])[0].split(',')
+        body = {'code': 'Ok',
+                'sources': [{'location': p} for p in src.tolist()],
+                'destinations': [{'location': p} for p in dst.tolist()], }
+        if 'duration' in annotations:
+            body['durations'] = np.round(durations, 1).tolist()
+        if 'distance' in annotations:
+            body['distances'] = np.round(distances, 1).tolist()
+        return body
+
+
+class OSRMStandin:
+    """
+    a lightweight local stand-in for the OSRM routing server of a mode to
+    benchmark and test the routers without building a network
+
+    the server runs in a thread, `latency` seconds are added to each
+    table request to simulate the network and the routing time
+    """
+
+    def __init__(self,
+                 mode: Mode,
+                 speed: float = None,
+                 detour: float = 1.3,
+                 latency: float = 0,
+                 host: str = '127.0.0.1',
+                 port: int = 0):
+        self.mode = mode
+        self.server = OSRMStandinServer((host, port),
+                                        speed=speed or MODE_SPEED[mode],
+                                        detour=detour,
+                                        latency=latency)
+        self._thread = None
+
+    @property
+    def host(self) -> str:
+        return self.server.server_address[0]
+
+    @property
+    def port(self) -> int:
+        return self.server.server_address[1]
+
+    @property
+    def n_requests(self) -> int:
+        return self.server.n_requests
+
+    @property
+    def n_pairs(self) -> int:
+        return self.server.n_pairs
+
+    @property
+    def routing_settings(self) -> dict:
+        """the settings of the mode in `OSRM_ROUTING` pointing to the
+        stand-in"""
+        alias = settings.OSRM_ROUTING.get(self.mode.name, {}).get(
+            'alias', MODE_ROUTERS[self.mode])
+        return {'alias': alias,
+                'host': self.host,
+                'service_port': self.port,
+                'routing_port': self.port, }
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever,
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self) -> 'OSRMStandin':
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+@contextmanager
+def osrm_standins(modes: List[Mode] = [Mode.WALK, Mode.BIKE, Mode.CAR],
+                  **kwargs) -> Dict[Mode, OSRMStandin]:
+    """start stand-ins for the modes and point the routers to them"""
+    with ExitStack() as stack:
+        standins = {mode: stack.enter_context(OSRMStandin(mode, **kwargs))
+                    for mode in modes}
+        osrm_routing = dict(settings.OSRM_ROUTING)
+        for mode, standin in standins.items():
+            osrm_routing[mode.name] = standin.routing_settings
+        stack.enter_context(override_settings(OSRM_ROUTING=osrm_routing))
+        yield standins
@@ -5,10 +5,10 @@ import pandas as pd
 import numpy as np
 from django.db import connection, transaction
 from django.db.utils import ProgrammingError
-from django.db.models import Max, Sum, F
+from django.db.models import Max, Sum, F, Q, Count
 from django.conf import settings
 
-from datentool_backend.area.models import Area, AreaLevel
+from datentool_backend.area.models import Area, AreaLevel, AreaOverlap
 from datentool_backend.population.models import (
     PopulationRaster,
     AreaCell,
@@ -17,12 +17,22 @@ from datentool_backend.population.models import (
     AreaPopulationAgeGender,
     RasterCellPopulationAgeGender,
     RasterCellPopulation)
+from datentool_backend.demand.models import CellDemandCache
+from datentool_backend.indicators.models import IndicatorResult
+from datentool_backend.indicators.prewarm import schedule_prewarm
 from datentool_backend.utils.raw_delete import delete_chunks
 from datentool_backend.utils.excel_template import write_template_df
 
 import logging
 logger = logging.getLogger('population')
 
+# overlaps below this share are ignored as inaccuracies of the boundaries
+MIN_OVERLAP_SHARE = 0.01
+# only areas lying in another area up to the numerical inaccuracy of the
+# intersection are treated as contained in it, so that the population rolled
+# up from them equals the one aggregated from the cells
+NESTING_TOLERANCE = 1e-6
+
 
 def disaggregate_population(population: Population,
                             use_intersected_data: bool=False,
@@ -122,6 +132,11 @@ def disaggregate_population(population: Population,
                           log_level=logging.DEBUG)
         logger.info(f'{i + n_inserted:n}/{n_rows:n} {model_name}-Einträgen geschrieben')
 
+    # the materialized demand has to be derived from the new population
+    CellDemandCache.invalidate(population_ids=[population.id])
+    IndicatorResult.invalidate()
+    schedule_prewarm()
+
     return msg
 
 
@@ -218,6 +233,85 @@ def intersect_areas_with_raster(
         logger.info(f'{i + n_inserted:n}/{n_rows:n} {model_name}-Einträgen geschrieben')
 
 
+def intersect_area_levels(areas: List[Area]):
+    """
+    compute the overlaps of the areas with the areas of the other area levels
+    in both directions, already existing overlaps of the areas are replaced
+    """
+    area_ids = list(areas.values_list('id', flat=True))
+    if not area_ids:
+        return
+    existing = AreaOverlap.objects.filter(Q(area__in=area_ids) |
+                                          Q(overlapping_area__in=area_ids))
+    delete_chunks(existing, logger)
+
+    area_tbl = Area._meta.db_table
+    # pairs of two of the given areas are inserted only once
+    query = f'''WITH i AS (
+    SELECT a."id" AS "a_id", b."id" AS "b_id",
+    st_area(st_transform(st_intersection(a."geom", b."geom"), 3035)) AS "m2",
+    st_area(st_transform(a."geom", 3035)) AS "m2_a",
+    st_area(st_transform(b."geom", 3035)) AS "m2_b"
+    FROM "{area_tbl}" a
+    JOIN "{area_tbl}" b
+    ON st_intersects(a."geom", b."geom")
+    AND a."area_level_id" <> b."area_level_id"
+    WHERE a."id" = ANY(%s)
+    AND NOT (b."id" = ANY(%s) AND b."id" < a."id")
+    )
+    INSERT INTO "{AreaOverlap._meta.db_table}"
+    ("area_id", "overlapping_area_id", "share")
+    SELECT i."a_id", i."b_id", LEAST(i."m2" / i."m2_a", 1)
+    FROM i WHERE i."m2_a" > 0 AND i."m2" / i."m2_a" >= %s
+    UNION ALL
+    SELECT i."b_id", i."a_id", LEAST(i."m2" / i."m2_b", 1)
+    FROM i WHERE i."m2_b" > 0 AND i."m2" / i."m2_b" >= %s
+    '''
+    params = (area_ids, area_ids, MIN_OVERLAP_SHARE, MIN_OVERLAP_SHARE)
+    with connection.cursor() as cursor:
+        cursor.execute(query, params)
+        logger.debug(f'{cursor.rowcount:n} Überschneidungen mit den Gebieten '
+                     'anderer Gebietseinheiten gefunden')
+
+
+def get_nested_area_level(area_level: AreaLevel,
+                          population: Population) -> AreaLevel:
+    """
+    an area level with the population aggregated already, whose areas lie
+    completely in the areas of the given area level and cover them,
+    None if there is none
+    """
+    candidates = AreaLevel.objects\
+        .exclude(id=area_level.id)\
+        .filter(populationarealevel__population=population,
+                populationarealevel__up_to_date=True)\
+        .annotate(n_areas=Count('area', distinct=True))\
+        .filter(n_areas__gt=0)\
+        .order_by('n_areas')
+    n_areas = Area.objects.filter(area_level=area_level).count()
+    if not n_areas:
+        return None
+    for candidate in candidates:
+        overlaps = AreaOverlap.objects.filter(
+            area__area_level=candidate,
+            overlapping_area__area_level=area_level)
+        # no area of the candidate may be split up
+        if overlaps.filter(share__lt=1 - NESTING_TOLERANCE).exists():
+            continue
+        # the areas of the level have to be covered completely
+        n_covered = AreaOverlap.objects\
+            .filter(area__area_level=area_level,
+                    overlapping_area__area_level=candidate)\
+            .values('area_id')\
+            .annotate(covered=Sum('share'))\
+            .filter(covered__gte=1 - NESTING_TOLERANCE)\
+            .count()
+        if n_covered < n_areas:
+            continue
+        return candidate
+    return None
+
+
 def aggregate_many(area_levels, populations, drop_constraints=False):
 
     manager = AreaPopulationAgeGender.copymanager
@@ -250,6 +344,48 @@ def aggregate_many(area_levels, populations, drop_constraints=False):
 
 def aggregate_population(area_level: AreaLevel, population: Population,
                          drop_constraints=False):
+    """
+    aggregate the population to the areas of the area level, rolled up from
+    the areas of a nested area level if possible or from the raster cells
+    """
+    columns = ['population_id', 'area_id', 'age_group_id', 'gender_id', 'value']
+    nested_level = get_nested_area_level(area_level, population)
+    if nested_level:
+        logger.debug(f'Bevölkerung aus Gebietseinheit {nested_level.name} '
+                     'hochgerechnet')
+        rows = rollup_population(nested_level, area_level, population)
+    else:
+        rows = aggregate_population_from_cells(area_level, population)
+    df_areaagegender = pd.DataFrame(rows, columns=columns)
+
+    ap_exist = AreaPopulationAgeGender.objects\
+        .filter(population=population, area__area_level=area_level)
+    delete_chunks(ap_exist, logger)
+
+    model = AreaPopulationAgeGender
+    model_name = model._meta.object_name
+    n_rows = len(df_areaagegender)
+    logger.debug(f'Schreibe insgesamt {n_rows:n} Einträge')
+    stepsize = settings.STEPSIZE
+    for i in np.arange(0, n_rows, stepsize, dtype=np.int64):
+        chunk = df_areaagegender.iloc[i:i + stepsize]
+        n_inserted = len(chunk)
+        write_template_df(chunk, model, logger,
+                          drop_constraints=drop_constraints,
+                          log_level=logging.DEBUG)
+        logger.debug(f'{i + n_inserted:n}/{n_rows:n} {model_name}-Einträgen geschrieben')
+
+    # validate_cache
+    pop_arealevel, created = PopulationAreaLevel.objects.get_or_create(
+        population=population,
+        area_level=area_level)
+    pop_arealevel.up_to_date = True
+    pop_arealevel.save()
+
+
+def aggregate_population_from_cells(area_level: AreaLevel,
+                                    population: Population) -> List[tuple]:
+    """the population by age group and gender summed up from the cells"""
     acells = AreaCell.objects.filter(area__area_level=area_level)
 
     rasterpop = RasterCellPopulationAgeGender.objects.filter(population=population)
@@ -280,33 +416,42 @@ def aggregate_population(area_level: AreaLevel, population: Population,
 
     params = p_acells + p_pop + p_rcp
 
-    columns = ['population_id', 'area_id', 'age_group_id', 'gender_id', 'value']
-
     with connection.cursor() as cursor:
         cursor.execute(query, params)
-        rows = cursor.fetchall()
-    df_areaagegender = pd.DataFrame(rows, columns=columns)
-
-    ap_exist = AreaPopulationAgeGender.objects\
-        .filter(population=population, area__area_level=area_level)
-    delete_chunks(ap_exist, logger)
-
-    model = AreaPopulationAgeGender
-    model_name = model._meta.object_name
-    n_rows = len(df_areaagegender)
-    logger.debug(f'Schreibe insgesamt {n_rows:n} Einträge')
-    stepsize = settings.STEPSIZE
-    for i in np.arange(0, n_rows, stepsize, dtype=np.int64):
-        chunk = df_areaagegender.iloc[i:i + stepsize]
-        n_inserted = len(chunk)
-        write_template_df(chunk, model, logger,
-                          drop_constraints=drop_constraints,
-                          log_level=logging.DEBUG)
-        logger.debug(f'{i + n_inserted:n}/{n_rows:n} {model_name}-Einträgen geschrieben')
+        return cursor.fetchall()
+
+
+def rollup_population(nested_level: AreaLevel,
+                      area_level: AreaLevel,
+                      population: Population) -> List[tuple]:
+    """
+    the population by age group and gender summed up from the areas of the
+    nested area level lying in the areas of the area level
+    """
+    areapop = AreaPopulationAgeGender.objects.filter(
+        population=population, area__area_level=nested_level)
+    overlaps = AreaOverlap.objects.filter(
+        area__area_level=nested_level,
+        overlapping_area__area_level=area_level,
+        share__gte=1 - NESTING_TOLERANCE)
+    q_areapop, p_areapop = areapop.values(
+        'population_id', 'area_id', 'age_group_id', 'gender_id', 'value')\
+        .query.sql_with_params()
+    q_overlaps, p_overlaps = overlaps.values(
+        'area_id', 'overlapping_area_id').query.sql_with_params()
 
-    # validate_cache
-    pop_arealevel, created = PopulationAreaLevel.objects.get_or_create(
-        population=population,
-        area_level=area_level)
-    pop_arealevel.up_to_date = True
-    pop_arealevel.save()
+    query = f'''SELECT
+      ap."population_id",
+      o."overlapping_area_id" AS "area_id",
+      ap."age_group_id",
+      ap."gender_id",
+      SUM(ap."value") AS "value"
+    FROM ({q_areapop}) AS ap
+    JOIN ({q_overlaps}) AS o ON o."area_id" = ap."area_id"
+    GROUP BY ap."population_id", o."overlapping_area_id",
+    ap."age_group_id", ap."gender_id"
+    '''
+    params = p_areapop + p_overlaps
+    with connection.cursor() as cursor:
+        cursor.execute(query, params)
+        return cursor.fetchall()
@@ -11,6 +11,7 @@ from rest_framework import status
 from rest_framework.response import Response
 
 from datentool_backend.site.models import ProcessScope, ProcessState
+from datentool_backend.logging.profiling import profile
 
 import channels.layers
 
@@ -166,7 +167,8 @@ class ProtectedProcessManager:
         self.init_calculation()
         if self._run_sync:
             try:
-                func(*args, logger=self.logger, **kwargs)
+                with self.profile(func):
+                    func(*args, logger=self.logger, **kwargs)
             finally:
                 self.reset_state()
         else:
@@ -177,4 +179,11 @@ class ProtectedProcessManager:
         async_task(self._async_func_wrapper, *args, kwargs, hook=self.finish)
 
     def _async_func_wrapper(self, *args):
-        self._async_func(*args[:-1], **args[-1])
+        with self.profile(self._async_func):
+            self._async_func(*args[:-1], **args[-1])
+
+    def profile(self, func):
+        '''profile the process, if profiling is enabled in the settings'''
+        name = f'{self.scope.name.lower()}.{getattr(func, "__name__", func)}'
+        return profile('process', name,
+                       user=getattr(self.me, 'profile', None))
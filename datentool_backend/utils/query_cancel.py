@@ -0,0 +1,169 @@
+import asyncio
+import threading
+from contextlib import contextmanager, nullcontext
+
+from django.db import connection, connections, transaction, OperationalError
+from rest_framework.exceptions import APIException
+
+# SQLSTATE of a query canceled by a statement timeout or pg_cancel_backend
+QUERY_CANCELED = '57014'
+
+
+class QueryTimeout(APIException):
+    status_code = 503
+    default_detail = ('Die Berechnung hat zu lange gedauert und wurde '
+                      'abgebrochen')
+    default_code = 'query_timeout'
+
+
+class QueryCancelled(APIException):
+    # nginx' code for a request closed by the client, nobody will receive it
+    status_code = 499
+    default_detail = 'Die Anfrage wurde vom Client abgebrochen'
+    default_code = 'query_cancelled'
+
+
+def is_query_canceled(error: Exception) -> bool:
+    """check if the database error was raised by a canceled query"""
+    if not isinstance(error, OperationalError):
+        return False
+    cause = error.__cause__
+    pgcode = getattr(cause, 'pgcode', None) or getattr(cause, 'sqlstate', None)
+    return pgcode == QUERY_CANCELED
+
+
+@contextmanager
+def statement_timeout(seconds: float = None):
+    """
+    abort the queries running longer than `seconds` within the enclosed
+    block. The setting is changed for the session and restored afterwards.
+    Outside of a transaction the block is not wrapped in one, so that the
+    short transactions within it (e.g. the row locks of the caches) end as
+    before. Inside of a transaction the block runs in a savepoint, so that
+    the transaction survives an aborted query
+    """
+    if not seconds:
+        yield
+        return
+    in_transaction = connection.in_atomic_block
+    with transaction.atomic() if in_transaction else nullcontext():
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT current_setting('statement_timeout')")
+            previous = cursor.fetchone()[0]
+            cursor.execute("SELECT set_config('statement_timeout', %s, false)",
+                           [f'{int(seconds * 1000)}ms'])
+        failed = False
+        try:
+            yield
+        except Exception:
+            failed = True
+            raise
+        finally:
+            # in a failed savepoint the setting is reverted by its rollback
+            if not (failed and in_transaction) and \
+               not connection.needs_rollback:
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT set_config('statement_timeout', %s, false)",
+                        [previous])
+
+
+class DisconnectWatchdog:
+    """
+    cancel the queries of the database connection of the current thread,
+    when the event signalling the disconnect of the client is set.
+    The running query is canceled with pg_cancel_backend from a separate
+    connection, the following queries are not executed any more
+    """
+    interval = 0.2
+
+    def __init__(self, disconnected: threading.Event = None):
+        self.disconnected = disconnected
+        self.cancelled = False
+        self._done = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def __enter__(self) -> 'DisconnectWatchdog':
+        if self.disconnected is None:
+            return self
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_backend_pid()')
+            self._pid = cursor.fetchone()[0]
+        self._wrapper = connection.execute_wrapper(self.check)
+        self._wrapper.__enter__()
+        self._thread = threading.Thread(target=self.watch, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        if self._thread is None:
+            return
+        self._done.set()
+        self._thread.join()
+        self._wrapper.__exit__(None, None, None)
+
+    def check(self, execute, sql, params, many, context):
+        """do not start new queries after the disconnect"""
+        if self.disconnected.is_set():
+            self.cancelled = True
+            raise QueryCancelled()
+        return execute(sql, params, many, context)
+
+    def watch(self):
+        while not self._done.is_set():
+            if self.disconnected.wait(self.interval):
+                if not self._done.is_set():
+                    self.cancel()
+                return
+
+    def cancel(self):
+        """cancel the running query of the watched connection"""
+        self.cancelled = True
+        # a new connection is opened for this thread
+        conn = connections['default']
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT pg_cancel_backend(%s)', [self._pid])
+        finally:
+            conn.close()
+
+
+def get_disconnect_event(request) -> threading.Event:
+    """the event set by the DisconnectMiddleware, None if not served by it"""
+    scope = getattr(request, 'scope', None) or {}
+    return scope.get('client_disconnected')
+
+
+class DisconnectMiddleware:
+    """
+    ASGI middleware signalling a disconnect of the client during a http
+    request with the threading.Event `scope['client_disconnected']`, so that
+    the synchronous views running in a thread can abort their work
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        disconnected = threading.Event()
+        queue = asyncio.Queue()
+
+        async def listen():
+            # forward the messages to the app, which stops reading
+            # after the body
+            while True:
+                message = await receive()
+                await queue.put(message)
+                if message['type'] == 'http.disconnect':
+                    disconnected.set()
+                    return
+
+        listener = asyncio.ensure_future(listen())
+        try:
+            await self.app(dict(scope, client_disconnected=disconnected),
+                           queue.get, send)
+        finally:
+            listener.cancel()
@@ -19,10 +19,17 @@ def delete_chunks(qs: QuerySet,
         return
     if hasattr(model, 'remove_n_rels'):
         model.remove_n_rels(qs)
+    # restrict the deletes of partitioned tables to the affected partitions
+    partition_filter = {}
+    keys = getattr(getattr(model, '_partitioning_meta', None), 'key', [])
+    if len(keys) == 1:
+        partitions = list(qs.order_by().values_list(keys[0], flat=True)
+                          .distinct())
+        partition_filter = {f'{keys[0]}__in': partitions}
     logger.debug(f'Lösche insgesamt {n_rows:n} {model_name}-Einträge')
     for i in np.arange(0, n_rows, stepsize, dtype=np.int64):
         chunk = ids[i:i + stepsize]
-        qs_chunk = model.objects.filter(id__in=chunk)
+        qs_chunk = model.objects.filter(id__in=chunk, **partition_filter)
         n_deleted = qs_chunk._raw_delete(using=qs_chunk.db)
         logger.log(log_level, f'{i + n_deleted:n}/{n_rows:n} {model_name}'
                    '-Einträgen gelöscht')
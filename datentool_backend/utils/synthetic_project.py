@@ -0,0 +1,619 @@
+import logging
+from io import StringIO
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+import pyproj
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.gis.geos import Polygon, MultiPolygon
+from django.db import transaction
+from django.db.models import Model
+
+from datentool_backend.utils.copy_postgres import DirectCopyMapping
+from datentool_backend.site.models import Year, ProjectSetting
+from datentool_backend.area.models import (AreaLevel,
+                                           Area,
+                                           AreaAttribute,
+                                           AreaField,
+                                           FieldType,
+                                           FieldTypes)
+from datentool_backend.population.models import (Raster,
+                                                 PopulationRaster,
+                                                 RasterCell,
+                                                 RasterCellPopulation,
+                                                 RasterCellPopulationAgeGender,
+                                                 AreaCell,
+                                                 Prognosis,
+                                                 Population,
+                                                 PopulationEntry)
+from datentool_backend.demand.models import (Gender,
+                                             AgeGroup,
+                                             DemandRateSet,
+                                             DemandRate,
+                                             CellDemandCache)
+from datentool_backend.demand.constants import RegStatAgeGroups
+from datentool_backend.infrastructure.models import Infrastructure, Service
+from datentool_backend.places.models import (Place,
+                                             Capacity,
+                                             PlanningProcess,
+                                             Scenario)
+from datentool_backend.modes.models import (Mode,
+                                            ModeVariant,
+                                            ModeVariantStatistic,
+                                            Network,
+                                            MODE_SPEED,
+                                            MODE_MAX_DISTANCE)
+from datentool_backend.indicators.models import (MatrixCellPlace,
+                                                 NearestPlaceCache)
+from datentool_backend.user.models import Profile
+
+logger = logging.getLogger(__name__)
+
+
+def copy_dataframe(model: Model, df: pd.DataFrame) -> int:
+    """load the rows of the dataframe into the table of the model with COPY"""
+    if not len(df):
+        return 0
+    with StringIO() as file:
+        df.to_csv(file, index=False)
+        file.seek(0)
+        return DirectCopyMapping(model, file, None).save(silent=True)
+
+
+class SyntheticProject:
+    """
+    create a reproducible synthetic project of a given size to benchmark
+    the indicators on realistic amounts of data
+
+    the cells of a LAEA-raster are populated around randomly placed towns,
+    the area levels are regular blocks of cells, the places are drawn
+    weighted by the population and the travel times are derived from the
+    air distance with a random detour. All bulk data is loaded with COPY.
+    """
+    # lower left corner of the raster in EPSG:3035
+    ORIGIN = (4200000, 3000000)
+    CELL_SIZE = 100
+    # factors applied to the air distance to get the distance on the network
+    DETOUR = (1.1, 1.6)
+    # share of the places with a capacity for a service of its infrastructure
+    P_CAPACITY = 0.8
+    # share of the places with a capacity changing in a prognosis year
+    P_CHANGE = 0.3
+    # share of the places with changed capacities per scenario
+    P_SCENARIO_CHANGE = 0.1
+
+    def __init__(self,
+                 n_cells: int = 10000,
+                 n_places: int = 200,
+                 n_infrastructures: int = 2,
+                 n_services: int = 2,
+                 n_years: int = 10,
+                 base_year: int = 2022,
+                 n_scenarios: int = 2,
+                 n_area_levels: int = 3,
+                 modes: List[Mode] = [Mode.WALK, Mode.BIKE, Mode.CAR],
+                 max_distance: Dict[Mode, float] = None,
+                 owner: str = 'benchmark',
+                 seed: int = 0,
+                 logger: logging.Logger = logger):
+        self.n_cells = n_cells
+        self.n_places = n_places
+        self.n_infrastructures = n_infrastructures
+        self.n_services = n_services
+        self.n_years = n_years
+        self.base_year = base_year
+        self.n_scenarios = n_scenarios
+        self.n_area_levels = n_area_levels
+        self.modes = modes
+        self.max_distance = dict(MODE_MAX_DISTANCE)
+        self.max_distance.update(max_distance or {})
+        self.owner = owner
+        self.rng = np.random.default_rng(seed)
+        self.logger = logger
+        self.counts: Dict[str, int] = {}
+
+        self.n_east = int(np.ceil(np.sqrt(n_cells)))
+        self.n_north = int(np.ceil(n_cells / self.n_east))
+        self.to_3857 = pyproj.Transformer.from_crs(3035, 3857, always_xy=True)
+
+    @staticmethod
+    def has_data() -> bool:
+        """check if there are already cells, areas or places"""
+        return (RasterCell.objects.exists()
+                or Area.objects.exists()
+                or Place.objects.exists())
+
+    @staticmethod
+    def truncate():
+        """remove the data of the project"""
+        for model in [RasterCell, AreaLevel, Infrastructure, PlanningProcess,
+                      Population, Prognosis, NearestPlaceCache,
+                      CellDemandCache]:
+            model.truncate()
+        MatrixCellPlace.invalidate_caches()
+
+    def create(self) -> Dict[str, int]:
+        """create the project, return the number of created rows by table"""
+        with transaction.atomic():
+            self.create_base_data()
+            self.create_raster()
+            self.create_areas()
+            self.create_population()
+            self.create_infrastructures()
+            self.create_scenarios()
+            self.create_places()
+            self.create_capacities()
+            self.create_matrices()
+        return self.counts
+
+    def copy(self, model: Model, df: pd.DataFrame):
+        """copy the dataframe to the model and count the rows"""
+        n_rows = copy_dataframe(model, df)
+        name = model._meta.object_name
+        self.counts[name] = self.counts.get(name, 0) + n_rows
+
+    def laea_to_ewkt(self, east: np.ndarray, north: np.ndarray) -> List[str]:
+        """points in EPSG:3035 as EWKT in EPSG:3857"""
+        x, y = self.to_3857.transform(east, north)
+        return [f'SRID=3857;POINT({xi:.2f} {yi:.2f})' for xi, yi in zip(x, y)]
+
+    def rectangles_to_ewkt(self,
+                           east0: np.ndarray,
+                           north0: np.ndarray,
+                           east1: np.ndarray,
+                           north1: np.ndarray,
+                           multi: bool = False) -> List[str]:
+        """rectangles in EPSG:3035 as polygons in EPSG:3857"""
+        corners_e = np.stack([east0, east0, east1, east1, east0], axis=1)
+        corners_n = np.stack([north0, north1, north1, north0, north0], axis=1)
+        x, y = self.to_3857.transform(corners_e.ravel(), corners_n.ravel())
+        x = x.reshape(corners_e.shape)
+        y = y.reshape(corners_n.shape)
+        geom_type, rings = ('MULTIPOLYGON', '((({})))') if multi \
+            else ('POLYGON', '(({}))')
+        return [f'SRID=3857;{geom_type}' + rings.format(
+            ','.join(f'{xi:.2f} {yi:.2f}' for xi, yi in zip(xr, yr)))
+            for xr, yr in zip(x, y)]
+
+    def create_base_data(self):
+        """years, genders, age groups and the prognosis"""
+        years = range(self.base_year, self.base_year + self.n_years)
+        Year.objects.exclude(year=self.base_year).update(is_default=False)
+        for year in years:
+            Year.objects.update_or_create(
+                year=year,
+                defaults=dict(is_default=year == self.base_year,
+                              is_real=year == self.base_year,
+                              is_prognosis=year > self.base_year))
+        self.years = list(Year.objects.filter(year__in=years).order_by('year'))
+
+        if not Gender.objects.exists():
+            Gender.objects.create(name='männlich')
+            Gender.objects.create(name='weiblich')
+        self.genders = list(Gender.objects.order_by('id'))
+
+        if not AgeGroup.objects.exists():
+            for age_group in RegStatAgeGroups.agegroups:
+                AgeGroup.objects.create(from_age=age_group.from_age,
+                                        to_age=age_group.to_age)
+        self.age_groups = list(AgeGroup.objects.order_by('from_age'))
+
+        self.prognosis = Prognosis.objects.create(name='Benchmark-Prognose',
+                                                  is_default=True)
+
+    def create_raster(self):
+        """raster cells and the population of the inhabited cells"""
+        raster, created = Raster.objects.get_or_create(name='LAEA-Raster')
+        self.popraster = PopulationRaster.objects.filter(raster=raster,
+                                                         default=True).first()
+        if not self.popraster:
+            self.popraster = PopulationRaster.objects.create(
+                raster=raster, name='Benchmark-Raster', default=True)
+
+        i = np.arange(self.n_cells)
+        self.row = i // self.n_east
+        self.col = i % self.n_east
+        east = self.ORIGIN[0] + self.col * self.CELL_SIZE
+        north = self.ORIGIN[1] + self.row * self.CELL_SIZE
+        cellcodes = [f'100mN{n // 100:05d}E{e // 100:05d}'
+                     for n, e in zip(north, east)]
+        half = self.CELL_SIZE / 2
+        df_cells = pd.DataFrame({
+            'raster_id': raster.id,
+            'cellcode': cellcodes,
+            'pnt': self.laea_to_ewkt(east + half, north + half),
+            'poly': self.rectangles_to_ewkt(east, north,
+                                            east + self.CELL_SIZE,
+                                            north + self.CELL_SIZE), })
+        self.copy(RasterCell, df_cells)
+        self.cell_ids = np.fromiter(
+            RasterCell.objects.filter(raster=raster).order_by('id')
+            .values_list('id', flat=True), dtype=np.int64)
+
+        # towns with a gaussian population density and scattered villages
+        density = np.ones(self.n_cells)
+        n_towns = max(1, self.n_cells // 5000)
+        for _ in range(n_towns):
+            row, col = self.rng.uniform(0, self.n_north), \
+                self.rng.uniform(0, self.n_east)
+            sigma = self.rng.uniform(5, 25)
+            peak = self.rng.uniform(20, 120)
+            d2 = (self.row - row) ** 2 + (self.col - col) ** 2
+            density += peak * np.exp(-d2 / (2 * sigma ** 2))
+        inhabited = self.rng.random(self.n_cells) < np.clip(density / 15,
+                                                            0.1, 1)
+        # the census publishes only cells with at least 3 inhabitants
+        self.pop = np.where(inhabited, self.rng.poisson(density) + 3, 0)\
+            .astype(float)
+        self.inhabited = np.flatnonzero(self.pop > 0)
+
+        df_rcp = pd.DataFrame({'popraster_id': self.popraster.id,
+                               'cell_id': self.cell_ids[self.inhabited],
+                               'value': self.pop[self.inhabited], })
+        self.copy(RasterCellPopulation, df_rcp)
+        self.rcp_ids = np.fromiter(
+            RasterCellPopulation.objects.filter(popraster=self.popraster)
+            .order_by('id').values_list('id', flat=True), dtype=np.int64)
+
+        e0, n0 = self.ORIGIN
+        e1 = e0 + self.n_east * self.CELL_SIZE
+        n1 = n0 + self.n_north * self.CELL_SIZE
+        project_area = MultiPolygon(Polygon.from_bbox((e0, n0, e1, n1)),
+                                    srid=3035)
+        project_area.transform(3857)
+        project_setting, created = ProjectSetting.objects.get_or_create(pk=1)
+        project_setting.project_area = project_area
+        project_setting.save()
+        self.logger.info(f'{self.n_cells:n} Rasterzellen, davon '
+                         f'{len(self.inhabited):n} bewohnt')
+
+    def create_areas(self):
+        """area levels with regular blocks of cells, the finest is the
+        population level"""
+        str_field, created = FieldType.objects.get_or_create(
+            name='Zeichenkette', ftype=FieldTypes.STRING,
+            defaults=dict(is_preset=True))
+        AreaLevel.objects.update(is_default_pop_level=False)
+        self.area_index: List[np.ndarray] = []
+        self.area_ids: List[np.ndarray] = []
+        self.area_levels: List[AreaLevel] = []
+        for k in range(self.n_area_levels):
+            is_pop_level = k == self.n_area_levels - 1
+            area_level = AreaLevel.objects.create(
+                name=f'Benchmark-Ebene {k + 1}',
+                order=k,
+                is_pop_level=is_pop_level,
+                is_default_pop_level=is_pop_level,
+                is_statistic_level=is_pop_level)
+            label_field = AreaField.objects.create(
+                area_level=area_level, name='gen', field_type=str_field,
+                is_label=True)
+            key_field = AreaField.objects.create(
+                area_level=area_level, name='ags', field_type=str_field,
+                is_key=True)
+
+            n_blocks_e = min(self.n_east, 2 ** (k + 1))
+            n_blocks_n = min(self.n_north, 2 ** (k + 1))
+            block_e = self.col * n_blocks_e // self.n_east
+            block_n = self.row * n_blocks_n // self.n_north
+            index = block_n * n_blocks_e + block_e
+            blocks = np.unique(index)
+            b_e, b_n = blocks % n_blocks_e, blocks // n_blocks_e
+            # first and last column and row of the blocks
+            col0 = -(-b_e * self.n_east // n_blocks_e)
+            col1 = -(-(b_e + 1) * self.n_east // n_blocks_e)
+            row0 = -(-b_n * self.n_north // n_blocks_n)
+            row1 = -(-(b_n + 1) * self.n_north // n_blocks_n)
+            e0, n0 = self.ORIGIN
+            df_areas = pd.DataFrame({
+                'area_level_id': area_level.id,
+                'is_cut': False,
+                'geom': self.rectangles_to_ewkt(
+                    e0 + col0 * self.CELL_SIZE, n0 + row0 * self.CELL_SIZE,
+                    e0 + col1 * self.CELL_SIZE, n0 + row1 * self.CELL_SIZE,
+                    multi=True), })
+            self.copy(Area, df_areas)
+            ids = np.fromiter(Area.objects.filter(area_level=area_level)
+                              .order_by('id').values_list('id', flat=True),
+                              dtype=np.int64)
+            area_ids = np.full(n_blocks_e * n_blocks_n, -1, dtype=np.int64)
+            area_ids[blocks] = ids
+
+            df_attrs = pd.concat([
+                pd.DataFrame({'area_id': ids,
+                              'field_id': label_field.id,
+                              'str_value': [f'Gebiet {k + 1}.{i + 1}'
+                                            for i in range(len(ids))], }),
+                pd.DataFrame({'area_id': ids,
+                              'field_id': key_field.id,
+                              'str_value': [f'{k + 1}{i:06d}'
+                                            for i in range(len(ids))], }),
+            ])
+            self.copy(AreaAttribute, df_attrs)
+
+            # the areas are aligned to the cells, so every inhabited cell
+            # lies completely in one area
+            cell_area = index[self.inhabited]
+            pop = self.pop[self.inhabited]
+            area_pop = np.bincount(cell_area, weights=pop,
+                                   minlength=len(area_ids))
+            df_areacells = pd.DataFrame({
+                'area_id': area_ids[cell_area],
+                'rastercellpop_id': self.rcp_ids,
+                'share_area_of_cell': 1.0,
+                'share_cell_of_area': pop / area_pop[cell_area], })
+            self.copy(AreaCell, df_areacells)
+
+            self.area_index.append(index)
+            self.area_ids.append(area_ids)
+            self.area_levels.append(area_level)
+        self.logger.info(f'{self.n_area_levels} Gebietseinteilungen mit '
+                         f'{self.counts.get("Area", 0):n} Gebieten')
+
+    def create_population(self):
+        """population by cell, age group and gender for the base year and
+        the prognosis years and the population entries of the population
+        level"""
+        n_ag, n_g = len(self.age_groups), len(self.genders)
+        widths = np.array([min(ag.to_age, 90) - ag.from_age + 1
+                           for ag in self.age_groups], dtype=float)
+        # age structure varies between the areas of the coarsest level
+        regions = self.area_index[0]
+        n_regions = regions.max() + 1
+        age_shares = self.rng.dirichlet(widths * 20, size=n_regions)
+        gender_shares = np.full((n_ag, n_g), 1 / n_g)
+        if n_g == 2:
+            female = np.array([0.6 if ag.from_age >= 75 else 0.5
+                               for ag in self.age_groups])
+            gender_shares = np.stack([1 - female, female], axis=1)
+        # annual growth rate of the age groups, the older ones grow
+        growth = self.rng.normal(0, 0.01, n_ag) + \
+            np.linspace(-0.01, 0.02, n_ag)
+
+        pop_level_index = self.area_index[-1]
+        pop_area_ids = self.area_ids[-1]
+        cell_area = pop_level_index[self.inhabited]
+        ag_ids = np.array([ag.id for ag in self.age_groups])
+        g_ids = np.array([g.id for g in self.genders])
+        step = max(1, settings.STEPSIZE // (n_ag * n_g))
+
+        for t, year in enumerate(self.years):
+            population = Population.objects.create(
+                year=year,
+                prognosis=self.prognosis if t else None,
+                popraster=self.popraster)
+            population.genders.set(self.genders)
+            factor = (1 + growth) ** t
+            area_values = np.zeros((len(pop_area_ids), n_ag, n_g))
+            for i in range(0, len(self.inhabited), step):
+                cells = self.inhabited[i:i + step]
+                values = self.pop[cells, None, None] \
+                    * age_shares[regions[cells], :, None] \
+                    * gender_shares[None, :, :] \
+                    * factor[None, :, None]
+                np.add.at(area_values, pop_level_index[cells], values)
+                n = len(cells)
+                df = pd.DataFrame({
+                    'population_id': population.id,
+                    'cell_id': np.repeat(self.cell_ids[cells], n_ag * n_g),
+                    'age_group_id': np.tile(np.repeat(ag_ids, n_g), n),
+                    'gender_id': np.tile(g_ids, n * n_ag),
+                    'value': values.ravel(), })
+                self.copy(RasterCellPopulationAgeGender, df)
+
+            areas = np.unique(cell_area)
+            df_entries = pd.DataFrame({
+                'population_id': population.id,
+                'area_id': np.repeat(pop_area_ids[areas], n_ag * n_g),
+                'age_group_id': np.tile(np.repeat(ag_ids, n_g), len(areas)),
+                'gender_id': np.tile(g_ids, len(areas) * n_ag),
+                'value': area_values[areas].ravel(), })
+            self.copy(PopulationEntry, df_entries)
+        self.logger.info(f'Bevölkerung für {len(self.years)} Jahre')
+
+    def create_infrastructures(self):
+        """mode variants, infrastructures, services and demand rates"""
+        missing = [mode for mode in self.modes
+                   if not ModeVariant.objects.filter(mode=mode,
+                                                     is_default=True).exists()]
+        if missing:
+            network = Network.objects.filter(is_default=True).first()
+            if network:
+                for mode in missing:
+                    ModeVariant(network=network, mode=mode,
+                                is_default=True).save()
+            else:
+                Network(name='Benchmark', is_default=True)\
+                    .save(modes2create=missing)
+        self.variants = [ModeVariant.objects.get(mode=mode, is_default=True)
+                         for mode in self.modes]
+
+        # the partitions of the matrices are created when saving
+        # the infrastructures
+        self.infrastructures = []
+        self.services: Dict[int, List[Service]] = {}
+        demand_rates = []
+        n_ag, n_g = len(self.age_groups), len(self.genders)
+        for i in range(self.n_infrastructures):
+            infrastructure = Infrastructure.objects.create(
+                name=f'Benchmark-Infrastruktur {i + 1}', order=i)
+            self.infrastructures.append(infrastructure)
+            services = []
+            for j in range(self.n_services):
+                service = Service.objects.create(
+                    name=f'Leistung {i + 1}.{j + 1}',
+                    infrastructure=infrastructure,
+                    quota_type='Plätze',
+                    demand_type=Service.DemandType.QUOTA)
+                services.append(service)
+                drs = DemandRateSet.objects.create(
+                    name=f'Standard {service.name}',
+                    service=service,
+                    is_default=True)
+                # the demand is concentrated on some adjacent age groups
+                first = self.rng.integers(0, n_ag - 1)
+                last = min(n_ag, first + self.rng.integers(1, 5))
+                rates = np.full((n_ag, n_g), 0.01)
+                rates[first:last] = self.rng.uniform(0.3, 0.9,
+                                                     (last - first, n_g))
+                for t, year in enumerate(self.years):
+                    for a, age_group in enumerate(self.age_groups):
+                        for g, gender in enumerate(self.genders):
+                            demand_rates.append(
+                                (year.id, age_group.id, gender.id, drs.id,
+                                 rates[a, g] * (1 + 0.005 * t)))
+            self.services[infrastructure.id] = services
+        self.copy(DemandRate, pd.DataFrame(
+            demand_rates, columns=['year_id', 'age_group_id', 'gender_id',
+                                   'demand_rate_set_id', 'value']))
+
+    def create_scenarios(self):
+        """a planning process with the scenarios"""
+        user, created = User.objects.get_or_create(username=self.owner)
+        profile, created = Profile.objects.get_or_create(user=user)
+        process = PlanningProcess.objects.create(name='Benchmark',
+                                                 owner=profile,
+                                                 allow_shared_change=False)
+        process.infrastructures.set(self.infrastructures)
+        # the scenarios get the default prognosis, demand rates and modes
+        self.scenarios = [Scenario.objects.create(name=f'Szenario {s + 1}',
+                                                  planning_process=process)
+                          for s in range(self.n_scenarios)]
+
+    def create_places(self):
+        """places in the inhabited cells, weighted by the population, and
+        some new places in each scenario"""
+        p = self.pop[self.inhabited] / self.pop[self.inhabited].sum()
+        n_per_infra = np.full(self.n_infrastructures,
+                              self.n_places // self.n_infrastructures)
+        n_per_infra[:self.n_places % self.n_infrastructures] += 1
+        n_new = max(1, self.n_places // 20)
+        places = []
+        for infrastructure, n in zip(self.infrastructures, n_per_infra):
+            scenario_ids = [None] * n
+            for scenario in self.scenarios:
+                scenario_ids += [scenario.id] * n_new
+            n_total = len(scenario_ids)
+            cells = self.rng.choice(self.inhabited, size=n_total, p=p)
+            east = self.ORIGIN[0] + (self.col[cells]
+                                     + self.rng.random(n_total)) \
+                * self.CELL_SIZE
+            north = self.ORIGIN[1] + (self.row[cells]
+                                      + self.rng.random(n_total)) \
+                * self.CELL_SIZE
+            df = pd.DataFrame({
+                'name': [f'{infrastructure.name} - Ort {i + 1}'
+                         for i in range(n_total)],
+                'infrastructure_id': infrastructure.id,
+                'geom': self.laea_to_ewkt(east, north),
+                'scenario_id': pd.array(scenario_ids, dtype='Int64'), })
+            self.copy(Place, df)
+            df['id'] = np.fromiter(
+                Place.objects.filter(infrastructure=infrastructure)
+                .order_by('id').values_list('id', flat=True), dtype=np.int64)
+            df['east'] = east
+            df['north'] = north
+            places.append(df[['id', 'infrastructure_id', 'scenario_id',
+                              'east', 'north']])
+        self.places = pd.concat(places, ignore_index=True)
+        self.logger.info(f'{len(self.places):n} Standorte')
+
+    def create_capacities(self):
+        """capacities changing over the years and in the scenarios"""
+        capacities = []
+        prognosis_years = [year.year for year in self.years[1:]]
+        for place in self.places.itertuples():
+            services = self.services[place.infrastructure_id]
+            scenario_id = None if pd.isna(place.scenario_id) \
+                else int(place.scenario_id)
+            for service in services:
+                if self.rng.random() > self.P_CAPACITY:
+                    continue
+                capacity = float(self.rng.integers(10, 200))
+                if scenario_id is not None:
+                    capacities.append((place.id, service.id, capacity,
+                                       0, 99999999, scenario_id))
+                    continue
+                if prognosis_years and self.rng.random() < self.P_CHANGE:
+                    year = int(self.rng.choice(prognosis_years))
+                    # the place may close
+                    changed = float(self.rng.choice([0, capacity * 0.5,
+                                                     capacity * 1.5]))
+                    capacities.append((place.id, service.id, capacity,
+                                       0, year - 1, None))
+                    capacities.append((place.id, service.id, changed,
+                                       year, 99999999, None))
+                else:
+                    capacities.append((place.id, service.id, capacity,
+                                       0, 99999999, None))
+                for scenario in self.scenarios:
+                    if self.rng.random() < self.P_SCENARIO_CHANGE:
+                        changed = float(self.rng.choice([0, capacity * 2]))
+                        capacities.append((place.id, service.id, changed,
+                                           0, 99999999, scenario.id))
+        df = pd.DataFrame(capacities,
+                          columns=['place_id', 'service_id', 'capacity',
+                                   'from_year', 'to_year', 'scenario_id'])
+        df['scenario_id'] = df['scenario_id'].astype('Int64')
+        self.copy(Capacity, df)
+
+    def create_matrices(self):
+        """travel times between the inhabited cells and the places within
+        the maximum distance of the mode"""
+        grid = np.full((self.n_north, self.n_east), -1, dtype=np.int64)
+        grid[self.row[self.inhabited], self.col[self.inhabited]] = \
+            self.inhabited
+        e0, n0 = self.ORIGIN
+        size = self.CELL_SIZE
+        chunk_size = settings.STEPSIZE * 5
+
+        for variant in self.variants:
+            max_distance = self.max_distance[variant.mode]
+            # km/h to meters per minute
+            speed = MODE_SPEED[variant.mode] * 1000 / 60
+            radius = int(np.ceil(max_distance / size))
+            for infrastructure in self.infrastructures:
+                places = self.places[
+                    self.places['infrastructure_id'] == infrastructure.id]
+                partition_id = f'{{{variant.id},{infrastructure.id}}}'
+                chunks, n_rows = [], 0
+                for place in places.itertuples():
+                    row = int((place.north - n0) // size)
+                    col = int((place.east - e0) // size)
+                    cells = grid[max(row - radius, 0):row + radius + 1,
+                                 max(col - radius, 0):col + radius + 1]
+                    cells = cells[cells >= 0]
+                    dist = np.hypot(
+                        e0 + (self.col[cells] + 0.5) * size - place.east,
+                        n0 + (self.row[cells] + 0.5) * size - place.north)
+                    within = dist <= max_distance
+                    cells, dist = cells[within], dist[within]
+                    detour = self.rng.uniform(*self.DETOUR, len(dist))
+                    chunks.append(pd.DataFrame({
+                        'cell_id': self.cell_ids[cells],
+                        'place_id': place.id,
+                        'minutes': dist * detour / speed, }))
+                    n_rows += len(cells)
+                    if n_rows >= chunk_size:
+                        self.copy_matrix(chunks, variant, partition_id)
+                        chunks, n_rows = [], 0
+                self.copy_matrix(chunks, variant, partition_id)
+            ModeVariantStatistic.objects.filter(variant=variant).delete()
+        MatrixCellPlace.invalidate_caches(
+            variant_ids=[variant.id for variant in self.variants])
+        self.logger.info(f'{self.counts.get("MatrixCellPlace", 0):n} '
+                         'Reisezeiten')
+
+    def copy_matrix(self,
+                    chunks: List[pd.DataFrame],
+                    variant: ModeVariant,
+                    partition_id: str):
+        if not chunks:
+            return
+        df = pd.concat(chunks, ignore_index=True)
+        df['variant_id'] = variant.id
+        df['partition_id'] = partition_id
+        self.copy(MatrixCellPlace, df)
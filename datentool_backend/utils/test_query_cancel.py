@@ -0,0 +1,114 @@
+import time
+import asyncio
+import threading
+from unittest import TestCase
+
+from django.db import connection, OperationalError
+from django.test import TransactionTestCase
+from test_plus import APITestCase
+
+from datentool_backend.indicators.compute.base import (ComputeIndicator,
+                                                       ResultSerializer)
+from datentool_backend.utils.query_cancel import (statement_timeout,
+                                                  is_query_canceled,
+                                                  QueryTimeout,
+                                                  QueryCancelled,
+                                                  DisconnectMiddleware)
+
+
+class SleepingIndicator(ComputeIndicator):
+    title = 'Schläfer'
+    result_serializer = ResultSerializer.AREA
+    statement_timeout = 0.2
+
+    def compute(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_sleep(%s)', [self.data['seconds']])
+        return []
+
+
+class TestStatementTimeout(APITestCase):
+
+    def test_statement_timeout(self):
+        with self.assertRaises(OperationalError) as cm:
+            with statement_timeout(0.1):
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT pg_sleep(1)')
+        self.assertTrue(is_query_canceled(cm.exception))
+
+        # the setting is restored afterwards
+        with statement_timeout(0.1):
+            pass
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_sleep(0.2)')
+
+    def test_indicator_timeout(self):
+        self.assertEqual(
+            SleepingIndicator({'seconds': 0})
+            .result()['values'], [])
+        with self.assertRaises(QueryTimeout):
+            SleepingIndicator({'seconds': 1}).result()
+        with self.settings(INDICATOR_STATEMENT_TIMEOUTS={'sleepingindicator': 0}):
+            SleepingIndicator({'seconds': 0.3}).result()
+
+    def test_cancel_on_disconnect(self):
+        disconnected = threading.Event()
+        timer = threading.Timer(0.3, disconnected.set)
+        timer.start()
+        start = time.perf_counter()
+        with self.settings(INDICATOR_STATEMENT_TIMEOUTS={'sleepingindicator': 0}):
+            with self.assertRaises(QueryCancelled):
+                SleepingIndicator({'seconds': 10})\
+                    .result(disconnected=disconnected)
+        self.assertLess(time.perf_counter() - start, 5)
+
+        # no further queries are started after the disconnect
+        with self.assertRaises(QueryCancelled):
+            SleepingIndicator({'seconds': 0}).result(disconnected=disconnected)
+
+
+class TestStatementTimeoutAutocommit(TransactionTestCase):
+
+    def test_no_transaction(self):
+        """outside of a transaction, the block is not wrapped in one"""
+        with statement_timeout(1):
+            self.assertFalse(connection.in_atomic_block)
+
+        # the setting of the session is restored after a timeout
+        with self.assertRaises(OperationalError):
+            with statement_timeout(0.1):
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT pg_sleep(1)')
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_sleep(0.2)')
+
+
+class TestDisconnectMiddleware(TestCase):
+
+    def test_middleware(self):
+        events = {}
+
+        async def app(scope, receive, send):
+            message = await receive()
+            events['body'] = message['body']
+            disconnected = scope['client_disconnected']
+            for i in range(50):
+                if disconnected.is_set():
+                    break
+                await asyncio.sleep(0.01)
+            events['disconnected'] = disconnected.is_set()
+
+        messages = [{'type': 'http.request', 'body': b'data',
+                     'more_body': False},
+                    {'type': 'http.disconnect'}]
+
+        async def receive():
+            await asyncio.sleep(0.05)
+            return messages.pop(0)
+
+        async def send(message):
+            pass
+
+        asyncio.run(DisconnectMiddleware(app)({'type': 'http'},
+                                              receive, send))
+        self.assertEqual(events, {'body': b'data', 'disconnected': True})
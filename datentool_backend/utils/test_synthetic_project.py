@@ -0,0 +1,67 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import Sum
+from test_plus import APITestCase
+
+from datentool_backend.area.models import Area, AreaLevel
+from datentool_backend.population.models import (RasterCell,
+                                                 RasterCellPopulation,
+                                                 RasterCellPopulationAgeGender,
+                                                 AreaCell,
+                                                 Population)
+from datentool_backend.places.models import Place, Capacity
+from datentool_backend.indicators.models import MatrixCellPlace
+
+
+class TestSyntheticProject(APITestCase):
+    """test the generation of the benchmark project"""
+
+    def create(self, **kwargs):
+        params = dict(cells=400, places=20, infrastructures=2, services=2,
+                      years=3, scenarios=2, area_levels=2,
+                      modes=['WALK', 'CAR'], max_distance=1000, seed=1)
+        params.update(kwargs)
+        call_command('createbenchmarkproject', stdout=StringIO(), **params)
+
+    def get_state(self):
+        return (RasterCellPopulation.objects.aggregate(s=Sum('value'))['s'],
+                Capacity.objects.aggregate(s=Sum('capacity'))['s'],
+                MatrixCellPlace.objects.count())
+
+    def test_create_project(self):
+        self.create()
+        self.assertEqual(RasterCell.objects.count(), 400)
+        self.assertEqual(AreaLevel.objects.count(), 2)
+        # 2x2 and 4x4 blocks
+        self.assertEqual(Area.objects.count(), 20)
+        n_inhabited = RasterCellPopulation.objects.count()
+        self.assertEqual(AreaCell.objects.count(), 2 * n_inhabited)
+        # 20 places and 1 new place per scenario and infrastructure
+        self.assertEqual(Place.objects.count(), 24)
+        self.assertEqual(Population.objects.count(), 3)
+
+        # the population of the base year is distributed
+        # to age groups and genders
+        base = Population.objects.get(prognosis__isnull=True)
+        total = RasterCellPopulation.objects.aggregate(s=Sum('value'))['s']
+        by_age_gender = RasterCellPopulationAgeGender.objects\
+            .filter(population=base).aggregate(s=Sum('value'))['s']
+        self.assertAlmostEqual(total, by_age_gender, places=3)
+
+        # every partition of the matrix is filled
+        for place in Place.objects.all():
+            self.assertTrue(MatrixCellPlace.objects.filter(
+                place=place, minutes__lte=30).exists())
+        self.assertFalse(MatrixCellPlace.objects.filter(
+            minutes__gt=1000 * 1.6 / (3.5 * 1000 / 60)).exists())
+
+        # the project is reproducible
+        state = self.get_state()
+        with self.assertRaises(CommandError):
+            self.create()
+        self.create(truncate=True)
+        self.assertEqual(self.get_state(), state)
+        self.create(truncate=True, seed=2)
+        self.assertNotEqual(self.get_state(), state)